@@ -1,6 +1,5 @@
 import flet as ft
 import os
-import threading
 import time
 import yaml
 import logging
@@ -8,13 +7,8 @@ import sqlite3
 from datetime import datetime, timezone
 
 # --- LangChain Importok (Most már az AI motorhoz is kellenek) ---
-from langchain_google_vertexai import ChatVertexAI, HarmCategory, HarmBlockThreshold, VertexAIEmbeddings
-from langchain_chroma import Chroma
-from langchain_community.chat_message_histories.sql import SQLChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
-from langchain_core.runnables import RunnableLambda
+from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.tools import StructuredTool
 from pydantic.v1 import BaseModel, Field
 
@@ -23,7 +17,7 @@ from pydantic.v1 import BaseModel, Field
 # --- Saját modulok importálása ---
 # Most már szükségünk van az összes eszközre is!
 from shared_components import (
-    ATOM_DATA, PROMPTS, message_to_document, chunk_text,
+    ATOM_DATA, PROMPTS, get_token_encoding,
     search_memory_tool, search_knowledge_base_tool, list_uploaded_files_tool,
     set_registry_value, get_registry_value, list_registry_keys,
     read_full_document_tool,
@@ -31,6 +25,23 @@ from shared_components import (
 )
 # from task_dispatcher import TaskDispatcher # Ezt még mindig nem
 from document_processor import process_and_store_document # Erre most már szükség van
+from response_streamer import ThrottledUpdater
+from memory_stores import (CHROMA_CONVERSATION_PATH, CHROMA_DOCS_PATH, COLD_CONVERSATION_COLLECTION, create_embeddings,
+                           create_vector_store, create_chat_history, vector_store_path)
+from warmup import WarmupOrchestrator
+from tool_executor import ToolCallExecutor
+from tool_cache import ToolResultCache
+from query_cache import CachedEmbeddings, SemanticQueryCache
+from model_factory import create_chat_model
+from async_pipeline import AsyncChatPipeline
+from tracing import configure_tracing, span, traced
+from document_reader import read_document_range, DEFAULT_READ_MAX_TOKENS
+from lexical_index import open_lexical_index
+from document_manifest import open_document_manifest
+from document_blob_store import DocumentBlobStore
+from memory_indexer import MemoryIndexer
+from memory_tiering import compact_partitions
+from memory_partitions import PartitionRegistry, PartitionedMemory, PARTITION_METADATA_KEY
 
 # --- Konfiguráció betöltése a YAML fájlból ---
 try:
@@ -41,61 +52,33 @@ except FileNotFoundError:
     print("HIBA: A 'config_aito.yaml' fájl nem található!")
     CONFIG = {}
 
+# --- Nyomkövetés (span-ek a JSONL naplóba, a lassú kérések Chrome trace fájlba) ---
+configure_tracing(CONFIG)
+
 # --- Globális Beállítások ---
 INITIAL_ATOM_ID = "ATOM1"
 
 # --- Hitelesítés (TESZTELVE, OK) ---
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = CONFIG.get('credentials_file', '')
 
-# --- Globális Változók (ideiglenesen None) ---
-google_embeddings = None
-vector_store = None
-docs_vector_store = None
-firestore_history = None
-
-# --- Lokális Memória és Adatbázis Inicializálása (TESZTELVE, OK) ---
-try:
-    LOCAL_DB_PATH = "./aito_local_data"
-    CHROMA_CONVERSATION_PATH = f"{LOCAL_DB_PATH}/chroma_conversations"
-    CHROMA_DOCS_PATH = f"{LOCAL_DB_PATH}/chroma_documents"
-    SQLITE_HISTORY_FILE = f"{LOCAL_DB_PATH}/aito_chat_history.db"
-    os.makedirs(LOCAL_DB_PATH, exist_ok=True)
-
-    print("Google Cloud embedding kliens inicializálása...")
-    google_embeddings = VertexAIEmbeddings(
-        model_name="text-embedding-004",
-        project=CONFIG['project_id'],
-    )
-    print("Embedding kliens inicializálva.")
-
-    vector_store = Chroma(
-        persist_directory=CHROMA_CONVERSATION_PATH,
-        embedding_function=google_embeddings
-    )
-    print(f"Beszélgetés-vektorok sikeresen csatlakoztatva: {CHROMA_CONVERSATION_PATH}")
-    docs_vector_store = Chroma(
-        persist_directory=CHROMA_DOCS_PATH,
-        embedding_function=google_embeddings
-    )
-    print(f"Dokumentum-vektorok sikeresen csatlakoztatva: {CHROMA_DOCS_PATH}")
-
-    connection_string = f"sqlite:///{SQLITE_HISTORY_FILE}"
-    firestore_history = SQLChatMessageHistory(
-        session_id=CONFIG['session_id'],
-        connection=connection_string
-    )
-    print(f"Beszélgetés-napló sikeresen csatlakoztatva: {SQLITE_HISTORY_FILE}")
-    try:
-        initial_messages = firestore_history.messages
-        print(f"{len(initial_messages)} üzenet betöltve a helyi adatbázisból.")
-    except Exception as hist_err:
-        print(f"Figyelmeztetés: Nem sikerült betölteni az előzményeket az adatbázisból: {hist_err}")
-        print("Lehet, hogy az adatbázis még üres vagy a séma nem megfelelő.")
-
-except Exception as e:
-    print(f"!!! KRITIKUS HIBA az inicializálás közben: {e} !!!")
-    import traceback
-    traceback.print_exc()
+# --- Memória és adatbázis ---
+# Az embedding kliens, a Chroma tárolók és az SQLite napló már nem importáláskor épül fel,
+# hanem a main() első kirajzolása után, párhuzamosan a háttérben (lásd WarmupOrchestrator).
+WARMUP_MAX_WORKERS = 4
+
+# Ezek az eszközök csak olvasnak, ezért egy válaszon belül párhuzamosan futhatnak.
+# Az írók (nyilvántartás, jegyzetfüzet, megbeszélés-állapot) sorban futnak.
+READ_ONLY_TOOLS = {
+    "wrapped_search_memory_tool",
+    "wrapped_search_knowledge_base_tool",
+    "wrapped_list_uploaded_files_tool",
+    "wrapped_get_registry_value",
+    "wrapped_list_registry_keys",
+    "wrapped_read_full_document_tool",
+    "wrapped_read_document_range_tool",
+    "wrapped_get_meeting_status",
+    "wrapped_read_notebook",
+}
 
 class MessageBubble(ft.Row):
     def __init__(self, message: HumanMessage or AIMessage):
@@ -106,13 +89,15 @@ class MessageBubble(ft.Row):
         color_name = ATOM_DATA.get(speaker, {}).get("color", "BLACK")
         bubble_color = getattr(ft.Colors, color_name, ft.Colors.BLACK)
 
+        self.display_speaker = display_speaker
+        self.markdown = ft.Markdown(
+            f"**{display_speaker}:** {message.content}" if display_speaker != "Te" else message.content,
+            extension_set="gitHubWeb", # Ez egy robusztus, általános Markdown értelmező
+            code_theme="atom-one-dark" # Kódrészletekhez szép sötét téma
+        )
         bubble_container = ft.Container(
             content=ft.SelectionArea( # <-- A kijelölhetőség kulcsa
-                content=ft.Markdown(
-                    f"**{display_speaker}:** {message.content}" if display_speaker != "Te" else message.content,
-                    extension_set="gitHubWeb", # Ez egy robusztus, általános Markdown értelmező
-                    code_theme="atom-one-dark" # Kódrészletekhez szép sötét téma
-                )
+                content=self.markdown
             ),
             padding=12, border_radius=ft.border_radius.all(15), expand=True,
         )
@@ -125,6 +110,10 @@ class MessageBubble(ft.Row):
             bubble_container.bgcolor = ft.Colors.with_opacity(0.5, bubble_color) # <-- JAVÍTVA
         self.controls = [bubble_container]
 
+    def set_content(self, text: str):
+        """Lecseréli a buborék szövegét (streamelt válaszokhoz). A page.update() a hívó dolga."""
+        self.markdown.value = f"**{self.display_speaker}:** {text}" if self.display_speaker != "Te" else text
+
 
 class ImageBubble(ft.Row):
     def __init__(self, base64_image: str, speaker: str):
@@ -157,11 +146,36 @@ def main(page: ft.Page):
     print(f"{time.monotonic():.4f}: --- STARTING INITIALIZATION ---")
 
     print(f"{time.monotonic():.4f}: Checking critical components...")
-    if not all(comp is not None for comp in [ATOM_DATA, PROMPTS, CONFIG, vector_store, docs_vector_store, firestore_history]): # <-- FIGYELEM: firestore_history is hozzáadva!
+    if not all(comp is not None for comp in [ATOM_DATA, PROMPTS, CONFIG]):
         page.add(ft.Text("Hiba: Az alkalmazás kritikus komponenseinek betöltése sikertelen!", color=ft.Colors.RED))
         return
     print(f"{time.monotonic():.4f}: Critical components OK.")
 
+    # A lassú komponensek Future-jai. A hívók a warmup.get(...) hívással várnak rájuk,
+    # így a felület már az első kirajzolás után használható.
+    warmup = WarmupOrchestrator(max_workers=CONFIG.get('warmup_max_workers', WARMUP_MAX_WORKERS))
+    tool_executor = ToolCallExecutor.from_config(CONFIG, concurrent_tools=READ_ONLY_TOOLS, name="AITO-Tools")
+    # A dokumentum-eszközök eredményei a tudásbázis következő változásáig újrahasznosíthatók.
+    tool_cache = ToolResultCache.from_config(CONFIG)
+    # A beszélgetés-vektorok írása késleltetett: az üzenetek egy tartós sorból, kötegekben kerülnek a memóriába.
+    # Megbeszélésenként külön memória-partíció (gyűjtemény + napló-session); az alapértelmezett a korábbi közös tár.
+    partition_registry = PartitionRegistry.from_config(CONFIG)
+    partitions = PartitionedMemory(
+        partition_registry,
+        open_vector_store=lambda partition: warmup.get("conversation_store") if partition.is_default else create_vector_store(
+            vector_store_path(CHROMA_CONVERSATION_PATH, CONFIG), warmup.get("embeddings"), collection_name=partition.collection_name),
+        open_chat_history=lambda partition: warmup.get("chat_history") if partition.is_default else create_chat_history(
+            CONFIG, session_id=partition.history_session_id),
+        open_cold_vector_store=lambda partition: warmup.get("conversation_cold_store") if partition.is_default else create_vector_store(
+            vector_store_path(CHROMA_CONVERSATION_PATH, CONFIG), warmup.get("embeddings"), collection_name=partition.cold_collection_name),
+    )
+    memory_indexer = MemoryIndexer.from_config(CONFIG, lambda: warmup.get("conversation_store"), get_partition_store=partitions.vector_store)
+    memory_indexer.start()
+    # A hasonló memória- és tudásbázis-keresések találati listái, a tároló következő írásáig.
+    query_cache = SemanticQueryCache.from_config(CONFIG)
+    # A chat körök a Flet oldal eseményhurkában futnak (page.run_task), kérésenként szál nélkül, explicit korlátokkal.
+    pipeline = AsyncChatPipeline.from_config(CONFIG, tool_executor)
+
 
     # --- FÁJLKEZELŐ ÉS FELTÖLTÉS LOGIKA ---
     def on_document_upload(e: ft.FilePickerResultEvent):
@@ -169,12 +183,13 @@ def main(page: ft.Page):
             uploaded_file_path = e.files[0].path
             print(f"Fájl kiválasztva: {uploaded_file_path}")
 
-            # A feldolgozás elindítása egy külön szálon, hogy a UI ne fagyjon le
-            thread = threading.Thread(
-                target=process_and_store_document,
-                args=(uploaded_file_path, docs_vector_store, CONFIG, page) # <-- page hozzáadva az args-hoz
-            )
-            thread.start()
+            # A feldolgozás a csővezeték korlátos háttérfeladataként fut, hogy a UI ne fagyjon le.
+            # A dokumentum-tárolóra is ott várunk, ha még nem készült el.
+            page.run_task(pipeline.run_background,
+                          lambda: process_and_store_document(uploaded_file_path, warmup.get("docs_store"), CONFIG, page,
+                                                             lexical_index=warmup.get("lexical_index"),
+                                                             manifest=warmup.get("document_manifest"),
+                                                             blob_store=warmup.get("blob_store")))
 
             status_text = f"'{e.files[0].name}' feltöltése és feldolgozása megkezdődött a háttérben."
 
@@ -197,20 +212,62 @@ def main(page: ft.Page):
 
     # === VALÓDI ESZKÖZ CSOMAGOLÓK ===
     # Ezek kellenek a valódi switch_atom-hoz
-    def wrapped_search_memory_tool(query: str) -> str:
-        return search_memory_tool(query=query, config=CONFIG, vector_store=vector_store)
+    def wrapped_search_memory_tool(query: str, search_cold: bool = False, all_partitions: bool = False) -> str:
+        """
+        A beszélgetés-memóriában keres, alapesetben csak az aktuális beszélgetésben (futó megbeszélés alatt
+        a megbeszélés saját memóriájában). Ha más beszélgetések / megbeszélések is kellenek, hívd újra
+        all_partitions=True értékkel. A régebbi időszakokból alapesetben csak napi / megbeszélésenkénti
+        kivonatok találhatók; ha a részletek kellenek, hívd újra search_cold=True értékkel.
+        """
+        partition = partition_registry.active(wrapped_get_meeting_status())
+        # Minden partíciónak saját hideg (tömörített) gyűjteménye van.
+        return search_memory_tool(query=query, config=CONFIG, vector_store=partitions.vector_store(partition.partition_id),
+                                  memory_indexer=memory_indexer, search_cold=search_cold, query_cache=query_cache,
+                                  cold_store=partitions.cold_vector_store(partition.partition_id) if search_cold else None,
+                                  partition_id=partition.partition_id,
+                                  other_partition_stores=partitions.other_vector_stores(partition.partition_id) if all_partitions else None)
     def wrapped_search_knowledge_base_tool(query: str) -> str:
-        return search_knowledge_base_tool(query=query, config=CONFIG, docs_vector_store=docs_vector_store)
+        return tool_cache.get_or_compute("wrapped_search_knowledge_base_tool", {"query": query},
+            lambda: search_knowledge_base_tool(query=query, config=CONFIG, docs_vector_store=warmup.get("docs_store"),
+                                               lexical_index=warmup.get("lexical_index"), query_cache=query_cache))
     def wrapped_list_uploaded_files_tool(filter: str = "ALL") -> str:
-        return list_uploaded_files_tool(config=CONFIG, docs_vector_store=docs_vector_store, filter=filter)
+        return tool_cache.get_or_compute("wrapped_list_uploaded_files_tool", {"filter": filter},
+            lambda: list_uploaded_files_tool(config=CONFIG, docs_vector_store=warmup.get("docs_store"), filter=filter,
+                                             manifest=warmup.get("document_manifest")))
     def wrapped_set_registry_value(key: str, value: str) -> str:
         return set_registry_value(key=key, value=value, config=CONFIG)
     def wrapped_get_registry_value(key: str) -> str:
         return get_registry_value(key=key, config=CONFIG)
     def wrapped_list_registry_keys() -> str:
         return list_registry_keys(config=CONFIG)
+    def missing_document_error(filename: str):
+        # A jegyzékből a vektor-tároló érintése nélkül kiderül, ha a fájl nem létezik.
+        if not warmup.get("document_manifest").exists(filename):
+            return f"Hiba: A '{filename}' nevű dokumentum nem található a tudásbázisban."
+        return None
     def wrapped_read_full_document_tool(filename: str) -> str:
-        return read_full_document_tool(filename=filename, docs_vector_store=docs_vector_store) # <- FIGYELEM: Ezt ki kellett egészítenem a docs_vector_store-ral
+        error = missing_document_error(filename)
+        if error:
+            return error
+        return tool_cache.get_or_compute("wrapped_read_full_document_tool", {"filename": filename},
+            lambda: read_full_document_tool(filename=filename, docs_vector_store=warmup.get("docs_store"),
+                                            blob_store=warmup.get("blob_store"))) # <- FIGYELEM: Ezt ki kellett egészítenem a docs_vector_store-ral
+    def wrapped_read_document_range_tool(filename: str, start_chunk: int = 0, end_chunk: int = 0, start_page: int = 0,
+                                         end_page: int = 0, section: str = "", cursor: str = "", max_tokens: int = 0) -> str:
+        """
+        Egy nagy dokumentum egy részét olvassa be, tokenkereten belül. A tartomány megadható darabszámmal
+        (start_chunk/end_chunk), oldalszámmal (start_page/end_page) vagy fejezetcímmel (section); a 0 vagy üres
+        érték nem szűr. Ha a válasz NEXT_CURSOR sort tartalmaz, a folytatáshoz add vissza a 'cursor' argumentumban.
+        """
+        args = {"filename": filename, "start_chunk": start_chunk, "end_chunk": end_chunk, "start_page": start_page,
+                "end_page": end_page, "section": section, "cursor": cursor, "max_tokens": max_tokens}
+        error = None if cursor else missing_document_error(filename)
+        if error:
+            return error
+        budget = max_tokens or CONFIG.get('document_reader', {}).get('max_tokens', DEFAULT_READ_MAX_TOKENS)
+        return tool_cache.get_or_compute("wrapped_read_document_range_tool", args,
+            lambda: read_document_range(filename, warmup.get("docs_store"), start_chunk, end_chunk, start_page,
+                                        end_page, section, cursor, budget, blob_store=warmup.get("blob_store")))
     def wrapped_set_meeting_status(active: bool, meeting_id: str = "") -> str:
         return set_meeting_status(active=active, meeting_id=meeting_id, config=CONFIG)
     def wrapped_get_meeting_status() -> dict:
@@ -247,17 +304,8 @@ def main(page: ft.Page):
         )
         logging.info("System prompt sikeresen összeállítva.")
 
-        llm = ChatVertexAI(
-            model_name=current_atom_config["model_name"],
-            project=CONFIG['project_id'],
-            location=CONFIG['conversation_location'],
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-            }
-        )
+        llm = create_chat_model(current_atom_config["model_name"], caller="chat", config=CONFIG,
+                                atom_id=selected_atom_id, disable_safety_filters=True)
         logging.info(f"ChatVertexAI kliens inicializálva a '{current_atom_config['model_name']}' modellel, a '{CONFIG['conversation_location']}' régióban.")
 
         # A modellnek már a becsomagolt, egyszerűsített eszközt adjuk át.
@@ -269,6 +317,7 @@ def main(page: ft.Page):
             "wrapped_get_registry_value": wrapped_get_registry_value,
             "wrapped_list_registry_keys": wrapped_list_registry_keys,
             "wrapped_read_full_document_tool": wrapped_read_full_document_tool,
+            "wrapped_read_document_range_tool": wrapped_read_document_range_tool,
             "wrapped_set_meeting_status": wrapped_set_meeting_status,
             "wrapped_get_meeting_status": wrapped_get_meeting_status,
             "wrapped_read_notebook": wrapped_read_notebook,
@@ -281,31 +330,14 @@ def main(page: ft.Page):
         app_state["tool_registry"] = tool_registry
         app_state["base_system_prompt"] = final_system_prompt
 
+        # A láncot nem csomagoljuk history-be: a kör köztes (eszközhívásos) válaszai nem
+        # kerülnek a naplóba, a felhasználó üzenetét és a végleges választ az AsyncChatPipeline menti.
         prompt = ChatPromptTemplate.from_messages([
             ("system", "{system_prompt}"),
             MessagesPlaceholder(variable_name="history"),
-            ("human", "{input}"),
+            MessagesPlaceholder(variable_name="turn_messages"),
         ])
-
-        # --- METADATOK HOZZÁADÁSA A VÁLASZHOZ ---
-        # Ez a kis függvény veszi a modell válaszát (AIMessage) és hozzáadja
-        # a 'name' és 'timestamp' mezőket, MIELŐTT a history-ba kerülne.
-        def add_metadata_to_response(response_message: AIMessage):
-            response_message.name = selected_atom_id
-            response_message.additional_kwargs = {"timestamp": datetime.now(timezone.utc).isoformat()}
-            return response_message
-
-        # A lánc végére fűzzük a metadatokat hozzáadó függvényt
-        chain_with_metadata = prompt | llm_with_tools | RunnableLambda(add_metadata_to_response)
-
-
-        chain_with_history = RunnableWithMessageHistory(
-            chain_with_metadata,
-            lambda session_id: firestore_history,
-            input_messages_key="input",
-            history_messages_key="history",
-        )
-        app_state["atom_chain"] = chain_with_history
+        app_state["atom_chain"] = prompt | llm_with_tools
         print(f"Motor átkonfigurálva: {app_state['active_atom_id']} aktív.")
 
         page.title = f"AITO Vezérlőpult - {app_state['active_atom_id']} Aktív"
@@ -348,104 +380,38 @@ def main(page: ft.Page):
         controls=[upload_button] + list(atom_buttons.values())
     )
 
-    def get_ai_response(user_message: HumanMessage, chain_for_request, atom_id_for_request: str, tool_registry: dict):
-        try:
-            config = {"configurable": {"session_id": CONFIG['session_id']}}
-
-            # === DINAMIKUS RENDSZERÜZENET ÖSSZEÁLLÍTÁSA ===
-            # Aktuális idő lekérdezése
-            current_time_str = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S %Z')
-            time_prompt_addition = f"Current Timestamp: {current_time_str}\n"
-
-            # Aktuális megbeszélés állapotának lekérdezése (ez egy gyors, helyi DB hívás)
-            meeting_status = wrapped_get_meeting_status()
-            meeting_id_str = "None (INACTIVE)"
-            if meeting_status.get('is_active'):
-                meeting_id_str = f"{meeting_status.get('meeting_id')} (ACTIVE)"
-            status_prompt_addition = f"Current Meeting ID: {meeting_id_str}\n\n" # Két sortörés a jobb tagolásért
-
-            # A végleges prompt összeállítása
-            final_system_prompt = time_prompt_addition + status_prompt_addition + app_state["base_system_prompt"]
-            # ============================================
-
-            # A bemenet összeállítása a lánc számára (ez a sor már létezik, csak ellenőrizd)
-            current_input = {
-                "input": user_message.content, # vagy 'tool_messages' a ciklusban
-                "active_atom_role": atom_id_for_request,
-                "system_prompt": final_system_prompt
-            }
-            response = chain_for_request.invoke(current_input, config=config)
-
-            while response.tool_calls:
-                tool_messages = []
-                for tool_call in response.tool_calls:
-                    tool_name = tool_call['name']
-                    logging.info(f"--- {atom_id_for_request} Eszközt Használ: {tool_name}, Argumentumok: {tool_call['args']} ---")
-
-                    if tool_name not in tool_registry:
-                        tool_messages.append(ToolMessage(content=f"Ismeretlen eszköz: {tool_name}", tool_call_id=tool_call['id'], name=tool_name))
-                        continue
-
-                    tool_to_call = tool_registry[tool_name]
-                    tool_output = tool_to_call(**tool_call['args'])
-                    logging.debug(f"Nyers eszköz-kimenet a '{tool_name}' eszköztől: {tool_output}")
-
-                    tool_messages.append(ToolMessage(content=tool_output, tool_call_id=tool_call['id'], name=tool_name))
-
-                # A modell újrahívása az eszközök kimenetével
-                # A rendszerüzenet frissítése itt is megtörténik
-                # === DINAMIKUS RENDSZERÜZENET ÖSSZEÁLLÍTÁSA ===
-                # Aktuális idő lekérdezése
-                current_time_str = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S %Z')
-                time_prompt_addition = f"Current Timestamp: {current_time_str}\n"
-
-                # Aktuális megbeszélés állapotának lekérdezése (ez egy gyors, helyi DB hívás)
-                meeting_status = wrapped_get_meeting_status()
-                meeting_id_str = "None (INACTIVE)"
-                if meeting_status.get('is_active'):
-                    meeting_id_str = f"{meeting_status.get('meeting_id')} (ACTIVE)"
-                status_prompt_addition = f"Current Meeting ID: {meeting_id_str}\n\n" # Két sortörés a jobb tagolásért
-
-                # A végleges prompt összeállítása
-                final_system_prompt = time_prompt_addition + status_prompt_addition + app_state["base_system_prompt"]
-                # ============================================
-                current_input = {
-                    "input": tool_messages, # vagy 'tool_messages' a ciklusban
-                    "active_atom_role": atom_id_for_request,
-                    "system_prompt": final_system_prompt
-                }
-                response = chain_for_request.invoke(current_input, config=config)
-
-            # Ha a ciklus lefutott (vagy nem is volt benne tool_calls), a `response` a végleges szöveges válasz.
-            final_response = response
-            print(f"AI üzenet ({final_response.name}) a láncon keresztül automatikusan mentve (SQLite).")
-
-            # Szöveges válasz feldolgozása és megjelenítése
-            text_chunks = chunk_text(final_response.content)
-            documents_to_add = []
-            meeting_status = wrapped_get_meeting_status()
-            meeting_id = meeting_status.get('meeting_id') if meeting_status.get('is_active') else None
-            for i, chunk in enumerate(text_chunks):
-                doc = message_to_document(
-                    content=chunk,
-                    speaker=final_response.name,
-                    timestamp=final_response.additional_kwargs.get("timestamp"),
-                    session_id=CONFIG['session_id'],
-                    chunk_num=i + 1,
-                    total_chunks=len(text_chunks),
-                    meeting_id=meeting_id
-                )
-                documents_to_add.append(doc)
-            if documents_to_add:
-                vector_store.add_documents(documents_to_add)
-                print(f"AI üzenet {len(documents_to_add)} darabra vágva és a memóriába mentve.")
-
-            page.run_thread(update_ui_with_ai_message, final_response)
+    def build_dynamic_system_prompt() -> str:
+        """Az aktív ATOM rendszerüzenete, kiegészítve az aktuális idővel és a megbeszélés állapotával."""
+        # Aktuális idő lekérdezése
+        current_time_str = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S %Z')
+        time_prompt_addition = f"Current Timestamp: {current_time_str}\n"
 
-        except Exception as ex:
-            logging.error(f"Hiba a get_ai_response függvényben: {ex}", exc_info=True)
-            error_message = AIMessage(content=f"Hiba történt: {ex}", name="SYSTEM_ERROR")
-            page.run_thread(update_ui_with_ai_message, error_message)
+        # Aktuális megbeszélés állapotának lekérdezése (ez egy gyors, helyi DB hívás)
+        meeting_status = wrapped_get_meeting_status()
+        meeting_id_str = "None (INACTIVE)"
+        if meeting_status.get('is_active'):
+            meeting_id_str = f"{meeting_status.get('meeting_id')} (ACTIVE)"
+        status_prompt_addition = f"Current Meeting ID: {meeting_id_str}\n\n" # Két sortörés a jobb tagolásért
+
+        return time_prompt_addition + status_prompt_addition + app_state["base_system_prompt"]
+
+    def store_message_in_vector_memory(message):
+        """
+        A kimenő sorba teszi az üzenetet; a darabolás és az embedding a memória-indexelő
+        háttérszálán történik, így a válasz sosem vár az embedding szolgáltatásra.
+        """
+        meeting_status = wrapped_get_meeting_status()
+        partition = partition_registry.active(meeting_status)
+        metadata = {
+            "speaker": message.name,
+            "timestamp": message.additional_kwargs.get("timestamp"),
+            "session_id": partition.history_session_id,
+        }
+        if meeting_status.get('is_active') and meeting_status.get('meeting_id'):
+            metadata["meeting_id"] = meeting_status.get('meeting_id')
+        if not partition.is_default:
+            metadata[PARTITION_METADATA_KEY] = partition.partition_id
+        return memory_indexer.enqueue(message.content, metadata)
 
     def update_ui_with_ai_message(ai_message: AIMessage):
         if chat_history_view.controls:
@@ -453,6 +419,38 @@ def main(page: ft.Page):
         chat_history_view.controls.append(MessageBubble(ai_message))
         page.update()
 
+    @traced("respond")
+    async def respond(human_message: HumanMessage, response_bubble: MessageBubble):
+        """
+        Egy chat kör az AsyncChatPipeline-on: streameléskor a választ tokenenként írja a
+        'response_bubble'-be (ritkított page.update() hívásokkal), egyébként a végén egyszerre.
+        """
+        updater = ThrottledUpdater(page, response_bubble.set_content)
+        try:
+            # Ha a memória vagy a motor még bemelegszik, itt várunk rá, a hurok blokkolása nélkül.
+            # Futó megbeszélés alatt a kör a megbeszélés saját naplójába (partíciójába) kerül.
+            partition = await pipeline.run_blocking(lambda: partition_registry.active(wrapped_get_meeting_status()))
+            chat_history = await pipeline.run_blocking(partitions.chat_history, partition.partition_id)
+            await pipeline.run_blocking(warmup.get, "atom_engine")
+            atom_id = app_state["active_atom_id"]
+            streamed = CONFIG.get('stream_responses', True)
+            final_response = await pipeline.run_turn(
+                app_state["atom_chain"], human_message, atom_id, app_state["tool_registry"], chat_history,
+                build_dynamic_system_prompt, store_message=store_message_in_vector_memory,
+                on_text=updater.push if streamed else None,
+                on_tool_calls=lambda tool_calls: updater.flush(f"gondolkodik... (eszköz: {', '.join(tool_call['name'] for tool_call in tool_calls)})"))
+            print(f"AI üzenet ({final_response.name}) mentve (SQLite), a vektor-memória indexelése a háttérben.")
+            if streamed:
+                updater.flush(final_response.content)
+            else:
+                update_ui_with_ai_message(final_response)
+        except Exception as ex:
+            logging.error(f"Hiba a respond korutinban: {ex}", exc_info=True)
+            if CONFIG.get('stream_responses', True):
+                updater.flush(f"Hiba történt: {ex}")
+            else:
+                update_ui_with_ai_message(AIMessage(content=f"Hiba történt: {ex}", name="SYSTEM_ERROR"))
+
     def send_click(e):
         user_input_text = input_field.value
         if not user_input_text.strip(): return
@@ -465,38 +463,19 @@ def main(page: ft.Page):
 
         chat_history_view.controls.append(MessageBubble(human_message))
 
-        text_chunks = chunk_text(human_message.content)
-        documents_to_add = []
-        meeting_status = wrapped_get_meeting_status()
-        meeting_id = meeting_status.get('meeting_id') if meeting_status.get('is_active') else None
-        for i, chunk in enumerate(text_chunks):
-            doc = message_to_document(
-                content=chunk,
-                speaker=human_message.name,
-                timestamp=human_message.additional_kwargs.get("timestamp"),
-                session_id=CONFIG['session_id'],
-                chunk_num=i + 1,
-                total_chunks=len(text_chunks),
-                meeting_id=meeting_id
-            )
-            documents_to_add.append(doc)
-
-        if documents_to_add:
-            vector_store.add_documents(documents_to_add)
-            print(f"Üzenet {len(documents_to_add)} darabra vágva és a memóriába mentve.")
-
         if user_input_text.strip().lower() == "exitchatnow":
-            firestore_history.add_message(human_message)
+            warmup.get("chat_history").add_message(human_message)
             os._exit(0)
             return
 
-        input_field.value = ""
-        thinking_bubble = MessageBubble(AIMessage(content="gondolkodik...", name=app_state["active_atom_id"]))
-        chat_history_view.controls.append(thinking_bubble)
-        page.update()
+        with span("send_click", atom=app_state["active_atom_id"], chars=len(user_input_text)):
+            input_field.value = ""
+            thinking_bubble = MessageBubble(AIMessage(content="gondolkodik...", name=app_state["active_atom_id"]))
+            chat_history_view.controls.append(thinking_bubble)
+            page.update()
 
-        thread = threading.Thread(target=get_ai_response, args=(human_message, app_state["atom_chain"], app_state["active_atom_id"], app_state["tool_registry"]))
-        thread.start()
+            # A kör a Flet eseményhurkában fut; a span-ek (a run_task hívás kontextusán át) a send_click alá kerülnek.
+            page.run_task(respond, human_message, thinking_bubble)
 
     def on_keyboard(e: ft.KeyboardEvent):
         if e.key == "Enter" and not e.shift:
@@ -516,21 +495,52 @@ def main(page: ft.Page):
     page.update()
     print(f"{time.monotonic():.4f}: Első Flet UI kirajzolás (page.update) elküldve.")
 
-    try:
-        logging.info("Az első ATOM motorjának beállítása (fő szál)...")
-        switch_atom(INITIAL_ATOM_ID)
-        logging.info("Az első ATOM motorja sikeresen beállítva.")
-    except Exception as e:
-         logging.error(f"HIBA az első switch_atom hívásakor: {e}", exc_info=True)
-         page.add(ft.Text(f"Indítási hiba: {e}", color=ft.Colors.RED))
-         page.update()
+    # --- Bemelegítés: a lassú komponensek párhuzamosan, a háttérben épülnek fel ---
+    # A lekérdezések embeddingje cache-elt: az ATOM-ok ismétlődő keresései nem hívják újra az embedding szolgáltatást.
+    warmup.submit("embeddings", lambda: CachedEmbeddings.from_config(CONFIG, create_embeddings(CONFIG)))
+    warmup.submit("conversation_store", lambda embeddings: create_vector_store(vector_store_path(CHROMA_CONVERSATION_PATH, CONFIG), embeddings), depends_on=["embeddings"])
+    warmup.submit("conversation_cold_store", lambda embeddings: create_vector_store(vector_store_path(CHROMA_CONVERSATION_PATH, CONFIG), embeddings,
+                                                                                 collection_name=COLD_CONVERSATION_COLLECTION), depends_on=["embeddings"])
+    warmup.submit("docs_store", lambda embeddings: create_vector_store(vector_store_path(CHROMA_DOCS_PATH, CONFIG), embeddings), depends_on=["embeddings"])
+    # A BM25 index az első indításkor a meglévő dokumentumdarabokból épül fel (embedding hívás nélkül).
+    warmup.submit("lexical_index", lambda docs_store: open_lexical_index(CONFIG, docs_store), depends_on=["docs_store"])
+    warmup.submit("document_manifest", lambda docs_store: open_document_manifest(docs_store), depends_on=["docs_store"])
+    warmup.submit("blob_store", lambda: DocumentBlobStore.from_config(CONFIG))
+    warmup.submit("chat_history", lambda: create_chat_history(CONFIG))
+    warmup.submit("token_encoding", get_token_encoding)
+    engine_future = warmup.submit("atom_engine", lambda: switch_atom(INITIAL_ATOM_ID))
+    logging.info(f"{time.monotonic():.4f}: Bemelegítés elindítva, az ablak interaktív.")
+
+    def on_engine_ready(future):
+        if future.exception() is not None:
+            logging.error(f"HIBA az első switch_atom hívásakor: {future.exception()}")
+            page.add(ft.Text(f"Indítási hiba: {future.exception()}", color=ft.Colors.RED))
+            page.update()
+    engine_future.add_done_callback(on_engine_ready)
+
+    def report_warmup_timings():
+        all_ready = warmup.wait_all()
+        timings = ", ".join(f"{name}: {seconds:.2f} mp" for name, seconds in warmup.timings().items())
+        logging.info(f"Bemelegítés befejeződött ({'OK' if all_ready else 'HIBÁVAL'}) - {timings}")
+        print(f"{time.monotonic():.4f}: Bemelegítés befejeződött - {timings}")
+
+    def run_memory_tiering():
+        """A régi beszélgetés-vektorok kivonatokba tömörítése partíciónként, a bemelegítés után, a háttérben."""
+        if not CONFIG.get('memory_tiering', {}).get('enabled', True):
+            return
+        try:
+            warmup.wait_all()
+            for partition_id, stats in compact_partitions(CONFIG, partitions).items():
+                logging.info(f"Memória-rétegzés kész ({partition_id}): {stats['groups']} csoport, {stats['moved_vectors']} vektor a hideg gyűjteményben, {stats['digests']} új kivonat.")
+        except Exception as e:
+            logging.error(f"Hiba a memória-rétegzés közben: {e}", exc_info=True)
 
     def initialize_app_in_background():
         """CSAK az előzményeket tölti be a háttérben, THREAD-SAFE módon."""
         logging.info("--- Háttér-előzmény betöltés elindult ---")
         try:
             logging.info("Előzmények betöltése az SQLite adatbázisból...")
-            messages_to_load = firestore_history.messages # Ez lehet lassú
+            messages_to_load = warmup.get("chat_history").messages # Ez lehet lassú
             logging.info(f"{len(messages_to_load)} üzenet sikeresen betöltve az adatbázisból.")
 
             if messages_to_load:
@@ -562,6 +572,8 @@ def main(page: ft.Page):
     # Csak az előzmények betöltését indítjuk a háttérben
     logging.info("Háttér-előzmény betöltési szál indítása...")
     page.run_thread(initialize_app_in_background)
+    page.run_thread(report_warmup_timings)
+    page.run_thread(run_memory_tiering)
     logging.info("Háttérszál elindítva. A main függvény véget ért.")
 
 if __name__ == "__main__":
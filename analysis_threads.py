@@ -1,7 +1,8 @@
 # analysis_threads.py
 
+import logging
 from data_handler import DailyContext
-from langchain_google_vertexai import ChatVertexAI
+from model_factory import create_chat_model
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 
@@ -30,7 +31,7 @@ def run_factual_analysis(context: DailyContext) -> str:
         HumanMessage(content=f"Itt van a {context.date_str} napi kontextus. Kérlek, végezd el a tényszerű elemzést:\n\n{context_string}")
     ])
     
-    llm = ChatVertexAI(model_name="gemini-2.5-pro", project=PROJECT_ID, location=LOCATION)
+    llm = create_chat_model("gemini-2.5-pro", caller="analysis/factual", atom_id="ATOM1", project=PROJECT_ID, location=LOCATION)
     chain = analysis_prompt | llm
     
     # A láncnak már nincs szüksége input változókra, mert a prompt teljes
@@ -56,7 +57,7 @@ def run_thematic_analysis(context: DailyContext) -> str:
         HumanMessage(content=f"Itt van a {context.date_str} napi kontextus. Kérlek, végezd el a tematikus elemzést:\n\n{context_string}")
     ])
     
-    llm = ChatVertexAI(model_name="gemini-2.5-flash", project=PROJECT_ID, location=LOCATION)
+    llm = create_chat_model("gemini-2.5-flash", caller="analysis/thematic", atom_id="ATOM2", project=PROJECT_ID, location=LOCATION)
     chain = analysis_prompt | llm
     response_content = chain.invoke({}).content
     
@@ -81,10 +82,10 @@ def run_insight_analysis(context: DailyContext) -> str:
         HumanMessage(content=f"Itt van a {context.date_str} napi kontextus. Kérlek, add meg a szintézisedet:\n\n{context_string}")
     ])
     
-    llm = ChatVertexAI(model_name="gemini-2.5-pro", project=PROJECT_ID, location=LOCATION)
+    llm = create_chat_model("gemini-2.5-pro", caller="analysis/insight", atom_id="ATOM3", project=PROJECT_ID, location=LOCATION)
     chain = analysis_prompt | llm
     response_content = chain.invoke({}).content
     
     return response_content
 
-print("Elemző szálak modul (analysis_threads.py) v1.1 sikeresen betöltve (specifikáció-hű verzió).")
\ No newline at end of file
+logging.debug("Elemző szálak modul (analysis_threads.py) v1.1 sikeresen betöltve (specifikáció-hű verzió).")
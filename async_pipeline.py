@@ -0,0 +1,160 @@
+# async_pipeline.py
+# Az ATOM chat körök asyncio csővezetéke. Egy kör (felhasználói üzenet -> modellhívások
+# és eszközhívások -> végleges válasz -> mentés) egyetlen korutin a Flet oldal
+# eseményhurkában (page.run_task), így kérésenként nem indul új szál. A modell az
+# ainvoke() / astream() hívásokkal fut, az eszközök a ToolCallExecutor.aexecute()
+# útján, a blokkoló mentések (SQLite napló, memória-indexelő sora) pedig korlátos
+# számban, a hurok alapértelmezett szálkészletén. Az egyidejű körök, modellhívások,
+# írások és háttérfeladatok (pl. dokumentum-feltöltés) száma a config 'async_pipeline'
+# szekciójában állítható.
+
+import asyncio
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from llm_ledger import call_site_config
+from response_streamer import astream_response
+from tool_executor import ToolCallExecutor
+from tracing import span
+
+# Alapértékek (a config 'async_pipeline' szekciója felülírja)
+DEFAULT_MAX_CONCURRENT_TURNS = 8
+DEFAULT_MAX_CONCURRENT_LLM_CALLS = 4
+DEFAULT_MAX_CONCURRENT_WRITES = 2
+DEFAULT_MAX_CONCURRENT_BACKGROUND = 1
+
+class AsyncChatPipeline:
+    """
+    Chat körök egy eseményhurkon, explicit korlátokkal: legfeljebb 'max_concurrent_turns'
+    kör fut egyszerre (a többi sorban áll), ezeken belül legfeljebb 'max_concurrent_llm_calls'
+    modellhívás, 'max_concurrent_writes' mentés és 'max_concurrent_background' háttérfeladat.
+    A várakozó körök nem foglalnak szálat. A szemaforok az első használatkor kötődnek a
+    hurokhoz, ezért egy példányt egyetlen eseményhurokból szabad használni.
+    """
+    def __init__(self, tool_executor: ToolCallExecutor, max_concurrent_turns: int = DEFAULT_MAX_CONCURRENT_TURNS,
+                 max_concurrent_llm_calls: int = DEFAULT_MAX_CONCURRENT_LLM_CALLS,
+                 max_concurrent_writes: int = DEFAULT_MAX_CONCURRENT_WRITES,
+                 max_concurrent_background: int = DEFAULT_MAX_CONCURRENT_BACKGROUND):
+        self.tool_executor = tool_executor
+        self._turns = asyncio.Semaphore(max_concurrent_turns)
+        self._llm_calls = asyncio.Semaphore(max_concurrent_llm_calls)
+        self._writes = asyncio.Semaphore(max_concurrent_writes)
+        self._background = asyncio.Semaphore(max_concurrent_background)
+        # Csak a hurok szálán változik, ezért nem kell zár.
+        self._stats = {"turns": 0, "failed_turns": 0, "active_turns": 0, "peak_active_turns": 0,
+                       "queued_turns": 0, "llm_calls": 0, "active_llm_calls": 0, "peak_llm_calls": 0}
+
+    @classmethod
+    def from_config(cls, config: dict, tool_executor: ToolCallExecutor) -> "AsyncChatPipeline":
+        pipeline_config = config.get('async_pipeline', {})
+        return cls(
+            tool_executor,
+            max_concurrent_turns=pipeline_config.get('max_concurrent_turns', DEFAULT_MAX_CONCURRENT_TURNS),
+            max_concurrent_llm_calls=pipeline_config.get('max_concurrent_llm_calls', DEFAULT_MAX_CONCURRENT_LLM_CALLS),
+            max_concurrent_writes=pipeline_config.get('max_concurrent_writes', DEFAULT_MAX_CONCURRENT_WRITES),
+            max_concurrent_background=pipeline_config.get('max_concurrent_background', DEFAULT_MAX_CONCURRENT_BACKGROUND)
+        )
+
+    async def run_blocking(self, fn: Callable, *args):
+        """Egy rövid, blokkoló hívás (pl. SQLite olvasás, bemelegítésre várás) a hurok szálkészletén."""
+        return await asyncio.to_thread(fn, *args)
+
+    async def persist(self, fn: Callable, *args):
+        """Egy blokkoló írás, legfeljebb 'max_concurrent_writes' egyszerre."""
+        async with self._writes:
+            return await asyncio.to_thread(fn, *args)
+
+    async def run_background(self, fn: Callable, *args):
+        """Egy hosszú háttérfeladat (pl. dokumentum-feldolgozás), legfeljebb 'max_concurrent_background' egyszerre."""
+        async with self._background:
+            return await asyncio.to_thread(fn, *args)
+
+    async def call_model(self, chain, chain_input: dict, config: Optional[dict] = None,
+                         on_text: Optional[Callable[[str], None]] = None, **span_attributes) -> AIMessage:
+        """Egy modellhívás (ainvoke, vagy 'on_text' esetén astream) a modellhívás-korláton belül."""
+        async with self._llm_calls:
+            self._stats["llm_calls"] += 1
+            self._stats["active_llm_calls"] += 1
+            self._stats["peak_llm_calls"] = max(self._stats["peak_llm_calls"], self._stats["active_llm_calls"])
+            try:
+                with span("llm_call", streamed=on_text is not None, **span_attributes) as llm_span:
+                    if on_text:
+                        response = await astream_response(chain, chain_input, config=config, on_text=on_text)
+                    else:
+                        response = await chain.ainvoke(chain_input, config=config)
+                    llm_span.set_attribute("tool_calls", len(response.tool_calls))
+                    return response
+            finally:
+                self._stats["active_llm_calls"] -= 1
+
+    async def run_turn(self, chain, user_message: BaseMessage, atom_id: str, tool_registry: Dict[str, Callable],
+                       chat_history, build_system_prompt: Callable[[], str],
+                       store_message: Optional[Callable[[BaseMessage], object]] = None,
+                       on_text: Optional[Callable[[str], None]] = None,
+                       on_tool_calls: Optional[Callable[[List[dict]], None]] = None) -> AIMessage:
+        """
+        Egy teljes chat kör. A 'chain' a {system_prompt, history, turn_messages} bemenetet várja
+        (history nélküli lánc); a felhasználó üzenetét és a végleges választ a kör maga menti a
+        'chat_history'-ba, a 'store_message' (pl. a memória-indexelő sora) pedig mindkettőt
+        megkapja. Az eszközhívásos köztes válaszok nem kerülnek mentésre.
+        """
+        self._stats["queued_turns"] += 1
+        async with self._turns:
+            self._stats["queued_turns"] -= 1
+            self._stats["turns"] += 1
+            self._stats["active_turns"] += 1
+            self._stats["peak_active_turns"] = max(self._stats["peak_active_turns"], self._stats["active_turns"])
+            try:
+                with span("chat_turn", atom=atom_id, streamed=on_text is not None):
+                    return await self._run_turn(chain, user_message, atom_id, tool_registry, chat_history,
+                                                build_system_prompt, store_message, on_text, on_tool_calls)
+            except Exception:
+                self._stats["failed_turns"] += 1
+                raise
+            finally:
+                self._stats["active_turns"] -= 1
+
+    async def _run_turn(self, chain, user_message, atom_id, tool_registry, chat_history, build_system_prompt,
+                        store_message, on_text, on_tool_calls) -> AIMessage:
+        # A napló (SQLChatMessageHistory) szinkron SQLite motorral fut, ezért a szálkészleten olvassuk és írjuk.
+        history_messages = await self.run_blocking(lambda: chat_history.messages)
+        # A felhasználó üzenetét azonnal naplózzuk, a válasz a végén kerül mellé.
+        await self.persist(chat_history.add_message, user_message)
+        if store_message:
+            await self.persist(store_message, user_message)
+
+        turn_messages = [user_message]
+        for iteration in itertools.count():
+            current_input = {
+                "system_prompt": await self.run_blocking(build_system_prompt),
+                "history": history_messages,
+                "turn_messages": turn_messages,
+            }
+            # Az eszközök kimenetével történő újrahívások a modellhívás-naplóban külön hívási helyen szerepelnek.
+            run_config = call_site_config("chat/tool_loop") if iteration else None
+            response = await self.call_model(chain, current_input, config=run_config, on_text=on_text,
+                                             atom=atom_id, iteration=iteration)
+            if not response.tool_calls:
+                break
+            turn_messages.append(response)
+            if on_tool_calls:
+                on_tool_calls(response.tool_calls)
+            turn_messages.extend(await self.tool_executor.aexecute(response.tool_calls, tool_registry, caller=atom_id))
+
+        final_response = response
+        final_response.name = atom_id
+        final_response.additional_kwargs = {"timestamp": datetime.now(timezone.utc).isoformat()}
+        await self.persist(chat_history.add_message, final_response)
+        if store_message:
+            await self.persist(store_message, final_response)
+        return final_response
+
+    def stats(self) -> dict:
+        """Körök és modellhívások száma, az éppen futók és a sorban állók, valamint a csúcsértékek."""
+        return dict(self._stats)
+
+logging.debug("Asyncio csővezeték modul (async_pipeline.py) betöltve.")
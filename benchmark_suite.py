@@ -0,0 +1,404 @@
+# benchmark_suite.py
+# Hálózat nélküli teljesítménymérés szintetikus korpuszokon, determinisztikus helyi
+# embeddinggel (embedding_backends.HashingEmbeddings) és hamis (fix választ adó) LLM-mel.
+# Minden skála egy ideiglenes munkamappában fut, a valódi ./aito_local_data érintetlen marad.
+#   python benchmark_suite.py                               - 1k üzenet / 10 dokumentum
+#   python benchmark_suite.py --scale 1k,100k,1m --out bench.json
+#   python benchmark_suite.py --messages 5000 --documents 20 --only memory_search,registry
+#   python benchmark_suite.py compare regi.json uj.json      - két futás összevetése
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+from unittest.mock import patch
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+# Skála -> (üzenetek száma, dokumentumok száma)
+SCALES = {
+    "1k": (1_000, 10),
+    "100k": (100_000, 100),
+    "1m": (1_000_000, 1000),
+}
+DEFAULT_SCALE = "1k"
+BENCHMARKS = ["chunk_text", "ingestion", "memory_search", "knowledge_base_search", "history_load", "daily_context", "registry"]
+# Ezek a mérések a tiktoken kódolására épülnek, amelyet a tiktoken első használatkor az internetről tölt le.
+TOKENIZER_BENCHMARKS = {"chunk_text", "ingestion"}
+
+DEFAULT_QUERIES = 50
+DEFAULT_REGISTRY_OPERATIONS = 1000
+DEFAULT_WORDS_PER_DOCUMENT = 3000
+DEFAULT_DIMENSIONS = 256
+DEFAULT_SEED = 42
+# A vektor-tárolóba és az SQLite naplóba ekkora kötegekben töltjük a szintetikus üzeneteket.
+LOAD_BATCH_SIZE = 5000
+MESSAGES_PER_DAY = 500
+
+SPEAKERS = ["benchmark_user", "ATOM1", "ATOM2", "ATOM3", "ATOM4", "ATOM5"]
+VOCABULARY = (
+    "projekt kockázat határidő költségvetés stratégia ügyfél szerződés beszállító minőség ütemterv "
+    "fejlesztés tesztelés kiadás architektúra adatbázis memória dokumentum összefoglaló elemzés javaslat "
+    "döntés prioritás erőforrás kapacitás mérföldkő megbeszélés jelentés mutató bevétel kiadás "
+    "optimalizálás biztonság megfelelőség auditor szabályzat folyamat automatizálás integráció felhő "
+    "szerver hálózat felhasználó visszajelzés igény funkció hiba javítás verzió csapat vezető feladat "
+    "ügynök eszköz keresés index vektor tudásbázis rendszer modell válasz kérdés terv eredmény"
+).split()
+FAKE_SUMMARY = "Szintetikus összefoglaló: a dokumentum a projekt kockázatait, ütemtervét és döntéseit tárgyalja."
+
+def latency_summary(samples: Sequence[float]) -> dict:
+    """Késleltetés-összesítő (mp-ben mért mintákból, ms-ban): darabszám, p50, p99 (legközelebbi rang), átlag, maximum."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    def percentile(fraction):
+        return ordered[max(1, math.ceil(fraction * len(ordered))) - 1] * 1000
+    return {
+        "count": len(ordered), "p50_ms": round(percentile(0.50), 3), "p99_ms": round(percentile(0.99), 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3), "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def _timed(function: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def _timed_tool(function: Callable, *args, **kwargs) -> float:
+    """Egy eszköz futásideje; a hibaüzenettel visszatérő (gyors, de hamis) hívás kivételt dob."""
+    output, elapsed = _timed(function, *args, **kwargs)
+    if str(output).startswith("Hiba"):
+        raise RuntimeError(output)
+    return elapsed
+
+class SyntheticCorpus:
+    """Determinisztikus (a 'seed'-től függő) szintetikus beszélgetés- és dokumentumkorpusz."""
+    def __init__(self, seed: int = DEFAULT_SEED, now: Optional[datetime] = None):
+        self.random = random.Random(seed)
+        self.now = now or datetime.now(timezone.utc)
+
+    def sentence(self, min_words: int = 5, max_words: int = 40) -> str:
+        words = [self.random.choice(VOCABULARY) for _ in range(self.random.randint(min_words, max_words))]
+        if self.random.random() < 0.2:
+            words.append(f"PRJ-{self.random.randint(1000, 9999)}")
+        return " ".join(words).capitalize() + "."
+
+    def messages(self, count: int, session_id: str) -> List[dict]:
+        """'count' üzenet egyenletesen elosztva az utolsó napokon (napi kb. MESSAGES_PER_DAY), a mai nappal bezárólag."""
+        days = max(1, count // MESSAGES_PER_DAY)
+        step = timedelta(days=days) / max(1, count)
+        start = self.now - timedelta(days=days) + step
+        return [{
+            "content": self.sentence(), "speaker": self.random.choice(SPEAKERS),
+            "timestamp": (start + step * index).isoformat(), "session_id": session_id,
+        } for index in range(count)]
+
+    def document(self, index: int, words: int = DEFAULT_WORDS_PER_DOCUMENT) -> str:
+        sections, written = [f"# Szintetikus dokumentum {index + 1}"], 0
+        while written < words:
+            sections.append(f"\n## {self.sentence(2, 5)[:-1]}\n")
+            for _ in range(self.random.randint(2, 5)):
+                paragraph = " ".join(self.sentence() for _ in range(self.random.randint(3, 8)))
+                sections.append(paragraph)
+                written += len(paragraph.split())
+        return "\n".join(sections)
+
+class _HeadlessPage:
+    """A process_and_store_document a kész-üzenetet a UI-nak küldi; a benchmark csak eldobja."""
+    def run_thread(self, handler, *args, **kwargs):
+        pass
+
+def _fake_chat_model(*args, **kwargs):
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    return GenericFakeChatModel(messages=itertools.repeat(AIMessage(content=FAKE_SUMMARY)))
+
+def _tokenizer_unavailable_reason() -> Optional[str]:
+    """None, ha a darabolás tokenizálója betölthető; különben a kihagyás oka (pl. offline gépen)."""
+    import shared_components
+    try:
+        shared_components.get_token_encoding()
+    except Exception as e:
+        return f"a tokenizáló (tiktoken cl100k_base) nem tölthető be (offline gépen a kódolásfájl nincs a gyorsítótárban): {type(e).__name__}"
+    return None
+
+@contextlib.contextmanager
+def _scratch_directory(workdir: Optional[str] = None):
+    """
+    A helyi tárolók (SQLite napló, rendszer-nyilvántartás, Chroma) relatív './aito_local_data'
+    útvonalat használnak, ezért a mérés egy ideiglenes munkamappában fut. A YAML fájlokat
+    (promptok, ATOM-ok) előtte betöltjük, hogy a cache-elt példányok a mappaváltás után is elérhetők legyenek.
+    """
+    from shared_components import get_atom_data, get_prompts
+    get_prompts()
+    get_atom_data()
+    original = os.getcwd()
+    with contextlib.ExitStack() as stack:
+        path = workdir or stack.enter_context(tempfile.TemporaryDirectory(prefix="aito_benchmark_"))
+        os.makedirs(path, exist_ok=True)
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(original)
+            # A Chroma folyamatonként, útvonal szerint gyorsítótárazza a klienseket; a következő skála friss klienst kap.
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+
+class BenchmarkRun:
+    """Egy skála összes mérése, egy ideiglenes munkamappában (lásd _scratch_directory)."""
+    def __init__(self, messages: int, documents: int, queries: int = DEFAULT_QUERIES,
+                 registry_operations: int = DEFAULT_REGISTRY_OPERATIONS, words_per_document: int = DEFAULT_WORDS_PER_DOCUMENT,
+                 dimensions: int = DEFAULT_DIMENSIONS, seed: int = DEFAULT_SEED):
+        self.message_count = messages
+        self.document_count = documents
+        self.query_count = queries
+        self.registry_operations = registry_operations
+        self.words_per_document = words_per_document
+        self.corpus = SyntheticCorpus(seed)
+        self.config = {
+            "session_id": "benchmark_session",
+            "user_id": SPEAKERS[0],
+            "embeddings": {"backend": "local", "dimensions": dimensions},
+            "ingestion": {"chunk_pause_seconds": 0},
+        }
+        self.queries = [self.corpus.sentence(3, 8) for _ in range(queries)]
+        self._docs_store = None
+        self._lexical_index = None
+        self._conversation_store = None
+
+    def _embeddings(self):
+        from memory_stores import create_embeddings
+        return create_embeddings(self.config)
+
+    def _vector_store(self, base_path: str):
+        from memory_stores import create_vector_store, vector_store_path
+        return create_vector_store(vector_store_path(base_path, self.config), self._embeddings())
+
+    # --- Mérések ---
+
+    def bench_chunk_text(self) -> dict:
+        from shared_components import chunk_text
+        texts = [self.corpus.document(index, self.words_per_document) for index in range(max(1, self.document_count))]
+        chunk_text(texts[0][:100])  # A tokenizáló betöltése ne számítson bele.
+        chunks, elapsed = _timed(lambda: sum(len(chunk_text(text)) for text in texts))
+        chars = sum(len(text) for text in texts)
+        return {"documents": len(texts), "chars": chars, "chunks": chunks, "seconds": round(elapsed, 4),
+                "chars_per_second": round(chars / elapsed), "chunks_per_second": round(chunks / elapsed, 2)}
+
+    def bench_ingestion(self) -> dict:
+        import shared_components
+        from document_processor import process_and_store_document
+        from document_manifest import DocumentManifest
+        from document_blob_store import DocumentBlobStore
+        from lexical_index import LexicalIndex
+        from memory_stores import CHROMA_DOCS_PATH
+
+        os.makedirs("documents", exist_ok=True)
+        paths = []
+        for index in range(self.document_count):
+            path = os.path.join("documents", f"synthetic_{index + 1:04d}.md")
+            with open(path, "w", encoding="utf-8") as document_file:
+                document_file.write(self.corpus.document(index, self.words_per_document))
+            paths.append(path)
+        self._docs_store = self._vector_store(CHROMA_DOCS_PATH)
+        # Az alapértelmezett (relatív) útvonalak a munkamappába mutatnak.
+        self._lexical_index = LexicalIndex()
+        manifest = DocumentManifest()
+        blob_store = DocumentBlobStore()
+
+        page = _HeadlessPage()
+        with patch.object(shared_components, "create_chat_model", _fake_chat_model):
+            _, elapsed = _timed(lambda: [process_and_store_document(path, self._docs_store, self.config, page,
+                                                                    lexical_index=self._lexical_index, manifest=manifest,
+                                                                    blob_store=blob_store) for path in paths])
+        chunks = sum(entry["chunk_count"] for entry in manifest.list_documents())
+        if paths and not chunks:
+            # A process_and_store_document a hibákat csak kiírja; itt a mérés érvénytelen.
+            raise RuntimeError("egyetlen darab sem került a tudásbázisba (lásd a --verbose kimenetet)")
+        return {"documents": len(paths), "chunks": chunks, "seconds": round(elapsed, 4),
+                "chunks_per_second": round(chunks / elapsed, 2) if elapsed else 0.0}
+
+    def _conversations(self):
+        """
+        A szintetikus üzenetek betöltése a beszélgetés-vektortárolóba és az SQLite naplóba
+        (egyszer, az első ezt igénylő mérés előtt; nem része a mérésnek).
+        """
+        if self._conversation_store is not None:
+            return self._conversation_store
+        from memory_stores import CHROMA_CONVERSATION_PATH, create_chat_history
+        from shared_components import message_to_document
+        load_start = time.perf_counter()
+        store = self._vector_store(CHROMA_CONVERSATION_PATH)
+        history = create_chat_history(self.config)
+        messages = self.corpus.messages(self.message_count, self.config["session_id"])
+        for start in range(0, len(messages), LOAD_BATCH_SIZE):
+            batch = messages[start:start + LOAD_BATCH_SIZE]
+            store.add_documents([message_to_document(item["content"], item["speaker"], item["timestamp"], item["session_id"])
+                                 for item in batch])
+            history.add_messages([
+                (HumanMessage if item["speaker"] == self.config["user_id"] else AIMessage)(
+                    content=item["content"], name=item["speaker"], additional_kwargs={"timestamp": item["timestamp"]})
+                for item in batch
+            ])
+        self.load_seconds = time.perf_counter() - load_start
+        self._conversation_store = store
+        return store
+
+    def bench_memory_search(self) -> dict:
+        from shared_components import search_memory_tool
+        store = self._conversations()
+        samples = [_timed_tool(search_memory_tool, query, self.config, store) for query in self.queries]
+        return dict(latency_summary(samples), messages=self.message_count, load_seconds=round(self.load_seconds, 4))
+
+    def bench_knowledge_base_search(self) -> dict:
+        from shared_components import search_knowledge_base_tool
+        if self._docs_store is None or not self._docs_store.get(limit=1)["ids"]:
+            return {"skipped": "üres tudásbázis (az 'ingestion' mérés nem futott, kimaradt vagy hibára futott)"}
+        vector = [_timed_tool(search_knowledge_base_tool, query, self.config, self._docs_store) for query in self.queries]
+        hybrid = [_timed_tool(search_knowledge_base_tool, query, self.config, self._docs_store, lexical_index=self._lexical_index)
+                  for query in self.queries]
+        return {"vector": latency_summary(vector), "hybrid": latency_summary(hybrid), "documents": self.document_count}
+
+    def bench_history_load(self) -> dict:
+        from memory_stores import create_chat_history
+        self._conversations()
+        messages, elapsed = _timed(lambda: create_chat_history(self.config).messages)
+        return {"messages": len(messages), "seconds": round(elapsed, 4),
+                "messages_per_second": round(len(messages) / elapsed) if elapsed else 0}
+
+    def bench_daily_context(self) -> dict:
+        from data_handler import create_daily_context_object
+        from memory_stores import create_chat_history
+        self._conversations()
+        history = create_chat_history(self.config)
+        context, elapsed = _timed(create_daily_context_object, "ATOM1", history, days_ago=0)
+        return {"interactions": len(context.interactions), "seconds": round(elapsed, 4)}
+
+    def bench_registry(self) -> dict:
+        from shared_components import get_registry_value, list_registry_keys, set_registry_value
+        keys = [f"benchmark_key_{index}" for index in range(self.registry_operations)]
+        _, set_seconds = _timed(lambda: [set_registry_value(key, f"érték {key}", self.config) for key in keys])
+        _, get_seconds = _timed(lambda: [get_registry_value(key, self.config) for key in keys])
+        list_samples = [_timed(list_registry_keys, self.config)[1] for _ in range(10)]
+        return {"operations": len(keys), "set_per_second": round(len(keys) / set_seconds, 1),
+                "get_per_second": round(len(keys) / get_seconds, 1), "list_keys": latency_summary(list_samples)}
+
+    def run(self, only: Optional[Sequence[str]] = None, workdir: Optional[str] = None) -> Dict[str, dict]:
+        results = {}
+        selected = [name for name in BENCHMARKS if not only or name in only]
+        tokenizer_skip_reason = _tokenizer_unavailable_reason() if TOKENIZER_BENCHMARKS & set(selected) else None
+        with _scratch_directory(workdir):
+            for name in selected:
+                if tokenizer_skip_reason and name in TOKENIZER_BENCHMARKS:
+                    # Más tokenizálóval mért darabolás nem vethető össze a valódival, ezért kihagyjuk.
+                    logging.warning(f"A(z) '{name}' mérés kimarad: {tokenizer_skip_reason}")
+                    results[name] = {"skipped": tokenizer_skip_reason}
+                    continue
+                logging.info(f"Benchmark: {name} ({self.message_count} üzenet, {self.document_count} dokumentum)")
+                try:
+                    results[name] = getattr(self, f"bench_{name}")()
+                except Exception as e:
+                    # Egy mérés hibája nem állítja le a többit.
+                    logging.warning(f"A(z) '{name}' mérés hibára futott: {e}")
+                    results[name] = {"error": f"{type(e).__name__}: {e}"}
+        return results
+
+def run_benchmarks(scales: Dict[str, tuple], only: Optional[Sequence[str]] = None, verbose: bool = False, **options) -> dict:
+    """Az összes megadott skála mérése; a JSON-ba írható eredmény a futtatási környezettel együtt."""
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(),
+        "options": dict(options, only=list(only) if only else None), "results": {},
+    }
+    for label, (messages, documents) in scales.items():
+        # Az eszközök print() kimenete (üzenetenként több sor) csak kérésre jelenik meg.
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            report["results"][label] = BenchmarkRun(messages, documents, **options).run(only=only)
+    return report
+
+def _numeric_metrics(results: dict, prefix: str = ""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from _numeric_metrics(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+def compare_reports(old: dict, new: dict) -> List[str]:
+    """A két futás közös számszerű mutatói, soronként: 'skála mérés.mutató: régi -> új (+x%)'."""
+    lines = []
+    for label, new_results in new.get("results", {}).items():
+        old_metrics = dict(_numeric_metrics(old.get("results", {}).get(label, {})))
+        for metric, value in _numeric_metrics(new_results):
+            if metric in old_metrics:
+                previous = old_metrics[metric]
+                change = f"{(value - previous) / previous * 100:+.1f}%" if previous else "n/a"
+                lines.append(f"{label} {metric}: {previous} -> {value} ({change})")
+    return lines
+
+def print_summary(report: dict):
+    for label, results in report["results"].items():
+        print(f"=== {label} ===")
+        for name, metrics in results.items():
+            print(f"  {name}: {json.dumps(metrics, ensure_ascii=False)}")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Az AITO hálózat nélküli teljesítménymérése szintetikus adatokon.")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "compare"])
+    parser.add_argument("reports", nargs="*", help="compare: a régi és az új JSON eredményfájl")
+    parser.add_argument("--scale", default=DEFAULT_SCALE, help=f"vesszővel elválasztva: {', '.join(SCALES)}")
+    parser.add_argument("--messages", type=int, help="egyedi skála: az üzenetek száma (a --scale helyett)")
+    parser.add_argument("--documents", type=int, default=None, help="egyedi skála: a dokumentumok száma")
+    parser.add_argument("--only", help=f"csak ezek a mérések (vesszővel): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--registry-operations", type=int, default=DEFAULT_REGISTRY_OPERATIONS)
+    parser.add_argument("--words-per-document", type=int, default=DEFAULT_WORDS_PER_DOCUMENT)
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS, help="a helyi embedding mérete")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--out", help="az eredmények JSON fájlja (alapértelmezés: benchmark-<időpont>.json)")
+    parser.add_argument("--verbose", action="store_true", help="az eszközök kimenete is megjelenik")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        if len(args.reports) != 2:
+            parser.error("a 'compare' parancshoz két eredményfájl kell")
+        with open(args.reports[0], encoding="utf-8") as old_file, open(args.reports[1], encoding="utf-8") as new_file:
+            lines = compare_reports(json.load(old_file), json.load(new_file))
+        print("\n".join(lines) if lines else "Nincs közös mutató a két futásban.")
+        return
+
+    if args.messages is not None:
+        scales = {f"{args.messages}m_{args.documents or 0}d": (args.messages, args.documents or 0)}
+    else:
+        unknown = [label for label in args.scale.split(",") if label not in SCALES]
+        if unknown:
+            parser.error(f"ismeretlen skála: {', '.join(unknown)} (választható: {', '.join(SCALES)})")
+        scales = {label: SCALES[label] for label in args.scale.split(",")}
+    only = [name.strip() for name in args.only.split(",")] if args.only else None
+    if only and set(only) - set(BENCHMARKS):
+        parser.error(f"ismeretlen mérés: {', '.join(sorted(set(only) - set(BENCHMARKS)))}")
+
+    report = run_benchmarks(scales, only=only, verbose=args.verbose, queries=args.queries,
+                            registry_operations=args.registry_operations, words_per_document=args.words_per_document,
+                            dimensions=args.dimensions, seed=args.seed)
+    out = args.out or f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, ensure_ascii=False, indent=2)
+    print_summary(report)
+    print(f"Eredmények elmentve: {out}")
+
+logging.debug("Benchmark modul (benchmark_suite.py) betöltve.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
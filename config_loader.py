@@ -0,0 +1,22 @@
+# config_loader.py
+
+import logging
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def load_yaml_file(filename: str) -> dict:
+    """
+    Beolvas egy YAML konfigurációs fájlt, de fájlonként csak egyszer: a további
+    hívások ugyanazt a (megosztott) szótárat kapják. Hiba esetén üres szótárat ad.
+    """
+    import yaml
+    try:
+        with open(filename, 'r', encoding='utf-8') as file:
+            data = yaml.safe_load(file) or {}
+        logging.debug(f"Konfiguráció sikeresen betöltve a '{filename}' fájlból.")
+        return data
+    except Exception as e:
+        logging.error(f"HIBA a '{filename}' YAML fájl olvasása közben: {e}")
+        return {}
+
+logging.debug("Konfiguráció-betöltő modul (config_loader.py) betöltve.")
@@ -1,5 +1,6 @@
 # data_handler.py
 
+import logging
 from dataclasses import dataclass, field
 from typing import List, Dict, Any
 from datetime import datetime, timezone, timedelta
@@ -145,4 +146,4 @@ def create_daily_context_object(
         atom_id=atom_id
     )
 
-print("Adatkezelő modul (data_handler.py) v1.3 sikeresen betöltve (specifikáció-hű, rezonancia-javított verzió).")
\ No newline at end of file
+logging.debug("Adatkezelő modul (data_handler.py) v1.3 sikeresen betöltve (specifikáció-hű, rezonancia-javított verzió).")
@@ -0,0 +1,213 @@
+# document_blob_store.py
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import unicodedata
+import zlib
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+from memory_stores import LOCAL_DB_PATH
+
+BLOB_STORE_PATH = f"{LOCAL_DB_PATH}/document_blobs"
+
+# Alapértékek (a config 'blob_store' szekciója felülírja)
+DEFAULT_BLOCK_CHARS = 64 * 1024
+DEFAULT_COMPRESSION_LEVEL = 9
+
+# Fájlformátum: fejléc, blokktábla, majd a külön-külön tömörített blokkok. Minden blokk
+# (az utolsó kivételével) pontosan block_chars karaktert tartalmaz, így egy karakter-
+# tartomány olvasásához csak az érintett blokkokat kell kicsomagolni.
+BLOB_MAGIC = b"AITOBLOB"
+BLOB_VERSION = 1
+HEADER_FORMAT = "<8sBBII"   # magic, verzió, kodek, block_chars, blokkok száma
+BLOCK_ENTRY_FORMAT = "<QII" # bájt-eltolás, tömörített hossz, karakterhossz
+CODEC_ZSTD = 1
+CODEC_ZLIB = 2
+
+def normalize_text(text: str) -> str:
+    """A tárolt (és darabolt) szöveg egységes alakja: NFC, '\\n' sorvégek."""
+    return unicodedata.normalize("NFC", text.replace("\r\n", "\n").replace("\r", "\n"))
+
+def _compressor(level: int):
+    # A zstandard opcionális: ha nincs telepítve, zlib-bel tömörítünk (a kodek a fejlécben van).
+    try:
+        import zstandard
+    except ImportError:
+        return CODEC_ZLIB, lambda data: zlib.compress(data, min(level, 9))
+    return CODEC_ZSTD, zstandard.ZstdCompressor(level=level).compress
+
+def _decompressor(codec: int):
+    if codec == CODEC_ZSTD:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress
+    if codec == CODEC_ZLIB:
+        return zlib.decompress
+    raise ValueError(f"Ismeretlen tömörítési kodek: {codec}")
+
+class DocumentBlobStore:
+    """
+    A feltöltött dokumentumok normalizált teljes szövegének tartalom-címzett, tömörített
+    tárolója. Egy blob a szöveg SHA-256 hash-e alapján kap helyet (azonos tartalom egyszer
+    tárolódik); a név -> blob hozzárendelést, az oldal- és darab-pozíciókat és a
+    fejezetcímeket egy SQLite index őrzi. Az olvasás memórialeképezéssel (mmap) történik,
+    és csak a kért tartományt lefedő blokkokat csomagolja ki. A vektor-tárolóhoz nem nyúl.
+    """
+    def __init__(self, root: str = BLOB_STORE_PATH, block_chars: int = DEFAULT_BLOCK_CHARS,
+                 compression_level: int = DEFAULT_COMPRESSION_LEVEL):
+        self.root = root
+        self.block_chars = block_chars
+        self.compression_level = compression_level
+        self.index_path = os.path.join(root, "blob_index.db")
+        self._initialize_index()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "DocumentBlobStore":
+        store_config = config.get('blob_store', {})
+        return cls(
+            root=store_config.get('path', BLOB_STORE_PATH),
+            block_chars=store_config.get('block_chars', DEFAULT_BLOCK_CHARS),
+            compression_level=store_config.get('compression_level', DEFAULT_COMPRESSION_LEVEL)
+        )
+
+    def _initialize_index(self):
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        conn = sqlite3.connect(self.index_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS document_blobs (
+                name TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                char_count INTEGER NOT NULL,
+                page_offsets TEXT NOT NULL,
+                chunk_offsets TEXT NOT NULL,
+                headings TEXT NOT NULL,
+                stored_at TEXT NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, "objects", content_hash[:2], f"{content_hash}.blob")
+
+    def _write_blob(self, content_hash: str, text: str):
+        path = self._blob_path(content_hash)
+        if os.path.exists(path):
+            return
+        codec, compress = _compressor(self.compression_level)
+        blocks = [text[start:start + self.block_chars] for start in range(0, len(text), self.block_chars)]
+        payloads = [compress(block.encode("utf-8")) for block in blocks]
+        table_size = struct.calcsize(HEADER_FORMAT) + struct.calcsize(BLOCK_ENTRY_FORMAT) * len(blocks)
+        entries, offset = [], table_size
+        for block, payload in zip(blocks, payloads):
+            entries.append(struct.pack(BLOCK_ENTRY_FORMAT, offset, len(payload), len(block)))
+            offset += len(payload)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as blob_file:
+            blob_file.write(struct.pack(HEADER_FORMAT, BLOB_MAGIC, BLOB_VERSION, codec, self.block_chars, len(blocks)))
+            blob_file.writelines(entries)
+            blob_file.writelines(payloads)
+        os.replace(temp_path, path)
+
+    def put(self, name: str, pages: Sequence[str], chunk_offsets: Sequence[Tuple[int, int]] = (),
+            headings: Sequence[Tuple[int, str]] = ()) -> str:
+        """
+        Eltárolja a dokumentum szövegét (az oldalakat '\\n'-nel összefűzve, normalizálva).
+        'chunk_offsets': a darabok (kezdő, záró) karakterpozíciói; 'headings': (pozíció, cím)
+        párok. A tartalom hash-ét adja vissza.
+        """
+        pages = [normalize_text(page) for page in pages]
+        text = "\n".join(pages)
+        page_offsets, position = [], 0
+        for page in pages:
+            page_offsets.append(position)
+            position += len(page) + 1
+
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self._write_blob(content_hash, text)
+        previous = self.info(name)
+
+        conn = sqlite3.connect(self.index_path)
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO document_blobs
+                (name, content_hash, char_count, page_offsets, chunk_offsets, headings, stored_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (name, content_hash, len(text), json.dumps(page_offsets), json.dumps([list(span) for span in chunk_offsets]),
+                  json.dumps([list(heading) for heading in headings], ensure_ascii=False), datetime.now(timezone.utc).isoformat()))
+        conn.close()
+        if previous and previous["content_hash"] != content_hash:
+            self._remove_blob_if_unused(previous["content_hash"])
+        return content_hash
+
+    def info(self, name: str) -> Optional[dict]:
+        conn = sqlite3.connect(self.index_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM document_blobs WHERE name = ?", (name,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        info = dict(row)
+        for key in ("page_offsets", "chunk_offsets", "headings"):
+            info[key] = json.loads(info[key])
+        return info
+
+    def has(self, name: str) -> bool:
+        return self.info(name) is not None
+
+    def read(self, name: str, start: int = 0, end: Optional[int] = None) -> str:
+        """A dokumentum szövegének [start, end) karaktertartománya (alapértelmezésben az egész)."""
+        info = self.info(name)
+        if info is None:
+            raise KeyError(f"A '{name}' dokumentum nincs a blob-tárolóban.")
+        end = info["char_count"] if end is None else min(end, info["char_count"])
+        if end <= start:
+            return ""
+        with open(self._blob_path(info["content_hash"]), "rb") as blob_file, \
+                mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, codec, block_chars, block_count = struct.unpack_from(HEADER_FORMAT, mapped, 0)
+            if magic != BLOB_MAGIC or version != BLOB_VERSION:
+                raise ValueError(f"Sérült vagy ismeretlen formátumú blob: {info['content_hash']}")
+            decompress = _decompressor(codec)
+            entry_size, table_start = struct.calcsize(BLOCK_ENTRY_FORMAT), struct.calcsize(HEADER_FORMAT)
+            first_block, last_block = start // block_chars, min((end - 1) // block_chars, block_count - 1)
+            parts = []
+            for block in range(first_block, last_block + 1):
+                offset, length, _ = struct.unpack_from(BLOCK_ENTRY_FORMAT, mapped, table_start + block * entry_size)
+                parts.append(decompress(mapped[offset:offset + length]).decode("utf-8"))
+        text = "".join(parts)
+        base = first_block * block_chars
+        return text[start - base:end - base]
+
+    def delete(self, name: str) -> bool:
+        info = self.info(name)
+        if info is None:
+            return False
+        conn = sqlite3.connect(self.index_path)
+        with conn:
+            conn.execute("DELETE FROM document_blobs WHERE name = ?", (name,))
+        conn.close()
+        self._remove_blob_if_unused(info["content_hash"])
+        return True
+
+    def _remove_blob_if_unused(self, content_hash: str):
+        conn = sqlite3.connect(self.index_path)
+        in_use = conn.execute("SELECT 1 FROM document_blobs WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+        conn.close()
+        if not in_use and os.path.exists(self._blob_path(content_hash)):
+            os.remove(self._blob_path(content_hash))
+
+    def list_names(self) -> List[str]:
+        conn = sqlite3.connect(self.index_path)
+        names = [row[0] for row in conn.execute("SELECT name FROM document_blobs ORDER BY name")]
+        conn.close()
+        return names
+
+logging.debug("Dokumentum blob-tároló modul (document_blob_store.py) betöltve.")
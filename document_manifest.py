@@ -0,0 +1,134 @@
+# document_manifest.py
+
+import logging
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from memory_stores import LOCAL_DB_PATH
+
+# A manifest a rendszer-nyilvántartás adatbázisában él (lásd shared_components._get_registry_db_path).
+REGISTRY_DB_FILE = os.path.join(LOCAL_DB_PATH, "system_registry.db")
+
+SUMMARY_PREFIX = "SUM_"
+KIND_ORIGINAL = "ORIGINAL"
+KIND_SUMMARY = "SUMMARY"
+
+STATUS_COMPLETE = "COMPLETE"
+STATUS_PARTIAL = "PARTIAL"
+
+def document_kind(name: str) -> str:
+    return KIND_SUMMARY if name.startswith(SUMMARY_PREFIX) else KIND_ORIGINAL
+
+class DocumentManifest:
+    """
+    A tudásbázis dokumentumainak jegyzéke: név, fajta (eredeti / összefoglaló),
+    darabszám, tokenszám, tartalom-hash, méret és feltöltési idő. A feltöltés és a
+    törlés tranzakcióban frissíti, így a listázás és a létezés-ellenőrzés a
+    dokumentumok számával arányos, és nem kell hozzá a vektor-tárolót végigolvasni.
+    """
+    def __init__(self, db_path: str = REGISTRY_DB_FILE):
+        self.db_path = db_path
+        self._initialize_table()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _initialize_table(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS document_manifest (
+                name TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                token_count INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                ingested_at TEXT NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def record_document(self, name: str, chunk_count: int, token_count: int, content_hash: str = "",
+                        size_bytes: int = 0, complete: bool = True):
+        """Egy (újra)feltöltött dokumentum adatainak rögzítése; a korábbi bejegyzést felülírja."""
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO document_manifest
+                (name, kind, chunk_count, token_count, content_hash, size_bytes, status, ingested_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (name, document_kind(name), chunk_count, token_count, content_hash, size_bytes,
+                  STATUS_COMPLETE if complete else STATUS_PARTIAL, datetime.now(timezone.utc).isoformat()))
+        conn.close()
+
+    def remove_document(self, name: str) -> bool:
+        conn = self._connect()
+        with conn:
+            removed = conn.execute("DELETE FROM document_manifest WHERE name = ?", (name,)).rowcount
+        conn.close()
+        return bool(removed)
+
+    def get_document(self, name: str) -> Optional[dict]:
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM document_manifest WHERE name = ?", (name,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def exists(self, name: str) -> bool:
+        return self.get_document(name) is not None
+
+    def list_documents(self, kind: Optional[str] = None) -> List[dict]:
+        """A dokumentumok név szerint rendezve; 'kind' megadásával csak az eredetiek vagy csak az összefoglalók."""
+        conn = self._connect()
+        if kind:
+            rows = conn.execute("SELECT * FROM document_manifest WHERE kind = ? ORDER BY name", (kind,)).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM document_manifest ORDER BY name").fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def is_empty(self) -> bool:
+        conn = self._connect()
+        row = conn.execute("SELECT 1 FROM document_manifest LIMIT 1").fetchone()
+        conn.close()
+        return row is None
+
+    def rebuild_from_store(self, docs_vector_store) -> int:
+        """
+        A jegyzék feltöltése a vektor-tároló meglévő darabjaiból (a manifest bevezetése
+        előtt feltöltött dokumentumokhoz). Csak a metaadatokat olvassa; a hash és a
+        fájlméret ezeknél ismeretlen marad.
+        """
+        metadatas = docs_vector_store.get(include=["metadatas"]).get('metadatas') or []
+        documents = {}
+        for metadata in metadatas:
+            name = (metadata or {}).get('source_document')
+            if not name:
+                continue
+            entry = documents.setdefault(name, {"chunks": 0, "tokens": 0, "total": 0})
+            entry["chunks"] += 1
+            entry["tokens"] += metadata.get('token_count', 0) - metadata.get('overlap_tokens', 0)
+            entry["total"] = max(entry["total"], metadata.get('total_chunks', 0))
+        for name, entry in documents.items():
+            self.record_document(name, entry["chunks"], entry["tokens"], complete=entry["chunks"] >= entry["total"])
+        logging.info(f"Dokumentum-jegyzék újraépítve a vektor-tárolóból: {len(documents)} dokumentum.")
+        return len(documents)
+
+def open_document_manifest(docs_vector_store=None, db_path: str = REGISTRY_DB_FILE) -> DocumentManifest:
+    """Megnyitja a jegyzéket; ha üres, de a vektor-tárolóban már vannak darabok, feltölti belőlük."""
+    manifest = DocumentManifest(db_path)
+    if manifest.is_empty() and docs_vector_store is not None:
+        try:
+            manifest.rebuild_from_store(docs_vector_store)
+        except Exception as e:
+            logging.error(f"Hiba a dokumentum-jegyzék újraépítése közben: {e}", exc_info=True)
+    return manifest
+
+logging.debug("Dokumentum-jegyzék modul (document_manifest.py) betöltve.")
@@ -1,28 +1,81 @@
 # document_processor.py
 
 import os
+import re
 import time
-import flet as ft
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
+import bisect
+import hashlib
+import logging
 from langchain_core.documents import Document
 from langchain_core.messages import AIMessage
-from shared_components import chunk_text, summarize_document
+from shared_components import chunk_text_with_offsets, summarize_document
+from tool_cache import bump_generation, DOCUMENTS_SCOPE
+from document_blob_store import normalize_text
+from tracing import span, traced, current_span
 
-def create_document_chunk(content: str, source: str, chunk_num: int, total_chunks: int) -> Document:
+MARKDOWN_HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+# Szünet két darab feltöltése között (embedding kvóta); a config 'ingestion.chunk_pause_seconds' felülírja.
+DEFAULT_CHUNK_PAUSE_SECONDS = 5
+
+def create_document_chunk(content: str, source: str, chunk_num: int, total_chunks: int, extra_metadata: dict = None) -> Document:
     """Creates a LangChain Document object for a document chunk."""
+    metadata = {
+        "source_document": source,
+        "chunk_number": chunk_num,
+        "total_chunks": total_chunks
+    }
+    # Chroma nem fogad None értékű metaadatot, ezért csak a kitöltött mezőket vesszük át.
+    metadata.update({key: value for key, value in (extra_metadata or {}).items() if value is not None})
     return Document(
         page_content=content,
-        metadata={
-            "source_document": source,
-            "chunk_number": chunk_num,
-            "total_chunks": total_chunks
-        }
+        metadata=metadata
     )
 
-def process_and_store_document(filepath: str, docs_vector_store, config: dict, page: ft.Page):
-    """Loads, processes, chunks, and stores a document in the specified vector store."""
+def build_chunk_position_metadata(chunk: dict, page_starts: list = None, headings: list = None) -> dict:
+    """
+    Egy darab pozíció-metaadatai a lapozó olvasóhoz (document_reader.py): token- és
+    karakterpozíció, átfedés, valamint ha ismert, az oldalszám-tartomány és a fejezetcím.
+    'page_starts': az oldalak kezdő karakterpozíciói; 'headings': (pozíció, cím) párok.
+    """
+    metadata = {key: chunk[key] for key in ("token_start", "token_end", "token_count", "char_start", "char_end", "overlap_tokens", "overlap_chars")}
+    if page_starts:
+        metadata["page_start"] = bisect.bisect_right(page_starts, chunk["char_start"])
+        metadata["page_end"] = bisect.bisect_right(page_starts, max(chunk["char_start"], chunk["char_end"] - 1))
+    if headings:
+        heading_index = bisect.bisect_right([position for position, _ in headings], chunk["char_start"]) - 1
+        if heading_index >= 0:
+            metadata["section"] = headings[heading_index][1]
+    return metadata
+
+def _update_index(index, method: str, *args, **kwargs):
+    """
+    Egy kiegészítő index (lexikális index, dokumentum-jegyzék) frissítése. Hibája nem
+    akasztja meg a feltöltést: a vektor-tároló a hiteles forrás, az indexek újraépíthetők.
+    """
+    if index is None:
+        return
+    try:
+        getattr(index, method)(*args, **kwargs)
+    except Exception as index_err:
+        print(f"!!! FIGYELMEZTETÉS: Hiba a(z) {type(index).__name__} frissítése közben: {index_err}")
+
+def _chunk_new_tokens(chunk: dict) -> int:
+    # Egy darab saját (az előzőt nem ismétlő) tokenjei; ezek összege a dokumentum tokenszáma.
+    return chunk["token_count"] - chunk["overlap_tokens"]
+
+@traced("process_and_store_document")
+def process_and_store_document(filepath: str, docs_vector_store, config: dict, page: "ft.Page", lexical_index=None,
+                               manifest=None, blob_store=None):
+    """
+    Loads, processes, chunks, and stores a document in the specified vector store.
+    Ha 'lexical_index' meg van adva, a darabokat a BM25 indexbe is felveszi (hibrid keresés);
+    ha 'manifest' (document_manifest.DocumentManifest), a dokumentum adatait a jegyzékbe is rögzíti;
+    ha 'blob_store' (document_blob_store.DocumentBlobStore), a teljes szöveget tömörítve eltárolja.
+    """
     print(f"--- Dokumentum feldolgozása: {filepath} ---")
     file_name = os.path.basename(filepath) # Fájlnév kinyerése
+    current_span().set_attribute("file", file_name)
+    chunk_pause = config.get('ingestion', {}).get('chunk_pause_seconds', DEFAULT_CHUNK_PAUSE_SECONDS)
 
     # Segédfüggvény a biztonságos UI frissítéshez, már itt definiáljuk, hogy a `except` blokk is elérje
     def _add_msg_to_chat(msg):
@@ -38,21 +91,27 @@ def process_and_store_document(filepath: str, docs_vector_store, config: dict, p
     try:
         # === KORÁBBI VERZIÓ TÖRLÉSE ===
         print(f"Korábbi '{file_name}' darabok keresése és törlése...")
-        try:
-            # Lekérdezzük az összes ID-t, ami ehhez a fájlhoz tartozik
-            existing_ids = docs_vector_store.get(where={"source_document": file_name}).get("ids", [])
-            if existing_ids:
-                print(f"  {len(existing_ids)} korábbi darab törlése...")
-                docs_vector_store.delete(ids=existing_ids)
-                print(f"  Korábbi darabok sikeresen törölve.")
-            else:
-                print(f"  Nincsenek korábbi darabok ehhez a fájlhoz.")
-        except Exception as delete_err:
-            # Logoljuk a hibát, de folytatjuk a feltöltéssel
-            print(f"!!! FIGYELMEZTETÉS: Hiba történt a korábbi darabok törlése közben: {delete_err}")
+        with span("ingest.delete_previous"):
+            try:
+                # Lekérdezzük az összes ID-t, ami ehhez a fájlhoz tartozik
+                existing_ids = docs_vector_store.get(where={"source_document": file_name}).get("ids", [])
+                _update_index(lexical_index, "remove_source", file_name)
+                _update_index(manifest, "remove_document", file_name)
+                _update_index(blob_store, "delete", file_name)
+                if existing_ids:
+                    print(f"  {len(existing_ids)} korábbi darab törlése...")
+                    docs_vector_store.delete(ids=existing_ids)
+                    bump_generation(DOCUMENTS_SCOPE)
+                    print(f"  Korábbi darabok sikeresen törölve.")
+                else:
+                    print(f"  Nincsenek korábbi darabok ehhez a fájlhoz.")
+            except Exception as delete_err:
+                # Logoljuk a hibát, de folytatjuk a feltöltéssel
+                print(f"!!! FIGYELMEZTETÉS: Hiba történt a korábbi darabok törlése közben: {delete_err}")
         # =============================
 
         # Determine loader based on file extension
+        from langchain_community.document_loaders import PyPDFLoader, TextLoader
         if filepath.lower().endswith(".pdf"):
             loader = PyPDFLoader(filepath)
         elif filepath.lower().endswith(".txt") or filepath.lower().endswith(".md"):
@@ -65,53 +124,84 @@ def process_and_store_document(filepath: str, docs_vector_store, config: dict, p
             return
 
         # Load the document content
-        documents = loader.load()
-        full_text = "\n".join([doc.page_content for doc in documents])
+        with span("ingest.load") as load_span:
+            documents = loader.load()
+            load_span.set_attribute("pages", len(documents))
+        # A szöveget normalizáljuk, hogy a darabok pozíciói a blob-tárolóban őrzött szövegre is érvényesek legyenek.
+        pages = [normalize_text(doc.page_content) for doc in documents]
+        full_text = "\n".join(pages)
+
+        # Az oldalak (PDF-nél egy betöltött dokumentum = egy oldal) kezdő pozíciói és a Markdown fejezetcímek,
+        # hogy a darabok oldal vagy fejezet szerint is visszakereshetők legyenek.
+        page_starts = None
+        if filepath.lower().endswith(".pdf"):
+            page_starts, position = [], 0
+            for page_text in pages:
+                page_starts.append(position)
+                position += len(page_text) + 1
+        headings = [(match.start(), match.group(1)) for match in MARKDOWN_HEADING_PATTERN.finditer(full_text)]
 
         # Chunk the text using the shared function
-        text_chunks = chunk_text(full_text)
+        with span("ingest.chunk") as chunk_span:
+            text_chunks = chunk_text_with_offsets(full_text)
+            chunk_span.set_attribute("chunks", len(text_chunks))
+        # Az eredeti szöveg a vektoros feltöltéstől függetlenül (embedding hívás nélkül) is tárolásra kerül.
+        with span("ingest.blob_store"):
+            _update_index(blob_store, "put", file_name, pages,
+                          chunk_offsets=[(chunk["char_start"], chunk["char_end"]) for chunk in text_chunks], headings=headings)
 
         # Create Document objects for each chunk AND ADD THEM IMMEDIATELY
         total_chunks_processed = len(text_chunks)
         added_chunks_count = 0
+        added_tokens = 0
         for i, chunk in enumerate(text_chunks):
             doc = create_document_chunk(
-                content=chunk,
+                content=chunk["text"],
                 source=os.path.basename(filepath),
                 chunk_num=i + 1,
-                total_chunks=total_chunks_processed
+                total_chunks=total_chunks_processed,
+                extra_metadata=build_chunk_position_metadata(chunk, page_starts, headings)
             )
             # === AZONNALI HOZZÁADÁS DARABONKÉNT, ÚJRAPRÓBÁLKOZÁSSAL ===
             max_retries = 5
             added_successfully = False
-            for attempt in range(max_retries + 1):
-                try:
-                    docs_vector_store.add_documents([doc])
-                    print(f"  Darab #{i + 1}/{total_chunks_processed} sikeresen hozzáadva (próbálkozás: {attempt + 1}).")
-                    added_chunks_count += 1
-                    added_successfully = True
-                    time.sleep(5) # Consider making this sleep configurable or removing it if not necessary for rate limiting
-                    break # Kilépés az újrapróbálkozási ciklusból
-
-                except Exception as add_err:
-                    is_quota_error = "429" in str(add_err)
-                    if is_quota_error and attempt < max_retries:
-                        wait_time = (attempt + 1) * 5
-                        print(f"!!! KVÓTA HIBA a(z) {i + 1}. darabnál ({attempt + 1}. próbálkozás). Várakozás {wait_time} mp...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"!!! VÉGLEGES HIBA a(z) {i + 1}. darab hozzáadása közben ({attempt + 1}. próbálkozás): {add_err}")
-                        break # Kilépés az újrapróbálkozási ciklusból, a darab kimarad
+            with span("ingest.add_chunk", chunk=i + 1):
+                for attempt in range(max_retries + 1):
+                    try:
+                        docs_vector_store.add_documents([doc])
+                        _update_index(lexical_index, "add_documents", [doc])
+                        # A tudásbázis változott: a dokumentum-eszközök cache-elt eredményei elavultak.
+                        bump_generation(DOCUMENTS_SCOPE)
+                        print(f"  Darab #{i + 1}/{total_chunks_processed} sikeresen hozzáadva (próbálkozás: {attempt + 1}).")
+                        added_chunks_count += 1
+                        added_tokens += _chunk_new_tokens(chunk)
+                        added_successfully = True
+                        time.sleep(chunk_pause)
+                        break # Kilépés az újrapróbálkozási ciklusból
+
+                    except Exception as add_err:
+                        is_quota_error = "429" in str(add_err)
+                        if is_quota_error and attempt < max_retries:
+                            wait_time = (attempt + 1) * 5
+                            print(f"!!! KVÓTA HIBA a(z) {i + 1}. darabnál ({attempt + 1}. próbálkozás). Várakozás {wait_time} mp...")
+                            time.sleep(wait_time)
+                        else:
+                            print(f"!!! VÉGLEGES HIBA a(z) {i + 1}. darab hozzáadása közben ({attempt + 1}. próbálkozás): {add_err}")
+                            break # Kilépés az újrapróbálkozási ciklusból, a darab kimarad
 
         # A ciklus után már csak az összefoglaló kiírás marad
         file_name = os.path.basename(filepath)
+        _update_index(manifest, "record_document", file_name, added_chunks_count, added_tokens,
+                      content_hash=hashlib.sha256(full_text.encode("utf-8")).hexdigest(),
+                      size_bytes=os.path.getsize(filepath), complete=added_chunks_count == total_chunks_processed)
         if added_chunks_count == total_chunks_processed:
             print(f"--- '{file_name}' sikeresen feldolgozva: {added_chunks_count} darab mentve a memóriába. ---")
 
             # === ÖSSZEFOGLALÓ KÉSZÍTÉSE ÉS TÁROLÁSA ===
             try:
                 print(f"Összefoglaló készítése a(z) '{file_name}' dokumentumhoz...")
-                summary_content = summarize_document(full_text, config)
+                with span("ingest.summarize"):
+                    summary_content = summarize_document(full_text, config)
                 summary_filename = f"SUM_{file_name}"
 
                 # Mentsük az összefoglalót egy külön fájlba is (opcionális, de jó gyakorlat)
@@ -122,28 +212,40 @@ def process_and_store_document(filepath: str, docs_vector_store, config: dict, p
 
                 # Töröljük a korábbi összefoglaló-darabokat is
                 summary_existing_ids = docs_vector_store.get(where={"source_document": summary_filename}).get("ids", [])
+                _update_index(lexical_index, "remove_source", summary_filename)
+                _update_index(manifest, "remove_document", summary_filename)
+                _update_index(blob_store, "delete", summary_filename)
                 if summary_existing_ids:
                     print(f"  {len(summary_existing_ids)} korábbi összefoglaló-darab törlése...")
                     docs_vector_store.delete(ids=summary_existing_ids)
+                    bump_generation(DOCUMENTS_SCOPE)
 
                 # Daraboljuk és tároljuk az összefoglalót a vektoradatbázisban
-                summary_chunks = chunk_text(summary_content)
+                summary_content = normalize_text(summary_content)
+                summary_chunks = chunk_text_with_offsets(summary_content)
+                _update_index(blob_store, "put", summary_filename, [summary_content],
+                              chunk_offsets=[(chunk["char_start"], chunk["char_end"]) for chunk in summary_chunks])
                 summary_chunks_added = 0
+                summary_tokens = 0
                 for i, chunk in enumerate(summary_chunks):
                     doc = create_document_chunk(
-                        content=chunk,
+                        content=chunk["text"],
                         source=summary_filename,
                         chunk_num=i + 1,
-                        total_chunks=len(summary_chunks)
+                        total_chunks=len(summary_chunks),
+                        extra_metadata=build_chunk_position_metadata(chunk)
                     )
                     # === AZONNALI HOZZÁADÁS DARABONKÉNT, ÚJRAPRÓBÁLKOZÁSSAL (ÖSSZEFOGLALÓHOZ) ===
                     max_retries = 5
                     for attempt in range(max_retries + 1):
                         try:
                             docs_vector_store.add_documents([doc])
+                            _update_index(lexical_index, "add_documents", [doc])
+                            bump_generation(DOCUMENTS_SCOPE)
                             print(f"  Összefoglaló darab #{i + 1}/{len(summary_chunks)} sikeresen hozzáadva.")
                             summary_chunks_added += 1
-                            time.sleep(5)  # API hívások közötti szünet
+                            summary_tokens += _chunk_new_tokens(chunk)
+                            time.sleep(chunk_pause)  # API hívások közötti szünet
                             break  # Sikeres hozzáadás után kilépünk a ciklusból
                         except Exception as add_err:
                             is_quota_error = "429" in str(add_err) or "RESOURCE_EXHAUSTED" in str(add_err)
@@ -155,6 +257,10 @@ def process_and_store_document(filepath: str, docs_vector_store, config: dict, p
                                 print(f"!!! VÉGLEGES HIBA az összefoglaló darab hozzáadása közben: {add_err}")
                                 break # A darab kimarad
 
+                summary_bytes = summary_content.encode("utf-8")
+                _update_index(manifest, "record_document", summary_filename, summary_chunks_added, summary_tokens,
+                              content_hash=hashlib.sha256(summary_bytes).hexdigest(), size_bytes=len(summary_bytes),
+                              complete=summary_chunks_added == len(summary_chunks))
                 print(f"Összefoglaló ({summary_chunks_added}/{len(summary_chunks)} darab) sikeresen hozzáadva a tudásbázishoz '{summary_filename}' néven.")
 
                 if summary_chunks_added == len(summary_chunks):
@@ -184,4 +290,4 @@ def process_and_store_document(filepath: str, docs_vector_store, config: dict, p
         error_message = AIMessage(content=f"Kritikus hiba '{os.path.basename(filepath)}' feldolgozása közben: {e}", name="SYSTEM_ERROR")
         page.run_thread(_add_msg_to_chat, error_message)
 
-print("Dokumentum feldolgozó modul (document_processor.py) betöltve.")
+logging.debug("Dokumentum feldolgozó modul (document_processor.py) betöltve.")
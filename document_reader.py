@@ -0,0 +1,243 @@
+# document_reader.py
+
+import base64
+import bisect
+import json
+import logging
+from typing import List, Optional, Tuple
+
+# Egy lapozott olvasás alapértelmezett tokenkerete (a config 'document_reader' szekciója felülírja)
+DEFAULT_READ_MAX_TOKENS = 4000
+# A metaadatok nélküli (régebben feltöltött) darabok átfedését szöveg-összevetéssel keressük:
+# ennél rövidebb egyezést nem tekintünk átfedésnek, ennél hosszabbat nem keresünk.
+MIN_FALLBACK_OVERLAP_CHARS = 16
+MAX_FALLBACK_OVERLAP_CHARS = 2000
+# Tokenbecslés, ahol nincs pontos tokenszám (kb. 4 karakter / token)
+CHARS_PER_TOKEN = 4
+
+def _find_text_overlap(previous_text: str, text: str) -> int:
+    """A 'text' elejének az a leghosszabb része, amellyel a 'previous_text' végződik."""
+    longest = min(len(previous_text), len(text), MAX_FALLBACK_OVERLAP_CHARS)
+    for size in range(longest, MIN_FALLBACK_OVERLAP_CHARS - 1, -1):
+        if previous_text.endswith(text[:size]):
+            return size
+    return 0
+
+def strip_chunk_overlaps(chunks: List[Tuple[str, dict]], strip_first: bool = False) -> List[str]:
+    """
+    Az egymást követő (chunk_number szerint rendezett) darabok szövegéből levágja az
+    előző darabot ismétlő átfedést. Ha a metaadat tartalmazza az 'overlap_chars'
+    mezőt, azt használja; különben szöveg-összevetéssel keresi az átfedést.
+    """
+    texts = []
+    previous_text, previous_number = None, None
+    for index, (text, metadata) in enumerate(chunks):
+        number = metadata.get('chunk_number')
+        follows_previous = previous_number is not None and number == previous_number + 1
+        if index > 0 and not follows_previous:
+            cut = 0
+        elif index == 0 and not strip_first:
+            cut = 0
+        elif 'overlap_chars' in metadata:
+            cut = metadata['overlap_chars']
+        elif previous_text is not None:
+            cut = _find_text_overlap(previous_text, text)
+        else:
+            cut = 0
+        texts.append(text[cut:])
+        previous_text, previous_number = text, number
+    return texts
+
+def estimate_chunk_tokens(text: str, metadata: dict, stripped: bool) -> Tuple[int, bool]:
+    """A darab (átfedés nélküli) tokenszáma a metaadatokból; ha hiányzik, becslés (kb. 4 karakter / token)."""
+    if 'token_count' in metadata:
+        return metadata['token_count'] - (metadata.get('overlap_tokens', 0) if stripped else 0), True
+    return max(1, len(text) // CHARS_PER_TOKEN), False
+
+def encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, sort_keys=True).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> dict:
+    return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+
+def _source_filter(filename: str, *conditions: dict) -> dict:
+    conditions = [{"source_document": filename}] + [condition for condition in conditions if condition]
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+def _resolve_chunk_range(docs_vector_store, filename: str, start_chunk: Optional[int], end_chunk: Optional[int],
+                         start_page: Optional[int], end_page: Optional[int], section: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """
+    A kért tartományt (darab, oldal vagy fejezet) darabszám-tartománnyá alakítja.
+    Csak a metaadatokat kéri le, a szöveget nem. (első, utolsó, összes darab) hármast ad.
+    """
+    metadata_result = docs_vector_store.get(where=_source_filter(filename), include=["metadatas"])
+    metadatas = metadata_result.get('metadatas') or []
+    if not metadatas:
+        return None
+    total_chunks = max(metadata.get('total_chunks') or metadata.get('chunk_number', 0) for metadata in metadatas)
+
+    selected = []
+    for metadata in metadatas:
+        number = metadata.get('chunk_number', 0)
+        if start_chunk and number < start_chunk:
+            continue
+        if end_chunk and number > end_chunk:
+            continue
+        if (start_page or end_page) and 'page_start' in metadata:
+            if start_page and metadata.get('page_end', metadata['page_start']) < start_page:
+                continue
+            if end_page and metadata['page_start'] > end_page:
+                continue
+        if section and section.strip().lower() not in str(metadata.get('section', '')).lower():
+            continue
+        selected.append(number)
+    if not selected:
+        return (0, -1, total_chunks)
+    return (min(selected), max(selected), total_chunks)
+
+def _resolve_char_range(info: dict, start_chunk: int, end_chunk: int, start_page: int, end_page: int,
+                        section: str) -> Tuple[int, int]:
+    """A kért tartomány (darab, oldal, fejezet) karaktertartománnyá alakítása a blob-tároló indexéből."""
+    start, end = 0, info["char_count"]
+    chunk_offsets, page_offsets, headings = info["chunk_offsets"], info["page_offsets"], info["headings"]
+    # A dokumentumon kívül eső tartomány üres, ahogy a darab-alapú olvasásnál (_resolve_chunk_range) is.
+    if start_chunk or end_chunk:
+        if not chunk_offsets or (start_chunk and start_chunk > len(chunk_offsets)):
+            return (0, -1)
+        if start_chunk and end_chunk and end_chunk < start_chunk:
+            return (0, -1)
+        if start_chunk:
+            start = max(start, chunk_offsets[start_chunk - 1][0])
+        if end_chunk:
+            end = min(end, chunk_offsets[min(end_chunk, len(chunk_offsets)) - 1][1])
+    if (start_page and start_page > len(page_offsets)) or (start_page and end_page and end_page < start_page):
+        return (0, -1)
+    if start_page:
+        start = max(start, page_offsets[start_page - 1])
+    if end_page and end_page < len(page_offsets):
+        end = min(end, page_offsets[end_page] - 1)
+    if section:
+        wanted = section.strip().lower()
+        matching = [index for index, (_, title) in enumerate(headings) if wanted in title.lower()]
+        if not matching:
+            return (0, -1)
+        first_index = matching[0]
+        start = max(start, headings[first_index][0])
+        if first_index + 1 < len(headings):
+            end = min(end, headings[first_index + 1][0])
+    return (start, end)
+
+def read_blob_range(filename: str, blob_store, start: int = 0, end: Optional[int] = None,
+                    max_tokens: int = DEFAULT_READ_MAX_TOKENS) -> str:
+    """
+    A [start, end) karaktertartomány olvasása a blob-tárolóból (document_blob_store.py),
+    tokenkereten belül; a vektor-tárolóhoz nem nyúl. A formátum megegyezik a darab-alapú
+    olvasáséval, a folytatási kurzor karakterpozíciót tartalmaz.
+    """
+    info = blob_store.info(filename)
+    end = info["char_count"] if end is None else min(end, info["char_count"])
+    budget_chars = max(1, max_tokens) * CHARS_PER_TOKEN
+    stop = min(end, start + budget_chars)
+    text = blob_store.read(filename, start, stop)
+    if stop < end:
+        # A részlet lehetőleg sor- vagy szóhatáron érjen véget.
+        boundary = max(text.rfind("\n"), text.rfind(" "))
+        if boundary > len(text) // 2:
+            text = text[:boundary + 1]
+            stop = start + len(text)
+
+    page_offsets = info["page_offsets"]
+    header = f"DOCUMENT_CONTENT ('{filename}', {start}-{stop}. karakter / {info['char_count']}"
+    if len(page_offsets) > 1:
+        header += f", {bisect.bisect_right(page_offsets, start)}-{bisect.bisect_right(page_offsets, max(start, stop - 1))}. oldal"
+    header += f", ~{max(1, len(text) // CHARS_PER_TOKEN)} token):"
+
+    if stop < end:
+        next_cursor = encode_cursor({"filename": filename, "next_char": stop, "end_char": end, "max_tokens": max_tokens})
+        footer = f"NEXT_CURSOR: {next_cursor} (még {end - stop} karakter van hátra a tartományból)"
+    else:
+        footer = "A kért tartomány vége."
+    return f"{header}\n{text}\n---\n{footer}"
+
+def read_document_range(filename: str, docs_vector_store, start_chunk: int = 0, end_chunk: int = 0,
+                        start_page: int = 0, end_page: int = 0, section: str = "", cursor: str = "",
+                        max_tokens: int = DEFAULT_READ_MAX_TOKENS, blob_store=None) -> str:
+    """
+    Egy dokumentum egy részének olvasása, tokenkereten belül. A tartomány megadható
+    darabszámmal, oldalszámmal (PDF) vagy fejezetcímmel; a 0 / üres érték "nincs megkötés".
+    A válasz tartalmazza a visszaadott rész tokenszámát, és ha a tartomány nem fért bele
+    a keretbe, egy folytatási kurzort (cursor), amellyel a következő rész kérhető.
+    Ha a dokumentum szerepel a 'blob_store'-ban, onnan olvas, a vektor-tároló nélkül.
+    """
+    print(f"--- ESZKÖZHÍVÁS: Dokumentum_Részlet_Olvasása, Fájlnév: '{filename}' ---")
+    try:
+        state = decode_cursor(cursor) if cursor else None
+        if state is not None and 'next_char' in state:
+            if blob_store is None or not blob_store.has(state['filename']):
+                return f"Hiba: A kurzorhoz tartozó '{state['filename']}' dokumentum nem található a blob-tárolóban."
+            return read_blob_range(state['filename'], blob_store, state['next_char'], state['end_char'],
+                                   state.get('max_tokens', max_tokens))
+        if state is None and blob_store is not None:
+            info = blob_store.info(filename)
+            if info is not None:
+                start, end = _resolve_char_range(info, start_chunk, end_chunk, start_page, end_page, section)
+                if end <= start:
+                    return f"A '{filename}' dokumentumban nincs a megadott tartománynak megfelelő rész."
+                return read_blob_range(filename, blob_store, start, end, max_tokens)
+
+        resuming = state is not None
+        if resuming:
+            filename, first, last, total_chunks = state['filename'], state['next_chunk'], state['end_chunk'], state['total_chunks']
+            max_tokens = state.get('max_tokens', max_tokens)
+        else:
+            resolved = _resolve_chunk_range(docs_vector_store, filename, start_chunk, end_chunk, start_page, end_page, section)
+            if resolved is None:
+                return f"Hiba: A '{filename}' nevű dokumentum nem található a tudásbázisban."
+            first, last, total_chunks = resolved
+            if last < first:
+                return f"A '{filename}' dokumentumban nincs a megadott tartománynak megfelelő rész."
+
+        # Csak annyi darabot kérünk le, amennyi a tokenkeretbe beleférhet (egy darab ~900 új token).
+        window_end = min(last, first + max(1, max_tokens // 900))
+        result = docs_vector_store.get(
+            where=_source_filter(filename, {"chunk_number": {"$gte": first}}, {"chunk_number": {"$lte": window_end}}),
+            include=["documents", "metadatas"]
+        )
+        if not result or not result.get('documents'):
+            return f"Hiba: A '{filename}' dokumentum {first}-{window_end}. darabjai nem találhatók."
+        chunks = sorted(zip(result['documents'], result['metadatas']), key=lambda item: item[1].get('chunk_number', 0))
+        texts = strip_chunk_overlaps(chunks, strip_first=resuming)
+
+        parts, used_tokens, exact = [], 0, True
+        last_included = first - 1
+        for index, ((_, metadata), text) in enumerate(zip(chunks, texts)):
+            tokens, known = estimate_chunk_tokens(text, metadata, stripped=index > 0 or resuming)
+            if parts and used_tokens + tokens > max_tokens:
+                break
+            parts.append(text)
+            used_tokens += tokens
+            exact = exact and known
+            last_included = metadata.get('chunk_number', last_included + 1)
+
+        included_meta = [metadata for _, metadata in chunks[:len(parts)]]
+        pages = [metadata[key] for metadata in included_meta for key in ('page_start', 'page_end') if key in metadata]
+        header = f"DOCUMENT_CONTENT ('{filename}', {first}-{last_included}. darab / {total_chunks}"
+        if pages:
+            header += f", {min(pages)}-{max(pages)}. oldal"
+        header += f", {'' if exact else '~'}{used_tokens} token):"
+
+        if last_included < last:
+            next_cursor = encode_cursor({
+                "filename": filename, "next_chunk": last_included + 1, "end_chunk": last,
+                "total_chunks": total_chunks, "max_tokens": max_tokens
+            })
+            footer = f"NEXT_CURSOR: {next_cursor} (még {last - last_included} darab van hátra a tartományból)"
+        else:
+            footer = "A kért tartomány vége."
+        return f"{header}\n{''.join(parts)}\n---\n{footer}"
+
+    except Exception as e:
+        logging.error(f"Hiba a(z) '{filename}' dokumentum részletének olvasása közben: {e}", exc_info=True)
+        return f"Hiba történt a(z) '{filename}' dokumentum olvasása közben: {e}"
+
+logging.debug("Dokumentum-olvasó modul (document_reader.py) betöltve.")
@@ -0,0 +1,107 @@
+# embedding_backends.py
+
+import logging
+import zlib
+from typing import Callable, Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import tokenize
+
+# Alapértékek (a config 'embeddings' szekciója felülírja)
+DEFAULT_BACKEND = "vertex"
+VERTEX_MODEL_NAME = "text-embedding-004"
+DEFAULT_LOCAL_DIMENSIONS = 768
+DEFAULT_BATCH_SIZE = 64
+# A szavak mellett a karakter-n-gramok is bekerülnek a vektorba, így a ragozott
+# alakok és az elgépelések is közel kerülnek egymáshoz.
+CHAR_NGRAM_SIZE = 4
+CHAR_NGRAM_WEIGHT = 0.5
+
+class HashingEmbeddings(Embeddings):
+    """
+    Helyi, CPU-n futó embedding letöltött modellsúlyok nélkül. A szavakat (a lexikális
+    index magyar tövesítőjével) és a karakter-n-gramokat egy rögzített méretű vektorba
+    hasheli (előjeles "hashing trick"), log-skálázott gyakorisággal, majd L2-normál.
+    A szövegeket kötegenként, NumPy-jal dolgozza fel. Hálózat nélkül is működik:
+    offline munkához, tesztekhez, benchmarkokhoz, vagy egy kétlépcsős keresés első szűrőjeként.
+    """
+    def __init__(self, dimensions: int = DEFAULT_LOCAL_DIMENSIONS, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+
+    def _features(self, text: str) -> Dict[int, float]:
+        features: Dict[int, float] = {}
+        for word in tokenize(text):
+            grams = [(word, 1.0)]
+            padded = f"#{word}#"
+            if len(padded) > CHAR_NGRAM_SIZE:
+                grams += [(padded[i:i + CHAR_NGRAM_SIZE], CHAR_NGRAM_WEIGHT) for i in range(len(padded) - CHAR_NGRAM_SIZE + 1)]
+            for gram, weight in grams:
+                # A crc32 futásonként stabil (a beépített hash() nem), így a tárolt vektorok újraindítás után is érvényesek.
+                hashed = zlib.crc32(gram.encode("utf-8"))
+                index = hashed % self.dimensions
+                sign = 1.0 if hashed & 0x80000000 else -1.0
+                features[index] = features.get(index, 0.0) + sign * weight
+        return features
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if features:
+                matrix[row, list(features.keys())] = list(features.values())
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+
+def _create_vertex_embeddings(config: dict, embedding_config: dict) -> Embeddings:
+    from langchain_google_vertexai import VertexAIEmbeddings
+    return VertexAIEmbeddings(
+        model_name=embedding_config.get('model_name', VERTEX_MODEL_NAME),
+        project=config['project_id'],
+    )
+
+def _create_local_embeddings(config: dict, embedding_config: dict) -> Embeddings:
+    return HashingEmbeddings(
+        dimensions=embedding_config.get('dimensions', DEFAULT_LOCAL_DIMENSIONS),
+        batch_size=embedding_config.get('batch_size', DEFAULT_BATCH_SIZE)
+    )
+
+def _create_standin_embeddings(config: dict, embedding_config: dict) -> Embeddings:
+    # A Vertex AI helyi helyettesítője: hash-embedding, a szolgáltatás késleltetésével, kvótájával és hibáival.
+    from vertex_standin import StandinEmbeddings, get_simulator
+    return StandinEmbeddings(_create_local_embeddings(config, embedding_config),
+                             get_simulator(config, "embeddings", embedding_config.get('model_name', VERTEX_MODEL_NAME)))
+
+# Név -> gyártófüggvény. Új háttér felvételéhez elég ide egy bejegyzés.
+EMBEDDING_BACKENDS: Dict[str, Callable[[dict, dict], Embeddings]] = {
+    "vertex": _create_vertex_embeddings,
+    "local": _create_local_embeddings,
+    "standin": _create_standin_embeddings,
+}
+
+def get_backend_name(config: dict) -> str:
+    return config.get('embeddings', {}).get('backend', DEFAULT_BACKEND)
+
+def create_embedding_backend(config: dict) -> Embeddings:
+    """A configban ('embeddings.backend') kiválasztott embedding háttér létrehozása."""
+    backend = get_backend_name(config)
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Ismeretlen embedding háttér: '{backend}'. Választható: {', '.join(EMBEDDING_BACKENDS)}")
+    embeddings = EMBEDDING_BACKENDS[backend](config, config.get('embeddings', {}))
+    logging.info(f"Embedding háttér: {backend} ({type(embeddings).__name__})")
+    return embeddings
+
+logging.debug("Embedding háttér modul (embedding_backends.py) betöltve.")
@@ -0,0 +1,248 @@
+# lexical_index.py
+
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from memory_stores import LOCAL_DB_PATH
+
+LEXICAL_INDEX_FILE = f"{LOCAL_DB_PATH}/lexical_index.db"
+
+# BM25 paraméterek (a config 'lexical_index' szekciója felülírja)
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+# A reciprok rang-fúzió (RRF) szokásos csillapító konstansa
+RRF_K = 60
+
+# Szavak, azonosítók és cikkszámok: a belső kötőjel, pont, perjel és aláhúzás a token része marad
+# (pl. "AX-200/B", "v2.1", "config_aito").
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+# A leggyakoribb magyar rag- és jeltoldalékok, a hosszabbak előre. A tő legalább
+# MIN_STEM_LENGTH karakter marad, így a rövid szavak nem csonkulnak értelmetlenné.
+HUNGARIAN_SUFFIXES = sorted([
+    "ban", "ben", "ba", "be", "ból", "ből", "ra", "re", "ról", "ről", "on", "en", "ön", "n",
+    "hoz", "hez", "höz", "nál", "nél", "tól", "től", "nak", "nek", "val", "vel", "ért", "ig",
+    "ként", "ul", "ül", "vá", "vé", "kor", "t", "at", "et", "ot", "öt",
+    "ok", "ek", "ak", "ök", "k", "ai", "ei", "jai", "jei", "juk", "jük",
+], key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+MAX_SUFFIX_PASSES = 2
+# Az egy mássalhangzós toldalékok ("t", "k", "n") csak magánhangzó után válnak le, mássalhangzó-torlódásból
+# soha: így a projekt / projektek / projektben alakok ugyanarra a tőre jutnak.
+VOWELS = set("aáeéiíoóöőuúüű")
+# Toldalék előtt a tővégi magánhangzó megnyúlik (alma -> almát), ezért a tővégi á / é mindig rövidül.
+LONG_VOWEL_ENDINGS = {"á": "a", "é": "e"}
+
+def _is_identifier(token: str) -> bool:
+    # A számjegyet vagy belső elválasztót tartalmazó tokenek azonosítók: ezeket nem tövesítjük.
+    return any(character.isdigit() for character in token) or any(separator in token for separator in "-./_")
+
+def stem_hungarian(word: str) -> str:
+    """Egyszerű, szótár nélküli magyar tövesítő: legfeljebb két toldalékot vág le a szó végéről."""
+    stem = word
+    for _ in range(MAX_SUFFIX_PASSES):
+        for suffix in HUNGARIAN_SUFFIXES:
+            if len(suffix) == 1 and stem[-2:-1] not in VOWELS:
+                continue
+            if stem.endswith(suffix) and len(stem) - len(suffix) >= MIN_STEM_LENGTH:
+                stem = stem[:-len(suffix)]
+                break
+        else:
+            break
+    if stem[-1:] in LONG_VOWEL_ENDINGS:
+        stem = stem[:-1] + LONG_VOWEL_ENDINGS[stem[-1]]
+    return stem
+
+def tokenize(text: str) -> List[str]:
+    """Kisbetűs, ékezetmegőrző tokenizálás; a közönséges szavak tövesítve, az azonosítók változatlanul."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group(0)
+        if _is_identifier(token):
+            tokens.append(token)
+            # Az azonosító részei is kereshetők maradnak ("AX-200" -> "ax-200", "ax", "200").
+            tokens.extend(part for part in re.split(r"[-./_]", token) if part and part != token)
+        else:
+            tokens.append(stem_hungarian(token))
+    return tokens
+
+def chunk_key(metadata: dict) -> str:
+    """Egy dokumentumdarab azonosítója a lexikális indexben és a fúzióban."""
+    return f"{metadata.get('source_document', 'Ismeretlen')}#{metadata.get('chunk_number', 0)}"
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Több rangsor összefésülése: a kulcs pontszáma a listákbeli helyezéseinek 1 / (k + rang) összege."""
+    scores: Dict[str, float] = {}
+    for ranked in ranked_lists:
+        for rank, key in enumerate(ranked, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class LexicalIndex:
+    """
+    A tudásbázis darabjainak BM25 indexe. A darabok SQLite-ban tárolódnak, a keresés
+    egy memóriabeli fordított indexen fut, így embedding hívás nélkül, a darabszámtól
+    szinte függetlenül gyors. A feltöltés darabonként, inkrementálisan frissíti.
+    'db_path=None' esetén csak memóriában él (tesztekhez).
+    """
+    def __init__(self, db_path: Optional[str] = LEXICAL_INDEX_FILE, k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._chunks: Dict[str, Tuple[str, dict]] = {}
+        self._total_length = 0
+        if db_path:
+            self._initialize_table()
+            self._load()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "LexicalIndex":
+        index_config = config.get('lexical_index', {})
+        return cls(
+            db_path=index_config.get('db_path', LEXICAL_INDEX_FILE),
+            k1=index_config.get('k1', DEFAULT_K1),
+            b=index_config.get('b', DEFAULT_B)
+        )
+
+    def _initialize_table(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS lexical_chunks (
+                chunk_key TEXT PRIMARY KEY,
+                source_document TEXT NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_lexical_chunks_source ON lexical_chunks (source_document)")
+        conn.commit()
+        conn.close()
+
+    def _load(self):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT chunk_key, content, metadata FROM lexical_chunks").fetchall()
+        conn.close()
+        with self._lock:
+            for key, content, metadata in rows:
+                self._index_chunk(key, content, json.loads(metadata))
+        logging.info(f"Lexikális index betöltve: {len(rows)} darab ({self.db_path}).")
+
+    def _index_chunk(self, key: str, content: str, metadata: dict):
+        # A _lock alatt hívjuk.
+        if key in self._chunks:
+            self._unindex_chunk(key)
+        term_counts = Counter(tokenize(content))
+        for term, count in term_counts.items():
+            self._postings.setdefault(term, {})[key] = count
+        length = sum(term_counts.values())
+        self._lengths[key] = length
+        self._total_length += length
+        self._chunks[key] = (content, metadata)
+
+    def _unindex_chunk(self, key: str):
+        # A _lock alatt hívjuk.
+        content, _ = self._chunks.pop(key)
+        for term in set(tokenize(content)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(key, 0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._chunks)
+
+    def add_documents(self, documents: Iterable[Document]):
+        """Darabok felvétele (vagy cseréje, ha a forrás és a darabszám már szerepel)."""
+        entries = [(chunk_key(doc.metadata), doc.page_content, dict(doc.metadata)) for doc in documents]
+        if not entries:
+            return
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            conn.executemany(
+                "INSERT OR REPLACE INTO lexical_chunks (chunk_key, source_document, content, metadata) VALUES (?, ?, ?, ?)",
+                [(key, metadata.get('source_document', 'Ismeretlen'), content, json.dumps(metadata, ensure_ascii=False))
+                 for key, content, metadata in entries]
+            )
+            conn.commit()
+            conn.close()
+        with self._lock:
+            for key, content, metadata in entries:
+                self._index_chunk(key, content, metadata)
+
+    def remove_source(self, source_document: str) -> int:
+        """Egy dokumentum összes darabjának törlése. A törölt darabok számát adja vissza."""
+        if self.db_path:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("DELETE FROM lexical_chunks WHERE source_document = ?", (source_document,))
+            conn.commit()
+            conn.close()
+        with self._lock:
+            keys = [key for key, (_, metadata) in self._chunks.items() if metadata.get('source_document') == source_document]
+            for key in keys:
+                self._unindex_chunk(key)
+        return len(keys)
+
+    def rebuild_from_store(self, docs_vector_store) -> int:
+        """
+        Feltölti az indexet a vektor-tároló meglévő darabjaiból (az index bevezetése előtt
+        feltöltött dokumentumokhoz). Csak a tárolt szöveget olvassa, embedding hívás nélkül.
+        """
+        result = docs_vector_store.get(include=["documents", "metadatas"])
+        documents = [
+            Document(page_content=content, metadata=metadata or {})
+            for content, metadata in zip(result.get('documents') or [], result.get('metadatas') or [])
+        ]
+        self.add_documents(documents)
+        logging.info(f"Lexikális index újraépítve a vektor-tárolóból: {len(documents)} darab.")
+        return len(documents)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Document, float]]:
+        """A 'k' legjobb darab BM25 pontszám szerint csökkenő sorrendben."""
+        terms = set(tokenize(query))
+        with self._lock:
+            chunk_count = len(self._chunks)
+            if not terms or not chunk_count:
+                return []
+            average_length = self._total_length / chunk_count or 1.0
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (chunk_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / average_length)
+                    scores[key] = scores.get(key, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [
+                (Document(page_content=self._chunks[key][0], metadata=dict(self._chunks[key][1])), score)
+                for key, score in best
+            ]
+
+def open_lexical_index(config: dict, docs_vector_store=None) -> LexicalIndex:
+    """Megnyitja az indexet; ha üres, de a vektor-tárolóban már vannak darabok, feltölti belőlük."""
+    index = LexicalIndex.from_config(config)
+    if not len(index) and docs_vector_store is not None:
+        try:
+            index.rebuild_from_store(docs_vector_store)
+        except Exception as e:
+            logging.error(f"Hiba a lexikális index újraépítése közben: {e}", exc_info=True)
+    return index
+
+logging.debug("Lexikális index modul (lexical_index.py) betöltve.")
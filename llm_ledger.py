@@ -0,0 +1,276 @@
+# llm_ledger.py
+# A modellhívások naplója (tokenek, késleltetés, újrapróbálkozások, 429-ek) és a jelentés:
+#   python llm_ledger.py report                      - összesítés ATOM, nap és hívási hely szerint
+#   python llm_ledger.py report --by caller --since 2026-10-01
+#   python llm_ledger.py report --by atom,model --days 7
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config_loader import load_yaml_file
+from memory_stores import LOCAL_DB_PATH
+
+LEDGER_DB_FILE = f"{LOCAL_DB_PATH}/llm_ledger.db"
+
+# A hívás helyét a futtatási konfiguráció metaadatában is meg lehet adni (lásd call_site_config);
+# így ugyanaz a modell-példány a chat első hívását és az eszköz-ciklus újrahívásait külön sorolja.
+CALL_SITE_KEY = "ledger_call_site"
+
+# Becsült ár (USD / 1 millió token: bemenet, kimenet); a config 'llm_ledger.prices' szekciója felülírja.
+DEFAULT_PRICES_PER_MILLION = {
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash-001": (0.10, 0.40),
+}
+
+GROUP_COLUMNS = {"atom": "atom_id", "day": "day", "caller": "caller", "model": "model"}
+DEFAULT_GROUP_BY = ("atom", "day", "caller")
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    text = f"{type(error).__name__}: {error}"
+    return "429" in text or "ResourceExhausted" in text or "RESOURCE_EXHAUSTED" in text
+
+def call_site_config(call_site: str, config: Optional[dict] = None) -> dict:
+    """Egy invoke()/stream() konfiguráció, amely a naplóban a megadott hívási helyre könyveli a hívást."""
+    config = dict(config or {})
+    config["metadata"] = dict(config.get("metadata") or {}, **{CALL_SITE_KEY: call_site})
+    return config
+
+class LLMLedger:
+    """
+    A modellhívások helyi SQLite naplója: hívásonként egy sor a hívó helyével, az ATOM-mal,
+    a modellel, a bemeneti és kimeneti tokenszámmal, a késleltetéssel, az újrapróbálkozások
+    és a 429-es (kvóta) hibák számával. A report() ezekből összesít.
+    """
+    def __init__(self, db_path: str = LEDGER_DB_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._initialize_table()
+
+    def _initialize_table(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT NOT NULL,
+                day TEXT NOT NULL,
+                caller TEXT NOT NULL,
+                atom_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                latency_ms REAL NOT NULL,
+                retries INTEGER NOT NULL,
+                rate_limited INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_day ON llm_calls (day)")
+        conn.commit()
+        conn.close()
+
+    def record(self, caller: str, model: str, prompt_tokens: int, completion_tokens: int, latency_ms: float,
+               atom_id: str = "", retries: int = 0, rate_limited: int = 0, error: Optional[str] = None,
+               started_at: Optional[datetime] = None):
+        started_at = started_at or datetime.now(timezone.utc)
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            with conn:
+                conn.execute('''
+                    INSERT INTO llm_calls (started_at, day, caller, atom_id, model, prompt_tokens, completion_tokens,
+                                           latency_ms, retries, rate_limited, status, error)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (started_at.isoformat(), started_at.date().isoformat(), caller, atom_id or "", model,
+                      prompt_tokens, completion_tokens, latency_ms, retries, rate_limited,
+                      "ERROR" if error else "OK", error))
+            conn.close()
+
+    def report(self, group_by: Sequence[str] = DEFAULT_GROUP_BY, since: Optional[str] = None,
+               prices: Optional[Dict[str, Sequence[float]]] = None) -> List[dict]:
+        """
+        Összesítés a 'group_by' dimenziók (atom, day, caller, model) szerint: hívásszám, tokenek,
+        átlagos és legnagyobb késleltetés, újrapróbálkozások, 429-ek, hibák és becsült költség.
+        'since': ISO dátum (YYYY-MM-DD), az ennél korábbi napok kimaradnak.
+        """
+        columns = [GROUP_COLUMNS[name] for name in group_by]
+        prices = dict(DEFAULT_PRICES_PER_MILLION, **(prices or {}))
+        where, params = ("WHERE day >= ?", (since,)) if since else ("", ())
+        # A költség modellenként számolódik, ezért a modell mindig része a belső csoportosításnak.
+        inner_columns = list(dict.fromkeys(columns + ["model"]))
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(f'''
+            SELECT {", ".join(inner_columns)}, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens),
+                   SUM(latency_ms), MAX(latency_ms), SUM(retries), SUM(rate_limited), SUM(status = 'ERROR')
+            FROM llm_calls {where}
+            GROUP BY {", ".join(inner_columns)}
+        ''', params).fetchall()
+        conn.close()
+
+        groups: Dict[tuple, dict] = {}
+        for row in rows:
+            values = dict(zip(inner_columns, row[:len(inner_columns)]))
+            calls, prompt_tokens, completion_tokens, latency_sum, latency_max, retries, rate_limited, errors = row[len(inner_columns):]
+            key = tuple(values[column] for column in columns)
+            entry = groups.setdefault(key, dict(zip(group_by, key), calls=0, prompt_tokens=0, completion_tokens=0,
+                                                 latency_ms_sum=0.0, max_latency_ms=0.0, retries=0, rate_limited=0,
+                                                 errors=0, cost_usd=0.0))
+            input_price, output_price = prices.get(values["model"], (0.0, 0.0))
+            entry["calls"] += calls
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["latency_ms_sum"] += latency_sum
+            entry["max_latency_ms"] = max(entry["max_latency_ms"], latency_max)
+            entry["retries"] += retries
+            entry["rate_limited"] += rate_limited
+            entry["errors"] += errors
+            entry["cost_usd"] += (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+        report = []
+        for entry in groups.values():
+            entry["avg_latency_ms"] = entry.pop("latency_ms_sum") / entry["calls"]
+            report.append(entry)
+        # A legtöbb időt elvivő csoportok elöl.
+        report.sort(key=lambda entry: entry["avg_latency_ms"] * entry["calls"], reverse=True)
+        return report
+
+@lru_cache(maxsize=None)
+def open_ledger(db_path: str = LEDGER_DB_FILE) -> LLMLedger:
+    """Adatbázis-fájlonként egyetlen, megosztott napló-példány."""
+    return LLMLedger(db_path)
+
+def get_ledger(config: Optional[dict] = None) -> Optional[LLMLedger]:
+    """A config 'llm_ledger' szekciója szerinti napló, vagy None, ha ki van kapcsolva."""
+    ledger_config = (config or {}).get('llm_ledger', {})
+    if not ledger_config.get('enabled', True):
+        return None
+    return open_ledger(ledger_config.get('db_path', LEDGER_DB_FILE))
+
+def _usage_from_result(response) -> tuple:
+    """(bemeneti, kimeneti) tokenszám egy LLMResult-ból: az üzenet usage_metadata-ja, különben a Vertex llm_output."""
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += usage.get("input_tokens", 0)
+            completion_tokens += usage.get("output_tokens", 0)
+    if not prompt_tokens and not completion_tokens:
+        usage = (response.llm_output or {}).get("usage_metadata") or {}
+        prompt_tokens = usage.get("prompt_token_count", 0)
+        completion_tokens = usage.get("candidates_token_count", 0)
+    return prompt_tokens, completion_tokens
+
+class LedgerCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain visszahívás, amely a modell minden hívásáról egy sort ír a naplóba. A
+    modell-példányhoz kötjük (callbacks=[...]), így minden invoke / stream / bind_tools
+    lánc hívása rögzül. A hívási hely a run metaadatában (CALL_SITE_KEY) felülírható.
+    """
+    def __init__(self, ledger: LLMLedger, caller: str, model: str, atom_id: str = ""):
+        self.ledger = ledger
+        self.caller = caller
+        self.model = model
+        self.atom_id = atom_id
+        self._runs: Dict[UUID, dict] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, metadata: Optional[dict]):
+        with self._lock:
+            self._runs[run_id] = {
+                "started_at": datetime.now(timezone.utc), "start": time.monotonic(),
+                "caller": (metadata or {}).get(CALL_SITE_KEY, self.caller), "retries": 0, "rate_limited": 0,
+            }
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any):
+        self._start(run_id, metadata)
+
+    def on_retry(self, retry_state, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            run["retries"] += 1
+            outcome = getattr(retry_state, "outcome", None)
+            error = outcome.exception() if outcome is not None and outcome.failed else None
+            if error is not None and is_rate_limit_error(error):
+                run["rate_limited"] += 1
+
+    def _finish(self, run_id: UUID, prompt_tokens: int = 0, completion_tokens: int = 0, error: Optional[BaseException] = None):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        rate_limited = run["rate_limited"] + (1 if error is not None and is_rate_limit_error(error) else 0)
+        try:
+            self.ledger.record(run["caller"], self.model, prompt_tokens, completion_tokens,
+                               (time.monotonic() - run["start"]) * 1000, atom_id=self.atom_id, retries=run["retries"],
+                               rate_limited=rate_limited, error=str(error) if error is not None else None,
+                               started_at=run["started_at"])
+        except Exception as e:
+            # A napló hibája soha nem akaszthatja meg a modellhívást.
+            logging.warning(f"A modellhívás naplózása sikertelen: {e}")
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, *_usage_from_result(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id, error=error)
+
+def print_report(report: List[dict], group_by: Sequence[str]):
+    if not report:
+        print("A naplóban nincs a feltételeknek megfelelő hívás.")
+        return
+    header = [name.upper() for name in group_by] + ["HÍVÁS", "BE TOKEN", "KI TOKEN", "ÁTL. MS", "MAX MS", "ÚJRA", "429", "HIBA", "USD"]
+    lines = [[str(entry[name]) for name in group_by] + [
+        str(entry["calls"]), str(entry["prompt_tokens"]), str(entry["completion_tokens"]),
+        f"{entry['avg_latency_ms']:.0f}", f"{entry['max_latency_ms']:.0f}", str(entry["retries"]),
+        str(entry["rate_limited"]), str(entry["errors"]), f"{entry['cost_usd']:.4f}",
+    ] for entry in report]
+    widths = [max(len(row[i]) for row in [header] + lines) for i in range(len(header))]
+    for row in [header] + lines:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+    print(f"\nÖsszesen: {sum(entry['calls'] for entry in report)} hívás, "
+          f"{sum(entry['prompt_tokens'] + entry['completion_tokens'] for entry in report)} token, "
+          f"{sum(entry['cost_usd'] for entry in report):.4f} USD (becslés)")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Az AITO modellhívás-naplójának összesítése.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--config", default="config_aito.yaml")
+    parser.add_argument("--by", default=",".join(DEFAULT_GROUP_BY), help="csoportosítás: atom, day, caller, model (vesszővel)")
+    parser.add_argument("--since", help="csak az ettől a naptól (YYYY-MM-DD) kezdődő hívások")
+    parser.add_argument("--days", type=int, help="csak az utolsó N nap hívásai")
+    args = parser.parse_args(argv)
+
+    group_by = [name.strip() for name in args.by.split(",") if name.strip()]
+    unknown = [name for name in group_by if name not in GROUP_COLUMNS]
+    if unknown:
+        parser.error(f"ismeretlen csoportosítás: {', '.join(unknown)}")
+    since = args.since
+    if args.days:
+        since = (datetime.now(timezone.utc) - timedelta(days=args.days - 1)).date().isoformat()
+
+    config = load_yaml_file(args.config) or {}
+    ledger_config = config.get('llm_ledger', {})
+    ledger = open_ledger(ledger_config.get('db_path', LEDGER_DB_FILE))
+    print_report(ledger.report(group_by, since=since, prices=ledger_config.get('prices')), group_by)
+
+logging.debug("Modellhívás-napló modul (llm_ledger.py) betöltve.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -10,7 +10,7 @@ import sqlite3
 from datetime import datetime, timezone
 
 # --- LangChain Importok ---
-from langchain_google_vertexai import ChatVertexAI, HarmCategory, HarmBlockThreshold, VertexAIEmbeddings # Google Embedding
+from langchain_google_vertexai import ChatVertexAI, HarmCategory, HarmBlockThreshold
 from langchain_community.vectorstores import Chroma # Helyi Vektor DB
 from langchain_community.chat_message_histories.sql import SQLChatMessageHistory # Helyi Napló DB
 from langchain_text_splitters import RecursiveCharacterTextSplitter # Helyes import
@@ -21,8 +21,11 @@ from langchain_core.documents import Document
 
 # --- Saját modulok importálása ---
 from shared_components import ATOM_DATA, PROMPTS, message_to_document, chunk_text, search_memory_tool, search_knowledge_base_tool, list_uploaded_files_tool, set_registry_value, get_registry_value, list_registry_keys, generate_diagram_tool, read_full_document_tool, display_image_tool, set_meeting_status, get_meeting_status
-from task_dispatcher import TaskDispatcher
+from task_dispatcher import TaskDispatcher, current_meeting_partition_id
 from document_processor import process_and_store_document
+from warmup import WarmupOrchestrator
+from memory_stores import create_embeddings, vector_store_path
+from memory_partitions import PartitionRegistry, PartitionedMemory, DEFAULT_PARTITION_ID
 
 
 # --- Konfiguráció betöltése a YAML fájlból ---
@@ -52,13 +55,11 @@ try:
     SQLITE_HISTORY_FILE = f"{LOCAL_DB_PATH}/aito_chat_history.db"
     os.makedirs(LOCAL_DB_PATH, exist_ok=True)
 
-    # === GOOGLE CLOUD EMBEDDING (A MINŐSÉGÉRT) ===
-    print("Google Cloud embedding kliens inicializálása...")
-    google_embeddings = VertexAIEmbeddings(
-        model_name="text-embedding-004",
-        project=CONFIG['project_id'],
-        # Itt már nincs szükség location-re az embeddinghez az újabb verziókban
-    )
+    # === EMBEDDING (a háttér a config 'embeddings' szekciójából: Google Cloud vagy helyi) ===
+    print("Embedding kliens inicializálása...")
+    google_embeddings = create_embeddings(CONFIG)
+    CHROMA_CONVERSATION_PATH = vector_store_path(CHROMA_CONVERSATION_PATH, CONFIG)
+    CHROMA_DOCS_PATH = vector_store_path(CHROMA_DOCS_PATH, CONFIG)
     print("Embedding kliens inicializálva.")
 
     # === LOKÁLIS VEKTOR TÁROLÓ (CHROMA DB) ===
@@ -110,13 +111,15 @@ class MessageBubble(ft.Row):
         color_name = ATOM_DATA.get(speaker, {}).get("color", "BLACK")
         bubble_color = getattr(ft.Colors, color_name, ft.Colors.BLACK)
 
+        self.display_speaker = display_speaker
+        self.markdown = ft.Markdown(
+            f"**{display_speaker}:** {message.content}" if display_speaker != "Te" else message.content,
+            selectable=True,
+            extension_set="gitHubWeb", # Ez egy robusztus, általános Markdown értelmező
+            code_theme="atom-one-dark" # Kódrészletekhez szép sötét téma
+        )
         bubble_container = ft.Container(
-            content=ft.Markdown(
-                f"**{display_speaker}:** {message.content}" if display_speaker != "Te" else message.content,
-                selectable=True,
-                extension_set="gitHubWeb", # Ez egy robusztus, általános Markdown értelmező
-                code_theme="atom-one-dark" # Kódrészletekhez szép sötét téma
-            ),
+            content=self.markdown,
             padding=12, border_radius=ft.border_radius.all(15), expand=True,
         )
         if speaker == CONFIG.get('user_id'):
@@ -127,6 +130,10 @@ class MessageBubble(ft.Row):
             bubble_container.bgcolor = bubble_color
         self.controls = [bubble_container]
 
+    def set_content(self, text: str):
+        """Lecseréli a buborék szövegét (streamelt válaszokhoz). A page.update() a hívó dolga."""
+        self.markdown.value = f"**{self.display_speaker}:** {text}" if self.display_speaker != "Te" else text
+
 def main(page: ft.Page):
     start_time = time.monotonic()
     print(f"{start_time:.4f}: Main function started.")
@@ -174,10 +181,31 @@ def main(page: ft.Page):
     page.overlay.append(file_picker)
     print(f"{time.monotonic():.4f}: FilePicker OK.")
 
+    # Minden megbeszélés a saját memória-partíciójába ír (az alapértelmezett partíció a meglévő tár és napló).
+    partitions = PartitionedMemory(
+        PartitionRegistry.from_config(CONFIG),
+        open_vector_store=lambda partition: vector_store if partition.is_default else Chroma(
+            persist_directory=CHROMA_CONVERSATION_PATH,
+            embedding_function=google_embeddings,
+            collection_name=partition.collection_name
+        ),
+        open_chat_history=lambda partition: firestore_history if partition.is_default else SQLChatMessageHistory(
+            session_id=partition.history_session_id,
+            connection=connection_string
+        )
+    )
+
     # --- ESZKÖZ CSOMAGOLÓ FÜGGVÉNYEK LÉTREHOZÁSA ---
-    def wrapped_search_memory_tool(query: str) -> str:
-        """A teljes SYNERGAQUA memóriában (beszélgetésekben) keres releváns, teljes beszélgetések után."""
-        return search_memory_tool(query=query, config=CONFIG, vector_store=vector_store)
+    def wrapped_search_memory_tool(query: str, all_partitions: bool = False) -> str:
+        """
+        A SYNERGAQUA beszélgetés-memóriában keres releváns, teljes beszélgetések után; megbeszélés
+        alatt csak a megbeszélés saját memóriájában. Ha más beszélgetések / megbeszélések is
+        kellenek, hívd újra all_partitions=True értékkel.
+        """
+        partition_id = current_meeting_partition_id() or DEFAULT_PARTITION_ID
+        return search_memory_tool(query=query, config=CONFIG, vector_store=partitions.vector_store(partition_id),
+                                  partition_id=partition_id,
+                                  other_partition_stores=partitions.other_vector_stores(partition_id) if all_partitions else None)
 
     def wrapped_search_knowledge_base_tool(query: str) -> str:
         """Kizárólag a feltöltött dokumentumok (PDF, MD, TXT) tudásbázisában keres releváns információk után."""
@@ -232,9 +260,13 @@ def main(page: ft.Page):
         firestore_history=firestore_history,
         config=CONFIG,
         vector_store=vector_store,
-        search_memory_tool=wrapped_search_memory_tool
+        search_memory_tool=wrapped_search_memory_tool,
+        partitions=partitions
     )
     print(f"{time.monotonic():.4f}: TaskDispatcher OK.")
+    # A gráfok fordítása a háttérben történik, az első /task már kész gráfot kap.
+    warmup = WarmupOrchestrator(max_workers=1, name="ATOMOD-Warmup")
+    warmup.submit("atomod_graphs", task_dispatcher.warm_up)
 
     app_state = {"active_atom_id": INITIAL_ATOM_ID, "atom_chain": None}
 
@@ -383,12 +415,76 @@ def get_ai_response(user_message: HumanMessage, chain_for_request, atom_id_for_r
             os._exit(0)
             return
 
+        if user_input_text.strip().lower() == "/tasks":
+            firestore_history.add_message(human_message)
+            chat_history_view.controls.append(MessageBubble(AIMessage(content=task_dispatcher.describe_tasks(), name="SYSTEM")))
+            input_field.value = ""
+            page.update()
+            return
+
+        if user_input_text.strip().lower().startswith("/cancel"):
+            firestore_history.add_message(human_message)
+            task_prefix = user_input_text.strip()[7:].strip()
+            full_task_id = task_dispatcher.executor.find_task_id(task_prefix) if task_prefix else None
+            if full_task_id and task_dispatcher.cancel_task(full_task_id):
+                feedback = f"A(z) {full_task_id[:8]}... feladat lemondva."
+            else:
+                feedback = f"Nem található lemondható feladat ezzel az azonosítóval: '{task_prefix}'."
+            chat_history_view.controls.append(MessageBubble(AIMessage(content=feedback, name="SYSTEM")))
+            input_field.value = ""
+            page.update()
+            return
+
+        if user_input_text.strip().lower().startswith("/resume"):
+            # "/resume" listázza a megszakadt megbeszéléseket, "/resume <azonosító>" vagy
+            # "/resume all" folytatja őket az utolsó checkpointtól.
+            firestore_history.add_message(human_message)
+            task_prefix = user_input_text.strip()[7:].strip()
+            interrupted = task_dispatcher.list_interrupted_tasks()
+            if not task_prefix:
+                if interrupted:
+                    feedback = "Megszakadt ATOMOD feladatok:\n" + "\n".join(
+                        f"- {row['task_id'][:8]} [{row['status']}] {row['task_description']}" for row in interrupted
+                    )
+                else:
+                    feedback = "Nincs megszakadt ATOMOD feladat."
+            elif task_prefix.lower() == "all":
+                resumed_ids = task_dispatcher.resume_interrupted_tasks()
+                feedback = f"{len(resumed_ids)} feladat folytatása elindítva."
+            else:
+                matches = [row['task_id'] for row in interrupted if row['task_id'].startswith(task_prefix)]
+                if len(matches) == 1 and task_dispatcher.resume_task(matches[0]):
+                    feedback = f"A(z) {matches[0][:8]}... feladat folytatása elindítva."
+                else:
+                    feedback = f"Nem található folytatható feladat ezzel az azonosítóval: '{task_prefix}'."
+            chat_history_view.controls.append(MessageBubble(AIMessage(content=feedback, name="SYSTEM")))
+            input_field.value = ""
+            page.update()
+            return
+
         if user_input_text.strip().lower().startswith("/task"):
             task_content = user_input_text.strip()[5:].strip()
+            # A "/task --parallel ..." formával a kör résztvevői egyszerre szólalnak fel,
+            # a "/task --priority=risk ..." felülírja az automatikus prioritás-besorolást.
+            meeting_mode = "round_robin"
+            priority_category = None
+            while task_content.startswith("--"):
+                option, _, task_content = task_content.partition(" ")
+                task_content = task_content.strip()
+                if option == "--parallel":
+                    meeting_mode = "parallel"
+                elif option.startswith("--priority="):
+                    priority_category = option.split("=", 1)[1]
             firestore_history.add_message(human_message)
-            task_id = task_dispatcher.start_new_task(task_content, initiated_by=CONFIG['user_id'])
+            try:
+                task_id = task_dispatcher.start_new_task(task_content, initiated_by=CONFIG['user_id'], mode=meeting_mode, category=priority_category)
+            except ValueError as task_err:
+                chat_history_view.controls.append(MessageBubble(AIMessage(content=f"Hiba: {task_err}", name="SYSTEM_ERROR")))
+                input_field.value = ""
+                page.update()
+                return
             task_init_message = AIMessage(
-                content=f"Rendben, a(z) '{task_content}' feladat fogadva (Azonosító: {task_id[:8]}...). ATOMOD átvette az irányítást.",
+                content=f"Rendben, a(z) '{task_content}' feladat fogadva (Azonosító: {task_id[:8]}..., mód: {meeting_mode}). ATOMOD átvette az irányítást.",
                 name="SYSTEM"
             )
             chat_history_view.controls.append(MessageBubble(task_init_message))
@@ -0,0 +1,284 @@
+# maintenance.py
+# Karbantartó parancs a helyi adattárakhoz. Az alkalmazás LEÁLLÍTOTT állapotában futtatandó:
+#   python maintenance.py report            - méretek, árva darabok, töredezettség
+#   python maintenance.py compact           - árva és duplikált darabok törlése + VACUUM/ANALYZE
+#   python maintenance.py rebuild           - a vektor-tárolók újraépítése friss mappába (új HNSW index)
+#   python maintenance.py vacuum            - csak az SQLite adatbázisok VACUUM/ANALYZE-ja
+
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from config_loader import load_yaml_file
+from memory_stores import CHROMA_CONVERSATION_PATH, CHROMA_DOCS_PATH, SQLITE_HISTORY_FILE, vector_store_path
+from document_manifest import REGISTRY_DB_FILE, DocumentManifest
+from lexical_index import LEXICAL_INDEX_FILE
+from document_blob_store import BLOB_STORE_PATH
+
+# Ennyi darabot másolunk / törlünk egy lépésben a vektor-tárolók között.
+COPY_BATCH_SIZE = 500
+# A Chroma műveleti naplójában (embeddings_queue) a törlés kódja.
+CHROMA_DELETE_OPERATION = 3
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+
+# Egy darab azonossága tárolónként: ha ugyanez a kulcs többször szerepel, a későbbiek duplikátumok.
+DOCUMENT_IDENTITY = ("source_document", "chunk_number")
+CONVERSATION_IDENTITY = ("session_id", "timestamp", "speaker", "chunk_number")
+
+def directory_size(path: str) -> int:
+    """Egy mappa (vagy fájl) teljes mérete bájtban."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def find_orphaned_chunks(ids: Sequence[str], metadatas: Sequence[dict], source_key: str,
+                         identity_keys: Sequence[str], known_sources: Optional[Set[str]] = None) -> Dict[str, List[str]]:
+    """
+    Az árva és a duplikált darabok azonosítói. Árva az a darab, amelynek forrása
+    ('source_key') nem szerepel a 'known_sources' halmazban (None: nem vizsgáljuk);
+    duplikált az, amelynek azonossága ('identity_keys') egy korábbi darabéval egyezik.
+    """
+    orphaned, duplicates, seen = [], [], set()
+    for chunk_id, metadata in zip(ids, metadatas):
+        metadata = metadata or {}
+        if known_sources is not None and metadata.get(source_key) not in known_sources:
+            orphaned.append(chunk_id)
+            continue
+        identity = tuple(metadata.get(key) for key in identity_keys)
+        if identity in seen:
+            duplicates.append(chunk_id)
+        seen.add(identity)
+    return {"orphaned": orphaned, "duplicates": duplicates}
+
+def known_documents(registry_path: str = REGISTRY_DB_FILE) -> Optional[Set[str]]:
+    """A dokumentum-jegyzékben szereplő nevek; None, ha nincs (még) jegyzék, így az árvaság nem dönthető el."""
+    if not os.path.exists(registry_path):
+        return None
+    manifest = DocumentManifest(registry_path)
+    return None if manifest.is_empty() else {document['name'] for document in manifest.list_documents()}
+
+def known_sessions(history_path: str = SQLITE_HISTORY_FILE) -> Optional[Set[str]]:
+    """A beszélgetés-naplóban szereplő session_id-k; None, ha a napló nem létezik."""
+    if not os.path.exists(history_path):
+        return None
+    conn = sqlite3.connect(history_path)
+    try:
+        return {row[0] for row in conn.execute("SELECT DISTINCT session_id FROM message_store")}
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+def log_fragmentation(chroma_dir: str) -> Dict[str, float]:
+    """
+    A töredezettség becslése a Chroma műveleti naplójából: a törlések aránya a
+    hozzáadásokhoz képest. A törölt elemek helye a HNSW indexben csak újraépítéskor szabadul fel.
+    """
+    path = os.path.join(chroma_dir, CHROMA_SQLITE_FILE)
+    if not os.path.exists(path):
+        return {"logged_adds": 0, "logged_deletes": 0, "ratio": 0.0}
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        counts = dict(conn.execute("SELECT operation, COUNT(*) FROM embeddings_queue GROUP BY operation").fetchall())
+    except sqlite3.OperationalError:
+        counts = {}
+    finally:
+        conn.close()
+    deletes = counts.get(CHROMA_DELETE_OPERATION, 0)
+    adds = sum(count for operation, count in counts.items() if operation != CHROMA_DELETE_OPERATION)
+    return {"logged_adds": adds, "logged_deletes": deletes, "ratio": deletes / adds if adds else 0.0}
+
+def sqlite_maintenance(path: str) -> Optional[tuple]:
+    """VACUUM és ANALYZE egy SQLite adatbázison. A (korábbi, új) méretet adja vissza, vagy None, ha nincs ilyen fájl."""
+    if not os.path.exists(path):
+        return None
+    before = os.path.getsize(path)
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    conn.close()
+    return (before, os.path.getsize(path))
+
+def _open_client(chroma_dir: str):
+    import chromadb
+    return chromadb.PersistentClient(path=chroma_dir)
+
+def _release_clients():
+    # A Chroma folyamatonként gyorsítótárazza a klienseket; a mappák cseréje előtt el kell engedni őket.
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+
+def _iter_batches(collection, include: List[str]) -> Iterable[dict]:
+    offset = 0
+    while True:
+        batch = collection.get(include=include, limit=COPY_BATCH_SIZE, offset=offset)
+        if not batch['ids']:
+            return
+        yield batch
+        offset += len(batch['ids'])
+
+def inspect_store(chroma_dir: str, source_key: str, identity_keys: Sequence[str],
+                  known_sources: Optional[Set[str]]) -> Dict[str, dict]:
+    """Gyűjteményenként: darabszám, árva és duplikált darabok azonosítói."""
+    client = _open_client(chroma_dir)
+    report = {}
+    for collection in client.list_collections():
+        ids, metadatas = [], []
+        for batch in _iter_batches(collection, include=["metadatas"]):
+            ids.extend(batch['ids'])
+            metadatas.extend(batch['metadatas'])
+        report[collection.name] = dict(count=len(ids), **find_orphaned_chunks(ids, metadatas, source_key, identity_keys, known_sources))
+    return report
+
+def purge_chunks(chroma_dir: str, ids_by_collection: Dict[str, List[str]]) -> int:
+    """A megadott darabok törlése a helyükön (a HNSW index mérete ettől nem csökken, lásd rebuild_store)."""
+    client = _open_client(chroma_dir)
+    removed = 0
+    for name, ids in ids_by_collection.items():
+        collection = client.get_collection(name, embedding_function=None)
+        for start in range(0, len(ids), COPY_BATCH_SIZE):
+            collection.delete(ids=ids[start:start + COPY_BATCH_SIZE])
+        removed += len(ids)
+    return removed
+
+def rebuild_store(chroma_dir: str, exclude_ids: Dict[str, Set[str]] = None, keep_backup: bool = True) -> Dict[str, int]:
+    """
+    A vektor-tároló újraépítése: minden gyűjtemény a tárolt vektorokkal együtt (újra-embedding
+    nélkül) átmásolódik egy friss mappába, a kizárt darabok kihagyásával, majd a friss mappa
+    a régi helyére kerül. A régi mappa '<mappa>.bak-<időbélyeg>' néven megmarad, ha 'keep_backup'.
+    Gyűjteményenként az átmásolt darabok számát adja vissza.
+    """
+    exclude_ids = exclude_ids or {}
+    target_dir = f"{chroma_dir.rstrip('/')}.rebuild"
+    if os.path.exists(target_dir):
+        shutil.rmtree(target_dir)
+    source_client, target_client = _open_client(chroma_dir), _open_client(target_dir)
+    copied = {}
+    for collection in source_client.list_collections():
+        target = target_client.create_collection(collection.name, metadata=collection.metadata,
+                                                 configuration=collection.configuration, embedding_function=None)
+        excluded = exclude_ids.get(collection.name, set())
+        copied[collection.name] = 0
+        for batch in _iter_batches(collection, include=["embeddings", "documents", "metadatas"]):
+            keep = [index for index, chunk_id in enumerate(batch['ids']) if chunk_id not in excluded]
+            if keep:
+                target.add(ids=[batch['ids'][i] for i in keep], embeddings=[batch['embeddings'][i] for i in keep],
+                           documents=[batch['documents'][i] for i in keep], metadatas=[batch['metadatas'][i] for i in keep])
+            copied[collection.name] += len(keep)
+    _release_clients()
+
+    backup_dir = f"{chroma_dir.rstrip('/')}.bak-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    os.replace(chroma_dir, backup_dir)
+    os.replace(target_dir, chroma_dir)
+    if not keep_backup:
+        shutil.rmtree(backup_dir)
+    return copied
+
+def _stores(config: dict) -> List[tuple]:
+    return [
+        ("beszélgetések", vector_store_path(CHROMA_CONVERSATION_PATH, config), "session_id", CONVERSATION_IDENTITY, known_sessions()),
+        ("dokumentumok", vector_store_path(CHROMA_DOCS_PATH, config), "source_document", DOCUMENT_IDENTITY, known_documents()),
+    ]
+
+def _sqlite_databases(config: dict) -> List[str]:
+    return [
+        SQLITE_HISTORY_FILE,
+        REGISTRY_DB_FILE,
+        config.get('lexical_index', {}).get('db_path', LEXICAL_INDEX_FILE),
+        os.path.join(config.get('blob_store', {}).get('path', BLOB_STORE_PATH), "blob_index.db"),
+        config.get('checkpoint_db_path', "./aito_local_data/atomod_checkpoints.db"),
+    ]
+
+def _removable_ids(store_report: Dict[str, dict]) -> Dict[str, List[str]]:
+    return {name: entry["orphaned"] + entry["duplicates"] for name, entry in store_report.items() if entry["orphaned"] or entry["duplicates"]}
+
+def run_report(config: dict):
+    print("=== AITO ADATTÁR JELENTÉS ===")
+    for label, chroma_dir, source_key, identity_keys, known in _stores(config):
+        if not os.path.exists(chroma_dir):
+            print(f"\n[{label}] {chroma_dir}: nem létezik.")
+            continue
+        fragmentation = log_fragmentation(chroma_dir)
+        print(f"\n[{label}] {chroma_dir}: {_format_bytes(directory_size(chroma_dir))}")
+        for name, entry in inspect_store(chroma_dir, source_key, identity_keys, known).items():
+            orphan_note = "nem vizsgálható (nincs nyilvántartás)" if known is None else len(entry["orphaned"])
+            print(f"  Gyűjtemény '{name}': {entry['count']} darab, árva: {orphan_note}, duplikált: {len(entry['duplicates'])}")
+        print(f"  Töredezettség: {fragmentation['logged_deletes']} törlés / {fragmentation['logged_adds']} hozzáadás "
+              f"a naplóban ({fragmentation['ratio']:.0%})")
+    print("\n[SQLite adatbázisok]")
+    for path in _sqlite_databases(config):
+        print(f"  {path}: {_format_bytes(os.path.getsize(path)) if os.path.exists(path) else 'nem létezik'}")
+
+def run_vacuum(config: dict, chroma_dirs: Iterable[str] = ()):
+    for path in list(_sqlite_databases(config)) + [os.path.join(chroma_dir, CHROMA_SQLITE_FILE) for chroma_dir in chroma_dirs]:
+        result = sqlite_maintenance(path)
+        if result:
+            print(f"  VACUUM/ANALYZE: {path}: {_format_bytes(result[0])} -> {_format_bytes(result[1])}")
+
+def run_compact(config: dict, dry_run: bool = False):
+    print("=== TÖMÖRÍTÉS (árva és duplikált darabok törlése) ===")
+    chroma_dirs = []
+    for label, chroma_dir, source_key, identity_keys, known in _stores(config):
+        if not os.path.exists(chroma_dir):
+            continue
+        chroma_dirs.append(chroma_dir)
+        removable = _removable_ids(inspect_store(chroma_dir, source_key, identity_keys, known))
+        total = sum(len(ids) for ids in removable.values())
+        if dry_run:
+            print(f"[{label}] {total} darab törölhető (próbafuttatás, nem törlünk).")
+        else:
+            print(f"[{label}] {purge_chunks(chroma_dir, removable)} darab törölve.")
+    _release_clients()
+    if not dry_run:
+        run_vacuum(config, chroma_dirs)
+
+def run_rebuild(config: dict, keep_backup: bool = True):
+    print("=== ÚJRAÉPÍTÉS (friss HNSW index, árva és duplikált darabok nélkül) ===")
+    chroma_dirs = []
+    for label, chroma_dir, source_key, identity_keys, known in _stores(config):
+        if not os.path.exists(chroma_dir):
+            continue
+        chroma_dirs.append(chroma_dir)
+        report = inspect_store(chroma_dir, source_key, identity_keys, known)
+        excluded = {name: set(ids) for name, ids in _removable_ids(report).items()}
+        before = directory_size(chroma_dir)
+        copied = rebuild_store(chroma_dir, excluded, keep_backup=keep_backup)
+        print(f"[{label}] {sum(copied.values())} darab átmásolva, "
+              f"{_format_bytes(before)} -> {_format_bytes(directory_size(chroma_dir))}")
+    run_vacuum(config, chroma_dirs)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Az AITO helyi adattárainak karbantartása (leállított alkalmazás mellett).")
+    parser.add_argument("command", choices=["report", "compact", "rebuild", "vacuum"])
+    parser.add_argument("--config", default="config_aito.yaml")
+    parser.add_argument("--dry-run", action="store_true", help="compact: csak kiírja, mit törölne")
+    parser.add_argument("--no-backup", action="store_true", help="rebuild: a régi mappát nem őrzi meg")
+    args = parser.parse_args(argv)
+
+    config = load_yaml_file(args.config)
+    if args.command == "report":
+        run_report(config)
+    elif args.command == "compact":
+        run_compact(config, dry_run=args.dry_run)
+    elif args.command == "rebuild":
+        run_rebuild(config, keep_backup=not args.no_backup)
+    else:
+        run_vacuum(config)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,296 @@
+# memory_indexer.py
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from langchain_core.documents import Document
+
+from memory_stores import LOCAL_DB_PATH
+from memory_partitions import DEFAULT_PARTITION_ID, PARTITION_METADATA_KEY
+from lexical_index import tokenize
+from tool_cache import bump_generation, CONVERSATIONS_SCOPE
+
+OUTBOX_DB_FILE = f"{LOCAL_DB_PATH}/memory_outbox.db"
+
+# Alapértékek (a config 'memory_indexer' szekciója felülírja)
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_FLUSH_INTERVAL_SECONDS = 0.5
+DEFAULT_RETRY_BASE_SECONDS = 2.0
+DEFAULT_RETRY_MAX_SECONDS = 120.0
+# Ennyi sikertelen próbálkozás után a sor a "parkoló" (dead-letter) táblába kerül, az utolsó hibával együtt.
+DEFAULT_MAX_ATTEMPTS = 8
+
+def _default_chunker(text: str) -> List[str]:
+    from shared_components import chunk_text
+    return chunk_text(text)
+
+class MemoryIndexer:
+    """
+    Késleltetett (write-behind) indexelő a beszélgetés-vektorokhoz. Az üzenetek egy
+    tartós SQLite "kimenő" táblába (outbox) kerülnek, ami azonnal visszatér; egy
+    háttérszál darabolja és kis kötegekben (micro-batch) embeddeli őket. Egy sikertelen
+    köteg sorait ezután egyenként, soronként exponenciálisan növekvő várakozással
+    próbálja újra, így egy hibás üzenet nem tartja vissza a többit; 'max_attempts'
+    sikertelen próbálkozás után a sor a parkoló táblába kerül. Ami még nincs indexelve, az a
+    search_pending() kulcsszavas keresésével érhető el, így a memória-keresés addig
+    sem veszít el egyetlen üzenetet sem. Újraindításkor a maradék sor folytatódik.
+    A 'partition_id' metaadattal érkező üzenetek a 'get_partition_store' által adott
+    partíció-tárolóba kerülnek (lásd memory_partitions.py), a többi az alapértelmezettbe.
+    """
+    def __init__(self, get_vector_store: Callable[[], object], db_path: str = OUTBOX_DB_FILE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+                 retry_base: float = DEFAULT_RETRY_BASE_SECONDS, retry_max: float = DEFAULT_RETRY_MAX_SECONDS,
+                 chunker: Callable[[str], List[str]] = _default_chunker, name: str = "MemoryIndexer",
+                 get_partition_store: Optional[Callable[[str], object]] = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        # A vektor-tárolót függvényként kapjuk: a munkaszál akkor vár rá (pl. warmup.get), amikor először szüksége van rá.
+        self.get_vector_store = get_vector_store
+        self.get_partition_store = get_partition_store
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.max_attempts = max_attempts
+        self.chunker = chunker
+        self.name = name
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"indexed_messages": 0, "indexed_chunks": 0, "batches": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
+        self._initialize_table()
+
+    @classmethod
+    def from_config(cls, config: dict, get_vector_store: Callable[[], object], name: str = "MemoryIndexer",
+                    get_partition_store: Optional[Callable[[str], object]] = None) -> "MemoryIndexer":
+        indexer_config = config.get('memory_indexer', {})
+        return cls(
+            get_vector_store,
+            db_path=indexer_config.get('db_path', OUTBOX_DB_FILE),
+            batch_size=indexer_config.get('batch_size', DEFAULT_BATCH_SIZE),
+            flush_interval=indexer_config.get('flush_interval_seconds', DEFAULT_FLUSH_INTERVAL_SECONDS),
+            retry_base=indexer_config.get('retry_base_seconds', DEFAULT_RETRY_BASE_SECONDS),
+            retry_max=indexer_config.get('retry_max_seconds', DEFAULT_RETRY_MAX_SECONDS),
+            name=name,
+            get_partition_store=get_partition_store,
+            max_attempts=indexer_config.get('max_attempts', DEFAULT_MAX_ATTEMPTS)
+        )
+
+    def _initialize_table(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS memory_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS memory_outbox_parked (
+                id INTEGER PRIMARY KEY,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                parked_at TEXT NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def enqueue(self, content: str, metadata: dict) -> int:
+        """Egy üzenet felvétele a kimenő táblába. Nem hív embedding szolgáltatást; az új sor azonosítóját adja vissza."""
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            row_id = conn.execute(
+                "INSERT INTO memory_outbox (content, metadata, created_at) VALUES (?, ?, ?)",
+                (content, json.dumps(metadata, ensure_ascii=False), datetime.now(timezone.utc).isoformat())
+            ).lastrowid
+        conn.close()
+        self._wakeup.set()
+        return row_id
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def pending_count(self) -> int:
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute("SELECT COUNT(*) FROM memory_outbox").fetchone()[0]
+        conn.close()
+        return count
+
+    def parked_count(self) -> int:
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute("SELECT COUNT(*) FROM memory_outbox_parked").fetchone()[0]
+        conn.close()
+        return count
+
+    def requeue_parked(self) -> int:
+        """A parkoló sorok visszaállítása a kimenő táblába, nullázott próbálkozás-számmal. A visszaállított sorok számát adja."""
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute('''
+                INSERT INTO memory_outbox (id, content, metadata, created_at, last_error)
+                SELECT id, content, metadata, created_at, last_error FROM memory_outbox_parked
+            ''')
+            count = conn.execute("DELETE FROM memory_outbox_parked").rowcount
+        conn.close()
+        self._wakeup.set()
+        return count
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Megvárja, hogy a kimenő tábla kiürüljön. True, ha az időkorláton belül sikerült."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.pending_count():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._wakeup.set()
+            time.sleep(0.05)
+        return True
+
+    def _fetch_due(self) -> list:
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            "SELECT id, content, metadata, attempts FROM memory_outbox WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+            (time.time(), self.batch_size)
+        ).fetchall()
+        conn.close()
+        return rows
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                return
+            rows = self._fetch_due()
+            while rows and not self._stopping.is_set():
+                # Az új sorok kötegben mennek; a már egyszer elbukott sorok egyenként, hogy a hibás ne vigye magával a többit.
+                fresh = [row for row in rows if row[3] == 0]
+                if fresh:
+                    self._index_batch(fresh)
+                for row in rows:
+                    if row[3] and not self._stopping.is_set():
+                        self._index_batch([row])
+                rows = self._fetch_due() if len(rows) == self.batch_size else []
+
+    def _store_for(self, partition_id: str):
+        if partition_id == DEFAULT_PARTITION_ID or self.get_partition_store is None:
+            return self.get_vector_store()
+        return self.get_partition_store(partition_id)
+
+    def _index_batch(self, rows: list):
+        # Partíciónként egy add_documents hívás (a köteg sorrendjében).
+        batches: dict = {}
+        for row_id, content, metadata, _ in rows:
+            metadata = json.loads(metadata)
+            documents, ids = batches.setdefault(metadata.get(PARTITION_METADATA_KEY, DEFAULT_PARTITION_ID), ([], []))
+            chunks = self.chunker(content)
+            for number, chunk in enumerate(chunks, start=1):
+                documents.append(Document(page_content=chunk, metadata=dict(metadata, chunk_number=number, total_chunks=len(chunks))))
+                # Determinisztikus azonosító: egy sikeres, de nem nyugtázott köteg ismétlése nem duplikál.
+                ids.append(f"outbox-{row_id}-{number}")
+        documents = [document for partition_documents, _ in batches.values() for document in partition_documents]
+
+        start = time.monotonic()
+        try:
+            for partition_id, (partition_documents, ids) in batches.items():
+                if partition_documents:
+                    self._store_for(partition_id).add_documents(partition_documents, ids=ids)
+        except Exception as e:
+            self._schedule_retry(rows, e)
+            return
+
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.executemany("DELETE FROM memory_outbox WHERE id = ?", [(row[0],) for row in rows])
+        conn.close()
+        # A beszélgetés-vektorokra épülő cache-bejegyzések (query_cache) ezzel elavulnak.
+        bump_generation(CONVERSATIONS_SCOPE)
+        with self._stats_lock:
+            self._stats["indexed_messages"] += len(rows)
+            self._stats["indexed_chunks"] += len(documents)
+            self._stats["batches"] += 1
+        logging.info(f"{self.name}: {len(rows)} üzenet ({len(documents)} darab) indexelve {time.monotonic() - start:.2f} mp alatt.")
+
+    def _schedule_retry(self, rows: list, error: Exception):
+        """Soronkénti újrapróbálás a saját próbálkozás-száma szerint; a 'max_attempts'-et elérő sor parkolóba kerül."""
+        with self._stats_lock:
+            self._stats["failures"] += 1
+        retries, parked = [], []
+        for row_id, _, _, attempts in rows:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                parked.append((attempts, str(error), datetime.now(timezone.utc).isoformat(), row_id))
+            else:
+                delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+                retries.append((time.time() + delay, str(error), row_id))
+        logging.warning(f"{self.name}: {len(rows)} üzenet indexelése sikertelen ({len(retries)} újrapróbálva, "
+                        f"{len(parked)} parkolóba téve): {error}")
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.executemany(
+                "UPDATE memory_outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?", retries
+            )
+            for attempts, last_error, parked_at, row_id in parked:
+                conn.execute('''
+                    INSERT OR REPLACE INTO memory_outbox_parked (id, content, metadata, created_at, attempts, last_error, parked_at)
+                    SELECT id, content, metadata, created_at, ?, ?, ? FROM memory_outbox WHERE id = ?
+                ''', (attempts, last_error, parked_at, row_id))
+                conn.execute("DELETE FROM memory_outbox WHERE id = ?", (row_id,))
+        conn.close()
+        if parked:
+            logging.error(f"{self.name}: {len(parked)} üzenet {self.max_attempts} próbálkozás után parkolóba került: {error}")
+
+    def search_pending(self, query: str, k: int = 5, partition_id: Optional[str] = None) -> List[Document]:
+        """
+        Kulcsszavas keresés a még nem indexelt üzenetek között (a vektoros keresés kiegészítésére),
+        a parkolóba került üzeneteket is beleértve. 'partition_id' esetén csak az adott
+        memória-partíció üzenetei között.
+        """
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return []
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            "SELECT id, content, metadata FROM memory_outbox UNION ALL SELECT id, content, metadata FROM memory_outbox_parked ORDER BY id"
+        ).fetchall()
+        conn.close()
+        scored = []
+        for _, content, metadata in rows:
+            metadata = json.loads(metadata)
+            if partition_id is not None and metadata.get(PARTITION_METADATA_KEY, DEFAULT_PARTITION_ID) != partition_id:
+                continue
+            overlap = len(query_terms & set(tokenize(content)))
+            if overlap:
+                scored.append((overlap, Document(page_content=content, metadata=metadata)))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [document for _, document in scored[:k]]
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats, pending=self.pending_count(), parked=self.parked_count())
+
+logging.debug("Memória-indexelő modul (memory_indexer.py) betöltve.")
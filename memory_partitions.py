@@ -0,0 +1,208 @@
+# memory_partitions.py
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from memory_stores import LOCAL_DB_PATH
+
+PARTITIONS_DB_FILE = f"{LOCAL_DB_PATH}/memory_partitions.db"
+# Az alapértelmezett partíció a korábbi, közös tár: a "langchain" Chroma gyűjtemény és a config 'session_id' naplója.
+DEFAULT_PARTITION_ID = "default"
+# Ezzel a metaadat-kulccsal kerül egy üzenet (és a vektor-darabjai) a partíciójába; hiánya = alapértelmezett partíció.
+PARTITION_METADATA_KEY = "partition_id"
+MEETING_KIND = "meeting"
+# A Chroma gyűjteménynév legfeljebb 63 karakter, csak betű, szám, '_' és '-'.
+COLLECTION_NAME_MAX_CHARS = 63
+# A nyers kulcs rövid hash-e a név végén: a tisztítás ("a.b" és "a_b") és a levágás se okozhasson ütközést.
+COLLECTION_HASH_CHARS = 8
+# A partíció hideg (tömörített) gyűjteménye a saját gyűjteménynevéből és ebből az utótagból áll.
+COLD_COLLECTION_SUFFIX = "_cold"
+
+def _collection_name(kind: str, key: str) -> str:
+    key_hash = hashlib.sha1(key.encode("utf-8")).hexdigest()[:COLLECTION_HASH_CHARS]
+    max_readable_chars = COLLECTION_NAME_MAX_CHARS - len(COLD_COLLECTION_SUFFIX) - COLLECTION_HASH_CHARS - 1
+    readable = f"aito_{kind}_{re.sub(r'[^A-Za-z0-9_-]', '_', key)}"[:max_readable_chars].rstrip("_-")
+    return f"{readable}_{key_hash}"
+
+@dataclass
+class MemoryPartition:
+    """Egy logikai memória-partíció: saját vektor-gyűjtemény és saját beszélgetés-napló (SQLite session)."""
+    partition_id: str
+    kind: str
+    history_session_id: str
+    collection_name: Optional[str] = None  # None = a régi, alapértelmezett gyűjtemény
+    meeting_id: Optional[str] = None
+    description: str = ""
+    created_at: str = ""
+
+    @property
+    def is_default(self) -> bool:
+        return self.partition_id == DEFAULT_PARTITION_ID
+
+    @property
+    def cold_collection_name(self) -> Optional[str]:
+        """A memória-rétegzés hideg gyűjteménye; None = a régi, alapértelmezett hideg gyűjtemény."""
+        if self.collection_name is None:
+            return None
+        return f"{self.collection_name[:COLLECTION_NAME_MAX_CHARS - len(COLD_COLLECTION_SUFFIX)]}{COLD_COLLECTION_SUFFIX}"
+
+class PartitionRegistry:
+    """
+    A memória-partíciók nyilvántartása (SQLite): melyik megbeszéléshez melyik
+    gyűjtemény és napló-session tartozik. Egy megbeszélés partíciója az első használatkor jön
+    létre, és ezután mindig ugyanaz marad. Kikapcsolt partícionálásnál minden az alapértelmezett
+    partícióba kerül, ahogy korábban.
+    """
+    def __init__(self, default_session_id: str, db_path: str = PARTITIONS_DB_FILE, enabled: bool = True):
+        self.default_session_id = default_session_id
+        self.db_path = db_path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._initialize_table()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "PartitionRegistry":
+        partition_config = config.get('memory_partitions', {})
+        return cls(
+            config.get('session_id', 'aito_shared_log'),
+            db_path=partition_config.get('db_path', PARTITIONS_DB_FILE),
+            enabled=partition_config.get('enabled', True)
+        )
+
+    def _initialize_table(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS memory_partitions (
+                partition_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                history_session_id TEXT NOT NULL,
+                collection_name TEXT NOT NULL,
+                meeting_id TEXT,
+                description TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_memory_partitions_meeting ON memory_partitions (meeting_id)")
+        conn.commit()
+        conn.close()
+
+    def default(self) -> MemoryPartition:
+        return MemoryPartition(DEFAULT_PARTITION_ID, "default", self.default_session_id)
+
+    def get(self, partition_id: Optional[str]) -> Optional[MemoryPartition]:
+        if not partition_id or partition_id == DEFAULT_PARTITION_ID:
+            return self.default()
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute('''
+            SELECT partition_id, kind, history_session_id, collection_name, meeting_id, description, created_at
+            FROM memory_partitions WHERE partition_id = ?
+        ''', (partition_id,)).fetchone()
+        conn.close()
+        return MemoryPartition(*row) if row else None
+
+    def _get_or_create(self, kind: str, key: str, meeting_id: Optional[str], description: str) -> MemoryPartition:
+        partition_id = f"{kind}:{key}"
+        with self._lock:
+            existing = self.get(partition_id)
+            if existing:
+                return existing
+            history_session_id = f"{self.default_session_id}/{kind}/{key}"
+            partition = MemoryPartition(partition_id, kind, history_session_id, _collection_name(kind, key), meeting_id,
+                                        description, datetime.now(timezone.utc).isoformat())
+            conn = sqlite3.connect(self.db_path)
+            with conn:
+                conn.execute('''
+                    INSERT INTO memory_partitions (partition_id, kind, history_session_id, collection_name, meeting_id, description, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (partition.partition_id, kind, history_session_id, partition.collection_name, meeting_id,
+                      description, partition.created_at))
+            conn.close()
+            logging.info(f"Új memória-partíció: {partition_id} (gyűjtemény: {partition.collection_name}).")
+            return partition
+
+    def for_meeting(self, meeting_id: str, description: str = "") -> MemoryPartition:
+        """A megbeszélés partíciója (az első híváskor létrehozva)."""
+        if not self.enabled or not meeting_id:
+            return self.default()
+        return self._get_or_create(MEETING_KIND, meeting_id, meeting_id, description)
+
+    def active(self, meeting_status: Optional[dict]) -> MemoryPartition:
+        """Az aktív partíció: futó megbeszélés alatt a megbeszélésé, egyébként az alapértelmezett."""
+        meeting_status = meeting_status or {}
+        if meeting_status.get('is_active') and meeting_status.get('meeting_id'):
+            return self.for_meeting(meeting_status['meeting_id'])
+        return self.default()
+
+    def list_partitions(self) -> List[MemoryPartition]:
+        """Az alapértelmezett partíció, majd a többi a létrehozás sorrendjében."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute('''
+            SELECT partition_id, kind, history_session_id, collection_name, meeting_id, description, created_at
+            FROM memory_partitions ORDER BY created_at, partition_id
+        ''').fetchall()
+        conn.close()
+        return [self.default()] + [MemoryPartition(*row) for row in rows]
+
+class PartitionedMemory:
+    """
+    Partíciónként a vektor-tároló, a hideg (tömörített) vektor-tároló és a beszélgetés-napló,
+    lustán megnyitva és megtartva. A megnyitó függvények a partíciót kapják (az alapértelmezettnél
+    a meglévő tárolót adják vissza).
+    """
+    def __init__(self, registry: PartitionRegistry, open_vector_store: Callable[[MemoryPartition], object],
+                 open_chat_history: Callable[[MemoryPartition], object],
+                 open_cold_vector_store: Optional[Callable[[MemoryPartition], object]] = None):
+        self.registry = registry
+        self.open_vector_store = open_vector_store
+        self.open_chat_history = open_chat_history
+        self.open_cold_vector_store = open_cold_vector_store
+        self._vector_stores: Dict[str, object] = {}
+        self._cold_vector_stores: Dict[str, object] = {}
+        self._chat_histories: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _partition(self, partition_id: Optional[str]) -> MemoryPartition:
+        partition = self.registry.get(partition_id)
+        if partition is None:
+            raise KeyError(f"Ismeretlen memória-partíció: '{partition_id}'")
+        return partition
+
+    def vector_store(self, partition_id: Optional[str] = None):
+        with self._lock:
+            partition = self._partition(partition_id)
+            if partition.partition_id not in self._vector_stores:
+                self._vector_stores[partition.partition_id] = self.open_vector_store(partition)
+            return self._vector_stores[partition.partition_id]
+
+    def cold_vector_store(self, partition_id: Optional[str] = None):
+        """A partíció hideg gyűjteménye (None, ha nincs megnyitó megadva)."""
+        if self.open_cold_vector_store is None:
+            return None
+        with self._lock:
+            partition = self._partition(partition_id)
+            if partition.partition_id not in self._cold_vector_stores:
+                self._cold_vector_stores[partition.partition_id] = self.open_cold_vector_store(partition)
+            return self._cold_vector_stores[partition.partition_id]
+
+    def chat_history(self, partition_id: Optional[str] = None):
+        with self._lock:
+            partition = self._partition(partition_id)
+            if partition.partition_id not in self._chat_histories:
+                self._chat_histories[partition.partition_id] = self.open_chat_history(partition)
+            return self._chat_histories[partition.partition_id]
+
+    def other_vector_stores(self, partition_id: Optional[str] = None) -> list:
+        """Az összes többi partíció vektor-tárolója (a kifejezetten kért, partíciókon átnyúló kereséshez)."""
+        partition_id = partition_id or DEFAULT_PARTITION_ID
+        return [self.vector_store(partition.partition_id) for partition in self.registry.list_partitions()
+                if partition.partition_id != partition_id]
+
+logging.debug("Memória-partíció modul (memory_partitions.py) betöltve.")
@@ -0,0 +1,61 @@
+# memory_stores.py
+
+import logging
+import os
+
+# --- Helyi adatbázis fájlok és mappák ---
+LOCAL_DB_PATH = "./aito_local_data"
+CHROMA_CONVERSATION_PATH = f"{LOCAL_DB_PATH}/chroma_conversations"
+CHROMA_DOCS_PATH = f"{LOCAL_DB_PATH}/chroma_documents"
+SQLITE_HISTORY_FILE = f"{LOCAL_DB_PATH}/aito_chat_history.db"
+# A régi beszélgetés-vektorok "hideg" gyűjteménye (memory_tiering.py); a beszélgetés-mappában él.
+COLD_CONVERSATION_COLLECTION = "aito_conversations_cold"
+
+# A nehéz könyvtárakat (Vertex AI, Chroma, SQLAlchemy) csak a függvényeken belül
+# importáljuk, így a modul importja gyors, és a tényleges munka a háttérben,
+# a bemelegítő (warmup.py) szálain történhet.
+
+def create_embeddings(config: dict):
+    """A configban kiválasztott embedding háttér (alapértelmezésben Google Cloud, lásd embedding_backends.py)."""
+    from embedding_backends import create_embedding_backend
+    return create_embedding_backend(config)
+
+def vector_store_path(base_path: str, config: dict) -> str:
+    """
+    A vektor-tároló mappája az aktív embedding háttérhez. A különböző hátterek vektorai
+    nem összemérhetők, ezért a nem alapértelmezett háttér saját mappát kap
+    (pl. 'chroma_documents_local'); a Vertex AI a meglévő mappákat használja tovább.
+    """
+    from embedding_backends import get_backend_name, DEFAULT_BACKEND
+    backend = get_backend_name(config)
+    return base_path if backend == DEFAULT_BACKEND else f"{base_path}_{backend}"
+
+def create_vector_store(persist_directory: str, embeddings, collection_name: str = None):
+    """Egy helyi Chroma vektor-tároló megnyitása (vagy létrehozása) a megadott mappában (és gyűjteményben)."""
+    from langchain_chroma import Chroma
+    os.makedirs(LOCAL_DB_PATH, exist_ok=True)
+    # A gyűjtemény neve alapértelmezésben a LangChain-é ("langchain"), ahogy eddig.
+    extra = {"collection_name": collection_name} if collection_name else {}
+    store = Chroma(
+        persist_directory=persist_directory,
+        embedding_function=embeddings,
+        **extra
+    )
+    print(f"Vektor-tároló sikeresen csatlakoztatva: {persist_directory}{f' ({collection_name})' if collection_name else ''}")
+    return store
+
+def create_chat_history(config: dict, session_id: str = None):
+    """
+    A helyi SQLite beszélgetés-napló csatlakoztatása. Alapértelmezésben a config 'session_id'
+    munkamenete; egy memória-partíció (memory_partitions.py) a saját session-jét adja meg.
+    """
+    from langchain_community.chat_message_histories.sql import SQLChatMessageHistory
+    os.makedirs(LOCAL_DB_PATH, exist_ok=True)
+    history = SQLChatMessageHistory(
+        session_id=session_id or config['session_id'],
+        connection=f"sqlite:///{SQLITE_HISTORY_FILE}"
+    )
+    print(f"Beszélgetés-napló sikeresen csatlakoztatva: {SQLITE_HISTORY_FILE}")
+    return history
+
+logging.debug("Memória-tároló modul (memory_stores.py) sikeresen betöltve.")
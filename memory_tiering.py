@@ -0,0 +1,181 @@
+# memory_tiering.py
+
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+
+from config_loader import load_yaml_file
+from model_factory import create_chat_model
+from document_reader import strip_chunk_overlaps
+from tool_cache import bump_generation, CONVERSATIONS_SCOPE
+
+# Alapértékek (a config 'memory_tiering' szekciója felülírja)
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_HOT_VECTORS = 20000
+DEFAULT_SUMMARY_MODEL = "gemini-2.0-flash-001"
+# Egy kivonat forrásszövegének felső korlátja; a nagyobb csoport több kivonatra oszlik.
+DIGEST_MAX_TRANSCRIPT_CHARS = 60000
+
+DIGEST_TIER = "digest"
+DIGEST_SPEAKER = "DIGEST"
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def digest_group(metadata: dict) -> Tuple[str, str]:
+    """Egy darab kivonat-csoportja: (session_id, "meeting:<id>") megbeszélésnél, különben (session_id, "day:<dátum>")."""
+    if metadata.get('meeting_id'):
+        return (metadata.get('session_id', ''), f"meeting:{metadata['meeting_id']}")
+    return (metadata.get('session_id', ''), f"day:{_parse_timestamp(metadata['timestamp']).date().isoformat()}")
+
+def _raw_collection(store):
+    # A vektorokat újra-embedding nélkül mozgatjuk, ehhez a LangChain Chroma mögötti gyűjtemény kell.
+    return getattr(store, "_collection", store)
+
+def _summarize_with_llm(config: dict) -> Callable[[str, str], str]:
+    def summarize(period: str, transcript: str) -> str:
+        llm = create_chat_model(config.get('memory_tiering', {}).get('summary_model', DEFAULT_SUMMARY_MODEL),
+                                caller="memory_digest", config=config, temperature=0.2)
+        prompt_content = load_yaml_file('prompts.yaml')['memory_digest_prompt'].format(period=period, transcript=transcript)
+        return llm.invoke([HumanMessage(content=prompt_content)]).content
+    return summarize
+
+class MemoryTiering:
+    """
+    A beszélgetés-vektorok rétegzése. A 'max_age_days'-nél régebbi üzenetek naponként
+    (megbeszélés esetén megbeszélésenként) egy-egy kivonatba kerülnek, amely egyetlen
+    új vektorként marad a "meleg" indexben; a nyers vektorok (újra-embedding nélkül) a
+    "hideg" gyűjteménybe költöznek, amelyet csak kérésre keresünk. Ha a meleg index így
+    is nagyobb 'max_hot_vectors'-nál, a legrégebbi napok is tömörítésre kerülnek.
+    Az eredeti üzenetek az SQLite naplóban változatlanul megmaradnak.
+    """
+    def __init__(self, hot_store, cold_store, summarize: Callable[[str, str], str],
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS, max_hot_vectors: int = DEFAULT_MAX_HOT_VECTORS):
+        self.hot_store = hot_store
+        self.cold_store = cold_store
+        self.summarize = summarize
+        self.max_age_days = max_age_days
+        self.max_hot_vectors = max_hot_vectors
+
+    @classmethod
+    def from_config(cls, config: dict, hot_store, cold_store, summarize: Callable[[str, str], str] = None) -> "MemoryTiering":
+        tiering_config = config.get('memory_tiering', {})
+        return cls(
+            hot_store, cold_store, summarize or _summarize_with_llm(config),
+            max_age_days=tiering_config.get('max_age_days', DEFAULT_MAX_AGE_DAYS),
+            max_hot_vectors=tiering_config.get('max_hot_vectors', DEFAULT_MAX_HOT_VECTORS)
+        )
+
+    def _select_groups(self, ids: List[str], metadatas: List[dict], now: datetime) -> "OrderedDict[Tuple[str, str], List[str]]":
+        """A tömörítendő csoportok (a legrégebbitől kezdve) és a hozzájuk tartozó darab-azonosítók."""
+        cutoff = now - timedelta(days=self.max_age_days)
+        groups: "OrderedDict[Tuple[str, str], List[str]]" = OrderedDict()
+        newest: Dict[Tuple[str, str], datetime] = {}
+        digest_count = 0
+        for chunk_id, metadata in sorted(zip(ids, metadatas), key=lambda item: str((item[1] or {}).get('timestamp'))):
+            metadata = metadata or {}
+            if metadata.get('tier') == DIGEST_TIER:
+                digest_count += 1
+                continue
+            timestamp = _parse_timestamp(metadata.get('timestamp'))
+            if timestamp is None:
+                continue
+            group = digest_group(metadata)
+            groups.setdefault(group, []).append(chunk_id)
+            newest[group] = max(newest.get(group, timestamp), timestamp)
+
+        selected = OrderedDict((group, members) for group, members in groups.items() if newest[group] < cutoff)
+        # A meleg index korlátja: ha a megmaradó nyers darabok és a kivonatok száma túl nagy, a következő legrégebbi csoportok is mennek.
+        remaining = sum(len(members) for group, members in groups.items() if group not in selected) + digest_count + len(selected)
+        for group, members in groups.items():
+            if remaining <= self.max_hot_vectors:
+                break
+            if group not in selected:
+                selected[group] = members
+                remaining -= len(members) - 1
+        return selected
+
+    def _build_digests(self, group: Tuple[str, str], rows: List[tuple]) -> List[Document]:
+        """Egy csoport darabjaiból (id, szöveg, metaadat) a kivonat dokumentum(ok)."""
+        session_id, period = group
+        messages: "OrderedDict[tuple, list]" = OrderedDict()
+        for _, text, metadata in sorted(rows, key=lambda row: (str(row[2].get('timestamp')), row[2].get('chunk_number', 0))):
+            messages.setdefault((metadata.get('timestamp'), metadata.get('speaker')), []).append((text, metadata))
+        lines = [f"[{timestamp}] {speaker}: {''.join(strip_chunk_overlaps(chunks))}" for (timestamp, speaker), chunks in messages.items()]
+
+        parts, current = [], []
+        for line in lines:
+            if current and sum(len(existing) for existing in current) + len(line) > DIGEST_MAX_TRANSCRIPT_CHARS:
+                parts.append(current)
+                current = []
+            current.append(line)
+        parts.append(current)
+
+        timestamps = sorted(str(metadata.get('timestamp')) for _, _, metadata in rows)
+        meeting_id = rows[0][2].get('meeting_id') if period.startswith("meeting:") else None
+        digests = []
+        for index, part in enumerate(parts, start=1):
+            label = period if len(parts) == 1 else f"{period} ({index}/{len(parts)})"
+            metadata = {
+                "tier": DIGEST_TIER, "speaker": DIGEST_SPEAKER, "session_id": session_id, "period": label,
+                "timestamp": timestamps[-1], "first_timestamp": timestamps[0], "message_count": len(part),
+                "chunk_number": index, "total_chunks": len(parts),
+            }
+            if meeting_id:
+                metadata["meeting_id"] = meeting_id
+            digests.append(Document(page_content=f"KIVONAT ({label}):\n{self.summarize(label, chr(10).join(part))}", metadata=metadata))
+        return digests
+
+    def compact(self, now: Optional[datetime] = None) -> dict:
+        """
+        Egy tömörítési kör. Sorrend: kivonat a meleg indexbe, nyers vektorok a hideg
+        gyűjteménybe, végül törlés a meleg indexből; egy megszakadt kör ismétlése így nem
+        veszít és nem duplikál adatot (determinisztikus kivonat-azonosítók, upsert).
+        """
+        now = now or datetime.now(timezone.utc)
+        listing = self.hot_store.get(include=["metadatas"])
+        groups = self._select_groups(listing['ids'], listing['metadatas'], now)
+        stats = {"groups": 0, "moved_vectors": 0, "digests": 0}
+        for group, member_ids in groups.items():
+            rows = self.hot_store.get(ids=member_ids, include=["documents", "metadatas", "embeddings"])
+            digests = self._build_digests(group, list(zip(rows['ids'], rows['documents'], rows['metadatas'])))
+            group_hash = hashlib.sha1("|".join(sorted(member_ids)).encode("utf-8")).hexdigest()[:16]
+            self.hot_store.add_documents(digests, ids=[f"digest-{group_hash}-{index}" for index in range(1, len(digests) + 1)])
+            _raw_collection(self.cold_store).upsert(ids=rows['ids'], embeddings=rows['embeddings'],
+                                                    documents=rows['documents'], metadatas=rows['metadatas'])
+            self.hot_store.delete(ids=rows['ids'])
+            stats["groups"] += 1
+            stats["moved_vectors"] += len(rows['ids'])
+            stats["digests"] += len(digests)
+            bump_generation(CONVERSATIONS_SCOPE)
+            logging.info(f"Memória-rétegzés: {group[1]} - {len(rows['ids'])} vektor a hideg gyűjteménybe, {len(digests)} kivonat.")
+        return stats
+
+def compact_partitions(config: dict, partitions, summarize: Callable[[str, str], str] = None,
+                       now: Optional[datetime] = None) -> Dict[str, dict]:
+    """
+    Egy tömörítési kör minden memória-partícióban (memory_partitions.PartitionedMemory): a
+    partíció meleg gyűjteménye a saját hideg gyűjteményébe tömörül. Egy partíció hibája nem
+    állítja le a többit. Partíciónként a compact() statisztikáját adja vissza.
+    """
+    summarize = summarize or _summarize_with_llm(config)
+    results = {}
+    for partition in partitions.registry.list_partitions():
+        try:
+            tiering = MemoryTiering.from_config(config, partitions.vector_store(partition.partition_id),
+                                                partitions.cold_vector_store(partition.partition_id), summarize)
+            results[partition.partition_id] = tiering.compact(now=now)
+        except Exception as e:
+            logging.error(f"Hiba a(z) '{partition.partition_id}' partíció memória-rétegzése közben: {e}", exc_info=True)
+    return results
+
+logging.debug("Memória-rétegző modul (memory_tiering.py) betöltve.")
@@ -0,0 +1,62 @@
+# model_factory.py
+
+import logging
+from typing import Callable, Dict, Optional
+
+from config_loader import load_yaml_file
+from llm_ledger import LedgerCallbackHandler, get_ledger
+
+DEFAULT_CHAT_BACKEND = "vertex"
+# A config nélküli hívók (elemző szálak, szintézis, kockázat-validálás) is az alkalmazás beállításait kapják.
+DEFAULT_CONFIG_FILE = "config_aito.yaml"
+
+def _create_vertex_chat_model(model_name: str, config: dict, project: Optional[str], location: Optional[str],
+                              disable_safety_filters: bool, callbacks: list, **model_kwargs):
+    from langchain_google_vertexai import ChatVertexAI, HarmCategory, HarmBlockThreshold
+    if disable_safety_filters:
+        model_kwargs["safety_settings"] = {
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+        }
+    return ChatVertexAI(
+        model_name=model_name,
+        project=project or config.get('project_id'),
+        location=location or config.get('conversation_location'),
+        callbacks=callbacks,
+        **model_kwargs
+    )
+
+def _create_standin_chat_model(model_name: str, config: dict, project: Optional[str], location: Optional[str],
+                               disable_safety_filters: bool, callbacks: list, **model_kwargs):
+    # A mintavételi paraméterek (temperature, top_p, ...) a helyettesítőnél nem számítanak.
+    from vertex_standin import StandinChatModel
+    return StandinChatModel.from_config(config, model_name, callbacks=callbacks)
+
+# Név -> gyártófüggvény (a config 'chat_backend' kulcsa választ; lásd embedding_backends.EMBEDDING_BACKENDS).
+CHAT_BACKENDS: Dict[str, Callable] = {
+    "vertex": _create_vertex_chat_model,
+    "standin": _create_standin_chat_model,
+}
+
+def create_chat_model(model_name: str, caller: str, config: Optional[dict] = None, atom_id: str = "",
+                      project: Optional[str] = None, location: Optional[str] = None,
+                      disable_safety_filters: bool = False, **model_kwargs):
+    """
+    Egy chat modell létrehozása a modellhívás-naplóhoz kötve: minden hívása a 'caller'
+    hívási helyre és az 'atom_id' ATOM-ra könyvelődik (lásd llm_ledger.py). A háttér a
+    config 'chat_backend' értéke: "vertex" (ChatVertexAI) vagy "standin" (helyi helyettesítő,
+    lásd vertex_standin.py). 'config' nélkül a config_aito.yaml beállításai érvényesek.
+    A projekt és a régió alapértelmezésben a config 'project_id' / 'conversation_location' értéke.
+    A Vertex AI SDK importja lusta, így a modul importja gyors marad.
+    """
+    config = config if config is not None else load_yaml_file(DEFAULT_CONFIG_FILE)
+    backend = config.get('chat_backend', DEFAULT_CHAT_BACKEND)
+    if backend not in CHAT_BACKENDS:
+        raise ValueError(f"Ismeretlen chat háttér: '{backend}'. Választható: {', '.join(CHAT_BACKENDS)}")
+    ledger = get_ledger(config)
+    callbacks = [LedgerCallbackHandler(ledger, caller=caller, model=model_name, atom_id=atom_id)] if ledger else []
+    return CHAT_BACKENDS[backend](model_name, config, project, location, disable_safety_filters, callbacks, **model_kwargs)
+
+logging.debug("Modell-gyár modul (model_factory.py) betöltve.")
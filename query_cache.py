@@ -0,0 +1,142 @@
+# query_cache.py
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from tool_cache import get_generation
+
+# Alapértékek (a config 'query_cache' szekciója felülírja)
+DEFAULT_EMBEDDING_ENTRIES = 1024
+DEFAULT_SEMANTIC_ENTRIES = 256
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+DEFAULT_TTL_SECONDS = 600
+
+def _normalize_query(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+def _cosine(first: Sequence[float], second: Sequence[float]) -> float:
+    dot = sum(a * b for a, b in zip(first, second))
+    norm = math.sqrt(sum(a * a for a in first)) * math.sqrt(sum(b * b for b in second))
+    return dot / norm if norm else 0.0
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embedding-csomagoló, amely a lekérdezések embeddingjét (a normalizált szöveg
+    alapján) LRU cache-ben tartja; ugyanaz a kérdés így nem hív újra embedding
+    szolgáltatást. A dokumentumok embeddingje (feltöltés, indexelés) nem kerül a cache-be.
+    A vektor-tárolók ezt kapják embedding függvényként, így az összes ATOM osztozik rajta.
+    """
+    def __init__(self, base: Embeddings, max_entries: int = DEFAULT_EMBEDDING_ENTRIES):
+        self.base = base
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @classmethod
+    def from_config(cls, config: dict, base: Embeddings) -> "CachedEmbeddings":
+        return cls(base, max_entries=config.get('query_cache', {}).get('embedding_entries', DEFAULT_EMBEDDING_ENTRIES))
+
+    def embed_query(self, text: str) -> List[float]:
+        key = _normalize_query(text)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return list(self._entries[key])
+            self._misses += 1
+        embedding = self.base.embed_query(text)
+        with self._lock:
+            self._entries[key] = list(embedding)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return embedding
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+class SemanticQueryCache:
+    """
+    A vektoros keresések találati listáinak szemantikus cache-e. Egy új lekérdezés
+    akkor kapja meg egy korábbi eredményét, ha az embeddingjük koszinusz-hasonlósága
+    eléri a küszöböt, ugyanarra a gyűjteményre és k-ra szólt, nem járt le, és a
+    tároló köre (tool_cache generáció) azóta nem kapott új írást. Így az ismétlődő
+    megbeszélés-keresések nem futtatnak újra HNSW-keresést.
+    """
+    def __init__(self, max_entries: int = DEFAULT_SEMANTIC_ENTRIES, similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, name: str = "QueryCache"):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        # Bejegyzés: (névtér, kör, generáció, lekérdezés-embedding, eredmény, tárolás ideje)
+        self._entries: List[tuple] = []
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @classmethod
+    def from_config(cls, config: dict, name: str = "QueryCache") -> "SemanticQueryCache":
+        cache_config = config.get('query_cache', {})
+        return cls(
+            max_entries=cache_config.get('semantic_entries', DEFAULT_SEMANTIC_ENTRIES),
+            similarity_threshold=cache_config.get('similarity_threshold', DEFAULT_SIMILARITY_THRESHOLD),
+            ttl_seconds=cache_config.get('ttl_seconds', DEFAULT_TTL_SECONDS),
+            name=name
+        )
+
+    def lookup(self, namespace: str, scope: str, query_embedding: Sequence[float]) -> Optional[Any]:
+        """A legjobban hasonlító, még érvényes bejegyzés eredménye, vagy None."""
+        generation = get_generation(scope)
+        now = time.monotonic()
+        with self._lock:
+            # A lejárt és az elavult generációjú bejegyzések itt kiesnek.
+            self._entries = [entry for entry in self._entries
+                             if now - entry[5] <= self.ttl_seconds and get_generation(entry[1]) == entry[2]]
+            best, best_similarity = None, self.similarity_threshold
+            for entry in self._entries:
+                if entry[0] != namespace or entry[1] != scope or entry[2] != generation:
+                    continue
+                similarity = _cosine(query_embedding, entry[3])
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+            if best is None:
+                self._misses += 1
+                return None
+            self._entries.remove(best)
+            self._entries.append(best)
+            self._hits += 1
+            logging.info(f"{self.name}: szemantikus TALÁLAT '{namespace}' (hasonlóság: {best_similarity:.3f}, "
+                         f"találati arány: {self._hits}/{self._hits + self._misses})")
+            return best[4]
+
+    def store(self, namespace: str, scope: str, query_embedding: Sequence[float], result: Any, generation: Optional[int] = None):
+        """'generation': a kör keresés előtti generációja; egy közben érkező írás így nem marad észrevétlen."""
+        generation = get_generation(scope) if generation is None else generation
+        with self._lock:
+            self._entries.append((namespace, scope, generation, list(query_embedding), result, time.monotonic()))
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses,
+                    "hit_rate": self._hits / lookups if lookups else 0.0}
+
+logging.debug("Lekérdezés-cache modul (query_cache.py) betöltve.")
@@ -0,0 +1,87 @@
+# response_streamer.py
+
+import logging
+import time
+import threading
+from typing import Callable, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, message_chunk_to_message
+
+# A page.update() hívások közötti minimális idő (mp) streamelés közben.
+# Tokenenként frissíteni fölöslegesen terhelné a Flet kapcsolatot.
+DEFAULT_UPDATE_INTERVAL = 0.1
+
+def content_to_text(content) -> str:
+    """Egy üzenet tartalmát egyszerű szöveggé alakítja (a Gemini listás, blokkos tartalmát is)."""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content or []:
+        if isinstance(block, str):
+            parts.append(block)
+        elif isinstance(block, dict) and block.get("type") == "text":
+            parts.append(block.get("text", ""))
+    return "".join(parts)
+
+class ThrottledUpdater:
+    """
+    A streamelt válasz buborékjának frissítését fogja össze: a szöveget minden
+    tokennél beállítja, de a page.update()-et legfeljebb 'min_interval'
+    másodpercenként hívja meg. A flush() a végén mindenképp frissít.
+    """
+    def __init__(self, page, apply_text: Callable[[str], None], min_interval: float = DEFAULT_UPDATE_INTERVAL):
+        self.page = page
+        self.apply_text = apply_text
+        self.min_interval = min_interval
+        self._last_update = 0.0
+        self._lock = threading.Lock()
+
+    def push(self, text: str):
+        with self._lock:
+            self.apply_text(text)
+            now = time.monotonic()
+            if now - self._last_update >= self.min_interval:
+                self._last_update = now
+                self.page.update()
+
+    def flush(self, text: Optional[str] = None):
+        with self._lock:
+            if text is not None:
+                self.apply_text(text)
+            self._last_update = time.monotonic()
+            self.page.update()
+
+def stream_response(runnable, runnable_input: dict, config: Optional[dict] = None, on_text: Optional[Callable[[str], None]] = None) -> AIMessage:
+    """
+    A 'runnable.stream()' darabjait egyetlen üzenetté fűzi össze.
+    Az 'on_text' visszahívás minden új szövegdarab után megkapja az eddigi teljes szöveget.
+    Az eszközhívások (tool_calls) a darabokból összeállítva a visszaadott üzenetben vannak.
+    """
+    aggregated: Optional[AIMessageChunk] = None
+    for chunk in runnable.stream(runnable_input, config=config):
+        aggregated = chunk if aggregated is None else aggregated + chunk
+        if on_text and chunk.content:
+            on_text(content_to_text(aggregated.content))
+
+    if aggregated is None:
+        return AIMessage(content="")
+    message = message_chunk_to_message(aggregated)
+    message.content = content_to_text(message.content)
+    return message
+
+async def astream_response(runnable, runnable_input: dict, config: Optional[dict] = None,
+                           on_text: Optional[Callable[[str], None]] = None) -> AIMessage:
+    """A stream_response() asyncio változata ('runnable.astream()'), azonos visszahívással és eredménnyel."""
+    aggregated: Optional[AIMessageChunk] = None
+    async for chunk in runnable.astream(runnable_input, config=config):
+        aggregated = chunk if aggregated is None else aggregated + chunk
+        if on_text and chunk.content:
+            on_text(content_to_text(aggregated.content))
+
+    if aggregated is None:
+        return AIMessage(content="")
+    message = message_chunk_to_message(aggregated)
+    message.content = content_to_text(message.content)
+    return message
+
+logging.debug("Válasz-streamelő modul (response_streamer.py) sikeresen betöltve.")
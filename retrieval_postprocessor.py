@@ -0,0 +1,217 @@
+# retrieval_postprocessor.py
+
+import copy
+import logging
+import math
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from document_reader import strip_chunk_overlaps
+from tool_cache import get_generation, DOCUMENTS_SCOPE
+
+# Alapértékek (a config 'retrieval' szekciójának 'memory' / 'knowledge_base' alszekciója felülírja)
+DEFAULT_FETCH_K = 10
+DEFAULT_MAX_K = 5
+DEFAULT_MIN_K = 1
+# Távolság a tároló saját mértékében (Chroma: négyzetes L2; normalizált embeddingeknél 2 * (1 - koszinusz)).
+DEFAULT_MAX_DISTANCE = 1.0
+# Adaptív k: a legjobb találatnál ennyivel távolabbi darabok már nem kerülnek be.
+DEFAULT_RELATIVE_MARGIN = 0.25
+DEFAULT_MMR_LAMBDA = 0.7
+# Két darab duplikátum, ha a szöveg-hasonlóságuk (szó-hármasok Jaccard-indexe) vagy az embeddingjeik koszinusz-hasonlósága eléri a küszöböt.
+DEFAULT_DEDUP_SIMILARITY = 0.85
+DEFAULT_DEDUP_EMBEDDING_SIMILARITY = 0.97
+
+SHINGLE_SIZE = 3
+
+def _text(document) -> str:
+    return document.page_content if isinstance(document.page_content, str) else ""
+
+def _shingles(text: str) -> set:
+    words = text.lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def _jaccard(first: set, second: set) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+def _cosine(first: Sequence[float], second: Sequence[float]) -> float:
+    dot = sum(a * b for a, b in zip(first, second))
+    norm = math.sqrt(sum(a * a for a in first)) * math.sqrt(sum(b * b for b in second))
+    return dot / norm if norm else 0.0
+
+def source_key(metadata: dict) -> tuple:
+    """Egy darab "forrása": dokumentumnál a fájlnév, beszélgetésnél az üzenet (session, idő, beszélő)."""
+    if metadata.get('source_document'):
+        return ("document", metadata['source_document'])
+    return ("message", metadata.get('session_id'), metadata.get('timestamp'), metadata.get('speaker'))
+
+def search_with_embeddings(store, query: str, k: int, query_cache=None,
+                           scope: str = DOCUMENTS_SCOPE) -> Tuple[List[tuple], Optional[List[float]]]:
+    """
+    Vektoros keresés, amely a találatok embeddingjeit is visszaadja (az MMR-hez):
+    ([(dokumentum, távolság, embedding)], lekérdezés-embedding). Ha a tároló nem
+    LangChain Chroma (pl. teszt-mock), sima similarity_search_with_score, embeddingek nélkül.
+    'query_cache' (query_cache.SemanticQueryCache) esetén a hasonló, korábbi lekérdezés
+    találati listáját adja vissza, amíg a 'scope' kör nem kap új írást.
+    """
+    embeddings = getattr(store, "embeddings", None)
+    collection = getattr(store, "_collection", None)
+    if not isinstance(embeddings, Embeddings) or collection is None:
+        return [(doc, score, None) for doc, score in store.similarity_search_with_score(query, k=k)], None
+
+    query_embedding = embeddings.embed_query(query)
+    namespace = f"{getattr(collection, 'name', '')}:{k}"
+    generation = get_generation(scope)
+    if query_cache is not None:
+        cached = query_cache.lookup(namespace, scope, query_embedding)
+        if cached is not None:
+            return list(cached), query_embedding
+
+    result = collection.query(query_embeddings=[query_embedding], n_results=k,
+                              include=["documents", "metadatas", "distances", "embeddings"])
+    hits = []
+    for text, metadata, distance, embedding in zip(result["documents"][0], result["metadatas"][0],
+                                                  result["distances"][0], result["embeddings"][0]):
+        hits.append((Document(page_content=text, metadata=metadata or {}), distance, list(embedding)))
+    if query_cache is not None:
+        query_cache.store(namespace, scope, query_embedding, tuple(hits), generation=generation)
+    return hits, query_embedding
+
+class RetrievalPostprocessor:
+    """
+    A vektoros találatok utófeldolgozása, mielőtt az eszköz szöveget épít belőlük:
+    abszolút távolság-küszöb, adaptív k (a legjobb találathoz képest túl távoliak
+    elhagyása), közel-duplikátumok kiszűrése, maximális marginális relevancia (MMR)
+    szerinti válogatás, végül az egy forrásból származó szomszédos darabok összevonása
+    az átfedés levágásával. Kevesebb, egymástól különböző darab kerül a promptba.
+    """
+    def __init__(self, fetch_k: int = DEFAULT_FETCH_K, max_k: int = DEFAULT_MAX_K, min_k: int = DEFAULT_MIN_K,
+                 max_distance: Optional[float] = DEFAULT_MAX_DISTANCE, relative_margin: Optional[float] = DEFAULT_RELATIVE_MARGIN,
+                 mmr_lambda: float = DEFAULT_MMR_LAMBDA, dedup_similarity: float = DEFAULT_DEDUP_SIMILARITY,
+                 dedup_embedding_similarity: float = DEFAULT_DEDUP_EMBEDDING_SIMILARITY, merge_neighbors: bool = True):
+        self.fetch_k = fetch_k
+        self.max_k = max_k
+        self.min_k = min_k
+        self.max_distance = max_distance
+        self.relative_margin = relative_margin
+        self.mmr_lambda = mmr_lambda
+        self.dedup_similarity = dedup_similarity
+        self.dedup_embedding_similarity = dedup_embedding_similarity
+        self.merge_neighbors = merge_neighbors
+
+    @classmethod
+    def from_config(cls, config: dict, section: str, max_k: int = DEFAULT_MAX_K) -> "RetrievalPostprocessor":
+        retrieval_config = config.get('retrieval', {}).get(section, {})
+        return cls(
+            fetch_k=retrieval_config.get('fetch_k', DEFAULT_FETCH_K),
+            max_k=retrieval_config.get('max_k', max_k),
+            min_k=retrieval_config.get('min_k', DEFAULT_MIN_K),
+            max_distance=retrieval_config.get('max_distance', DEFAULT_MAX_DISTANCE),
+            relative_margin=retrieval_config.get('relative_margin', DEFAULT_RELATIVE_MARGIN),
+            mmr_lambda=retrieval_config.get('mmr_lambda', DEFAULT_MMR_LAMBDA),
+            dedup_similarity=retrieval_config.get('dedup_similarity', DEFAULT_DEDUP_SIMILARITY),
+            dedup_embedding_similarity=retrieval_config.get('dedup_embedding_similarity', DEFAULT_DEDUP_EMBEDDING_SIMILARITY),
+            merge_neighbors=retrieval_config.get('merge_neighbors', True)
+        )
+
+    def with_options(self, **options) -> "RetrievalPostprocessor":
+        """Másolat néhány felülírt beállítással (pl. a hibrid keresés vektoros ágához)."""
+        clone = copy.copy(self)
+        clone.__dict__.update(options)
+        return clone
+
+    def search(self, store, query: str, query_cache=None, scope: str = DOCUMENTS_SCOPE) -> List[Tuple[Document, float]]:
+        """Keresés 'fetch_k' jelölttel, majd utófeldolgozás. (dokumentum, távolság) párokat ad vissza."""
+        hits, query_embedding = search_with_embeddings(store, query, self.fetch_k, query_cache=query_cache, scope=scope)
+        return self.process(hits, query_embedding)
+
+    def process(self, hits: List[tuple], query_embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+        """'hits': (dokumentum, távolság) vagy (dokumentum, távolság, embedding) elemek."""
+        candidates = sorted([(hit[0], hit[1], hit[2] if len(hit) > 2 else None) for hit in hits], key=lambda hit: hit[1])
+        candidates = self._apply_thresholds(candidates)
+        candidates = self._drop_duplicates(candidates)
+        selected = self._select_mmr(candidates, query_embedding)
+        if self.merge_neighbors:
+            return self._merge_neighbors(selected)
+        return [(doc, distance) for doc, distance, _ in selected]
+
+    def _apply_thresholds(self, candidates: List[tuple]) -> List[tuple]:
+        if not candidates:
+            return []
+        best = candidates[0][1]
+        cut = len(candidates)
+        for index, (_, distance, _) in enumerate(candidates):
+            if self.max_distance is not None and distance > self.max_distance:
+                cut = index
+                break
+            if self.relative_margin is not None and distance > best + self.relative_margin:
+                cut = index
+                break
+        # A 'min_k' a vágások után érvényes: a legközelebbi 'min_k' darab a küszöbökön túl is megmarad.
+        return candidates[:max(cut, self.min_k)]
+
+    def _drop_duplicates(self, candidates: List[tuple]) -> List[tuple]:
+        kept, kept_shingles = [], []
+        for doc, distance, embedding in candidates:
+            shingles = _shingles(_text(doc))
+            duplicate = any(
+                _jaccard(shingles, other_shingles) >= self.dedup_similarity
+                or (embedding is not None and other[2] is not None and _cosine(embedding, other[2]) >= self.dedup_embedding_similarity)
+                for other, other_shingles in zip(kept, kept_shingles)
+            )
+            if not duplicate:
+                kept.append((doc, distance, embedding))
+                kept_shingles.append(shingles)
+        return kept
+
+    def _select_mmr(self, candidates: List[tuple], query_embedding: Optional[List[float]]) -> List[tuple]:
+        if query_embedding is None or any(embedding is None for _, _, embedding in candidates):
+            return candidates[:self.max_k]
+        relevance = [_cosine(query_embedding, embedding) for _, _, embedding in candidates]
+        selected, remaining = [], list(range(len(candidates)))
+        while remaining and len(selected) < self.max_k:
+            def mmr_score(index):
+                redundancy = max((_cosine(candidates[index][2], candidates[chosen][2]) for chosen in selected), default=0.0)
+                return self.mmr_lambda * relevance[index] - (1 - self.mmr_lambda) * redundancy
+            best = max(remaining, key=mmr_score)
+            selected.append(best)
+            remaining.remove(best)
+        return [candidates[index] for index in selected]
+
+    def _merge_neighbors(self, selected: List[tuple]) -> List[Tuple[Document, float]]:
+        """Az egy forrásból származó, egymást követő darabok egy találattá vonása (az átfedés egyszer marad meg)."""
+        by_source, runs = {}, []
+        for position, (doc, distance, _) in enumerate(selected):
+            if isinstance(doc.metadata.get('chunk_number'), int) and _text(doc):
+                by_source.setdefault(source_key(doc.metadata), []).append((position, doc, distance))
+            else:
+                runs.append([(position, doc, distance)])
+        for items in by_source.values():
+            items.sort(key=lambda item: item[1].metadata['chunk_number'])
+            run = [items[0]]
+            for item in items[1:]:
+                if item[1].metadata['chunk_number'] == run[-1][1].metadata['chunk_number'] + 1:
+                    run.append(item)
+                else:
+                    runs.append(run)
+                    run = [item]
+            runs.append(run)
+
+        merged = []
+        # A sorrend a futás legjobb (legkorábban kiválasztott) darabjáé.
+        for run in sorted(runs, key=lambda run: min(position for position, _, _ in run)):
+            if len(run) == 1:
+                merged.append((run[0][1], run[0][2]))
+                continue
+            parts = strip_chunk_overlaps([(doc.page_content, doc.metadata) for _, doc, _ in run])
+            metadata = dict(run[0][1].metadata, merged_chunks=[doc.metadata['chunk_number'] for _, doc, _ in run])
+            merged.append((Document(page_content="".join(parts), metadata=metadata), min(distance for _, _, distance in run)))
+        return merged
+
+logging.debug("Találat-utófeldolgozó modul (retrieval_postprocessor.py) betöltve.")
@@ -1,11 +1,12 @@
 # risk_validator.py
 
-import yaml
+import logging
 from dataclasses import dataclass
 
+from config_loader import load_yaml_file
 from synthesis_engine import SynthesisOutput
 from data_handler import DailyContext
-from langchain_google_vertexai import ChatVertexAI
+from model_factory import create_chat_model
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 
@@ -13,14 +14,9 @@ from langchain_core.messages import SystemMessage, HumanMessage
 PROJECT_ID = "ai-team-office"
 LOCATION = "europe-central2"
 
-# Betöltjük az "Alkotmányt" a YAML fájlból
-try:
-    with open('constitution.yaml', 'r', encoding='utf-8') as file:
-        CONSTITUTION = yaml.safe_load(file)['immutable_core_principles']
-    print("Alkotmány (constitution.yaml) sikeresen betöltve.")
-except Exception as e:
-    print(f"!!! HIBA az Alkotmány betöltése közben: {e} !!!")
-    CONSTITUTION = {}
+def get_constitution() -> dict:
+    """Az "Alkotmány" alapelvei a constitution.yaml fájlból (az első használatkor, egyszer olvassuk be)."""
+    return load_yaml_file('constitution.yaml').get('immutable_core_principles', {})
 
 @dataclass
 class ValidationResult:
@@ -44,7 +40,7 @@ def run_risk_validation(
         return ValidationResult(is_safe=True, reasoning="Nincs validált tanulság, amit ellenőrizni kellene.")
 
     atom_id = context.atom_id
-    core_principle = CONSTITUTION.get(atom_id)
+    core_principle = get_constitution().get(atom_id)
     proposed_insight = synthesis_result.validated_core_insight
 
     if not core_principle:
@@ -70,7 +66,7 @@ def run_risk_validation(
         """)
     ])
 
-    llm = ChatVertexAI(model_name="gemini-2.5-pro", project=PROJECT_ID, location=LOCATION)
+    llm = create_chat_model("gemini-2.5-pro", caller="risk_validation", atom_id=atom_id, project=PROJECT_ID, location=LOCATION)
     chain = validator_prompt | llm
 
     try:
@@ -86,4 +82,4 @@ def run_risk_validation(
         print(f"!!! HIBA a kockázat-validáció során: {e} !!!")
         return ValidationResult(is_safe=False, reasoning=f"Kritikus hiba történt a validáció közben: {e}")
 
-print("Kockázat-validátor modul (risk_validator.py) sikeresen betöltve.")
\ No newline at end of file
+logging.debug("Kockázat-validátor modul (risk_validator.py) sikeresen betöltve.")
@@ -1,61 +1,121 @@
 # shared_components.py
 
-import yaml
 import os
-import tiktoken
+import logging
+import importlib
 from collections import Counter
+from functools import lru_cache
 from datetime import datetime, timezone
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.vectorstores import VectorStore
-from langchain_chroma import Chroma
-from langchain_community.chat_message_histories.sql import SQLChatMessageHistory
-from langchain_google_vertexai import ChatVertexAI
 import sqlite3
 import base64
 
-# --- YAML KONFIGURÁCIÓK BETÖLTÉSE ---
-try:
-    with open('atoms.yaml', 'r', encoding='utf-8') as file:
-        ATOM_DATA = yaml.safe_load(file)
-    print("ATOM konfiguráció sikeresen betöltve az 'atoms.yaml' fájlból.")
-    
-    with open('prompts.yaml', 'r', encoding='utf-8') as file:
-        PROMPTS = yaml.safe_load(file)
-    print("Prompt sablonok sikeresen betöltve a 'prompts.yaml' fájlból.")
-
-except Exception as e:
-    print(f"HIBA a YAML fájlok olvasása közben: {e}")
-    ATOM_DATA, PROMPTS = {}, {}
+from config_loader import load_yaml_file
+from document_reader import (strip_chunk_overlaps, estimate_chunk_tokens, encode_cursor, read_blob_range, CHARS_PER_TOKEN,
+                             DEFAULT_READ_MAX_TOKENS as DEFAULT_PAGED_READ_TOKENS)
+from lexical_index import chunk_key, reciprocal_rank_fusion, RRF_K
+from retrieval_postprocessor import RetrievalPostprocessor, search_with_embeddings
+from tool_cache import CONVERSATIONS_SCOPE, DOCUMENTS_SCOPE
+from model_factory import create_chat_model
+from tracing import span
+
+# --- LUSTA BETÖLTÉS ---
+# A nehéz függőségeket (SQLAlchemy, tiktoken; a Vertex AI-t a model_factory) és a YAML konfigurációkat
+# csak az első tényleges használatkor töltjük be, így a modul importja gyors marad
+# (tesztekhez, parancssori szkriptekhez). Az ATOM_DATA és a PROMPTS továbbra is
+# importálható név: a modul __getattr__ függvénye adja vissza őket.
+_LAZY_IMPORTS = {
+    "tiktoken": ("tiktoken", None),
+    "SQLChatMessageHistory": ("langchain_community.chat_message_histories.sql", "SQLChatMessageHistory"),
+}
+
+def get_atom_data() -> dict:
+    """Az ATOM-ok konfigurációja az 'atoms.yaml' fájlból (egyszer olvassuk be)."""
+    return load_yaml_file('atoms.yaml')
+
+def get_prompts() -> dict:
+    """A prompt sablonok a 'prompts.yaml' fájlból (egyszer olvassuk be)."""
+    return load_yaml_file('prompts.yaml')
+
+def __getattr__(name: str):
+    if name == "ATOM_DATA":
+        return get_atom_data()
+    if name == "PROMPTS":
+        return get_prompts()
+    if name in _LAZY_IMPORTS:
+        module_name, attribute = _LAZY_IMPORTS[name]
+        module = importlib.import_module(module_name)
+        value = getattr(module, attribute) if attribute else module
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _lazy(name: str):
+    """A lusta nevek feloldása a függvényeken belül (a tesztek által patch-elt értéket is visszaadja)."""
+    return globals()[name] if name in globals() else __getattr__(name)
 
 # --- FÜGGVÉNYEK ---
 
-def chunk_text(text: str) -> list[str]:
-    """Feloszt egy hosszabb szöveget tokenek alapján, kb. 1000 tokenes darabokra, 100 tokenes átfedéssel."""
+@lru_cache(maxsize=1)
+def get_token_encoding():
+    """A tokenizáló egyszer jön létre, utána minden hívó ugyanazt a példányt kapja."""
     # A 'cl100k_base' kódolás a legtöbb modern OpenAI modellhez (pl. GPT-4) megfelelő.
-    encoding = tiktoken.get_encoding("cl100k_base")
+    return _lazy("tiktoken").get_encoding("cl100k_base")
+
+def count_tokens(text: str) -> int:
+    """Megszámolja egy szöveg tokenjeit (a darabolással azonos kódolással)."""
+    return len(get_token_encoding().encode(text or ""))
+
+CHUNK_SIZE_TOKENS = 1000
+CHUNK_OVERLAP_TOKENS = 100
 
+def chunk_text_with_offsets(text: str) -> list[dict]:
+    """
+    A chunk_text részletes változata: minden darabhoz megadja a token- és karakterpozícióját
+    az eredeti szövegben, valamint hogy az elején hány token / karakter ismétli az előző
+    darab végét (átfedés). Ezekből a lapozó olvasó (document_reader.py) az átfedés
+    nélkül, tartományonként tudja visszaállítani a szöveget.
+    """
+    encoding = get_token_encoding()
     tokens = encoding.encode(text)
+    _, token_char_offsets = encoding.decode_with_offsets(tokens)
 
     chunks = []
-    chunk_size = 1000
-    overlap = 100
-
     i = 0
+    previous_end = 0
     while i < len(tokens):
         # Meghatározzuk a darab végét
-        end = min(i + chunk_size, len(tokens))
+        end = min(i + CHUNK_SIZE_TOKENS, len(tokens))
 
-        # A token darabot visszaalakítjuk szöveggé
+        # A token darabot visszaalakítjuk szöveggé, a tokenek darabon belüli karakterpozícióival
         chunk_tokens = tokens[i:end]
-        chunk_text = encoding.decode(chunk_tokens)
-        chunks.append(chunk_text)
+        chunk_string, chunk_offsets = encoding.decode_with_offsets(chunk_tokens)
+        overlap_tokens = max(0, previous_end - i)
+        chunks.append({
+            "text": chunk_string,
+            "token_start": i,
+            "token_end": end,
+            "token_count": end - i,
+            "char_start": token_char_offsets[i],
+            "char_end": token_char_offsets[end] if end < len(tokens) else len(text),
+            "overlap_tokens": overlap_tokens,
+            "overlap_chars": chunk_offsets[overlap_tokens] if overlap_tokens < len(chunk_offsets) else len(chunk_string),
+        })
+        previous_end = end
+        if end == len(tokens):
+            break
 
         # A következő darab kezdete az átfedés figyelembevételével
-        i += chunk_size - overlap
+        i += CHUNK_SIZE_TOKENS - CHUNK_OVERLAP_TOKENS
 
     return chunks
 
+def chunk_text(text: str) -> list[str]:
+    """Feloszt egy hosszabb szöveget tokenek alapján, kb. 1000 tokenes darabokra, 100 tokenes átfedéssel."""
+    return [chunk["text"] for chunk in chunk_text_with_offsets(text)]
+
 def message_to_document(content: str, speaker: str, timestamp: str, session_id: str, chunk_num: int = 1, total_chunks: int = 1, meeting_id: str = None) -> Document:
     """Létrehoz egy LangChain Document objektumot a megadott adatokból és metaadatokból."""
     metadata = {
@@ -73,15 +133,46 @@ def message_to_document(content: str, speaker: str, timestamp: str, session_id:
         metadata=metadata
     )
 
-def search_memory_tool(query: str, config: dict, vector_store: VectorStore) -> str:
-    """A teljes AITO memóriában keres releváns, teljes beszélgetések után."""
+# A memória-keresés legfeljebb ennyi (utófeldolgozott) darabból választja ki a beszélgetést.
+MEMORY_RESULTS = 5
+
+def search_memory_tool(query: str, config: dict, vector_store: VectorStore, memory_indexer=None,
+                       cold_store: VectorStore = None, search_cold: bool = False, query_cache=None,
+                       partition_id: str = None, other_partition_stores: list = None) -> str:
+    """
+    A teljes AITO memóriában keres releváns, teljes beszélgetések után.
+    Ha 'memory_indexer' (memory_indexer.MemoryIndexer) meg van adva, a még nem indexelt
+    (a kimenő sorban várakozó) üzenetek között is keres. 'search_cold' esetén a régi,
+    kivonatokba tömörített üzenetek nyers vektorai ('cold_store') között is.
+    'query_cache' (query_cache.SemanticQueryCache) esetén a hasonló, korábbi lekérdezések
+    találatait a következő memória-írásig újrahasznosítja.
+    Partícionált memóriában (memory_partitions.py) a 'vector_store' az aktív partícióé, és a
+    várakozó üzenetek közül is csak a 'partition_id' partícióéi számítanak; az
+    'other_partition_stores' megadásakor a többi partíció jelöltjei is ugyanabba az utófeldolgozásba kerülnek.
+    """
     print(f"--- ESZKÖZHÍVÁS: Kontextus-alapú Memória Keresés, Keresőkifejezés: '{query}' ---")
     if not vector_store:
         return "Hiba: A Vector Store nincs inicializálva."
 
     try:
-        # 1. FÁZIS: Vektoros keresés a legrelevánsabb DARABOKért
-        scored_chunks = vector_store.similarity_search_with_score(query, k=5)
+        # 1. FÁZIS: Vektoros keresés a legrelevánsabb DARABOKért (küszöb, duplikátum-szűrés, MMR)
+        with span("memory.vector_search", search_cold=search_cold, partitions=1 + len(other_partition_stores or [])) as search_span:
+            postprocessor = RetrievalPostprocessor.from_config(config, 'memory', max_k=MEMORY_RESULTS)
+            if other_partition_stores:
+                hits, query_embedding = [], None
+                for store in [vector_store] + list(other_partition_stores):
+                    store_hits, query_embedding = search_with_embeddings(store, query, postprocessor.fetch_k, query_cache=query_cache,
+                                                                         scope=CONVERSATIONS_SCOPE)
+                    hits.extend(store_hits)
+                scored_chunks = postprocessor.process(hits, query_embedding)
+            else:
+                scored_chunks = postprocessor.search(vector_store, query, query_cache=query_cache, scope=CONVERSATIONS_SCOPE)
+            if memory_indexer is not None:
+                pending_partition = None if other_partition_stores else partition_id
+                scored_chunks = list(scored_chunks) + [(doc, 0.0) for doc in memory_indexer.search_pending(query, k=5, partition_id=pending_partition)]
+            if search_cold and cold_store is not None:
+                scored_chunks = list(scored_chunks) + list(cold_store.similarity_search_with_score(query, k=5))
+            search_span.set_attribute("hits", len(scored_chunks))
         if not scored_chunks:
             return "A memóriában nem található releváns információ."
 
@@ -98,38 +189,41 @@ def search_memory_tool(query: str, config: dict, vector_store: VectorStore) -> s
         LOCAL_DB_PATH = "./aito_local_data"
         SQLITE_HISTORY_FILE = f"{LOCAL_DB_PATH}/aito_chat_history.db"
         connection_string = f"sqlite:///{SQLITE_HISTORY_FILE}"
-        history = SQLChatMessageHistory(
-            session_id=most_common_session_id,
-            connection=connection_string
-        )
-        
-        full_conversation_messages = history.messages
-        print(f"Teljes beszélgetés ({len(full_conversation_messages)} üzenet) sikeresen lekérve az SQLite adatbázisból.")
-
-        formatted_context = ""
-        for msg in full_conversation_messages:
-            speaker = getattr(msg, 'name', 'Ismeretlen')
-            display_speaker = "Te" if speaker == config.get('user_id', 'user') else speaker
-
-            # Metaadatok kinyerése
-            timestamp_str = msg.additional_kwargs.get("timestamp", "unknown_time")
-            try:
-                # Próbáljuk meg szépen formázni az időt (csak a dátumot és órát/percet)
-                dt = datetime.fromisoformat(timestamp_str).strftime('%Y-%m-%d %H:%M')
-            except:
-                dt = "N/A" # Ha az időbélyeg formátuma nem stimmel
-
-            # A meeting_id kinyerése (ez az aito_main_rebuild.py-ból jön)
-            meeting_id = msg.additional_kwargs.get("meeting_id")
-
-            # Metaadat sor összeállítása
-            meta_prefix = f"[{dt}"
-            if meeting_id:
-                meta_prefix += f" | M:{meeting_id}"
-            meta_prefix += "]"
-
-            # Formázott sor hozzáadása
-            formatted_context += f"{meta_prefix} {display_speaker}: {msg.content}\n"
+        with span("memory.sqlite_reconstruction", session_id=most_common_session_id) as sqlite_span:
+            history = _lazy("SQLChatMessageHistory")(
+                session_id=most_common_session_id,
+                connection=connection_string
+            )
+
+            full_conversation_messages = history.messages
+            print(f"Teljes beszélgetés ({len(full_conversation_messages)} üzenet) sikeresen lekérve az SQLite adatbázisból.")
+            sqlite_span.set_attribute("messages", len(full_conversation_messages))
+
+        with span("memory.format"):
+            formatted_context = ""
+            for msg in full_conversation_messages:
+                speaker = getattr(msg, 'name', 'Ismeretlen')
+                display_speaker = "Te" if speaker == config.get('user_id', 'user') else speaker
+
+                # Metaadatok kinyerése
+                timestamp_str = msg.additional_kwargs.get("timestamp", "unknown_time")
+                try:
+                    # Próbáljuk meg szépen formázni az időt (csak a dátumot és órát/percet)
+                    dt = datetime.fromisoformat(timestamp_str).strftime('%Y-%m-%d %H:%M')
+                except:
+                    dt = "N/A" # Ha az időbélyeg formátuma nem stimmel
+
+                # A meeting_id kinyerése (ez az aito_main_rebuild.py-ból jön)
+                meeting_id = msg.additional_kwargs.get("meeting_id")
+
+                # Metaadat sor összeállítása
+                meta_prefix = f"[{dt}"
+                if meeting_id:
+                    meta_prefix += f" | M:{meeting_id}"
+                meta_prefix += "]"
+
+                # Formázott sor hozzáadása
+                formatted_context += f"{meta_prefix} {display_speaker}: {msg.content}\n"
         # ========================
 
         # 4. FÁZIS: Végső válasz összeállítása
@@ -144,39 +238,99 @@ def search_memory_tool(query: str, config: dict, vector_store: VectorStore) -> s
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
         return f"Hiba történt a memória keresése közben: {e}"
 
-def search_knowledge_base_tool(query: str, config: dict, docs_vector_store: VectorStore) -> str:
-    """Kizárólag a feltöltött dokumentumok (PDF, MD, TXT) tudásbázisában keres releváns információk után."""
+# A tudásbázis-keresés által visszaadott darabok száma, és hogy a hibrid keresés
+# ágai (vektoros és lexikális) külön-külön hány jelöltet adnak a fúzióhoz.
+KNOWLEDGE_BASE_RESULTS = 3
+HYBRID_CANDIDATES = 10
+
+def search_knowledge_base_tool(query: str, config: dict, docs_vector_store: VectorStore, lexical_index=None, query_cache=None) -> str:
+    """
+    Kizárólag a feltöltött dokumentumok (PDF, MD, TXT) tudásbázisában keres releváns információk után.
+    Ha 'lexical_index' (lexical_index.LexicalIndex) is meg van adva, hibrid keresést végez: a vektoros
+    és a BM25 találatokat reciprok rang-fúzióval (RRF) fésüli össze, így a pontos azonosítók,
+    cikkszámok és ragozott kifejezések is előkerülnek. 'query_cache' esetén a vektoros ág
+    találatai a hasonló lekérdezések között a tudásbázis következő változásáig megosztottak.
+    """
     print(f"--- ESZKÖZHÍVÁS: Tudásbázis_Keresése, Kifejezés: '{query}' ---")
     try:
-        # Itt elég egy egyszerűbb keresés, ami a legjobb darabokat adja vissza
-        scored_documents = docs_vector_store.similarity_search_with_score(query, k=3) # Kérjünk le 3 releváns darabot
+        if lexical_index is None:
+            # Vektoros keresés utófeldolgozással: küszöb, adaptív k, MMR, a szomszédos darabok összevonása
+            postprocessor = RetrievalPostprocessor.from_config(config, 'knowledge_base', max_k=KNOWLEDGE_BASE_RESULTS)
+            scored_documents = postprocessor.search(docs_vector_store, query, query_cache=query_cache, scope=DOCUMENTS_SCOPE)
+            ranked = [(doc, _similarity_label(score)) for doc, score in scored_documents]
+        else:
+            ranked = _hybrid_knowledge_base_search(query, config, docs_vector_store, lexical_index, query_cache)
 
-        if not scored_documents:
+        if not ranked:
             return "A tudásbázisban nem található releváns dokumentumrészlet."
 
         results_text = "A tudásbázisból a következő releváns információk kerültek elő:\n\n"
-        for (doc, score) in scored_documents:
+        for (doc, relevance) in ranked:
             results_text += f"- Forrás: {doc.metadata.get('source_document', 'Ismeretlen')}\n"
-            results_text += f"  Relevancia: {1-score:.2f}\n" # A koszinusz-hasonlóságot jelenítjük meg (1 - távolság)
+            results_text += f"  Relevancia: {relevance}\n"
             results_text += f"  Részlet: {doc.page_content}\n---\n"
         return results_text
 
     except Exception as e:
         return f"Hiba történt a tudásbázis keresése közben: {e}"
 
-def list_uploaded_files_tool(config: dict, docs_vector_store: VectorStore, filter: str = "ALL") -> str:
+def _similarity_label(distance: float) -> str:
+    # A tároló négyzetes L2 távolságot ad; normalizált embeddingeknél ebből a koszinusz-hasonlóság 1 - d/2.
+    return f"{1 - distance / 2:.2f}"
+
+def _hybrid_knowledge_base_search(query: str, config: dict, docs_vector_store: VectorStore, lexical_index, query_cache=None) -> list:
+    """A vektoros és a lexikális rangsor RRF-fúziója. (dokumentum, relevancia-szöveg) párokat ad vissza."""
+    search_config = config.get('hybrid_search', {})
+    candidates = search_config.get('candidates', HYBRID_CANDIDATES)
+    result_count = search_config.get('results', KNOWLEDGE_BASE_RESULTS)
+
+    lexical_hits = lexical_index.search(query, k=candidates)
+    # A vektoros ág jelöltjei is átesnek a küszöbön, a duplikátum-szűrésen és az MMR-en; az összevonás a fúzió miatt itt elmarad.
+    postprocessor = RetrievalPostprocessor.from_config(config, 'knowledge_base').with_options(
+        fetch_k=candidates, max_k=candidates, merge_neighbors=False)
+    try:
+        vector_hits = postprocessor.search(docs_vector_store, query, query_cache=query_cache, scope=DOCUMENTS_SCOPE)
+    except Exception as e:
+        # Ha az embedding szolgáltatás nem elérhető, a lexikális ág egyedül is válaszol.
+        if not lexical_hits:
+            raise
+        logging.warning(f"A vektoros keresés sikertelen, csak lexikális találatok: {e}")
+        vector_hits = []
+
+    documents, labels = {}, {}
+    for doc, score in vector_hits:
+        key = chunk_key(doc.metadata)
+        documents.setdefault(key, doc)
+        labels.setdefault(key, _similarity_label(score))
+    for doc, score in lexical_hits:
+        key = chunk_key(doc.metadata)
+        documents.setdefault(key, doc)
+        labels[key] = f"{labels[key]} (+ kulcsszó-egyezés)" if key in labels else f"kulcsszó-egyezés (BM25 {score:.2f})"
+
+    fused = reciprocal_rank_fusion([
+        [chunk_key(doc.metadata) for doc, _ in vector_hits],
+        [chunk_key(doc.metadata) for doc, _ in lexical_hits],
+    ], k=search_config.get('rrf_k', RRF_K))
+    return [(documents[key], labels[key]) for key, _ in fused[:result_count]]
+
+def list_uploaded_files_tool(config: dict, docs_vector_store: VectorStore, filter: str = "ALL", manifest=None) -> str:
     """
     Kilistázza a Tudásbázisba feltöltött dokumentumok neveit a megadott szűrő alapján.
     A filter lehetséges értékei: "ALL", "SUMMARIES_ONLY", "DOCUMENTS_ONLY".
+    Ha 'manifest' (document_manifest.DocumentManifest) meg van adva, a neveket abból veszi,
+    és a vektor-tárolóhoz nem nyúl.
     """
     print(f"--- ESZKÖZHÍVÁS: Feltöltött_Fájlok_Listázása (Szűrő: {filter}) ---")
     try:
-        all_docs = docs_vector_store.get()
-        unique_files = set(
-            metadata.get('source_document')
-            for metadata in all_docs.get('metadatas', [])
-            if metadata and metadata.get('source_document')
-        )
+        if manifest is not None:
+            unique_files = set(document['name'] for document in manifest.list_documents())
+        else:
+            all_docs = docs_vector_store.get(include=["metadatas"])
+            unique_files = set(
+                metadata.get('source_document')
+                for metadata in all_docs.get('metadatas', [])
+                if metadata and metadata.get('source_document')
+            )
 
         if filter == "SUMMARIES_ONLY":
             filtered_files = {f for f in unique_files if f.startswith("SUM_")}
@@ -202,20 +356,20 @@ def _get_registry_db_path():
     return os.path.join("./aito_local_data", "system_registry.db")
 
 def _initialize_registry_db():
+    # A fájlt más is létrehozhatja előbb (pl. a dokumentum-manifest), ezért a táblát mindig ellenőrizzük.
     db_path = _get_registry_db_path()
-    if not os.path.exists(db_path):
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE registry (
-                key TEXT PRIMARY KEY,
-                value TEXT,
-                last_updated TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS registry (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            last_updated TEXT
+        )
+    ''')
+    conn.commit()
+    conn.close()
 
 def set_registry_value(key: str, value: str, config: dict) -> str:
     """Beállít vagy frissít egy kulcs-érték párt a helyi SQLite rendszer-nyilvántartásban."""
@@ -294,14 +448,28 @@ def get_meeting_status(config: dict) -> dict:
         print(f"Hiba a megbeszélés állapotának lekérdezése közben: {e}")
         return {'is_active': False, 'meeting_id': ""}
 
-def read_full_document_tool(filename: str, docs_vector_store: VectorStore) -> str:
+# E fölött a teljes olvasás csak a dokumentum elejét adja vissza, egy folytatási kurzorral.
+FULL_READ_MAX_TOKENS = 30000
+
+def read_full_document_tool(filename: str, docs_vector_store: VectorStore, max_tokens: int = FULL_READ_MAX_TOKENS,
+                            blob_store=None) -> str:
     """
     Beolvassa egy adott nevű, korábban feltöltött dokumentum teljes, rekonstruált tartalmát
     a ChromaDB-ből.
     Ellenőrizve: A függvény a ChromaDB get metódusát használja a where={"source_document": filename} szűrővel.
+    A darabok közötti átfedést levágja. Ha a dokumentum nagyobb a 'max_tokens' keretnél,
+    csak az elejét adja vissza, és egy kurzort a lapozó olvasóhoz (document_reader.py).
+    Ha a dokumentum eredeti szövege megvan a 'blob_store'-ban (document_blob_store.py),
+    azt adja vissza, a vektor-tároló lekérdezése nélkül.
     """
     print(f"--- ESZKÖZHÍVÁS: Teljes_Dokumentum_Olvasása, Fájlnév: '{filename}' ---")
     try:
+        blob_info = blob_store.info(filename) if blob_store is not None else None
+        if blob_info is not None:
+            if blob_info["char_count"] > max_tokens * CHARS_PER_TOKEN:
+                return read_blob_range(filename, blob_store, 0, None, max_tokens)
+            return f"DOCUMENT_CONTENT:\n{blob_store.read(filename)}"
+
         # A ChromaDB-ben a 'where' szűrővel tudunk metaadatokra keresni.
         retrieved_docs = docs_vector_store.get(
             where={"source_document": filename}
@@ -317,15 +485,27 @@ def read_full_document_tool(filename: str, docs_vector_store: VectorStore) -> st
         # Rendezés a 'chunk_number' alapján, ami a metaadatokban van.
         sorted_docs = sorted(docs_with_meta, key=lambda item: item[1].get('chunk_number', 0))
 
-        # A rendezett dokumentumok tartalmának összefűzése.
-        full_text = "".join(doc[0] for doc in sorted_docs)
+        # A rendezett dokumentumok tartalmának összefűzése, az átfedések nélkül.
+        texts = strip_chunk_overlaps(sorted_docs)
+        used_tokens = 0
+        for index, (text, (_, metadata)) in enumerate(zip(texts, sorted_docs)):
+            used_tokens += estimate_chunk_tokens(text, metadata, stripped=index > 0)[0]
+            if used_tokens > max_tokens and index > 0:
+                next_cursor = encode_cursor({
+                    "filename": filename, "next_chunk": metadata.get('chunk_number', index + 1),
+                    "end_chunk": sorted_docs[-1][1].get('chunk_number', len(sorted_docs)),
+                    "total_chunks": len(sorted_docs), "max_tokens": DEFAULT_PAGED_READ_TOKENS
+                })
+                return (f"DOCUMENT_CONTENT (a dokumentum túl hosszú, ez az első {index} darab / {len(sorted_docs)}):\n"
+                        f"{''.join(texts[:index])}\n---\nNEXT_CURSOR: {next_cursor} (a folytatáshoz használd a részlet-olvasó eszközt)")
+        full_text = "".join(texts)
 
         return f"DOCUMENT_CONTENT:\n{full_text}"
 
     except Exception as e:
         return f"Hiba történt a(z) '{filename}' dokumentum olvasása közben: {e}"
 
-print("Közös komponensek modul (shared_components.py) sikeresen betöltve.")
+logging.debug("Közös komponensek modul (shared_components.py) betöltve.")
 
 def summarize_document(content: str, config: dict) -> str:
     """
@@ -336,17 +516,17 @@ def summarize_document(content: str, config: dict) -> str:
         # A modell inicializálása kifejezetten ehhez a feladathoz
         # A konfigurációt most már argumentumként kapja meg
         model_name = "gemini-2.0-flash-001"
-        llm = ChatVertexAI(
-            model_name=model_name,
-            project=config['project_id'],
-            location=config['conversation_location'],
+        llm = create_chat_model(
+            model_name,
+            caller="summarize_document",
+            config=config,
             temperature=0.3,  # Kreativitás csökkentése a tényszerűbb összefoglalóért
             top_p=0.95,
         )
         print(f"Vertex AI '{model_name}' modell sikeresen inicializálva az összefoglaláshoz.")
 
         # A prompt összeállítása a prompts.yaml alapján
-        summary_prompt_template = PROMPTS.get('document_summary_prompt', "Készíts egy részletes, több bekezdésből álló összefoglalót a következő dokumentumról magyarul:\n\n{document_content}")
+        summary_prompt_template = get_prompts().get('document_summary_prompt', "Készíts egy részletes, több bekezdésből álló összefoglalót a következő dokumentumról magyarul:\n\n{document_content}")
 
         # A teljes prompt összeállítása
         prompt_content = summary_prompt_template.format(document_content=content)
@@ -1,9 +1,19 @@
 # state_manager.py
 
+import logging
 from typing import List, TypedDict, Annotated
 from langchain_core.messages import BaseMessage
 import operator
 
+def reduce_round_responses(current: list, update: list) -> list:
+    """
+    A párhuzamos kör válaszainak gyűjtője. A párhuzamos ágak listákat adnak vissza,
+    amiket összefűzünk; a None érték a kör összefésülése után üríti a gyűjtőt.
+    """
+    if update is None:
+        return []
+    return (current or []) + update
+
 # A TypedDict segítségével definiáljuk a "jegyzőkönyv" szerkezetét.
 # Ez olyan, mint egy tervrajz egy adat-objektumhoz.
 class MeetingState(TypedDict):
@@ -26,4 +36,16 @@ class MeetingState(TypedDict):
     # A következőnek felszólaló ATOM neve
     next_speaker: str
 
-print("Állapotkezelő modul (state_manager.py) sikeresen betöltve.")
\ No newline at end of file
+    # A megbeszélés módja: "round_robin" (egymás után) vagy "parallel" (körönként egyszerre)
+    meeting_mode: str
+
+    # Párhuzamos módban az aktuális kör még össze nem fésült válaszai: (résztvevő sorszáma, üzenet)
+    round_responses: Annotated[List[tuple], reduce_round_responses]
+
+    # Az átirat régebbi részének gördülő összefoglalója (a 'messages' lista teljes marad)
+    transcript_summary: str
+
+    # Hány üzenet van már beleolvasztva az összefoglalóba (a 'messages' elejéről számolva)
+    summarized_count: int
+
+logging.debug("Állapotkezelő modul (state_manager.py) sikeresen betöltve.")
@@ -1,5 +1,6 @@
 # synthesis_engine.py
 
+import logging
 import json
 from typing import List, Dict, Any, Optional
 
@@ -7,7 +8,7 @@ from typing import List, Dict, Any, Optional
 from pydantic.v1 import BaseModel, Field
 
 from data_handler import DailyContext
-from langchain_google_vertexai import ChatVertexAI
+from model_factory import create_chat_model
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 
@@ -74,7 +75,7 @@ def run_synthesis(
         HumanMessage(content=evidence_package)
     ])
     
-    llm = ChatVertexAI(model_name="gemini-2.5-pro", project=PROJECT_ID, location=LOCATION).with_structured_output(SynthesisOutput)
+    llm = create_chat_model("gemini-2.5-pro", caller="synthesis", atom_id="ARBITER", project=PROJECT_ID, location=LOCATION).with_structured_output(SynthesisOutput)
     chain = arbiter_prompt_template | llm
 
     try:
@@ -101,4 +102,4 @@ def run_synthesis(
         )
         
 
-print("Szintézis motor modul (synthesis_engine.py) v1.3 sikeresen betöltve (Pydantic modellekkel).")
\ No newline at end of file
+logging.debug("Szintézis motor modul (synthesis_engine.py) v1.3 sikeresen betöltve (Pydantic modellekkel).")
@@ -1,113 +1,349 @@
 # task_dispatcher.py
 
+import os
 import uuid
+import contextvars
+import logging
+import sqlite3
 import threading
 from datetime import datetime, timezone
-import flet as ft
-from typing import List
+from functools import wraps
+from typing import Callable, List, Optional
 
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
-from langgraph.graph import StateGraph, END
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from state_manager import MeetingState
-from langchain_google_vertexai import ChatVertexAI, HarmCategory, HarmBlockThreshold
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+# A LangGraph, a Vertex AI és a Flet csak a tényleges használatkor (függvényen belül)
+# töltődik be, hogy a modul importja gyors maradjon.
+
 # A közös komponensek importálása
-from shared_components import ATOM_DATA, PROMPTS, message_to_document
+from shared_components import get_atom_data, get_prompts, message_to_document, count_tokens
+from response_streamer import ThrottledUpdater, stream_response
+from tool_executor import ToolCallExecutor
+from model_factory import create_chat_model
+from llm_ledger import call_site_config
+from tracing import span, traced, current_span
+from memory_partitions import PARTITION_METADATA_KEY
+from task_executor import (
+    TaskExecutor, TaskInterrupted, TaskRecord, classify_task_priority, priority_rank,
+    QUEUED, RUNNING, DONE, FAILED, CANCELLED, TIMED_OUT, FINAL_STATUSES
+)
+
+# A megbeszélés támogatott módjai:
+# - "round_robin": a résztvevők egymás után szólalnak fel, mindenki látja az előzőek válaszát.
+# - "parallel": egy kör összes résztvevője egyszerre, ugyanarra az állapotra reagál.
+MEETING_MODES = ("round_robin", "parallel")
+
+# A megbeszélések állapota minden gráf-lépés után ide kerül (task_id a LangGraph thread_id).
+CHECKPOINT_DB_FILE = os.path.join("./aito_local_data", "atomod_checkpoints.db")
+
+# A futó megbeszélés memória-partíciója (a gráf csomópontjai a feladat szálának kontextusát öröklik).
+_meeting_partition_id: contextvars.ContextVar = contextvars.ContextVar("meeting_partition_id", default=None)
+
+def current_meeting_partition_id() -> Optional[str]:
+    """
+    A futó megbeszélés memória-partíciója (None, ha nincs futó megbeszélés vagy partícionálás).
+    A megbeszélés eszközei (pl. a memória-keresés) ez alapján választják ki a saját tárukat.
+    """
+    return _meeting_partition_id.get()
 
 class TaskDispatcher:
     """
     Ez az osztály felelős a komplex, több ágenst igénylő feladatok
     fogadásáért és az ATOMOD vezérlési lánc elindításáért.
     """
-    def __init__(self, page: ft.Page, chat_history_view: ft.ListView, firestore_history, config: dict, vector_store, search_memory_tool):
+    MAX_ROUNDS = 1
+    MAX_TOOL_ITERATIONS = 5
+    # Az átirat tömörítésének alapértékei (a config 'meeting_compaction' szekciója felülírja)
+    COMPACTION_MAX_PROMPT_TOKENS = 8000
+    COMPACTION_KEEP_LAST_TURNS = 4
+    COMPACTION_SUMMARY_MODEL = "gemini-2.0-flash-001"
+    # A feladat-végrehajtó alapértékei (a config 'task_executor' szekciója felülírja)
+    EXECUTOR_MAX_WORKERS = 2
+    EXECUTOR_DEFAULT_DEADLINE_SECONDS = 900
+
+    def __init__(self, page: "ft.Page", chat_history_view: "ft.ListView", firestore_history, config: dict, vector_store, search_memory_tool,
+                 partitions=None):
         self.page = page
+        # memory_partitions.PartitionedMemory: ha meg van adva, minden megbeszélés a saját partíciójába (napló + gyűjtemény) ír.
+        self.partitions = partitions
         self.chat_history_view = chat_history_view
         self.firestore_history = firestore_history
         self.config = config
         self.vector_store = vector_store
         self.search_memory_tool = search_memory_tool
-        self.atomod_graph = None  # A gráfot csak az első használatkor hozzuk létre
+        self.atomod_graphs = {}  # Módonként egy gráf, csak az első használatkor hozzuk létre
         self._graph_lock = threading.Lock() # Lock a versenyhelyzetek elkerülésére
+        executor_config = self.config.get('task_executor', {})
+        # Korlátos munkaszál-készlet: egy feladat-hullám sem indít egyszerre korlátlan számú Vertex hívást.
+        self.executor = TaskExecutor(
+            max_workers=executor_config.get('max_workers', self.EXECUTOR_MAX_WORKERS),
+            name="ATOMOD",
+            # A sorban lejárt feladat el sem indul, ezért az állapotát itt rögzítjük.
+            on_queue_expired=lambda record: self._set_task_status(record.task_id, TIMED_OUT)
+        )
+        self.tool_executor = ToolCallExecutor.from_config(self.config, name="ATOMOD-Tools")
+        self.priority_protocol = get_atom_data().get('ATOM1', {}).get('priority_protocol')
+        self.checkpoint_db_path = self.config.get('checkpoint_db_path', CHECKPOINT_DB_FILE)
+        self._checkpointer = None
+        self._initialize_task_table()
         print("Task Dispatcher (Forgalomirányító) inicializálva, a rendszerkomponensekhez bekötve.")
 
-    def _update_ui_and_memory(self, message: BaseMessage):
-        """Segédfüggvény, ami a UI-t és a memóriákat is frissíti a háttérszálból."""
-        # === JAVÍTÁS: HELYI IMPORT A KÖRKÖRÖS HIVATKOZÁS FELOLDÁSÁRA ===
-        # A MessageBubble-t csak itt importáljuk, hogy elkerüljük
-        # a 'main_aito' és a 'task_dispatcher' közötti import hurkot.
-        from main_aito import MessageBubble
-        # =============================================================
-        
-        self.firestore_history.add_message(message)
+    def _current_partition_id(self):
+        return _meeting_partition_id.get()
+
+    def _with_meeting_partition(self, tool: Callable) -> Callable:
+        """Az eszköz a végrehajtó szálkészletén is a megbeszélés partícióját látja (a szálkészlet nem örökli a kontextust)."""
+        partition_id = self._current_partition_id()
+        @wraps(tool)
+        def run_in_partition(*args, **kwargs):
+            token = _meeting_partition_id.set(partition_id)
+            try:
+                return tool(*args, **kwargs)
+            finally:
+                _meeting_partition_id.reset(token)
+        return run_in_partition
+
+    def _persist_message(self, message: BaseMessage, partition_id: str = None):
+        """
+        Egy végleges üzenet rögzítése az SQLite naplóban és a vektor-memóriában: partícionált
+        memóriánál a megbeszélés saját partíciójában, egyébként a közös tárakban.
+        """
+        partition_id = partition_id or self._current_partition_id()
+        if self.partitions is not None and partition_id:
+            partition = self.partitions.registry.get(partition_id)
+            history, vector_store = self.partitions.chat_history(partition_id), self.partitions.vector_store(partition_id)
+            session_id, meeting_id = partition.history_session_id, partition.meeting_id
+        else:
+            history, vector_store = self.firestore_history, self.vector_store
+            session_id, meeting_id = self.config.get('session_id', 'unknown_session'), None
+        history.add_message(message)
         # The dispatcher's own messages are not chunked, so we create a single document.
         doc = message_to_document(
             content=message.content,
             speaker=getattr(message, 'name', 'ATOMOD'),
             timestamp=datetime.now(timezone.utc).isoformat(),
-            session_id=self.config.get('session_id', 'unknown_session')
+            session_id=session_id,
+            meeting_id=meeting_id
         )
-        self.vector_store.add_documents([doc])
+        if partition_id and self.partitions is not None:
+            doc.metadata[PARTITION_METADATA_KEY] = partition_id
+        vector_store.add_documents([doc])
         print(f"ATOMOD Ciklus: '{message.name}' üzenete rögzítve a memóriákban.")
 
+    def _update_ui_and_memory(self, message: BaseMessage, partition_id: str = None):
+        """Segédfüggvény, ami a UI-t és a memóriákat is frissíti a háttérszálból."""
+        # === JAVÍTÁS: HELYI IMPORT A KÖRKÖRÖS HIVATKOZÁS FELOLDÁSÁRA ===
+        # A MessageBubble-t csak itt importáljuk, hogy elkerüljük
+        # a 'main_aito' és a 'task_dispatcher' közötti import hurkot.
+        from main_aito import MessageBubble
+        # =============================================================
+
+        self._persist_message(message, partition_id)
+
         if self.chat_history_view.controls and "gondolkodik..." in self.chat_history_view.controls[-1].controls[0].content.value:
              self.chat_history_view.controls.pop()
         
         self.chat_history_view.controls.append(MessageBubble(message))
         self.page.update()
 
+    def _completed_agent_turns(self, state: MeetingState) -> int:
+        """Megszámolja a résztvevő ATOM-ok eddigi hozzászólásait (a moderátor és a felhasználó nélkül)."""
+        participants = state['participants']
+        return len([msg for msg in state['messages'] if getattr(msg, 'name', None) in participants])
+
     def _select_speaker(self, state: MeetingState) -> dict:
         print("--- ATOMOD: Felszólaló kiválasztása... ---")
         participants = state['participants']
-        # Exclude the user from the agent message count
-        agent_messages = [msg for msg in state['messages'] if msg.name != self.config.get('user_id')]
-        agent_messages_count = len(agent_messages)
+        agent_messages_count = self._completed_agent_turns(state)
         current_round = agent_messages_count // len(participants) + 1
         speaker_index = agent_messages_count % len(participants)
-        max_rounds = 1 
-        if current_round > max_rounds:
+        if current_round > self.MAX_ROUNDS:
             next_speaker = None
         else:
             next_speaker = participants[speaker_index]
         return {"next_speaker": next_speaker, "current_round": current_round}
 
-    def _run_agent_turn(self, state: MeetingState) -> dict:
-        agent_id = state['next_speaker']
-        moderator_message = AIMessage(content=f"ATOMOD: A következő felszólaló: {agent_id} (Kör: {state['current_round']}). Kérem a hozzászólását.", name="ATOMOD")
-        
-        self.page.run_thread(target=self._update_ui_and_memory, args=(moderator_message,))
-        
+    def _invoke_agent(self, agent_id: str, messages: List[BaseMessage], on_text=None) -> AIMessage:
+        """
+        Egyetlen ATOM meghívása a megadott üzenetlistával. Ha 'on_text' meg van adva,
+        a választ streameli, és minden új szövegdarabnál meghívja az eddigi szöveggel.
+        Az ATOM eszközhívásait (memória-keresés) a végleges válaszig végrehajtja.
+        """
         print(f"--- ATOMOD: {agent_id} aktiválása... ---")
-        current_atom_config = ATOM_DATA[agent_id]
-        final_system_prompt = PROMPTS['team_simulation_template'].format(
+        prompts = get_prompts()
+        current_atom_config = get_atom_data()[agent_id]
+        final_system_prompt = prompts['team_simulation_template'].format(
             active_atom_role=agent_id,
             personality_description=current_atom_config['personality'],
-            grounding_instructions=PROMPTS['grounding_instructions']
-        )
-        llm = ChatVertexAI(
-            model_name=current_atom_config["model_name"],
-            project=self.config.get('project_id'),
-            location=self.config.get('conversation_location'),
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-            }
+            grounding_instructions=prompts['grounding_instructions']
         )
+        llm = create_chat_model(current_atom_config["model_name"], caller="meeting", config=self.config,
+                                atom_id=agent_id, disable_safety_filters=True)
         tools = [self.search_memory_tool]
+        tool_registry = {tool.__name__: self._with_meeting_partition(tool) for tool in tools}
         llm_with_tools = llm.bind_tools(tools)
         prompt = ChatPromptTemplate.from_messages([
-            ("system", final_system_prompt),
+            # A kész promptot változóként adjuk át: a szövegében lévő kapcsos zárójeleket nem értelmezheti sablonként.
+            ("system", "{system_prompt}"),
             MessagesPlaceholder(variable_name="messages"),
         ])
         chain = prompt | llm_with_tools
-        response = chain.invoke({"messages": state['messages']})
+
+        turn_messages = list(messages)
+        for iteration in range(self.MAX_TOOL_ITERATIONS):
+            # Az eszközök kimenetével történő újrahívások a naplóban külön hívási helyen szerepelnek.
+            run_config = call_site_config("meeting/tool_loop") if iteration else None
+            with span("llm_call", atom=agent_id, iteration=iteration, messages=len(turn_messages)) as llm_span:
+                if on_text:
+                    response = stream_response(chain, {"system_prompt": final_system_prompt, "messages": turn_messages},
+                                               config=run_config, on_text=on_text)
+                else:
+                    response = chain.invoke({"system_prompt": final_system_prompt, "messages": turn_messages}, config=run_config)
+                llm_span.set_attribute("tool_calls", len(response.tool_calls))
+            if not response.tool_calls:
+                break
+            turn_messages.append(response)
+            turn_messages.extend(self.tool_executor.execute(response.tool_calls, tool_registry, caller=f"ATOMOD/{agent_id}"))
         response.name = agent_id
+        return response
+
+    # --- ÁTIRAT TÖMÖRÍTÉS ---
+
+    def _prompt_messages(self, state: MeetingState) -> List[BaseMessage]:
+        """
+        Az ATOM-oknak küldött üzenetlista: a feladat, a régebbi körök gördülő
+        összefoglalója, majd a még össze nem foglalt üzenetek szó szerint.
+        """
+        messages = state['messages']
+        summary = state.get('transcript_summary', "")
+        if not summary:
+            return list(messages)
+        summary_message = AIMessage(content=f"ATOMOD ÖSSZEFOGLALÓ a megbeszélés korábbi részéről:\n{summary}", name="ATOMOD")
+        return messages[:1] + [summary_message] + messages[max(1, state.get('summarized_count', 0)):]
+
+    def _summarize_turns(self, previous_summary: str, messages: List[BaseMessage]) -> str:
+        """Beolvasztja a megadott üzeneteket a korábbi összefoglalóba egy gyors modellel."""
+        compaction_config = self.config.get('meeting_compaction', {})
+        llm = create_chat_model(compaction_config.get('summary_model', self.COMPACTION_SUMMARY_MODEL),
+                                caller="meeting/compaction", config=self.config, temperature=0.2)
+        transcript = "\n".join(f"{getattr(msg, 'name', None) or 'Ismeretlen'}: {msg.content}" for msg in messages)
+        prompt_content = get_prompts()['meeting_summary_prompt'].format(
+            previous_summary=previous_summary or "(nincs)",
+            transcript=transcript
+        )
+        return llm.invoke([HumanMessage(content=prompt_content)]).content
+
+    def _compact_transcript(self, state: MeetingState) -> dict:
+        """
+        Ha a következő felszólalás promptja túllépné a tokenkeretet, a régebbi
+        felszólalásokat beolvasztja a gördülő összefoglalóba, és csak az utolsó
+        K felszólalást (a hozzájuk tartozó moderátor-üzenetekkel) hagyja meg szó szerint.
+        """
+        compaction_config = self.config.get('meeting_compaction', {})
+        max_tokens = compaction_config.get('max_prompt_tokens', self.COMPACTION_MAX_PROMPT_TOKENS)
+        keep_last_turns = compaction_config.get('keep_last_turns', self.COMPACTION_KEEP_LAST_TURNS)
+
+        prompt_tokens = sum(count_tokens(str(msg.content)) for msg in self._prompt_messages(state))
+        if prompt_tokens <= max_tokens:
+            return {}
+
+        messages = state['messages']
+        already_summarized = max(1, state.get('summarized_count', 0))
+        turn_indices = [i for i in range(already_summarized, len(messages))
+                        if getattr(messages[i], 'name', None) in state['participants']]
+        if len(turn_indices) <= keep_last_turns:
+            return {}
+
+        # Az utolsó beolvasztandó felszólalásig (azt is beleértve) mindent összefoglalunk.
+        cut_index = turn_indices[len(turn_indices) - keep_last_turns - 1] + 1
+        print(f"--- ATOMOD: Az átirat {prompt_tokens} token, tömörítés: {cut_index - already_summarized} üzenet összefoglalása... ---")
+        new_summary = self._summarize_turns(state.get('transcript_summary', ""), messages[already_summarized:cut_index])
+        return {"transcript_summary": new_summary, "summarized_count": cut_index}
+
+    def _run_agent_turn(self, state: MeetingState) -> dict:
+        agent_id = state['next_speaker']
+        moderator_message = AIMessage(content=f"ATOMOD: A következő felszólaló: {agent_id} (Kör: {state['current_round']}). Kérem a hozzászólását.", name="ATOMOD")
         
-        self.page.run_thread(target=self._update_ui_and_memory, args=(response,))
+        if self.config.get('stream_responses', True):
+            response = self._run_streamed_agent_turn(agent_id, moderator_message, self._prompt_messages(state))
+            return {"messages": [moderator_message, response]}
+
+        self.page.run_thread(target=self._update_ui_and_memory, args=(moderator_message, self._current_partition_id()))
+
+        response = self._invoke_agent(agent_id, self._prompt_messages(state))
+        
+        self.page.run_thread(target=self._update_ui_and_memory, args=(response, self._current_partition_id()))
         return {"messages": [moderator_message, response]}
 
+    def _run_streamed_agent_turn(self, agent_id: str, moderator_message: AIMessage, messages: List[BaseMessage]) -> AIMessage:
+        """
+        Streamelt felszólalás: az ATOM válasza egyetlen buborékban, fokozatosan jelenik meg.
+        A gráf háttérszálon fut, így a moderátor üzenetét itt szinkron rögzítjük, hogy
+        a buborékok sorrendje biztosan megmaradjon. A választ csak a végén mentjük.
+        """
+        from main_aito import MessageBubble
+
+        self._update_ui_and_memory(moderator_message)
+        response_bubble = MessageBubble(AIMessage(content="gondolkodik...", name=agent_id))
+        self.chat_history_view.controls.append(response_bubble)
+        self.page.update()
+
+        updater = ThrottledUpdater(self.page, response_bubble.set_content)
+        response = self._invoke_agent(agent_id, messages, on_text=updater.push)
+        updater.flush(response.content)
+
+        self._persist_message(response)
+        return response
+
+    # --- PÁRHUZAMOS KÖR MÓD ---
+
+    def _plan_round(self, state: MeetingState) -> dict:
+        """Meghatározza a következő párhuzamos kör sorszámát."""
+        print("--- ATOMOD: Párhuzamos kör tervezése... ---")
+        current_round = self._completed_agent_turns(state) // len(state['participants']) + 1
+        return {"current_round": current_round, "next_speaker": ""}
+
+    def _fan_out_round(self, state: MeetingState):
+        """
+        Szétosztja a kört: minden résztvevő egy külön ágban, ugyanazon az
+        állapot-pillanatképen kapja meg a feladatot. Ha elfogytak a körök, lezár.
+        """
+        from langgraph.graph import END
+        from langgraph.types import Send
+        if state['current_round'] > self.MAX_ROUNDS:
+            print("--- ATOMOD: Minden kör lezajlott. Megbeszélés lezárva. ---")
+            return END
+        print(f"--- ATOMOD: {state['current_round']}. kör indítása párhuzamosan: {', '.join(state['participants'])} ---")
+        return [
+            Send("run_parallel_turn", {
+                "agent_id": agent_id,
+                "participant_index": index,
+                "messages": self._prompt_messages(state),
+            })
+            for index, agent_id in enumerate(state['participants'])
+        ]
+
+    def _run_parallel_turn(self, branch: dict) -> dict:
+        """Egy résztvevő hozzászólása a párhuzamos körben. Az UI-t még nem frissíti."""
+        response = self._invoke_agent(branch['agent_id'], branch['messages'])
+        return {"round_responses": [(branch['participant_index'], response)]}
+
+    def _merge_round(self, state: MeetingState) -> dict:
+        """
+        Összefésüli a kör válaszait a résztvevők sorrendjében, hogy az átirat
+        a befejezési sorrendtől függetlenül determinisztikus legyen.
+        """
+        ordered_responses = [response for _, response in sorted(state['round_responses'], key=lambda item: item[0])]
+        moderator_message = AIMessage(
+            content=f"ATOMOD: {state['current_round']}. kör párhuzamos hozzászólásai: {', '.join(state['participants'])}.",
+            name="ATOMOD"
+        )
+        for message in [moderator_message] + ordered_responses:
+            self.page.run_thread(target=self._update_ui_and_memory, args=(message, self._current_partition_id()))
+        return {"messages": [moderator_message] + ordered_responses, "round_responses": None}
+
     def _should_continue(self, state: MeetingState) -> str:
         print("--- ATOMOD: Befejezési feltétel ellenőrzése... ---")
         if not state['next_speaker']:
@@ -117,71 +353,291 @@ class TaskDispatcher:
             print("--- ATOMOD: Megbeszélés folytatódik. ---")
             return "continue"
 
-    def _build_graph(self):
+    def _build_graph(self, mode: str = "round_robin"):
+        from langgraph.graph import StateGraph, END
         workflow = StateGraph(MeetingState)
-        workflow.add_node("select_speaker", self._select_speaker)
-        workflow.add_node("run_agent_turn", self._run_agent_turn)
-        workflow.set_entry_point("select_speaker")
-        workflow.add_conditional_edges(
-            "select_speaker", self._should_continue,
-            {"continue": "run_agent_turn", "end": END}
-        )
-        workflow.add_edge("run_agent_turn", "select_speaker")
+        # Minden csomópont-futás egy span ("meeting.<csomópont>") a megbeszélés nyomkövetésében.
+        def add_node(name, node):
+            workflow.add_node(name, traced(f"meeting.{name}")(node))
+        if mode == "parallel":
+            add_node("plan_round", self._plan_round)
+            add_node("run_parallel_turn", self._run_parallel_turn)
+            add_node("merge_round", self._merge_round)
+            add_node("compact_transcript", self._compact_transcript)
+            workflow.set_entry_point("plan_round")
+            workflow.add_conditional_edges("plan_round", self._fan_out_round, ["run_parallel_turn", END])
+            workflow.add_edge("run_parallel_turn", "merge_round")
+            workflow.add_edge("merge_round", "compact_transcript")
+            workflow.add_edge("compact_transcript", "plan_round")
+        else:
+            add_node("select_speaker", self._select_speaker)
+            add_node("run_agent_turn", self._run_agent_turn)
+            add_node("compact_transcript", self._compact_transcript)
+            workflow.set_entry_point("select_speaker")
+            workflow.add_conditional_edges(
+                "select_speaker", self._should_continue,
+                {"continue": "run_agent_turn", "end": END}
+            )
+            workflow.add_edge("run_agent_turn", "compact_transcript")
+            workflow.add_edge("compact_transcript", "select_speaker")
         # A .compile() hívás időigényes, ezért ezt csak akkor végezzük el, amikor tényleg kell.
-        print("--- ATOMOD: LangGraph workflow definíció elkészült. Fordítás (compile) folyamatban... ---")
-        graph = workflow.compile()
+        print(f"--- ATOMOD: LangGraph workflow definíció elkészült ({mode}). Fordítás (compile) folyamatban... ---")
+        graph = workflow.compile(checkpointer=self._get_checkpointer())
         print("--- ATOMOD: LangGraph workflow sikeresen lefordítva. ---")
         return graph
 
-    def _get_or_build_graph(self):
+    def _get_checkpointer(self):
         """
-        Ellenőrzi, hogy a gráf már le van-e fordítva. Ha nem, akkor lock-olja
-        a szálat és lefordítja. Ez biztosítja, hogy a fordítás csak egyszer
-        történjen meg és a fő szálat nem blokkolja.
+        A gráfok közös, SQLite-alapú checkpointere. Minden csomópont után elmenti
+        a megbeszélés állapotát, így egy összeomlás után a befejezett felszólalásokat
+        nem kell újra legenerálni. A _graph_lock alatt hívjuk.
         """
-        with self._graph_lock:
-            if self.atomod_graph is None:
-                print("--- ATOMOD: A gráf még nincs lefordítva. A fordítás elindítása a háttérben... ---")
-                self.atomod_graph = self._build_graph()
-        return self.atomod_graph
+        if self._checkpointer is None:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+            os.makedirs(os.path.dirname(self.checkpoint_db_path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.checkpoint_db_path, check_same_thread=False)
+            self._checkpointer = SqliteSaver(connection)
+            print(f"--- ATOMOD: Checkpoint adatbázis csatlakoztatva: {self.checkpoint_db_path} ---")
+        return self._checkpointer
 
-    def start_new_task(self, task_description: str, initiated_by: str) -> str:
-        task_id = str(uuid.uuid4())
-        initial_state = MeetingState(
+    # --- FELADAT-NYILVÁNTARTÁS (a folytatáshoz) ---
+
+    def _initialize_task_table(self):
+        os.makedirs(os.path.dirname(self.checkpoint_db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.checkpoint_db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS atomod_tasks (
+                task_id TEXT PRIMARY KEY,
+                task_description TEXT,
+                initiated_by TEXT,
+                meeting_mode TEXT,
+                category TEXT,
+                status TEXT,
+                created_at TEXT,
+                last_updated TEXT
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _record_task(self, task_id: str, task_description: str, initiated_by: str, mode: str, category: str):
+        now = datetime.now(timezone.utc).isoformat()
+        conn = sqlite3.connect(self.checkpoint_db_path)
+        conn.execute('''
+            INSERT OR REPLACE INTO atomod_tasks
+            (task_id, task_description, initiated_by, meeting_mode, category, status, created_at, last_updated)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (task_id, task_description, initiated_by, mode, category, QUEUED, now, now))
+        conn.commit()
+        conn.close()
+
+    def _set_task_status(self, task_id: str, status: str):
+        conn = sqlite3.connect(self.checkpoint_db_path)
+        conn.execute("UPDATE atomod_tasks SET status = ?, last_updated = ? WHERE task_id = ?",
+                     (status, datetime.now(timezone.utc).isoformat(), task_id))
+        conn.commit()
+        conn.close()
+
+    def _get_task_row(self, task_id: str) -> dict:
+        conn = sqlite3.connect(self.checkpoint_db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM atomod_tasks WHERE task_id = ?", (task_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def _build_initial_state(self, task_description: str, initiated_by: str, mode: str) -> MeetingState:
+        return MeetingState(
             task_description=task_description,
             participants=["ATOM1", "ATOM5"],
             messages=[HumanMessage(content=task_description, name=initiated_by)],
             current_round=0,
-            next_speaker=""
+            next_speaker="",
+            meeting_mode=mode,
+            round_responses=[],
+            transcript_summary="",
+            summarized_count=0
+        )
+
+    def list_interrupted_tasks(self) -> list:
+        """
+        Azok a feladatok, amelyek nem fejeződtek be, és ebben a folyamatban sem futnak
+        (pl. összeomlott vagy bezárt alkalmazás, illetve hibára futott megbeszélés).
+        """
+        conn = sqlite3.connect(self.checkpoint_db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT * FROM atomod_tasks WHERE status IN (?, ?, ?, ?) ORDER BY created_at",
+            (QUEUED, RUNNING, FAILED, TIMED_OUT)
+        ).fetchall()
+        conn.close()
+        interrupted = []
+        for row in rows:
+            active_record = self.executor.get_status(row['task_id'])
+            if active_record is None or active_record.status in FINAL_STATUSES:
+                interrupted.append(dict(row))
+        return interrupted
+
+    def resume_task(self, task_id: str) -> bool:
+        """
+        Egy megszakadt megbeszélés folytatása az utolsó befejezett lépéstől.
+        A már lezárult felszólalásokat a checkpoint adja vissza, így azokat nem
+        kell újra legenerálni (és kifizetni).
+        """
+        row = self._get_task_row(task_id)
+        if row is None or row['status'] in (DONE, CANCELLED):
+            return False
+        active_record = self.executor.get_status(task_id)
+        if active_record is not None and active_record.status not in FINAL_STATUSES:
+            return False
+
+        self._set_task_status(task_id, QUEUED)
+        deadline_seconds = self.config.get('task_executor', {}).get('default_deadline_seconds', self.EXECUTOR_DEFAULT_DEADLINE_SECONDS)
+        self.executor.submit(
+            task_id,
+            lambda record: self._run_graph_in_background(task_id, row['meeting_mode'], None, record),
+            description=row['task_description'],
+            category=row['category'],
+            priority=priority_rank(row['category'], self.priority_protocol),
+            deadline_seconds=deadline_seconds
+        )
+        print(f"--- ATOMOD: A(z) {task_id[:8]} feladat folytatása sorba állítva. ---")
+        return True
+
+    def resume_interrupted_tasks(self) -> list:
+        """Az összes megszakadt feladat folytatása. A folytatott task_id-k listáját adja vissza."""
+        return [row['task_id'] for row in self.list_interrupted_tasks() if self.resume_task(row['task_id'])]
+
+    def warm_up(self, modes=MEETING_MODES):
+        """Előre lefordítja a gráfokat (a bemelegítő hívja), hogy az első /task ne a fordításra várjon."""
+        for mode in modes:
+            self._get_or_build_graph(mode)
+
+    def _get_or_build_graph(self, mode: str = "round_robin"):
+        """
+        Ellenőrzi, hogy az adott módhoz tartozó gráf már le van-e fordítva. Ha nem,
+        akkor lock-olja a szálat és lefordítja. Ez biztosítja, hogy a fordítás csak
+        egyszer történjen meg és a fő szálat nem blokkolja.
+        """
+        with self._graph_lock:
+            if mode not in self.atomod_graphs:
+                print(f"--- ATOMOD: A(z) '{mode}' gráf még nincs lefordítva. A fordítás elindítása a háttérben... ---")
+                self.atomod_graphs[mode] = self._build_graph(mode)
+        return self.atomod_graphs[mode]
+
+    def start_new_task(self, task_description: str, initiated_by: str, mode: str = "round_robin",
+                       category: str = None, deadline_seconds: float = None) -> str:
+        """
+        Sorba állít egy új ATOMOD megbeszélést. A prioritást az ATOM1 Prioritizálási
+        Protokollja adja (kockázat > stratégia > optimalizálás > új funkciók), ha a
+        'category' nincs kifejezetten megadva.
+        """
+        if mode not in MEETING_MODES:
+            raise ValueError(f"Ismeretlen megbeszélés mód: '{mode}'. Lehetséges értékek: {', '.join(MEETING_MODES)}")
+        task_id = str(uuid.uuid4())
+        initial_state = self._build_initial_state(task_description, initiated_by, mode)
+        if category:
+            priority = priority_rank(category, self.priority_protocol)
+        else:
+            priority, category = classify_task_priority(task_description, self.priority_protocol)
+        if deadline_seconds is None:
+            deadline_seconds = self.config.get('task_executor', {}).get('default_deadline_seconds', self.EXECUTOR_DEFAULT_DEADLINE_SECONDS)
+
+        self._record_task(task_id, task_description, initiated_by, mode, category)
+
+        # A gráf a végrehajtó egyik munkaszálán fut, hogy ne fagyjon a UI.
+        self.executor.submit(
+            task_id,
+            lambda record: self._run_graph_in_background(task_id, mode, initial_state, record),
+            description=task_description,
+            category=category,
+            priority=priority,
+            deadline_seconds=deadline_seconds
         )
-        # A gráf futtatását egy külön szálba szervezzük, hogy ne fagyjon a UI.
-        thread = threading.Thread(target=self._run_graph_in_background, args=(initial_state,))
-        thread.start()
         return task_id
 
-    def _run_graph_in_background(self, initial_state: MeetingState):
+    def cancel_task(self, task_id: str) -> bool:
+        """
+        Lemond egy sorban álló vagy futó feladatot (a futót a következő gráf-lépés előtt állítja le).
+        A sorban álló el sem indul, ezért a CANCELLED állapotot azonnal rögzítjük, különben a
+        /resume megszakadtként újra felajánlaná.
+        """
+        cancelled = self.executor.cancel(task_id)
+        if cancelled:
+            self._set_task_status(task_id, CANCELLED)
+        return cancelled
+
+    def describe_tasks(self) -> str:
+        """Ember által olvasható összesítő a feladatokról és a sor állapotáról (a UI '/tasks' parancsához)."""
+        metrics = self.executor.metrics()
+        lines = [
+            f"ATOMOD feladatsor: {metrics['queue_depth']} várakozik, {metrics['running']}/{metrics['max_workers']} fut, "
+            f"{metrics['completed']} lezárult. Átlagos várakozás: {metrics['avg_wait_seconds']:.1f} mp, "
+            f"maximum: {metrics['max_wait_seconds']:.1f} mp."
+        ]
+        for record in self.executor.list_tasks():
+            lines.append(f"- {record.task_id[:8]} [{record.status}] ({record.category}) {record.description}")
+        return "\n".join(lines)
+
+    @traced("meeting_task")
+    def _run_graph_in_background(self, task_id: str, mode: str, initial_state: MeetingState = None, record: TaskRecord = None):
         """
         Ez a függvény egy háttérszálon fut. Először megszerzi (vagy lefordítja)
-        a gráfot, majd futtatja a megadott állapottal.
+        a gráfot, majd lépésenként futtatja a megadott állapottal. Minden lépés
+        után ellenőrzi, hogy a feladatot nem mondták-e le, vagy nem járt-e le.
+        Ha az 'initial_state' None, a megbeszélést az utolsó checkpointtól folytatja.
         """
         print("\n--- ATOMOD MUNKAfolyamat a háttérben elindult ---")
+        current_span().set_attribute("task_id", task_id)
+        current_span().set_attribute("mode", mode)
+        self._set_task_status(task_id, RUNNING)
+        # A megbeszélés (task_id) saját memória-partíciója; a nyilvántartás a folytatáskor is ugyanazt adja.
+        partition_id = None
+        if self.partitions is not None:
+            description = initial_state['task_description'] if initial_state else ""
+            partition_id = self.partitions.registry.for_meeting(task_id, description=description).partition_id
+        partition_token = _meeting_partition_id.set(partition_id)
         try:
             # A gráf megszerzése (vagy első futás esetén a fordítás kivárása)
-            graph_to_run = self._get_or_build_graph()
+            graph_to_run = self._get_or_build_graph(mode)
+            graph_config = {"configurable": {"thread_id": task_id}}
+
+            graph_input = initial_state
+            if graph_input is None:
+                if graph_to_run.get_state(graph_config).values:
+                    print(f"--- ATOMOD: A(z) {task_id[:8]} megbeszélés folytatása az utolsó checkpointtól. ---")
+                else:
+                    # A feladat még az első lépés előtt szakadt meg: elölről indul.
+                    row = self._get_task_row(task_id)
+                    graph_input = self._build_initial_state(row['task_description'], row['initiated_by'], mode)
 
-            # A gráf futtatása
-            final_state = graph_to_run.invoke(initial_state)
+            # A gráf futtatása lépésenként, hogy a lépések között meg lehessen szakítani
+            final_state = graph_input or graph_to_run.get_state(graph_config).values
+            for state in graph_to_run.stream(graph_input, config=graph_config, stream_mode="values"):
+                final_state = state
+                if record:
+                    record.raise_if_stopped()
 
             final_report_message = AIMessage(
                 content=f"ATOMOD JELENTÉS: A '{final_state['task_description']}' feladat megbeszélése befejeződött.",
                 name="ATOMOD"
             )
-            self.page.run_thread(target=self._update_ui_and_memory, args=(final_report_message,))
+            self.page.run_thread(target=self._update_ui_and_memory, args=(final_report_message, self._current_partition_id()))
+            self._set_task_status(task_id, DONE)
             print("\n--- ATOMOD JELENTÉS: MEGBESZÉLÉS BEFEJEZVE ---")
+        except TaskInterrupted as e:
+            self._set_task_status(task_id, CANCELLED if record and record.cancel_event.is_set() else TIMED_OUT)
+            print(f"\n--- ATOMOD: A munkafolyamat leállítva: {e} ---")
+            stop_message = AIMessage(content=f"ATOMOD: {e}", name="ATOMOD")
+            self.page.run_thread(target=self._update_ui_and_memory, args=(stop_message, self._current_partition_id()))
+            raise
         except Exception as e:
+            self._set_task_status(task_id, FAILED)
             print(f"\n---!!! ATOMOD HIBA: A munkafolyamat megszakadt: {e} !!!---")
             error_message = AIMessage(content=f"ATOMOD HIBA: A feladat végrehajtása közben hiba történt: {e}", name="ATOMOD_ERROR")
-            self.page.run_thread(target=self._update_ui_and_memory, args=(error_message,))
+            self.page.run_thread(target=self._update_ui_and_memory, args=(error_message, self._current_partition_id()))
+            raise
+        finally:
+            _meeting_partition_id.reset(partition_token)
 
 
-print("Forgalomirányító modul (task_dispatcher.py) sikeresen betöltve, LangGraph motorral.")
\ No newline at end of file
+logging.debug("Forgalomirányító modul (task_dispatcher.py) betöltve.")
\ No newline at end of file
@@ -0,0 +1,239 @@
+# task_executor.py
+
+import logging
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# Ha az atoms.yaml nem tartalmaz protokollt, ez az ATOM1 prioritási sorrendje.
+DEFAULT_PRIORITY_ORDER = ["risk", "strategy", "optimization", "features"]
+
+# Egy feladat életciklusának állapotai
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+TIMED_OUT = "TIMED_OUT"
+FINAL_STATUSES = (DONE, FAILED, CANCELLED, TIMED_OUT)
+
+# A lezárult feladatokból és a várakozási időkből csak ennyi legutóbbit őrzünk meg,
+# így a hosszan futó folyamat memóriája nem nő a feladatok számával.
+DEFAULT_FINISHED_HISTORY = 100
+DEFAULT_WAIT_TIME_SAMPLES = 1000
+
+class TaskInterrupted(Exception):
+    """A futó feladat megszakítását jelzi (lemondás vagy lejárt határidő miatt)."""
+
+@dataclass
+class TaskRecord:
+    """Egy ütemezett feladat állapota és időadatai. Az időpontok time.monotonic() értékek."""
+    task_id: str
+    description: str
+    category: str
+    priority: int
+    submitted_at: float
+    deadline: Optional[float] = None
+    status: str = QUEUED
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def wait_time(self) -> Optional[float]:
+        """A sorban töltött idő (mp), ha a feladat már elindult."""
+        return self.started_at - self.submitted_at if self.started_at is not None else None
+
+    def is_past_deadline(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def should_stop(self) -> bool:
+        """A futó feladat ezt kérdezi le a lépései között."""
+        return self.cancel_event.is_set() or self.is_past_deadline()
+
+    def raise_if_stopped(self):
+        if self.cancel_event.is_set():
+            raise TaskInterrupted(f"A(z) {self.task_id} feladatot lemondták.")
+        if self.is_past_deadline():
+            raise TaskInterrupted(f"A(z) {self.task_id} feladat túllépte a határidejét.")
+
+def classify_task_priority(description: str, protocol: Optional[List[dict]] = None) -> Tuple[int, str]:
+    """
+    Az ATOM1 Prioritizálási Protokollja alapján besorol egy feladatot.
+    Visszaadja a (rang, kategória) párt; a kisebb rang előbb fut.
+    Ha egyik kulcsszó sem illeszkedik, a feladat a legutolsó kategóriába kerül.
+    """
+    protocol = protocol or [{"category": category, "keywords": []} for category in DEFAULT_PRIORITY_ORDER]
+    text = (description or "").lower()
+    for rank, entry in enumerate(protocol):
+        if any(keyword.lower() in text for keyword in entry.get("keywords", [])):
+            return rank, entry["category"]
+    return len(protocol) - 1, protocol[-1]["category"]
+
+def priority_rank(category: str, protocol: Optional[List[dict]] = None) -> int:
+    """Egy kifejezetten megadott kategória rangja a protokollban."""
+    categories = [entry["category"] for entry in protocol] if protocol else DEFAULT_PRIORITY_ORDER
+    if category not in categories:
+        raise ValueError(f"Ismeretlen prioritási kategória: '{category}'. Lehetséges értékek: {', '.join(categories)}")
+    return categories.index(category)
+
+class TaskExecutor:
+    """
+    Korlátos számú munkaszálon, prioritási sorból futtatja a feladatokat.
+    Azonos prioritáson belül az érkezési sorrend (FIFO) érvényes.
+    Minden feladat állapota a task_id alapján lekérdezhető és lemondható. Az 'on_queue_expired'
+    azt a feladatot kapja meg, amelyik a sorban járt le, és így el sem indult.
+    A lezárult feladatok kikerülnek az aktívak közül; közülük csak az utolsó
+    'finished_history' darab marad lekérdezhető.
+    """
+    def __init__(self, max_workers: int = 2, name: str = "TaskExecutor",
+                 on_queue_expired: Optional[Callable[[TaskRecord], None]] = None,
+                 finished_history: int = DEFAULT_FINISHED_HISTORY, wait_time_samples: int = DEFAULT_WAIT_TIME_SAMPLES):
+        self.max_workers = max_workers
+        self.name = name
+        self.on_queue_expired = on_queue_expired
+        self._queue = queue.PriorityQueue()
+        self._tasks: Dict[str, TaskRecord] = {}
+        self._finished: Deque[TaskRecord] = deque(maxlen=finished_history)
+        self._completed_count = 0
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._wait_times: Deque[float] = deque(maxlen=wait_time_samples)
+        self._workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"{name}-worker-{i + 1}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        print(f"{self.name}: {max_workers} munkaszál elindítva.")
+
+    def submit(self, task_id: str, fn: Callable[[TaskRecord], None], description: str = "",
+               category: str = "features", priority: int = 0, deadline_seconds: Optional[float] = None) -> TaskRecord:
+        """Sorba állít egy feladatot. Az 'fn' a saját TaskRecord-ját kapja meg, hogy figyelhesse a lemondást."""
+        now = time.monotonic()
+        record = TaskRecord(
+            task_id=task_id,
+            description=description,
+            category=category,
+            priority=priority,
+            submitted_at=now,
+            deadline=now + deadline_seconds if deadline_seconds else None
+        )
+        with self._lock:
+            self._tasks[task_id] = record
+        self._queue.put((priority, next(self._sequence), task_id, fn))
+        print(f"{self.name}: '{task_id[:8]}' sorba állítva (kategória: {category}, sor hossza: {self._queue.qsize()}).")
+        return record
+
+    def cancel(self, task_id: str) -> bool:
+        """Lemond egy feladatot. A sorban állót azonnal, a futót a következő lépése előtt állítja le."""
+        with self._lock:
+            record = self._tasks.get(task_id)
+            if record is None or record.status in FINAL_STATUSES:
+                return False
+            record.cancel_event.set()
+            if record.status == QUEUED:
+                record.status = CANCELLED
+                record.finished_at = time.monotonic()
+        print(f"{self.name}: '{task_id[:8]}' lemondva.")
+        return True
+
+    def get_status(self, task_id: str) -> Optional[TaskRecord]:
+        """Az aktív vagy a nemrég lezárult feladat rekordja; a régebben lezárultaké None."""
+        with self._lock:
+            record = self._tasks.get(task_id)
+            if record is None:
+                record = next((finished for finished in reversed(self._finished) if finished.task_id == task_id), None)
+            return record
+
+    def find_task_id(self, prefix: str) -> Optional[str]:
+        """A UI rövidített azonosítóiból (pl. az első 8 karakter) visszakeresi a teljes task_id-t."""
+        with self._lock:
+            task_ids = set(self._tasks) | {record.task_id for record in self._finished}
+        matches = [task_id for task_id in task_ids if task_id.startswith(prefix)]
+        return matches[0] if len(matches) == 1 else None
+
+    def list_tasks(self, active_only: bool = False) -> List[TaskRecord]:
+        with self._lock:
+            records = list(self._tasks.values())
+            if not active_only:
+                records += [record for record in self._finished if record.task_id not in self._tasks]
+        if active_only:
+            records = [record for record in records if record.status not in FINAL_STATUSES]
+        return sorted(records, key=lambda record: record.submitted_at)
+
+    def metrics(self) -> dict:
+        """A sor mélysége, a futó feladatok száma és a várakozási idők statisztikája."""
+        with self._lock:
+            statuses = [record.status for record in self._tasks.values()]
+            wait_times = sorted(self._wait_times)
+        return {
+            "queue_depth": statuses.count(QUEUED),
+            "running": statuses.count(RUNNING),
+            "max_workers": self.max_workers,
+            # A sorban lemondott feladat addig az aktívak között marad, amíg egy munkaszál ki nem veszi a sorból.
+            "completed": self._completed_count + sum(statuses.count(status) for status in FINAL_STATUSES),
+            "avg_wait_seconds": sum(wait_times) / len(wait_times) if wait_times else 0.0,
+            "max_wait_seconds": wait_times[-1] if wait_times else 0.0,
+            "p95_wait_seconds": wait_times[int(0.95 * (len(wait_times) - 1))] if wait_times else 0.0,
+        }
+
+    def _worker_loop(self):
+        while True:
+            priority, _, task_id, fn = self._queue.get()
+            try:
+                self._run_task(task_id, fn)
+            finally:
+                self._queue.task_done()
+
+    def _retire(self, record: TaskRecord):
+        # A _lock alatt hívjuk. Egy azonos task_id-val újra beküldött (folytatott) feladatot nem veszünk ki.
+        if self._tasks.get(record.task_id) is record:
+            del self._tasks[record.task_id]
+        self._finished.append(record)
+        self._completed_count += 1
+
+    def _run_task(self, task_id: str, fn: Callable[[TaskRecord], None]):
+        with self._lock:
+            record = self._tasks[task_id]
+            if record.status == CANCELLED:
+                self._retire(record)
+                return
+            if record.is_past_deadline():
+                record.status = TIMED_OUT
+                record.finished_at = time.monotonic()
+                self._retire(record)
+                expired = True
+            else:
+                expired = False
+                record.status = RUNNING
+                record.started_at = time.monotonic()
+                self._wait_times.append(record.wait_time)
+        if expired:
+            print(f"{self.name}: '{task_id[:8]}' a sorban lejárt, nem indul el.")
+            if self.on_queue_expired:
+                self.on_queue_expired(record)
+            return
+        print(f"{self.name}: '{task_id[:8]}' elindult (várakozás: {record.wait_time:.2f} mp, sor hossza: {self._queue.qsize()}).")
+
+        try:
+            fn(record)
+            final_status = DONE
+        except TaskInterrupted as e:
+            final_status = CANCELLED if record.cancel_event.is_set() else TIMED_OUT
+            record.error = str(e)
+        except Exception as e:
+            final_status = FAILED
+            record.error = str(e)
+
+        with self._lock:
+            record.status = final_status
+            record.finished_at = time.monotonic()
+            self._retire(record)
+        print(f"{self.name}: '{task_id[:8]}' befejeződött: {final_status} ({record.finished_at - record.started_at:.2f} mp).")
+
+logging.debug("Feladat-végrehajtó modul (task_executor.py) sikeresen betöltve.")
@@ -1,11 +1,49 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import MagicMock, patch
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import ANY, MagicMock, patch
 from langchain_core.messages import HumanMessage, AIMessage
 
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
+from langchain_core.documents import Document
 
 # Import the functions to be tested from their correct location
 from shared_components import search_memory_tool, search_knowledge_base_tool, list_uploaded_files_tool, read_full_document_tool
+from task_dispatcher import TaskDispatcher, current_meeting_partition_id
+from response_streamer import stream_response
+from task_executor import TaskExecutor, classify_task_priority, CANCELLED, DONE, TIMED_OUT
+from warmup import WarmupOrchestrator, WarmupError
+from tool_executor import ToolCallExecutor
+from tool_cache import ToolResultCache, bump_generation, CONVERSATIONS_SCOPE, DOCUMENTS_SCOPE
+from document_reader import read_document_range
+from lexical_index import LexicalIndex, stem_hungarian
+from embedding_backends import HashingEmbeddings, create_embedding_backend
+from memory_stores import vector_store_path
+from document_manifest import DocumentManifest
+from document_blob_store import DocumentBlobStore
+from memory_indexer import MemoryIndexer
+from memory_tiering import MemoryTiering, compact_partitions
+from retrieval_postprocessor import RetrievalPostprocessor
+from query_cache import CachedEmbeddings, SemanticQueryCache
+from llm_ledger import LLMLedger, LedgerCallbackHandler, call_site_config, main as llm_ledger_main
+from tracing import Tracer, set_tracer, span, bind_context, load_spans, main as tracing_main
+from benchmark_suite import latency_summary, compare_reports, main as benchmark_main
+from vertex_standin import ServiceSimulator, StandinRateLimitError, reset_simulators
+from model_factory import create_chat_model
+from async_pipeline import AsyncChatPipeline
+from memory_partitions import PartitionRegistry, PartitionedMemory, DEFAULT_PARTITION_ID
+from maintenance import find_orphaned_chunks, rebuild_store, log_fragmentation, sqlite_maintenance, DOCUMENT_IDENTITY
 
 
 class TestContextAwareSearch(unittest.TestCase):
@@ -54,6 +92,224 @@ class TestContextAwareSearch(unittest.TestCase):
         print("\n'test_search_memory_fallback_for_no_session_id' ran successfully!")
 
 
+class TestWriteBehindMemoryIndexer(unittest.TestCase):
+    """
+    Tests the durable outbox and the background micro-batch indexing of chat messages.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "memory_outbox.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_enqueue_returns_immediately_and_worker_retries_in_batches(self):
+        # ARRANGE
+        vector_store = MagicMock()
+        vector_store.add_documents.side_effect = [Exception("429 RESOURCE_EXHAUSTED"), None, None, None]
+        indexer = MemoryIndexer(lambda: vector_store, db_path=self.db_path, batch_size=8, flush_interval=0.01,
+                                retry_base=0.05, chunker=lambda text: [text])
+
+        # ACT
+        start = time.monotonic()
+        for i in range(3):
+            indexer.enqueue(f"üzenet {i}", {"speaker": "Pimpa", "session_id": "s1"})
+        enqueue_seconds = time.monotonic() - start
+        indexer.start()
+        flushed = indexer.flush(timeout=5)
+        indexer.stop(timeout=1)
+
+        # ASSERT
+        self.assertTrue(flushed)
+        self.assertLess(enqueue_seconds, 1.0)
+        # Az első köteg elbukott, utána a sorok egyenként mentek újra.
+        self.assertEqual(vector_store.add_documents.call_count, 4)
+        first_batch = vector_store.add_documents.call_args_list[0].args[0]
+        retried = [call.args[0] for call in vector_store.add_documents.call_args_list[1:]]
+        self.assertEqual([doc.page_content for doc in first_batch], ["üzenet 0", "üzenet 1", "üzenet 2"])
+        self.assertEqual([[doc.page_content for doc in documents] for documents in retried], [["üzenet 0"], ["üzenet 1"], ["üzenet 2"]])
+        self.assertEqual(retried[0][0].metadata, {"speaker": "Pimpa", "session_id": "s1", "chunk_number": 1, "total_chunks": 1})
+        stats = indexer.stats()
+        self.assertEqual((stats["indexed_messages"], stats["batches"], stats["failures"], stats["pending"]), (3, 3, 1, 0))
+        print("\n'test_enqueue_returns_immediately_and_worker_retries_in_batches' ran successfully!")
+
+    def test_failing_row_is_parked_without_blocking_the_rest(self):
+        # ARRANGE
+        stored = []
+        def add_documents(documents, ids):
+            if any("hibás" in doc.page_content for doc in documents):
+                raise ValueError("400 INVALID_ARGUMENT")
+            stored.extend(doc.page_content for doc in documents)
+        vector_store = MagicMock()
+        vector_store.add_documents.side_effect = add_documents
+        indexer = MemoryIndexer(lambda: vector_store, db_path=self.db_path, flush_interval=0.01, retry_base=0.01,
+                                chunker=lambda text: [text], max_attempts=3)
+        for text in ["jó üzenet 1", "hibás üzenet", "jó üzenet 2"]:
+            indexer.enqueue(text, {"speaker": "Pimpa", "session_id": "s1"})
+
+        # ACT
+        indexer.start()
+        flushed = indexer.flush(timeout=5)
+        indexer.stop(timeout=1)
+        parked_before_requeue = indexer.parked_count()
+        pending_matches = indexer.search_pending("hibás")
+        requeued = indexer.requeue_parked()
+
+        # ASSERT
+        self.assertTrue(flushed)
+        self.assertEqual(stored, ["jó üzenet 1", "jó üzenet 2"])
+        self.assertEqual(parked_before_requeue, 1)
+        self.assertEqual([doc.page_content for doc in pending_matches], ["hibás üzenet"])
+        conn = sqlite3.connect(self.db_path)
+        attempts, last_error = conn.execute("SELECT attempts, last_error FROM memory_outbox").fetchone()
+        conn.close()
+        self.assertEqual((requeued, indexer.pending_count(), indexer.parked_count()), (1, 1, 0))
+        self.assertEqual((attempts, last_error), (0, "400 INVALID_ARGUMENT"))
+        print("\n'test_failing_row_is_parked_without_blocking_the_rest' ran successfully!")
+
+    @patch('shared_components.SQLChatMessageHistory')
+    def test_memory_search_falls_back_to_pending_messages(self, mock_sql_history):
+        # ARRANGE
+        indexer = MemoryIndexer(MagicMock(), db_path=self.db_path, chunker=lambda text: [text])
+        indexer.enqueue("A szivattyú karbantartását holnapra tettük át.", {"speaker": "Pimpa", "session_id": "friss-session"})
+        mock_vector_store = MagicMock()
+        mock_vector_store.similarity_search_with_score.return_value = []
+        mock_history_instance = MagicMock()
+        mock_history_instance.messages = [HumanMessage(content="A szivattyú karbantartását holnapra tettük át.", name="Pimpa")]
+        mock_sql_history.return_value = mock_history_instance
+
+        # ACT
+        result = search_memory_tool(query="szivattyú karbantartás", config={}, vector_store=mock_vector_store, memory_indexer=indexer)
+
+        # ASSERT
+        mock_sql_history.assert_called_once_with(session_id="friss-session", connection=ANY)
+        self.assertIn("friss-session", result)
+        print("\n'test_memory_search_falls_back_to_pending_messages' ran successfully!")
+
+
+class FakeConversationStore:
+    """Minimal in-memory stand-in for a Chroma store (LangChain wrapper and raw collection API)."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, chunk_id, text, metadata):
+        self.rows[chunk_id] = (text, dict(metadata), [0.1, 0.2])
+
+    def get(self, ids=None, include=None):
+        selected = [chunk_id for chunk_id in self.rows if ids is None or chunk_id in ids]
+        return {"ids": selected,
+                "documents": [self.rows[chunk_id][0] for chunk_id in selected],
+                "metadatas": [self.rows[chunk_id][1] for chunk_id in selected],
+                "embeddings": [self.rows[chunk_id][2] for chunk_id in selected]}
+
+    def add_documents(self, documents, ids):
+        for chunk_id, document in zip(ids, documents):
+            self.add(chunk_id, document.page_content, document.metadata)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for chunk_id, embedding, text, metadata in zip(ids, embeddings, documents, metadatas):
+            self.rows[chunk_id] = (text, dict(metadata), embedding)
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.rows.pop(chunk_id, None)
+
+
+class TestMemoryTiering(unittest.TestCase):
+    """
+    Tests the digest compaction of old conversation vectors into the cold collection.
+    """
+
+    NOW = datetime(2026, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+    def _message(self, store, chunk_id, days_ago, text, session_id="s1"):
+        timestamp = (self.NOW - timedelta(days=days_ago)).isoformat()
+        store.add(chunk_id, text, {"speaker": "Pimpa", "session_id": session_id, "timestamp": timestamp,
+                                   "chunk_number": 1, "total_chunks": 1})
+
+    def test_old_days_are_digested_and_moved_to_cold_store(self):
+        # ARRANGE
+        hot_store, cold_store = FakeConversationStore(), FakeConversationStore()
+        self._message(hot_store, "a1", 40, "A szivattyút kicseréltük.")
+        self._message(hot_store, "a2", 40, "A számla a könyvelésen van.")
+        self._message(hot_store, "b1", 35, "Új beszállító a csavarokra.")
+        self._message(hot_store, "c1", 2, "Holnap leltár.")
+        summaries = []
+        summarize = lambda period, transcript: summaries.append((period, transcript)) or f"összefoglaló {len(summaries)}"
+        tiering = MemoryTiering(hot_store, cold_store, summarize, max_age_days=30)
+
+        # ACT
+        stats = tiering.compact(now=self.NOW)
+        second_run = tiering.compact(now=self.NOW)
+
+        # ASSERT
+        self.assertEqual(stats, {"groups": 2, "moved_vectors": 3, "digests": 2})
+        self.assertEqual(second_run, {"groups": 0, "moved_vectors": 0, "digests": 0})
+        self.assertEqual(sorted(cold_store.rows), ["a1", "a2", "b1"])
+        self.assertEqual(cold_store.rows["a1"][2], [0.1, 0.2])
+        hot_metadatas = [metadata for _, metadata, _ in hot_store.rows.values()]
+        self.assertIn("c1", hot_store.rows)
+        self.assertEqual(sorted(metadata.get("tier", "raw") for metadata in hot_metadatas), ["digest", "digest", "raw"])
+        self.assertIn("A szivattyút kicseréltük.", summaries[0][1])
+        self.assertIn("A számla a könyvelésen van.", summaries[0][1])
+        print("\n'test_old_days_are_digested_and_moved_to_cold_store' ran successfully!")
+
+    def test_hot_bound_compacts_recent_days_and_cold_search_is_opt_in(self):
+        # ARRANGE
+        hot_store, cold_store = FakeConversationStore(), FakeConversationStore()
+        for day in range(3):
+            for i in range(3):
+                self._message(hot_store, f"d{day}-{i}", 3 - day, f"üzenet {day}/{i}")
+        tiering = MemoryTiering(hot_store, cold_store, lambda period, transcript: "kivonat", max_age_days=30, max_hot_vectors=5)
+        mock_hot, mock_cold = MagicMock(), MagicMock()
+        mock_hot.similarity_search_with_score.return_value = []
+        mock_cold.similarity_search_with_score.return_value = [(Document(page_content="régi részlet", metadata={}), 0.2)]
+
+        # ACT
+        stats = tiering.compact(now=self.NOW)
+        default_result = search_memory_tool(query="részlet", config={}, vector_store=mock_hot, cold_store=mock_cold)
+        cold_result = search_memory_tool(query="részlet", config={}, vector_store=mock_hot, cold_store=mock_cold, search_cold=True)
+
+        # ASSERT
+        self.assertEqual(stats["groups"], 2)
+        self.assertLessEqual(len(hot_store.rows), 5)
+        self.assertTrue(all(chunk_id.startswith("d2-") or chunk_id.startswith("digest-") for chunk_id in hot_store.rows))
+        mock_cold.similarity_search_with_score.assert_called_once_with("részlet", k=5)
+        self.assertEqual(default_result, "A memóriában nem található releváns információ.")
+        self.assertIn("régi részlet", cold_result)
+        print("\n'test_hot_bound_compacts_recent_days_and_cold_search_is_opt_in' ran successfully!")
+
+    def test_every_partition_compacts_into_its_own_cold_collection(self):
+        # ARRANGE
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        registry = PartitionRegistry("s1", db_path=os.path.join(temp_dir.name, "memory_partitions.db"))
+        hot_stores, cold_stores = {}, {}
+        partitions = PartitionedMemory(
+            registry,
+            open_vector_store=lambda partition: hot_stores.setdefault(partition.partition_id, FakeConversationStore()),
+            open_chat_history=lambda partition: MagicMock(),
+            open_cold_vector_store=lambda partition: cold_stores.setdefault(partition.cold_collection_name, FakeConversationStore()),
+        )
+        meeting = registry.for_meeting("M1")
+        self._message(partitions.vector_store(DEFAULT_PARTITION_ID), "d1", 40, "Régi közös üzenet.")
+        self._message(partitions.vector_store(meeting.partition_id), "m1", 40, "Régi megbeszélés-üzenet.",
+                      session_id=meeting.history_session_id)
+
+        # ACT
+        results = compact_partitions({}, partitions, summarize=lambda period, transcript: "kivonat", now=self.NOW)
+
+        # ASSERT
+        self.assertEqual({partition_id: stats["moved_vectors"] for partition_id, stats in results.items()},
+                         {DEFAULT_PARTITION_ID: 1, meeting.partition_id: 1})
+        self.assertEqual(list(cold_stores[None].rows), ["d1"])
+        self.assertEqual(list(cold_stores[meeting.cold_collection_name].rows), ["m1"])
+        self.assertTrue(meeting.cold_collection_name.endswith("_cold"))
+        print("\n'test_every_partition_compacts_into_its_own_cold_collection' ran successfully!")
+
+
 class TestKnowledgeBaseSearch(unittest.TestCase):
     """
     Tests the dedicated knowledge base search tool.
@@ -72,10 +328,218 @@ class TestKnowledgeBaseSearch(unittest.TestCase):
 
         # ASSERT
         self.assertIn("Forrás: flet_guide.pdf", result)
-        self.assertIn("Relevancia: 0.80", result)
+        self.assertIn("Relevancia: 0.90", result)
         print("\n'test_search_knowledge_base_returns_formatted_string' ran successfully!")
 
 
+class TestHybridKnowledgeBaseSearch(unittest.TestCase):
+    """
+    Tests the BM25 lexical index and its reciprocal rank fusion with the vector hits.
+    """
+
+    def _chunk(self, text, source, number):
+        return Document(page_content=text, metadata={'source_document': source, 'chunk_number': number})
+
+    def test_lexical_hits_are_fused_with_vector_hits(self):
+        # ARRANGE
+        lexical_index = LexicalIndex(db_path=None)
+        lexical_index.add_documents([
+            self._chunk("A szivattyú cikkszáma AX-200/B, a tömítéseket évente cserélni kell.", "karbantartas.pdf", 4),
+            self._chunk("Az AITO architektúra áttekintése és a modulok kapcsolata.", "architektura.md", 1),
+        ])
+        vector_chunk = self._chunk("Általános szöveg a karbantartási ciklusokról.", "ciklusok.md", 2)
+        mock_docs_vector_store = MagicMock()
+        mock_docs_vector_store.similarity_search_with_score.return_value = [(vector_chunk, 0.3)]
+
+        # ACT
+        by_part_number = search_knowledge_base_tool("ax-200/b", config={}, docs_vector_store=mock_docs_vector_store, lexical_index=lexical_index)
+        by_inflection = lexical_index.search("tömítés cseréje")
+
+        # ASSERT
+        self.assertIn("Forrás: karbantartas.pdf", by_part_number)
+        self.assertIn("kulcsszó-egyezés (BM25", by_part_number)
+        self.assertIn("Forrás: ciklusok.md", by_part_number)
+        self.assertIn("Relevancia: 0.85", by_part_number)
+        self.assertEqual(by_inflection[0][0].metadata['source_document'], "karbantartas.pdf")
+        print("\n'test_lexical_hits_are_fused_with_vector_hits' ran successfully!")
+
+    def test_base_and_inflected_forms_share_a_stem(self):
+        # ARRANGE
+        word_families = [
+            ("projekt", ["projektek", "projektben"]),
+            ("alkalmazott", ["alkalmazottak"]),
+            ("kontakt", ["kontaktok"]),
+            ("alma", ["almát"]),
+        ]
+
+        # ACT & ASSERT
+        for base, inflected_forms in word_families:
+            for inflected in inflected_forms:
+                with self.subTest(base=base, inflected=inflected):
+                    self.assertEqual(stem_hungarian(inflected), stem_hungarian(base))
+        print("\n'test_base_and_inflected_forms_share_a_stem' ran successfully!")
+
+    def test_index_persists_and_updates_incrementally(self):
+        # ARRANGE
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, "lexical_index.db")
+            lexical_index = LexicalIndex(db_path=db_path)
+            lexical_index.add_documents([self._chunk("Régi verzió: XR-17 modul leírása.", "leiras.md", 1)])
+            lexical_index.remove_source("leiras.md")
+            lexical_index.add_documents([self._chunk("Új verzió: XR-18 modul leírása.", "leiras.md", 1)])
+
+            # ACT
+            reopened = LexicalIndex(db_path=db_path)
+            start = time.perf_counter()
+            old_hits = reopened.search("XR-17")
+            new_hits = reopened.search("xr-18 modulok")
+            elapsed = time.perf_counter() - start
+
+        # ASSERT
+        self.assertEqual(len(reopened), 1)
+        self.assertNotIn("XR-17", " ".join(doc.page_content for doc, _ in old_hits))
+        self.assertEqual(new_hits[0][0].page_content, "Új verzió: XR-18 modul leírása.")
+        self.assertLess(elapsed, 0.05)
+        print("\n'test_index_persists_and_updates_incrementally' ran successfully!")
+
+
+class TestRetrievalPostprocessor(unittest.TestCase):
+    """
+    Tests thresholds, deduplication, MMR selection and neighbour merging of vector hits.
+    """
+
+    def _hit(self, text, source, number, distance, embedding):
+        return (Document(page_content=text, metadata={'source_document': source, 'chunk_number': number}), distance, embedding)
+
+    def test_thresholds_dedup_and_mmr_select_distinct_chunks(self):
+        # ARRANGE
+        hits = [
+            self._hit("A szivattyú tömítését évente cserélni kell.", "karbantartas.pdf", 1, 0.10, [1.0, 0.0]),
+            self._hit("A szivattyú tömítését évente cserélni kell.", "karbantartas_masolat.pdf", 1, 0.11, [1.0, 0.01]),
+            self._hit("A szivattyú tömítése évente cserélendő, a régi tömítést le kell adni.", "utasitas.md", 5, 0.20, [0.95, 0.31]),
+            self._hit("A garanciális javítást a beszállító végzi.", "szerzodes.pdf", 2, 0.25, [0.7, -0.7]),
+            self._hit("Irodai leltár ütemezése.", "leltar.md", 1, 0.90, [0.0, 1.0]),
+            self._hit("Menza heti menü.", "menu.md", 1, 1.50, [-1.0, 0.0]),
+        ]
+        postprocessor = RetrievalPostprocessor(max_k=2, mmr_lambda=0.3)
+
+        # ACT
+        selected = postprocessor.process(hits, query_embedding=[1.0, 0.0])
+        by_relevance_only = postprocessor.with_options(mmr_lambda=1.0).process(hits, query_embedding=[1.0, 0.0])
+
+        # ASSERT
+        self.assertEqual([doc.metadata['source_document'] for doc, _ in selected], ["karbantartas.pdf", "szerzodes.pdf"])
+        self.assertEqual([doc.metadata['source_document'] for doc, _ in by_relevance_only], ["karbantartas.pdf", "utasitas.md"])
+        self.assertEqual(postprocessor.process([]), [])
+        print("\n'test_thresholds_dedup_and_mmr_select_distinct_chunks' ran successfully!")
+
+    def test_min_k_keeps_nearest_hits_past_the_distance_cut(self):
+        # ARRANGE
+        hits = [
+            self._hit("A kompresszor olajszintje.", "kompresszor.pdf", 1, 1.20, None),
+            self._hit("A hűtőkör nyomáspróbája.", "hutokor.pdf", 1, 1.30, None),
+            self._hit("Menza heti menü.", "menu.md", 1, 1.90, None),
+        ]
+        postprocessor = RetrievalPostprocessor(min_k=2, max_distance=1.0, merge_neighbors=False)
+
+        # ACT
+        kept = postprocessor.process(hits)
+        strict = postprocessor.with_options(min_k=0).process(hits)
+
+        # ASSERT
+        self.assertEqual([doc.metadata['source_document'] for doc, _ in kept], ["kompresszor.pdf", "hutokor.pdf"])
+        self.assertEqual(strict, [])
+        print("\n'test_min_k_keeps_nearest_hits_past_the_distance_cut' ran successfully!")
+
+    def test_knowledge_base_merges_neighbours_and_drops_copies_on_chroma(self):
+        # ARRANGE
+        from chromadb.api.client import SharedSystemClient
+        from memory_stores import create_vector_store
+        first = "A szivattyú karbantartása: a tömítést évente cserélni kell. "
+        overlap = "A szűrőt negyedévente tisztítani kell."
+        second = overlap + " A szivattyú csapágyát kétévente kenni kell."
+        config = {'retrieval': {'knowledge_base': {'max_distance': 1.9, 'relative_margin': None, 'mmr_lambda': 1.0}}}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = create_vector_store(os.path.join(temp_dir, "chroma_documents"), HashingEmbeddings(dimensions=256))
+            store.add_documents([
+                Document(page_content=first + overlap, metadata={'source_document': 'szivattyu.md', 'chunk_number': 1}),
+                Document(page_content=second, metadata={'source_document': 'szivattyu.md', 'chunk_number': 2, 'overlap_chars': len(overlap)}),
+                Document(page_content=first + overlap, metadata={'source_document': 'szivattyu_masolat.md', 'chunk_number': 1}),
+            ])
+
+            # ACT
+            result = search_knowledge_base_tool("szivattyú karbantartása", config=config, docs_vector_store=store)
+            SharedSystemClient.clear_system_cache()
+
+        # ASSERT
+        self.assertEqual(result.count("Forrás:"), 1)
+        self.assertIn("Forrás: szivattyu.md", result)
+        self.assertEqual(result.count(overlap), 1)
+        self.assertIn("csapágyát kétévente", result)
+        print("\n'test_knowledge_base_merges_neighbours_and_drops_copies_on_chroma' ran successfully!")
+
+
+class TestQueryCache(unittest.TestCase):
+    """
+    Tests the shared query-embedding cache and the semantic hit-list cache.
+    """
+
+    def test_repeated_memory_search_skips_embedding_and_index_until_new_write(self):
+        # ARRANGE
+        from chromadb.api.client import SharedSystemClient
+        from memory_stores import create_vector_store
+        base_embeddings = HashingEmbeddings(dimensions=256)
+        embeddings = CachedEmbeddings(base_embeddings)
+        query_cache = SemanticQueryCache(similarity_threshold=0.9)
+        postprocessor = RetrievalPostprocessor(max_distance=None)
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                patch.object(base_embeddings, 'embed_query', wraps=base_embeddings.embed_query) as embed_query:
+            store = create_vector_store(os.path.join(temp_dir, "chroma_conversations"), embeddings)
+            store.add_documents([Document(page_content="A szivattyú tömítését kicseréltük.", metadata={'session_id': 's1'})])
+            collection_query = MagicMock(wraps=store._collection.query)
+            store._collection.query = collection_query
+
+            # ACT
+            first = postprocessor.search(store, "szivattyú tömítés csere", query_cache=query_cache, scope=CONVERSATIONS_SCOPE)
+            repeated = postprocessor.search(store, "  Szivattyú tömítés csere ", query_cache=query_cache, scope=CONVERSATIONS_SCOPE)
+            calls_before_write = (embed_query.call_count, collection_query.call_count)
+            bump_generation(CONVERSATIONS_SCOPE)
+            after_write = postprocessor.search(store, "szivattyú tömítés csere", query_cache=query_cache, scope=CONVERSATIONS_SCOPE)
+            SharedSystemClient.clear_system_cache()
+
+        # ASSERT
+        self.assertEqual(calls_before_write, (1, 1))
+        self.assertEqual(collection_query.call_count, 2)
+        self.assertEqual(embed_query.call_count, 1)
+        self.assertEqual([doc.page_content for doc, _ in first], [doc.page_content for doc, _ in repeated])
+        self.assertEqual(len(after_write), 1)
+        self.assertEqual(query_cache.stats()["hits"], 1)
+        print("\n'test_repeated_memory_search_skips_embedding_and_index_until_new_write' ran successfully!")
+
+    def test_semantic_lookup_respects_threshold_scope_and_ttl(self):
+        # ARRANGE
+        query_cache = SemanticQueryCache(similarity_threshold=0.95, ttl_seconds=60)
+        query_cache.store("langchain:10", DOCUMENTS_SCOPE, [1.0, 0.0, 0.0], ("találatok",))
+
+        # ACT
+        near = query_cache.lookup("langchain:10", DOCUMENTS_SCOPE, [0.99, 0.05, 0.0])
+        far = query_cache.lookup("langchain:10", DOCUMENTS_SCOPE, [0.6, 0.8, 0.0])
+        other_scope = query_cache.lookup("langchain:10", CONVERSATIONS_SCOPE, [1.0, 0.0, 0.0])
+        other_k = query_cache.lookup("langchain:5", DOCUMENTS_SCOPE, [1.0, 0.0, 0.0])
+        query_cache.ttl_seconds = 0
+        time.sleep(0.01)
+        expired = query_cache.lookup("langchain:10", DOCUMENTS_SCOPE, [1.0, 0.0, 0.0])
+
+        # ASSERT
+        self.assertEqual(near, ("találatok",))
+        self.assertIsNone(far)
+        self.assertIsNone(other_scope)
+        self.assertIsNone(other_k)
+        self.assertIsNone(expired)
+        self.assertEqual(query_cache.stats()["entries"], 0)
+        print("\n'test_semantic_lookup_respects_threshold_scope_and_ttl' ran successfully!")
+
+
 class TestFileListingTool(unittest.TestCase):
     """
     Tests the tool for listing uploaded files from ChromaDB.
@@ -160,6 +624,78 @@ class TestFileListingTool(unittest.TestCase):
         print("\n'test_list_files_with_documents_only_filter' ran successfully!")
 
 
+class TestDocumentManifest(unittest.TestCase):
+    """
+    Tests the document manifest that replaces full vector store scans for file listing.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manifest = DocumentManifest(db_path=os.path.join(self.temp_dir.name, "system_registry.db"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_listing_uses_manifest_without_touching_vector_store(self):
+        # ARRANGE
+        self.manifest.record_document("file_a.pdf", chunk_count=12, token_count=10500, content_hash="abc", size_bytes=40960)
+        self.manifest.record_document("SUM_file_a.pdf", chunk_count=1, token_count=300)
+        self.manifest.record_document("file_b.txt", chunk_count=2, token_count=1500, complete=False)
+        mock_docs_vector_store = MagicMock()
+
+        # ACT
+        all_files = list_uploaded_files_tool(config={}, docs_vector_store=mock_docs_vector_store, manifest=self.manifest)
+        summaries = list_uploaded_files_tool(config={}, docs_vector_store=mock_docs_vector_store, filter="SUMMARIES_ONLY", manifest=self.manifest)
+
+        # ASSERT
+        mock_docs_vector_store.get.assert_not_called()
+        self.assertIn("- file_a.pdf\n- file_b.txt", all_files)
+        self.assertIn("SUM_file_a.pdf", summaries)
+        self.assertNotIn("file_b.txt", summaries)
+        self.assertEqual(self.manifest.get_document("file_b.txt")["status"], "PARTIAL")
+        self.assertEqual(self.manifest.get_document("SUM_file_a.pdf")["kind"], "SUMMARY")
+        print("\n'test_listing_uses_manifest_without_touching_vector_store' ran successfully!")
+
+    def test_rebuild_from_store_and_remove(self):
+        # ARRANGE
+        mock_docs_vector_store = MagicMock()
+        mock_docs_vector_store.get.return_value = {'metadatas': [
+            {'source_document': 'regi.md', 'chunk_number': 1, 'total_chunks': 2, 'token_count': 1000, 'overlap_tokens': 0},
+            {'source_document': 'regi.md', 'chunk_number': 2, 'total_chunks': 2, 'token_count': 400, 'overlap_tokens': 100},
+            {'source_document': 'legacy.txt', 'chunk_number': 1, 'total_chunks': 1},
+        ]}
+
+        # ACT
+        rebuilt = self.manifest.rebuild_from_store(mock_docs_vector_store)
+        removed = self.manifest.remove_document("legacy.txt")
+
+        # ASSERT
+        self.assertEqual(rebuilt, 2)
+        self.assertTrue(removed)
+        self.assertFalse(self.manifest.exists("legacy.txt"))
+        entry = self.manifest.get_document("regi.md")
+        self.assertEqual((entry["chunk_count"], entry["token_count"], entry["status"]), (2, 1300, "COMPLETE"))
+        print("\n'test_rebuild_from_store_and_remove' ran successfully!")
+
+    def test_registry_works_when_manifest_created_the_database_first(self):
+        # ARRANGE
+        from shared_components import set_registry_value, get_registry_value
+        original_cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        self.addCleanup(os.chdir, original_cwd)
+        DocumentManifest()
+
+        # ACT
+        set_result = set_registry_value("meeting_status", "INACTIVE", config={})
+        get_result = get_registry_value("meeting_status", config={})
+
+        # ASSERT
+        self.assertTrue(os.path.exists(os.path.join("aito_local_data", "system_registry.db")))
+        self.assertNotIn("Hiba", set_result)
+        self.assertEqual(get_result, "A 'meeting_status' kulcs értéke: 'INACTIVE'.")
+        print("\n'test_registry_works_when_manifest_created_the_database_first' ran successfully!")
+
+
 class TestReadFullDocumentTool(unittest.TestCase):
     """
     Tests the tool for reading a full document from ChromaDB.
@@ -198,5 +734,1307 @@ class TestReadFullDocumentTool(unittest.TestCase):
         print("\n'test_read_full_document_handles_not_found' ran successfully!")
 
 
+class FakeDocsStore:
+    """A Chroma get() metódusának minimális utánzata a metaadat-szűrőkkel ($and, $gte, $lte)."""
+
+    def __init__(self, documents, metadatas):
+        self.documents, self.metadatas = documents, metadatas
+        self.requested_documents = 0
+
+    def _matches(self, metadata, where):
+        if "$and" in where:
+            return all(self._matches(metadata, condition) for condition in where["$and"])
+        key, condition = next(iter(where.items()))
+        if isinstance(condition, dict):
+            value = metadata.get(key)
+            return all({"$gte": value >= bound, "$lte": value <= bound}[op] for op, bound in condition.items())
+        return metadata.get(key) == condition
+
+    def get(self, where=None, include=None):
+        selected = [i for i, metadata in enumerate(self.metadatas) if self._matches(metadata, where)]
+        result = {"ids": [str(i) for i in selected], "metadatas": [self.metadatas[i] for i in selected]}
+        if include is None or "documents" in include:
+            result["documents"] = [self.documents[i] for i in selected]
+            self.requested_documents += len(selected)
+        return result
+
+
+class TestPaginatedDocumentRead(unittest.TestCase):
+    """
+    Tests the range-addressable, cursor-based document reader.
+    """
+
+    def setUp(self):
+        # Három darab, 4 karakteres átfedéssel; a darabok tokenszáma a metaadatokban.
+        self.original = "Első oldal szövege. Második oldal szövege. Harmadik oldal vége."
+        bounds = [(0, 24), (20, 46), (42, len(self.original))]
+        documents, metadatas = [], []
+        for number, (start, end) in enumerate(bounds, start=1):
+            documents.append(self.original[start:end])
+            metadatas.append({
+                "source_document": "kezikonyv.pdf", "chunk_number": number, "total_chunks": 3,
+                "token_count": 10, "overlap_tokens": 0 if number == 1 else 2, "overlap_chars": 0 if number == 1 else 4,
+                "page_start": number, "page_end": number
+            })
+        self.store = FakeDocsStore(documents, metadatas)
+
+    def test_cursor_continues_within_budget_without_overlap(self):
+        # ACT
+        first_page = read_document_range("kezikonyv.pdf", self.store, max_tokens=18)
+        cursor = first_page.split("NEXT_CURSOR: ")[1].split(" ")[0]
+        second_page = read_document_range("kezikonyv.pdf", self.store, cursor=cursor)
+
+        # ASSERT
+        self.assertIn("1-2. darab / 3, 1-2. oldal, 18 token", first_page)
+        self.assertIn("A kért tartomány vége.", second_page)
+        first_text = first_page.split("\n")[1]
+        second_text = second_page.split("\n")[1]
+        self.assertEqual(first_text + second_text, self.original)
+        print("\n'test_cursor_continues_within_budget_without_overlap' ran successfully!")
+
+    def test_page_range_fetches_only_the_requested_chunks(self):
+        # ACT
+        result = read_document_range("kezikonyv.pdf", self.store, start_page=3, end_page=3)
+
+        # ASSERT
+        self.assertIn("3-3. darab / 3, 3-3. oldal", result)
+        self.assertIn("Harmadik oldal vége.", result)
+        self.assertEqual(self.store.requested_documents, 1)
+        print("\n'test_page_range_fetches_only_the_requested_chunks' ran successfully!")
+
+class TestDocumentBlobStore(unittest.TestCase):
+    """
+    Tests the compressed, content-addressed store of the original document texts.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.blob_store = DocumentBlobStore(root=self.temp_dir.name, block_chars=64)
+        self.pages = ["# Bevezetés\r\n" + "Az első oldal szövege. " * 5, "# Telepítés\n" + "A második oldal szövege. " * 5]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_ranged_reads_span_blocks_and_identical_content_is_stored_once(self):
+        # ARRANGE
+        full_text = "\n".join(page.replace("\r\n", "\n") for page in self.pages)
+
+        # ACT
+        first_hash = self.blob_store.put("kezikonyv.pdf", self.pages)
+        second_hash = self.blob_store.put("kezikonyv_masolat.pdf", self.pages)
+        blob_files = [name for _, _, files in os.walk(os.path.join(self.temp_dir.name, "objects")) for name in files]
+        self.blob_store.delete("kezikonyv_masolat.pdf")
+
+        # ASSERT
+        self.assertEqual(first_hash, second_hash)
+        self.assertEqual(len(blob_files), 1)
+        self.assertEqual(self.blob_store.read("kezikonyv.pdf"), full_text)
+        self.assertEqual(self.blob_store.read("kezikonyv.pdf", 50, 150), full_text[50:150])
+        self.assertEqual(self.blob_store.info("kezikonyv.pdf")["page_offsets"], [0, len(self.pages[0])])
+        self.assertFalse(self.blob_store.has("kezikonyv_masolat.pdf"))
+        print("\n'test_ranged_reads_span_blocks_and_identical_content_is_stored_once' ran successfully!")
+
+    def test_full_and_paged_reads_never_query_vector_store(self):
+        # ARRANGE
+        self.blob_store.put("kezikonyv.pdf", self.pages, headings=[(0, "Bevezetés"), (len(self.pages[0]), "Telepítés")])
+        mock_docs_vector_store = MagicMock()
+
+        # ACT
+        full = read_full_document_tool("kezikonyv.pdf", docs_vector_store=mock_docs_vector_store, blob_store=self.blob_store)
+        second_page = read_document_range("kezikonyv.pdf", mock_docs_vector_store, start_page=2, end_page=2, blob_store=self.blob_store)
+        parts = [read_document_range("kezikonyv.pdf", mock_docs_vector_store, section="bevezet", max_tokens=10, blob_store=self.blob_store)]
+        while "NEXT_CURSOR: " in parts[-1]:
+            cursor = parts[-1].split("NEXT_CURSOR: ")[1].split(" ")[0]
+            parts.append(read_document_range("kezikonyv.pdf", mock_docs_vector_store, cursor=cursor, blob_store=self.blob_store))
+
+        # ASSERT
+        mock_docs_vector_store.get.assert_not_called()
+        self.assertTrue(full.startswith("DOCUMENT_CONTENT:\n# Bevezetés\nAz első oldal"))
+        self.assertIn(", 2-2. oldal", second_page)
+        self.assertIn("# Telepítés", second_page)
+        self.assertGreater(len(parts), 1)
+        self.assertEqual("".join(part.split("\n", 1)[1].rsplit("\n---\n", 1)[0] for part in parts),
+                         self.pages[0].replace("\r\n", "\n") + "\n")
+        self.assertIn("A kért tartomány vége.", parts[-1])
+        print("\n'test_full_and_paged_reads_never_query_vector_store' ran successfully!")
+
+    def test_ranges_outside_the_document_return_nothing(self):
+        # ARRANGE
+        self.blob_store.put("kezikonyv.pdf", self.pages + ["A harmadik oldal szövege."])
+        mock_docs_vector_store = MagicMock()
+        empty = "A 'kezikonyv.pdf' dokumentumban nincs a megadott tartománynak megfelelő rész."
+
+        # ACT
+        past_the_end = read_document_range("kezikonyv.pdf", mock_docs_vector_store, start_page=7, end_page=8, blob_store=self.blob_store)
+        reversed_pages = read_document_range("kezikonyv.pdf", mock_docs_vector_store, start_page=3, end_page=2, blob_store=self.blob_store)
+        chunks_without_offsets = read_document_range("kezikonyv.pdf", mock_docs_vector_store, start_chunk=50, blob_store=self.blob_store)
+
+        # ASSERT
+        self.assertEqual(past_the_end, empty)
+        self.assertEqual(reversed_pages, empty)
+        self.assertEqual(chunks_without_offsets, empty)
+        mock_docs_vector_store.get.assert_not_called()
+        print("\n'test_ranges_outside_the_document_return_nothing' ran successfully!")
+
+
+class TestParallelMeetingRound(unittest.TestCase):
+    """
+    Tests the parallel-round meeting mode of the TaskDispatcher.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_db_path = os.path.join(self.temp_dir.name, "atomod_checkpoints.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @patch('task_dispatcher.count_tokens', side_effect=lambda text: len(text.split()))
+    def test_parallel_round_merges_in_participant_order(self, mock_count_tokens):
+        # ARRANGE
+        dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), {'user_id': 'Pimpa', 'stream_responses': False, 'checkpoint_db_path': self.checkpoint_db_path}, MagicMock(), MagicMock())
+        def fake_invoke_agent(agent_id, messages, on_text=None):
+            # Az első résztvevő válaszol utoljára, a sorrendnek mégis meg kell maradnia.
+            time.sleep(0.2 if agent_id == "ATOM1" else 0.0)
+            return AIMessage(content=f"{agent_id} válasza", name=agent_id)
+        dispatcher._invoke_agent = fake_invoke_agent
+        graph = dispatcher._get_or_build_graph("parallel")
+
+        # ACT
+        final_state = graph.invoke({
+            'task_description': 'teszt', 'participants': ['ATOM1', 'ATOM5'],
+            'messages': [HumanMessage(content='teszt', name='Pimpa')],
+            'current_round': 0, 'next_speaker': '', 'meeting_mode': 'parallel', 'round_responses': []
+        }, config={"configurable": {"thread_id": "parallel-test"}})
+
+        # ASSERT
+        speakers = [msg.name for msg in final_state['messages']]
+        self.assertEqual(speakers, ['Pimpa', 'ATOMOD', 'ATOM1', 'ATOM5'])
+        self.assertEqual(final_state['round_responses'], [])
+        print("\n'test_parallel_round_merges_in_participant_order' ran successfully!")
+
+    @patch('task_dispatcher.count_tokens', side_effect=lambda text: len(text.split()))
+    def test_round_robin_lets_every_participant_speak(self, mock_count_tokens):
+        # ARRANGE
+        dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), {'user_id': 'Pimpa', 'stream_responses': False, 'checkpoint_db_path': self.checkpoint_db_path}, MagicMock(), MagicMock())
+        dispatcher._invoke_agent = lambda agent_id, messages, on_text=None: AIMessage(content="ok", name=agent_id)
+        graph = dispatcher._get_or_build_graph("round_robin")
+
+        # ACT
+        final_state = graph.invoke({
+            'task_description': 'teszt', 'participants': ['ATOM1', 'ATOM5'],
+            'messages': [HumanMessage(content='teszt', name='Pimpa')],
+            'current_round': 0, 'next_speaker': '', 'meeting_mode': 'round_robin', 'round_responses': []
+        }, config={"configurable": {"thread_id": "round-robin-test"}})
+
+        # ASSERT
+        agent_speakers = [msg.name for msg in final_state['messages'] if msg.name != 'ATOMOD']
+        self.assertEqual(agent_speakers, ['Pimpa', 'ATOM1', 'ATOM5'])
+        print("\n'test_round_robin_lets_every_participant_speak' ran successfully!")
+
+
+class TestMeetingTranscriptCompaction(unittest.TestCase):
+    """
+    Tests the rolling-summary compaction of long ATOMOD meeting transcripts.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_db_path = os.path.join(self.temp_dir.name, "atomod_checkpoints.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @patch('task_dispatcher.count_tokens', side_effect=lambda text: len(text.split()))
+    def test_compaction_folds_old_turns_and_keeps_recent_ones(self, mock_count_tokens):
+        # ARRANGE
+        config = {'user_id': 'Pimpa', 'meeting_compaction': {'max_prompt_tokens': 50, 'keep_last_turns': 2},
+                  'checkpoint_db_path': self.checkpoint_db_path}
+        dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), config, MagicMock(), MagicMock())
+        dispatcher._summarize_turns = MagicMock(return_value="Korábban ATOM1 és ATOM5 vitatkozott.")
+        messages = [HumanMessage(content="feladat", name="Pimpa")]
+        for i in range(4):
+            agent_id = "ATOM1" if i % 2 == 0 else "ATOM5"
+            messages.append(AIMessage(content=f"ATOMOD: {agent_id} következik.", name="ATOMOD"))
+            messages.append(AIMessage(content=f"{agent_id} hosszú hozzászólása " * 10, name=agent_id))
+        state = {'messages': messages, 'participants': ['ATOM1', 'ATOM5'], 'transcript_summary': "", 'summarized_count': 0}
+
+        # ACT
+        update = dispatcher._compact_transcript(state)
+        state.update(update)
+        prompt_messages = dispatcher._prompt_messages(state)
+
+        # ASSERT
+        self.assertEqual(update['summarized_count'], 5)
+        folded = dispatcher._summarize_turns.call_args[0][1]
+        self.assertEqual(len(folded), 4)
+        self.assertEqual(prompt_messages[0].content, "feladat")
+        self.assertIn("ATOMOD ÖSSZEFOGLALÓ", prompt_messages[1].content)
+        self.assertEqual([msg.name for msg in prompt_messages[2:]], ['ATOMOD', 'ATOM1', 'ATOMOD', 'ATOM5'])
+        print("\n'test_compaction_folds_old_turns_and_keeps_recent_ones' ran successfully!")
+
+    @patch('task_dispatcher.count_tokens', side_effect=lambda text: len(text.split()))
+    def test_compaction_is_skipped_under_the_token_threshold(self, mock_count_tokens):
+        # ARRANGE
+        dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), {'user_id': 'Pimpa', 'checkpoint_db_path': self.checkpoint_db_path}, MagicMock(), MagicMock())
+        dispatcher._summarize_turns = MagicMock()
+        state = {'messages': [HumanMessage(content="rövid feladat", name="Pimpa")], 'participants': ['ATOM1'],
+                 'transcript_summary': "", 'summarized_count': 0}
+
+        # ACT
+        update = dispatcher._compact_transcript(state)
+
+        # ASSERT
+        self.assertEqual(update, {})
+        dispatcher._summarize_turns.assert_not_called()
+        print("\n'test_compaction_is_skipped_under_the_token_threshold' ran successfully!")
+
+
+class TestMeetingCheckpointing(unittest.TestCase):
+    """
+    Tests that interrupted ATOMOD meetings resume from their last checkpoint.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = {'user_id': 'Pimpa', 'stream_responses': False,
+                       'checkpoint_db_path': os.path.join(self.temp_dir.name, "atomod_checkpoints.db")}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @patch('task_dispatcher.count_tokens', side_effect=lambda text: len(text.split()))
+    def test_resume_continues_from_last_completed_turn(self, mock_count_tokens):
+        # ARRANGE
+        calls = []
+        def crashing_invoke_agent(agent_id, messages, on_text=None):
+            calls.append(agent_id)
+            if agent_id == "ATOM5":
+                raise RuntimeError("429 Resource exhausted")
+            return AIMessage(content=f"{agent_id} válasza", name=agent_id)
+        first_dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), self.config, MagicMock(), MagicMock())
+        first_dispatcher._invoke_agent = crashing_invoke_agent
+        task_id = first_dispatcher.start_new_task("teszt feladat", "Pimpa")
+        first_dispatcher.executor._queue.join()
+
+        # Egy új példány szimulálja az alkalmazás újraindítását.
+        resumed_dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), self.config, MagicMock(), MagicMock())
+        resumed_dispatcher._invoke_agent = lambda agent_id, messages, on_text=None: calls.append(agent_id) or AIMessage(content="ok", name=agent_id)
+        interrupted = [row['task_id'] for row in resumed_dispatcher.list_interrupted_tasks()]
+
+        # ACT
+        resumed = resumed_dispatcher.resume_task(task_id)
+        resumed_dispatcher.executor._queue.join()
+
+        # ASSERT
+        self.assertEqual(interrupted, [task_id])
+        self.assertTrue(resumed)
+        self.assertEqual(calls, ["ATOM1", "ATOM5", "ATOM5"])
+        graph = resumed_dispatcher._get_or_build_graph("round_robin")
+        final_messages = graph.get_state({"configurable": {"thread_id": task_id}}).values['messages']
+        self.assertEqual([msg.name for msg in final_messages if msg.name != 'ATOMOD'], ['Pimpa', 'ATOM1', 'ATOM5'])
+        self.assertEqual(resumed_dispatcher.list_interrupted_tasks(), [])
+        self.assertFalse(resumed_dispatcher.resume_task(task_id))
+        print("\n'test_resume_continues_from_last_completed_turn' ran successfully!")
+
+    def test_cancelled_and_queue_expired_tasks_are_recorded(self):
+        # ARRANGE
+        dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), self.config, MagicMock(), MagicMock())
+        dispatcher._invoke_agent = lambda agent_id, messages, on_text=None: AIMessage(content="ok", name=agent_id)
+        release = threading.Event()
+        for i in range(dispatcher.executor.max_workers):
+            dispatcher.executor.submit(f"blocker-{i}", lambda record: release.wait(5))
+        cancelled_id = dispatcher.start_new_task("lemondott feladat", "Pimpa")
+        expired_id = dispatcher.start_new_task("lejáró feladat", "Pimpa", deadline_seconds=0.05)
+
+        # ACT
+        cancelled = dispatcher.cancel_task(cancelled_id)
+        time.sleep(0.1)
+        release.set()
+        dispatcher.executor._queue.join()
+
+        # ASSERT
+        self.assertTrue(cancelled)
+        self.assertEqual(dispatcher._get_task_row(cancelled_id)['status'], CANCELLED)
+        self.assertEqual(dispatcher._get_task_row(expired_id)['status'], TIMED_OUT)
+        self.assertNotIn(cancelled_id, [row['task_id'] for row in dispatcher.list_interrupted_tasks()])
+        self.assertFalse(dispatcher.resume_task(cancelled_id))
+        print("\n'test_cancelled_and_queue_expired_tasks_are_recorded' ran successfully!")
+
+
+class TestLLMLedger(unittest.TestCase):
+    """
+    Tests the per-call model ledger callback and its aggregated report.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.ledger = LLMLedger(os.path.join(self.temp_dir.name, "llm_ledger.db"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_callback_records_tokens_call_site_retries_and_429s(self):
+        # ARRANGE
+        from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+        handler = LedgerCallbackHandler(self.ledger, caller="chat", model="gemini-2.5-pro", atom_id="ATOM1")
+        model = GenericFakeChatModel(messages=iter([
+            AIMessage(content="első", usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150}),
+            AIMessage(content="második", usage_metadata={"input_tokens": 200, "output_tokens": 10, "total_tokens": 210}),
+        ]), callbacks=[handler])
+        failed_attempt = MagicMock(failed=True)
+        failed_attempt.exception.return_value = Exception("429 RESOURCE_EXHAUSTED")
+        run_id = uuid.uuid4()
+
+        # ACT
+        model.invoke("Szia!")
+        model.invoke("Eszköz-eredmény", config=call_site_config("chat/tool_loop"))
+        handler.on_chat_model_start({}, [], run_id=run_id, metadata={})
+        handler.on_retry(MagicMock(outcome=failed_attempt), run_id=run_id)
+        handler.on_llm_error(Exception("429 RESOURCE_EXHAUSTED"), run_id=run_id)
+        report = {entry["caller"]: entry for entry in self.ledger.report(group_by=("caller",))}
+
+        # ASSERT
+        self.assertEqual((report["chat"]["calls"], report["chat"]["prompt_tokens"], report["chat"]["completion_tokens"]), (2, 120, 30))
+        self.assertEqual((report["chat"]["retries"], report["chat"]["rate_limited"], report["chat"]["errors"]), (1, 2, 1))
+        self.assertEqual((report["chat/tool_loop"]["prompt_tokens"], report["chat/tool_loop"]["completion_tokens"]), (200, 10))
+        self.assertAlmostEqual(report["chat/tool_loop"]["cost_usd"], (200 * 1.25 + 10 * 10.0) / 1_000_000)
+        print("\n'test_callback_records_tokens_call_site_retries_and_429s' ran successfully!")
+
+    def test_report_aggregates_by_atom_day_and_call_site(self):
+        # ARRANGE
+        day_one = datetime(2026, 10, 1, 9, 0, tzinfo=timezone.utc)
+        day_two = datetime(2026, 10, 2, 9, 0, tzinfo=timezone.utc)
+        self.ledger.record("meeting", "gemini-2.5-pro", 1000, 100, 800.0, atom_id="ATOM1", started_at=day_one)
+        self.ledger.record("meeting", "gemini-2.5-pro", 3000, 300, 1200.0, atom_id="ATOM1", retries=2, started_at=day_one)
+        self.ledger.record("summarize_document", "gemini-2.0-flash-001", 5000, 500, 400.0, started_at=day_two)
+        config_path = os.path.join(self.temp_dir.name, "config.yaml")
+        with open(config_path, "w", encoding="utf-8") as config_file:
+            config_file.write(f"llm_ledger:\n  db_path: '{self.ledger.db_path}'\n")
+        output = io.StringIO()
+
+        # ACT
+        report = self.ledger.report()
+        since_day_two = self.ledger.report(group_by=("day",), since="2026-10-02")
+        with contextlib.redirect_stdout(output):
+            llm_ledger_main(["report", "--config", config_path, "--by", "caller,model"])
+
+        # ASSERT
+        self.assertEqual(len(report), 2)
+        meeting = next(entry for entry in report if entry["caller"] == "meeting")
+        self.assertEqual((meeting["atom"], meeting["day"], meeting["calls"], meeting["retries"]), ("ATOM1", "2026-10-01", 2, 2))
+        self.assertEqual((meeting["avg_latency_ms"], meeting["max_latency_ms"]), (1000.0, 1200.0))
+        self.assertEqual([(entry["day"], entry["calls"]) for entry in since_day_two], [("2026-10-02", 1)])
+        self.assertIn("summarize_document", output.getvalue())
+        self.assertIn("Összesen: 3 hívás", output.getvalue())
+        print("\n'test_report_aggregates_by_atom_day_and_call_site' ran successfully!")
+
+
+class TestTracing(unittest.TestCase):
+    """
+    Tests nested tracing spans across threads and their JSONL / Chrome trace export.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.tracer = Tracer(trace_dir=self.temp_dir.name, slow_trace_ms=0)
+        self.previous_tracer = set_tracer(self.tracer)
+
+    def tearDown(self):
+        set_tracer(self.previous_tracer)
+        self.temp_dir.cleanup()
+
+    def test_spans_nest_across_threads_and_slow_traces_export_to_chrome_format(self):
+        # ARRANGE
+        def background_work():
+            with span("memory.vector_search", hits=3):
+                time.sleep(0.01)
+
+        # ACT
+        with span("send_click", atom="ATOM1") as root:
+            worker = threading.Thread(target=bind_context(background_work))
+            worker.start()
+        worker.join()
+        spans = {item["name"]: item for item in load_spans(self.tracer.jsonl_path)}
+        chrome_files = [name for name in os.listdir(self.temp_dir.name) if name.endswith(".json")]
+
+        # ASSERT
+        self.assertEqual(spans["memory.vector_search"]["trace_id"], root.trace_id)
+        self.assertEqual(spans["memory.vector_search"]["parent_id"], root.span_id)
+        self.assertNotEqual(spans["memory.vector_search"]["thread_id"], spans["send_click"]["thread_id"])
+        self.assertEqual(spans["send_click"]["attributes"], {"atom": "ATOM1"})
+        # A Chrome fájl csak az utolsó (háttérszálon futó) span lezárulása után készül el, a teljes fával.
+        self.assertEqual(len(chrome_files), 1)
+        with open(os.path.join(self.temp_dir.name, chrome_files[0]), encoding="utf-8") as trace_file:
+            events = json.load(trace_file)["traceEvents"]
+        self.assertEqual(sorted(event["name"] for event in events if event["ph"] == "X"), ["memory.vector_search", "send_click"])
+        self.assertGreaterEqual(next(event["dur"] for event in events if event["name"] == "memory.vector_search"), 10000)
+        print("\n'test_spans_nest_across_threads_and_slow_traces_export_to_chrome_format' ran successfully!")
+
+    def test_tool_executor_spans_are_children_of_the_calling_span(self):
+        # ARRANGE
+        executor = ToolCallExecutor(max_workers=2)
+        tool_registry = {"search_memory": lambda query: f"memória: {query}",
+                         "broken_tool": lambda: 1 / 0}
+        tool_calls = [{"name": "search_memory", "args": {"query": "kockázat"}, "id": "call-1"},
+                      {"name": "broken_tool", "args": {}, "id": "call-2"}]
+        output = io.StringIO()
+
+        # ACT
+        with span("llm_call", iteration=0) as caller_span:
+            executor.execute(tool_calls, tool_registry, caller="ATOM1")
+        spans = {item["name"]: item for item in load_spans(self.tracer.jsonl_path)}
+        with contextlib.redirect_stdout(output):
+            tracing_main(["chrome", caller_span.trace_id[:8], "--jsonl", self.tracer.jsonl_path,
+                          "--out", os.path.join(self.temp_dir.name, "exported.json")])
+
+        # ASSERT
+        self.assertEqual(spans["tool_batch"]["parent_id"], caller_span.span_id)
+        self.assertEqual(spans["tool.search_memory"]["parent_id"], spans["tool_batch"]["span_id"])
+        self.assertEqual(spans["tool.broken_tool"]["parent_id"], spans["tool_batch"]["span_id"])
+        self.assertIsNone(spans["tool.search_memory"]["error"])
+        self.assertIn("division by zero", spans["tool.broken_tool"]["error"])
+        self.assertIn("4 span kiírva", output.getvalue())
+        print("\n'test_tool_executor_spans_are_children_of_the_calling_span' ran successfully!")
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """
+    Tests the offline benchmark suite on a tiny synthetic corpus and its JSON report helpers.
+    """
+
+    def test_small_run_writes_json_report_without_touching_local_data(self):
+        # ARRANGE
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        out = os.path.join(temp_dir.name, "bench.json")
+        original_cwd = os.getcwd()
+
+        # ACT
+        with contextlib.redirect_stdout(io.StringIO()):
+            benchmark_main(["--messages", "120", "--only", "memory_search,history_load,daily_context,registry",
+                            "--queries", "3", "--registry-operations", "10", "--out", out])
+        with open(out, encoding="utf-8") as report_file:
+            results = json.load(report_file)["results"]["120m_0d"]
+
+        # ASSERT
+        self.assertEqual(os.getcwd(), original_cwd)
+        self.assertEqual(set(results), {"memory_search", "history_load", "daily_context", "registry"})
+        self.assertEqual(results["memory_search"]["count"], 3)
+        self.assertGreaterEqual(results["memory_search"]["p99_ms"], results["memory_search"]["p50_ms"])
+        self.assertEqual(results["history_load"]["messages"], 120)
+        self.assertGreater(results["daily_context"]["interactions"], 0)
+        self.assertEqual(results["registry"]["operations"], 10)
+        print("\n'test_small_run_writes_json_report_without_touching_local_data' ran successfully!")
+
+    def test_tokenizer_scenarios_are_skipped_when_the_encoding_cannot_load(self):
+        # ARRANGE
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        out = os.path.join(temp_dir.name, "bench.json")
+
+        # ACT
+        with patch("shared_components.get_token_encoding", side_effect=ConnectionError("offline")), \
+                contextlib.redirect_stdout(io.StringIO()):
+            benchmark_main(["--messages", "10", "--documents", "1", "--only", "chunk_text,ingestion,knowledge_base_search",
+                            "--out", out])
+        with open(out, encoding="utf-8") as report_file:
+            results = json.load(report_file)["results"]["10m_1d"]
+
+        # ASSERT
+        self.assertIn("tiktoken", results["chunk_text"]["skipped"])
+        self.assertIn("tiktoken", results["ingestion"]["skipped"])
+        self.assertIn("skipped", results["knowledge_base_search"])
+        self.assertFalse(any("error" in result for result in results.values()))
+        print("\n'test_tokenizer_scenarios_are_skipped_when_the_encoding_cannot_load' ran successfully!")
+
+    def test_latency_percentiles_and_report_comparison(self):
+        # ARRANGE
+        samples = [index / 1000 for index in range(100, 0, -1)]
+        old = {"results": {"1k": {"memory_search": {"p50_ms": 10.0}, "registry": {"error": "x"}}}}
+        new = {"results": {"1k": {"memory_search": {"p50_ms": 20.0}, "history_load": {"seconds": 1.0}}}}
+
+        # ACT
+        summary = latency_summary(samples)
+        lines = compare_reports(old, new)
+
+        # ASSERT
+        self.assertEqual((summary["count"], summary["p50_ms"], summary["p99_ms"], summary["max_ms"]), (100, 50.0, 99.0, 100.0))
+        self.assertEqual(latency_summary([]), {"count": 0})
+        self.assertEqual(lines, ["1k memory_search.p50_ms: 10.0 -> 20.0 (+100.0%)"])
+        print("\n'test_latency_percentiles_and_report_comparison' ran successfully!")
+
+class TestVertexStandin(unittest.TestCase):
+    """
+    Tests the local Vertex AI stand-in: scripted, tool-calling and structured responses,
+    and the simulated quota (429) with retries visible in the model ledger.
+    """
+
+    def setUp(self):
+        reset_simulators()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = {
+            'chat_backend': 'standin',
+            'llm_ledger': {'db_path': os.path.join(self.temp_dir.name, "llm_ledger.db")},
+            'embeddings': {'backend': 'standin', 'dimensions': 64},
+            'vertex_standin': {
+                'chat': {'latency': {'distribution': 'fixed', 'ms': 0}, 'output_tokens_per_second': 0,
+                         'retry_min_seconds': 0, 'retry_max_seconds': 0},
+                'embeddings': {'latency': {'distribution': 'fixed', 'ms': 0}},
+            },
+        }
+
+    def tearDown(self):
+        reset_simulators()
+        self.temp_dir.cleanup()
+
+    def test_scripted_tool_call_echo_and_structured_output(self):
+        # ARRANGE
+        from langchain_core.tools import tool
+        from synthesis_engine import SynthesisOutput
+
+        @tool
+        def search_memory(query: str) -> str:
+            """Keresés a memóriában."""
+            return query
+
+        self.config['vertex_standin']['chat'].update(mode="script", script=[
+            {"tool_calls": [{"name": "search_memory", "args": {"query": "szivattyú"}}]},
+            "A szivattyút tavaly cserélték.",
+        ])
+        model = create_chat_model("gemini-2.5-pro", caller="chat", config=self.config)
+
+        # ACT
+        tool_response = model.bind_tools([search_memory]).invoke("Mikor cserélték a szivattyút?")
+        streamed = "".join(chunk.content for chunk in model.stream("Összefoglalnád?"))
+        self.config['vertex_standin']['chat']['mode'] = "echo"
+        echo_model = create_chat_model("gemini-2.5-pro", caller="chat", config=self.config)
+        echo = echo_model.invoke("Szia!")
+        structured = echo_model.with_structured_output(SynthesisOutput).invoke("Szintézis")
+
+        # ASSERT
+        self.assertEqual(tool_response.tool_calls[0]["name"], "search_memory")
+        self.assertEqual(tool_response.tool_calls[0]["args"], {"query": "szivattyú"})
+        self.assertEqual(streamed, "A szivattyút tavaly cserélték.")
+        self.assertEqual(echo.content, "[gemini-2.5-pro] Szia!")
+        self.assertIsInstance(structured, SynthesisOutput)
+        self.assertEqual(structured.overall_result, "Szintézis")
+        print("\n'test_scripted_tool_call_echo_and_structured_output' ran successfully!")
+
+    def test_token_quota_returns_429_and_retries_are_recorded(self):
+        # ARRANGE
+        now = [0.0]
+        simulator = ServiceSimulator("chat:test", tokens_per_minute=10, clock=lambda: now[0], sleep=lambda seconds: None)
+        self.config['vertex_standin']['chat'].update(max_retries=2, requests_per_minute=1)
+        self.config['vertex_standin']['embeddings']['requests_per_minute'] = 1
+        model = create_chat_model("gemini-2.5-flash", caller="load_test", config=self.config)
+        embeddings = create_embedding_backend(self.config)
+
+        # ACT
+        simulator.admit(8)
+        with self.assertRaises(StandinRateLimitError):
+            simulator.admit(5)
+        now[0] = 61.0
+        simulator.admit(5)
+        model.invoke("Ez az első kérés kitölti a perces kvótát.")
+        with self.assertRaises(StandinRateLimitError):
+            model.invoke("A második már 429-et kap.")
+        embeddings.embed_query("első")
+        with self.assertRaisesRegex(StandinRateLimitError, "429"):
+            embeddings.embed_documents(["második"])
+        report = LLMLedger(self.config['llm_ledger']['db_path']).report(group_by=("caller",))
+
+        # ASSERT
+        self.assertEqual(simulator.stats()["rate_limited"], 1)
+        self.assertEqual((report[0]["calls"], report[0]["errors"], report[0]["retries"]), (2, 1, 2))
+        self.assertEqual(report[0]["rate_limited"], 3)
+        print("\n'test_token_quota_returns_429_and_retries_are_recorded' ran successfully!")
+
+class TestAsyncChatPipeline(unittest.TestCase):
+    """
+    Tests the asyncio chat turn pipeline: concurrent turns on one event loop under explicit
+    limits, async tool execution and async persistence of each turn.
+    """
+
+    def setUp(self):
+        reset_simulators()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = {
+            'chat_backend': 'standin',
+            'llm_ledger': {'enabled': False},
+            'vertex_standin': {'chat': {'mode': 'echo', 'call_tools': True, 'output_tokens_per_second': 0,
+                                        'latency': {'distribution': 'fixed', 'ms': 50}}},
+            'async_pipeline': {'max_concurrent_turns': 3, 'max_concurrent_llm_calls': 2},
+        }
+
+    def tearDown(self):
+        reset_simulators()
+        self.temp_dir.cleanup()
+
+    def test_concurrent_turns_respect_limits_and_persist_each_turn(self):
+        # ARRANGE
+        from langchain_core.chat_history import InMemoryChatMessageHistory
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+        def lookup(query: str) -> str:
+            """Keresés a memóriában."""
+            return f"találat: {query}"
+
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "{system_prompt}"),
+            MessagesPlaceholder(variable_name="history"),
+            MessagesPlaceholder(variable_name="turn_messages"),
+        ])
+        chain = prompt | create_chat_model("gemini-2.5-flash", caller="chat", config=self.config).bind_tools([lookup])
+        pipeline = AsyncChatPipeline.from_config(self.config, ToolCallExecutor(max_workers=2))
+        histories = [InMemoryChatMessageHistory() for _ in range(6)]
+        stored = []
+
+        async def run_all():
+            return await asyncio.gather(*[
+                pipeline.run_turn(chain, HumanMessage(content=f"kérdés {index}"), "ATOM1", {"lookup": lookup}, history,
+                                  lambda: "Te vagy ATOM1.", store_message=stored.append)
+                for index, history in enumerate(histories)
+            ])
+
+        # ACT
+        responses = asyncio.run(run_all())
+        stats = pipeline.stats()
+
+        # ASSERT
+        self.assertEqual([response.content for response in responses],
+                         [f"[gemini-2.5-flash] találat: kérdés {index}" for index in range(6)])
+        self.assertTrue(all(response.name == "ATOM1" for response in responses))
+        self.assertEqual([len(history.messages) for history in histories], [2] * 6)
+        self.assertEqual(len(stored), 12)
+        self.assertEqual((stats["turns"], stats["llm_calls"], stats["failed_turns"]), (6, 12, 0))
+        self.assertEqual(stats["peak_active_turns"], 3)
+        self.assertLessEqual(stats["peak_llm_calls"], 2)
+        self.assertEqual((stats["active_turns"], stats["queued_turns"]), (0, 0))
+        print("\n'test_concurrent_turns_respect_limits_and_persist_each_turn' ran successfully!")
+
+    def test_turn_persists_to_a_real_sqlite_chat_history(self):
+        # ARRANGE
+        from langchain_community.chat_message_histories.sql import SQLChatMessageHistory
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+        self.config['vertex_standin']['chat']['call_tools'] = False
+        connection = f"sqlite:///{os.path.join(self.temp_dir.name, 'chat_history.db')}"
+        history = SQLChatMessageHistory(session_id="s1", connection=connection)
+        history.add_message(HumanMessage(content="korábbi kérdés", name="Pimpa"))
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "{system_prompt}"),
+            MessagesPlaceholder(variable_name="history"),
+            MessagesPlaceholder(variable_name="turn_messages"),
+        ])
+        chain = prompt | create_chat_model("gemini-2.5-flash", caller="chat", config=self.config)
+        pipeline = AsyncChatPipeline.from_config(self.config, ToolCallExecutor(max_workers=1))
+
+        # ACT
+        response = asyncio.run(pipeline.run_turn(chain, HumanMessage(content="új kérdés", name="Pimpa"), "ATOM1", {},
+                                                 history, lambda: "Te vagy ATOM1."))
+        stored = SQLChatMessageHistory(session_id="s1", connection=connection).messages
+
+        # ASSERT
+        self.assertEqual(response.content, "[gemini-2.5-flash] új kérdés")
+        self.assertEqual([message.content for message in stored], ["korábbi kérdés", "új kérdés", "[gemini-2.5-flash] új kérdés"])
+        self.assertEqual(stored[-1].name, "ATOM1")
+        print("\n'test_turn_persists_to_a_real_sqlite_chat_history' ran successfully!")
+
+    def test_async_tool_execution_keeps_order_runs_concurrently_and_times_out(self):
+        # ARRANGE
+        async def slow_search(query: str) -> str:
+            await asyncio.sleep(0.2)
+            return f"memória: {query}"
+
+        async def slow_documents() -> str:
+            await asyncio.sleep(0.2)
+            return "dokumentumok"
+
+        async def hanging_tool() -> str:
+            await asyncio.sleep(5)
+
+        executor = ToolCallExecutor(max_workers=2, timeouts={"hanging_tool": 0.1})
+        tool_registry = {"slow_search": slow_search, "slow_documents": slow_documents, "hanging_tool": hanging_tool,
+                         "sync_registry": lambda key: f"érték: {key}", "broken_tool": lambda: 1 / 0}
+        tool_calls = [{"name": "slow_search", "args": {"query": "kockázat"}, "id": "call-1"},
+                      {"name": "slow_documents", "args": {}, "id": "call-2"},
+                      {"name": "hanging_tool", "args": {}, "id": "call-3"},
+                      {"name": "sync_registry", "args": {"key": "státusz"}, "id": "call-4"},
+                      {"name": "broken_tool", "args": {}, "id": "call-5"},
+                      {"name": "missing_tool", "args": {}, "id": "call-6"}]
+
+        # ACT
+        start = time.monotonic()
+        messages = asyncio.run(executor.aexecute(tool_calls, tool_registry, caller="ATOM1"))
+        elapsed = time.monotonic() - start
+
+        # ASSERT
+        self.assertEqual([message.tool_call_id for message in messages], [f"call-{index}" for index in range(1, 7)])
+        self.assertEqual(messages[0].content, "memória: kockázat")
+        self.assertEqual(messages[1].content, "dokumentumok")
+        self.assertIn("nem válaszolt", messages[2].content)
+        self.assertEqual(messages[3].content, "érték: státusz")
+        self.assertIn("division by zero", messages[4].content)
+        self.assertEqual(messages[5].content, "Ismeretlen eszköz: missing_tool")
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual(executor.latency_stats()["hanging_tool"]["timeouts"], 1)
+        print("\n'test_async_tool_execution_keeps_order_runs_concurrently_and_times_out' ran successfully!")
+
+class TestMemoryPartitions(unittest.TestCase):
+    """
+    Tests the per-meeting memory partitions: the partition registry, write routing and
+    partition-scoped memory search with opt-in fan-out.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "memory_partitions.db")
+        self.registry = PartitionRegistry("aito_shared_log", db_path=self.db_path)
+        self.stores = {}
+        self.histories = {}
+        self.partitions = PartitionedMemory(
+            self.registry,
+            open_vector_store=lambda partition: self.stores.setdefault(partition.partition_id, FakeConversationStore()),
+            open_chat_history=lambda partition: self.histories.setdefault(partition.partition_id, MagicMock()),
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_registry_maps_meetings_to_stable_partitions_and_routes_writes(self):
+        # ARRANGE
+        indexer = MemoryIndexer(lambda: self.partitions.vector_store(DEFAULT_PARTITION_ID),
+                                db_path=os.path.join(self.temp_dir.name, "memory_outbox.db"), flush_interval=0.01,
+                                chunker=lambda text: [text], get_partition_store=self.partitions.vector_store)
+
+        # ACT
+        meeting = self.registry.for_meeting("M-7/alfa", description="Szivattyú-csere")
+        reopened = PartitionRegistry("aito_shared_log", db_path=self.db_path)
+        indexer.enqueue("Közös beszélgetés a leltárról.", {"speaker": "Pimpa", "session_id": "aito_shared_log"})
+        indexer.enqueue("A szivattyút kedden cseréljük.", {"speaker": "ATOM1", "session_id": meeting.history_session_id,
+                                                            "partition_id": meeting.partition_id})
+        pending = indexer.search_pending("szivattyú leltár", partition_id=meeting.partition_id)
+        indexer.start()
+        flushed = indexer.flush(timeout=5)
+        indexer.stop(timeout=1)
+
+        # ASSERT
+        self.assertEqual((meeting.partition_id, meeting.collection_name), ("meeting:M-7/alfa", "aito_meeting_M-7_alfa_6c143901"))
+        self.assertEqual(meeting.history_session_id, "aito_shared_log/meeting/M-7/alfa")
+        self.assertEqual(reopened.for_meeting("M-7/alfa"), meeting)
+        self.assertEqual(reopened.active({"is_active": True, "meeting_id": "M-7/alfa"}), meeting)
+        self.assertTrue(reopened.active({"is_active": False, "meeting_id": "M-7/alfa"}).is_default)
+        self.assertEqual(reopened.default().history_session_id, "aito_shared_log")
+        self.assertIsNone(reopened.default().collection_name)
+        self.assertTrue(PartitionRegistry("aito_shared_log", db_path=self.db_path, enabled=False).for_meeting("M-8").is_default)
+        self.assertEqual([partition.partition_id for partition in reopened.list_partitions()], ["default", "meeting:M-7/alfa"])
+        self.assertEqual([document.page_content for document in pending], ["A szivattyút kedden cseréljük."])
+        self.assertTrue(flushed)
+        self.assertEqual([row[0] for row in self.stores["default"].rows.values()], ["Közös beszélgetés a leltárról."])
+        self.assertEqual([row[0] for row in self.stores["meeting:M-7/alfa"].rows.values()], ["A szivattyút kedden cseréljük."])
+        print("\n'test_registry_maps_meetings_to_stable_partitions_and_routes_writes' ran successfully!")
+
+    def test_collection_names_stay_distinct_after_sanitizing_and_truncation(self):
+        # ARRANGE
+        long_prefix = "megbeszeles-" * 8
+
+        # ACT
+        names = [self.registry.for_meeting(meeting_id).collection_name
+                 for meeting_id in ["a.b", "a_b", long_prefix + "1", long_prefix + "2"]]
+
+        # ASSERT
+        self.assertEqual(len(set(names)), 4)
+        self.assertTrue(all(len(name) <= 63 for name in names))
+        print("\n'test_collection_names_stay_distinct_after_sanitizing_and_truncation' ran successfully!")
+
+    @patch('shared_components.SQLChatMessageHistory')
+    def test_search_defaults_to_active_partition_and_meetings_persist_to_their_own(self, mock_sql_history):
+        # ARRANGE
+        meeting = self.registry.for_meeting("M1")
+        meeting_store, default_store = MagicMock(), MagicMock()
+        self.stores[meeting.partition_id] = meeting_store
+        meeting_store.similarity_search_with_score.return_value = [
+            (Document(page_content="kedden cseréljük", metadata={"session_id": meeting.history_session_id}), 0.4)]
+        default_store.similarity_search_with_score.return_value = [
+            (Document(page_content="a szivattyú régi", metadata={"session_id": "aito_shared_log"}), 0.1)]
+        mock_sql_history.return_value.messages = [HumanMessage(content="szivattyú", name="Pimpa")]
+        dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), {'user_id': 'Pimpa', 'session_id': 'aito_shared_log',
+                                    'checkpoint_db_path': os.path.join(self.temp_dir.name, "checkpoints.db")},
+                                    MagicMock(), MagicMock(), partitions=self.partitions)
+
+        # ACT
+        scoped = search_memory_tool(query="szivattyú", config={}, vector_store=meeting_store, partition_id=meeting.partition_id)
+        scoped_session = mock_sql_history.call_args.kwargs["session_id"]
+        fanned_out = search_memory_tool(query="szivattyú", config={}, vector_store=meeting_store,
+                                        partition_id=meeting.partition_id, other_partition_stores=[default_store])
+        dispatcher._persist_message(AIMessage(content="Döntés: kedd.", name="ATOM2"), meeting.partition_id)
+
+        # ASSERT
+        self.assertEqual(scoped_session, "aito_shared_log/meeting/M1")
+        default_store.similarity_search_with_score.assert_called_once()
+        self.assertIn("'aito_shared_log' azonosítójú", fanned_out)
+        self.histories[meeting.partition_id].add_message.assert_called_once()
+        dispatcher.firestore_history.add_message.assert_not_called()
+        persisted, = meeting_store.add_documents.call_args.args[0]
+        metadata = persisted.metadata
+        self.assertEqual(persisted.page_content, "Döntés: kedd.")
+        self.assertEqual((metadata["partition_id"], metadata["meeting_id"], metadata["session_id"]),
+                         ("meeting:M1", "M1", "aito_shared_log/meeting/M1"))
+        print("\n'test_search_defaults_to_active_partition_and_meetings_persist_to_their_own' ran successfully!")
+
+    @patch('task_dispatcher.count_tokens', side_effect=lambda text: len(text.split()))
+    def test_meeting_agents_search_their_own_partition_through_the_dispatcher(self, mock_count_tokens):
+        # ARRANGE
+        reset_simulators()
+        self.addCleanup(reset_simulators)
+        config = {'user_id': 'Pimpa', 'session_id': 'aito_shared_log', 'stream_responses': False,
+                  'checkpoint_db_path': os.path.join(self.temp_dir.name, "checkpoints.db"),
+                  'chat_backend': 'standin', 'llm_ledger': {'enabled': False},
+                  'vertex_standin': {'chat': {'mode': 'echo', 'call_tools': True, 'output_tokens_per_second': 0,
+                                              'latency': {'distribution': 'fixed', 'ms': 0}}}}
+        searched_partitions = []
+        # Ugyanaz a feloldás, mint a main_aito.py wrapped_search_memory_tool csomagolójában.
+        def wrapped_search_memory_tool(query: str, all_partitions: bool = False) -> str:
+            """Keresés a beszélgetés-memóriában."""
+            partition_id = current_meeting_partition_id() or DEFAULT_PARTITION_ID
+            searched_partitions.append(partition_id)
+            store = self.partitions.vector_store(partition_id)
+            return f"{len(store.rows)} találat"
+        dispatcher = TaskDispatcher(MagicMock(), MagicMock(), MagicMock(), config, MagicMock(), wrapped_search_memory_tool,
+                                    partitions=self.partitions)
+
+        # ACT
+        task_id = dispatcher.start_new_task("szivattyú csere", "Pimpa")
+        dispatcher.executor._queue.join()
+
+        # ASSERT
+        self.assertEqual(dispatcher._get_task_row(task_id)['status'], DONE)
+        self.assertTrue(searched_partitions)
+        self.assertEqual(set(searched_partitions), {f"meeting:{task_id}"})
+        self.assertNotIn(DEFAULT_PARTITION_ID, self.stores)
+        print("\n'test_meeting_agents_search_their_own_partition_through_the_dispatcher' ran successfully!")
+
+class TestTaskExecutor(unittest.TestCase):
+    """
+    Tests the bounded, prioritized executor behind TaskDispatcher.start_new_task.
+    """
+
+    def test_queued_tasks_run_in_priority_order(self):
+        # ARRANGE
+        executor = TaskExecutor(max_workers=1, name="TestExecutor")
+        release = threading.Event()
+        order = []
+        executor.submit("blocker", lambda record: release.wait(5), priority=0)
+        executor.submit("feature", lambda record: order.append("feature"), priority=3)
+        executor.submit("risk", lambda record: order.append("risk"), priority=0)
+        executor.submit("strategy", lambda record: order.append("strategy"), priority=1)
+
+        # ACT
+        release.set()
+        executor._queue.join()
+
+        # ASSERT
+        self.assertEqual(order, ["risk", "strategy", "feature"])
+        self.assertEqual(executor.get_status("feature").status, DONE)
+        self.assertEqual(executor.metrics()["queue_depth"], 0)
+        print("\n'test_queued_tasks_run_in_priority_order' ran successfully!")
+
+    def test_cancel_and_deadline_stop_tasks(self):
+        # ARRANGE
+        executor = TaskExecutor(max_workers=1, name="TestExecutor")
+        release = threading.Event()
+        executor.submit("blocker", lambda record: release.wait(5))
+        executor.submit("cancelled", lambda record: None)
+        def slow_task(record):
+            while True:
+                time.sleep(0.01)
+                record.raise_if_stopped()
+        executor.submit("expiring", slow_task, deadline_seconds=0.2)
+
+        # ACT
+        executor.cancel("cancelled")
+        release.set()
+        executor._queue.join()
+
+        # ASSERT
+        self.assertEqual(executor.get_status("cancelled").status, CANCELLED)
+        self.assertEqual(executor.get_status("expiring").status, TIMED_OUT)
+        print("\n'test_cancel_and_deadline_stop_tasks' ran successfully!")
+
+    def test_finished_tasks_and_wait_times_stay_bounded(self):
+        # ARRANGE
+        executor = TaskExecutor(max_workers=1, name="TestExecutor", finished_history=2, wait_time_samples=3)
+        for i in range(5):
+            executor.submit(f"task-{i}", lambda record: None)
+
+        # ACT
+        executor._queue.join()
+        metrics = executor.metrics()
+
+        # ASSERT
+        self.assertEqual(executor._tasks, {})
+        self.assertEqual([record.task_id for record in executor.list_tasks()], ["task-3", "task-4"])
+        self.assertIsNone(executor.get_status("task-0"))
+        self.assertEqual(executor.get_status("task-4").status, DONE)
+        self.assertEqual(len(executor._wait_times), 3)
+        self.assertEqual(metrics["completed"], 5)
+        self.assertEqual(metrics["queue_depth"], 0)
+        print("\n'test_finished_tasks_and_wait_times_stay_bounded' ran successfully!")
+
+    def test_classify_task_priority_follows_protocol(self):
+        # ARRANGE
+        protocol = [
+            {"category": "risk", "keywords": ["hiba"]},
+            {"category": "strategy", "keywords": ["stratégia"]},
+            {"category": "optimization", "keywords": ["gyorsít"]},
+            {"category": "features", "keywords": ["ötlet"]},
+        ]
+
+        # ACT & ASSERT
+        self.assertEqual(classify_task_priority("Stratégia és egy kritikus HIBA", protocol), (0, "risk"))
+        self.assertEqual(classify_task_priority("Gyorsítsuk a keresést", protocol), (2, "optimization"))
+        self.assertEqual(classify_task_priority("Valami egészen más", protocol), (3, "features"))
+        print("\n'test_classify_task_priority_follows_protocol' ran successfully!")
+
+
+class TestResponseStreaming(unittest.TestCase):
+    """
+    Tests the aggregation of streamed model responses.
+    """
+
+    def test_stream_response_reports_progress_and_collects_tool_calls(self):
+        # ARRANGE
+        mock_chain = MagicMock()
+        mock_chain.stream.return_value = iter([
+            AIMessageChunk(content="Szia, "),
+            AIMessageChunk(content="Pimpa!"),
+            AIMessageChunk(content="", tool_call_chunks=[{"name": "wrapped_search_memory_tool", "args": '{"query": "x"}', "id": "call_1", "index": 0}]),
+        ])
+        progress = []
+
+        # ACT
+        result = stream_response(mock_chain, {"messages": []}, on_text=progress.append)
+
+        # ASSERT
+        self.assertEqual(progress, ["Szia, ", "Szia, Pimpa!"])
+        self.assertEqual(result.content, "Szia, Pimpa!")
+        self.assertEqual(result.tool_calls[0]['name'], "wrapped_search_memory_tool")
+        self.assertEqual(result.tool_calls[0]['args'], {"query": "x"})
+        print("\n'test_stream_response_reports_progress_and_collects_tool_calls' ran successfully!")
+
+
+class TestWarmupOrchestrator(unittest.TestCase):
+    """
+    Tests the background warm-up of the slow startup components.
+    """
+
+    def test_components_start_in_parallel_after_their_dependencies(self):
+        # ARRANGE
+        warmup = WarmupOrchestrator(max_workers=3, name="TestWarmup")
+        embeddings_ready = threading.Event()
+        def slow_embeddings():
+            time.sleep(0.2)
+            embeddings_ready.set()
+            return "embeddings"
+
+        # ACT
+        start = time.monotonic()
+        warmup.submit("embeddings", slow_embeddings)
+        warmup.submit("store", lambda embeddings: f"store({embeddings}, {embeddings_ready.is_set()})", depends_on=["embeddings"])
+        warmup.submit("history", lambda: time.sleep(0.2) or "history")
+        submit_time = time.monotonic() - start
+        all_ready = warmup.wait_all(timeout=5)
+        total_time = time.monotonic() - start
+
+        # ASSERT
+        self.assertLess(submit_time, 0.1)
+        self.assertTrue(all_ready)
+        self.assertEqual(warmup.get("store"), "store(embeddings, True)")
+        self.assertLess(total_time, 0.35)
+        self.assertEqual(set(warmup.timings()), {"embeddings", "store", "history"})
+        warmup.shutdown()
+        print("\n'test_components_start_in_parallel_after_their_dependencies' ran successfully!")
+
+    def test_failure_propagates_to_dependents(self):
+        # ARRANGE
+        warmup = WarmupOrchestrator(max_workers=2, name="TestWarmup")
+        def failing_embeddings():
+            raise RuntimeError("nincs hitelesítés")
+
+        # ACT
+        warmup.submit("embeddings", failing_embeddings)
+        warmup.submit("store", lambda embeddings: "store", depends_on=["embeddings"])
+        all_ready = warmup.wait_all(timeout=5)
+
+        # ASSERT
+        self.assertFalse(all_ready)
+        with self.assertRaises(RuntimeError):
+            warmup.get("embeddings")
+        with self.assertRaises(WarmupError):
+            warmup.get("store", timeout=5)
+        self.assertFalse(warmup.is_ready("store"))
+        warmup.shutdown()
+        print("\n'test_failure_propagates_to_dependents' ran successfully!")
+
+class TestToolCallExecutor(unittest.TestCase):
+    """
+    Tests the concurrent execution of the tool calls of a single model response.
+    """
+
+    def test_independent_calls_run_concurrently_in_call_order(self):
+        # ARRANGE
+        executor = ToolCallExecutor(max_workers=4, concurrent_tools={"search_memory", "search_docs"})
+        def search_memory(query):
+            time.sleep(0.3)
+            return f"memória: {query}"
+        def search_docs(query):
+            time.sleep(0.2)
+            return f"dokumentum: {query}"
+        tool_registry = {"search_memory": search_memory, "search_docs": search_docs}
+        tool_calls = [
+            {"name": "search_memory", "args": {"query": "a"}, "id": "call-1"},
+            {"name": "search_docs", "args": {"query": "b"}, "id": "call-2"},
+            {"name": "missing_tool", "args": {}, "id": "call-3"},
+        ]
+
+        # ACT
+        start = time.monotonic()
+        tool_messages = executor.execute(tool_calls, tool_registry, caller="ATOM1")
+        elapsed = time.monotonic() - start
+
+        # ASSERT
+        self.assertLess(elapsed, 0.45)
+        self.assertEqual([msg.tool_call_id for msg in tool_messages], ["call-1", "call-2", "call-3"])
+        self.assertEqual(tool_messages[0].content, "memória: a")
+        self.assertEqual(tool_messages[1].content, "dokumentum: b")
+        self.assertEqual(tool_messages[2].content, "Ismeretlen eszköz: missing_tool")
+        self.assertEqual(executor.latency_stats()["search_memory"]["calls"], 1)
+        print("\n'test_independent_calls_run_concurrently_in_call_order' ran successfully!")
+
+    def test_slow_and_failing_tools_return_error_messages(self):
+        # ARRANGE
+        executor = ToolCallExecutor(max_workers=2, default_timeout=5, timeouts={"slow_tool": 0.1})
+        release = threading.Event()
+        def failing_tool():
+            raise RuntimeError("adatbázis zárolva")
+        tool_registry = {"slow_tool": lambda: release.wait(2) and "késő", "failing_tool": failing_tool}
+        tool_calls = [
+            {"name": "slow_tool", "args": {}, "id": "call-1"},
+            {"name": "failing_tool", "args": {}, "id": "call-2"},
+        ]
+
+        # ACT
+        tool_messages = executor.execute(tool_calls, tool_registry)
+        release.set()
+
+        # ASSERT
+        self.assertIn("nem válaszolt", tool_messages[0].content)
+        self.assertIn("adatbázis zárolva", tool_messages[1].content)
+        self.assertEqual(executor.latency_stats()["slow_tool"]["timeouts"], 1)
+        print("\n'test_slow_and_failing_tools_return_error_messages' ran successfully!")
+
+    def test_hung_calls_are_capped_and_writers_get_their_own_lane(self):
+        # ARRANGE
+        executor = ToolCallExecutor(max_workers=2, timeouts={"hung_read": 0.05, "hung_write": 0.05},
+                                    concurrent_tools={"hung_read", "quick_read"}, max_stuck_calls=1)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        tool_registry = {"hung_read": lambda: release.wait(5) and "késő", "quick_read": lambda: "olvasás kész",
+                         "hung_write": lambda: release.wait(5) and "késő", "quick_write": lambda: "írás kész"}
+        call = lambda name: [{"name": name, "args": {}, "id": f"call-{name}"}]
+
+        # ACT
+        first_hung_write = executor.execute(call("hung_write"), tool_registry)[0].content
+        read_beside_hung_write = executor.execute(call("quick_read"), tool_registry)[0].content
+        write_behind_hung_write = executor.execute(call("quick_write"), tool_registry)[0].content
+        first_hung_read = executor.execute(call("hung_read"), tool_registry)[0].content
+        read_beside_hung_read = executor.execute(call("quick_read"), tool_registry)[0].content
+        release.set()
+        deadline = time.monotonic() + 5
+        while any(executor._stuck_calls.values()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        after_release = [executor.execute(call(name), tool_registry)[0].content for name in ("quick_read", "quick_write")]
+
+        # ASSERT
+        self.assertIn("nem válaszolt", first_hung_write)
+        self.assertEqual(read_beside_hung_write, "olvasás kész")
+        self.assertIn("nem érhető el", write_behind_hung_write)
+        self.assertIn("nem válaszolt", first_hung_read)
+        self.assertIn("nem érhető el", read_beside_hung_read)
+        self.assertEqual(after_release, ["olvasás kész", "írás kész"])
+        self.assertEqual(executor.latency_stats()["quick_read"]["rejected"], 1)
+        print("\n'test_hung_calls_are_capped_and_writers_get_their_own_lane' ran successfully!")
+
+class TestToolResultCache(unittest.TestCase):
+    """
+    Tests the generation-aware result cache of the read-only document tools.
+    """
+
+    def test_repeated_call_hits_until_documents_change(self):
+        # ARRANGE
+        cache = ToolResultCache(max_entries=10, ttl_seconds=60, name="TestCache")
+        compute = MagicMock(side_effect=["első találat", "második találat"])
+        scope = "test-documents"
+
+        # ACT
+        first = cache.get_or_compute("search_docs", {"query": "AITO  architektúra"}, compute, scope=scope)
+        second = cache.get_or_compute("search_docs", {"query": " AITO architektúra "}, compute, scope=scope)
+        bump_generation(scope)
+        third = cache.get_or_compute("search_docs", {"query": "AITO architektúra"}, compute, scope=scope)
+
+        # ASSERT
+        self.assertEqual([first, second, third], ["első találat", "első találat", "második találat"])
+        self.assertEqual(compute.call_count, 2)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["invalidations"]), (1, 2, 1))
+        print("\n'test_repeated_call_hits_until_documents_change' ran successfully!")
+
+    def test_errors_are_not_cached_and_limits_apply(self):
+        # ARRANGE
+        cache = ToolResultCache(max_entries=1, ttl_seconds=0.05, name="TestCache")
+        failing = MagicMock(return_value="Hiba: a tudásbázis nem elérhető.")
+
+        # ACT
+        cache.get_or_compute("read_doc", {"filename": "a.md"}, failing)
+        cache.get_or_compute("read_doc", {"filename": "a.md"}, failing)
+        cache.get_or_compute("read_doc", {"filename": "b.md"}, lambda: "B tartalom")
+        cache.get_or_compute("read_doc", {"filename": "c.md"}, lambda: "C tartalom")
+        time.sleep(0.1)
+        expired = cache.get_or_compute("read_doc", {"filename": "c.md"}, lambda: "C friss tartalom")
+
+        # ASSERT
+        self.assertEqual(failing.call_count, 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(expired, "C friss tartalom")
+        print("\n'test_errors_are_not_cached_and_limits_apply' ran successfully!")
+
+class TestEmbeddingBackends(unittest.TestCase):
+    """
+    Tests the config-selected embedding backend and the offline hashing embedder.
+    """
+
+    def test_local_backend_embeds_offline_in_batches(self):
+        # ARRANGE
+        config = {'embeddings': {'backend': 'local', 'dimensions': 256, 'batch_size': 2}}
+        texts = ["A szivattyú tömítését évente cserélni kell.", "A szivattyúk tömítései évente cserélendők.",
+                 "Az ATOMOD megbeszélés napirendje.", ""]
+
+        # ACT
+        embeddings = create_embedding_backend(config)
+        vectors = embeddings.embed_documents(texts)
+        query_vector = embeddings.embed_query(texts[0])
+
+        # ASSERT
+        self.assertIsInstance(embeddings, HashingEmbeddings)
+        self.assertEqual([len(vector) for vector in vectors], [256] * 4)
+        similarity = lambda a, b: sum(x * y for x, y in zip(a, b))
+        self.assertGreater(similarity(vectors[0], vectors[1]), similarity(vectors[0], vectors[2]))
+        self.assertAlmostEqual(similarity(query_vector, vectors[0]), 1.0, places=5)
+        self.assertEqual(set(vectors[3]), {0.0})
+        print("\n'test_local_backend_embeds_offline_in_batches' ran successfully!")
+
+    def test_backend_selection_and_store_paths(self):
+        # ARRANGE
+        local_config = {'embeddings': {'backend': 'local'}}
+
+        # ACT & ASSERT
+        with self.assertRaises(ValueError):
+            create_embedding_backend({'embeddings': {'backend': 'ismeretlen'}})
+        self.assertEqual(vector_store_path("./data/chroma_documents", {}), "./data/chroma_documents")
+        self.assertEqual(vector_store_path("./data/chroma_documents", local_config), "./data/chroma_documents_local")
+        print("\n'test_backend_selection_and_store_paths' ran successfully!")
+
+
+class TestStoreMaintenance(unittest.TestCase):
+    """
+    Tests the offline maintenance helpers (orphan detection, collection rebuild, VACUUM).
+    """
+
+    def test_orphaned_and_duplicate_chunks_are_detected(self):
+        # ARRANGE
+        ids = ["1", "2", "3", "4"]
+        metadatas = [
+            {'source_document': 'a.pdf', 'chunk_number': 1},
+            {'source_document': 'a.pdf', 'chunk_number': 1},
+            {'source_document': 'torolt.md', 'chunk_number': 1},
+            {'source_document': 'a.pdf', 'chunk_number': 2},
+        ]
+
+        # ACT
+        with_registry = find_orphaned_chunks(ids, metadatas, "source_document", DOCUMENT_IDENTITY, known_sources={'a.pdf'})
+        without_registry = find_orphaned_chunks(ids, metadatas, "source_document", DOCUMENT_IDENTITY)
+
+        # ASSERT
+        self.assertEqual(with_registry, {"orphaned": ["3"], "duplicates": ["2"]})
+        self.assertEqual(without_registry, {"orphaned": [], "duplicates": ["2"]})
+        print("\n'test_orphaned_and_duplicate_chunks_are_detected' ran successfully!")
+
+    def test_rebuild_drops_excluded_chunks_and_keeps_backup(self):
+        # ARRANGE
+        import chromadb
+        from chromadb.api.client import SharedSystemClient
+        with tempfile.TemporaryDirectory() as temp_dir:
+            chroma_dir = os.path.join(temp_dir, "chroma_documents")
+            collection = chromadb.PersistentClient(path=chroma_dir).get_or_create_collection("langchain", embedding_function=None)
+            collection.add(ids=[str(i) for i in range(10)], embeddings=[[float(i), 1.0] for i in range(10)],
+                           documents=[f"darab {i}" for i in range(10)], metadatas=[{'source_document': 'a.pdf', 'chunk_number': i} for i in range(10)])
+            collection.delete(ids=["0", "1"])
+            fragmentation_before = log_fragmentation(chroma_dir)
+            SharedSystemClient.clear_system_cache()
+
+            # ACT
+            copied = rebuild_store(chroma_dir, exclude_ids={"langchain": {"9"}})
+            rebuilt = chromadb.PersistentClient(path=chroma_dir).get_collection("langchain", embedding_function=None)
+            remaining_ids = sorted(rebuilt.get()['ids'])
+            fragmentation_after = log_fragmentation(chroma_dir)
+            vacuum_result = sqlite_maintenance(os.path.join(chroma_dir, "chroma.sqlite3"))
+            backups = [name for name in os.listdir(temp_dir) if name.startswith("chroma_documents.bak-")]
+            SharedSystemClient.clear_system_cache()
+
+        # ASSERT
+        self.assertEqual(copied, {"langchain": 7})
+        self.assertEqual(remaining_ids, [str(i) for i in range(2, 9)])
+        self.assertEqual(fragmentation_before["logged_deletes"], 2)
+        self.assertEqual(fragmentation_after["logged_deletes"], 0)
+        self.assertIsNotNone(vacuum_result)
+        self.assertEqual(len(backups), 1)
+        print("\n'test_rebuild_drops_excluded_chunks_and_keeps_backup' ran successfully!")
+
+
+class TestImportTimeBudget(unittest.TestCase):
+    """
+    Guards the import time of the core modules. Each module is imported in a fresh
+    interpreter; heavy dependencies must stay unloaded until first use.
+    """
+    CORE_MODULES = ["shared_components", "task_dispatcher", "document_processor", "data_handler", "lexical_index", "embedding_backends",
+                    "retrieval_postprocessor", "query_cache", "llm_ledger", "model_factory", "tracing", "benchmark_suite", "vertex_standin", "async_pipeline", "memory_partitions", "analysis_threads", "synthesis_engine", "risk_validator"]
+    HEAVY_MODULES = ["langchain_google_vertexai", "langchain_chroma", "flet", "tiktoken", "langgraph", "langchain_community"]
+    # Felülírható az AITO_IMPORT_BUDGET_SECONDS környezeti változóval (pl. lassú CI gépen).
+    IMPORT_BUDGET_SECONDS = float(os.environ.get("AITO_IMPORT_BUDGET_SECONDS", "3.0"))
+
+    def _measure_import(self, module_name):
+        script = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            f"import {module_name}\n"
+            "elapsed = time.perf_counter() - start\n"
+            f"loaded = [name for name in {self.HEAVY_MODULES!r} if name in sys.modules]\n"
+            "print(elapsed, ','.join(loaded) or '-')\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        elapsed_text, loaded_text = result.stdout.strip().splitlines()[-1].split(" ")
+        return float(elapsed_text), [name for name in loaded_text.split(",") if name != "-"]
+
+    def test_core_modules_import_within_budget_without_heavy_dependencies(self):
+        for module_name in self.CORE_MODULES:
+            with self.subTest(module=module_name):
+                # ACT
+                elapsed, heavy_loaded = self._measure_import(module_name)
+
+                # ASSERT
+                self.assertEqual(heavy_loaded, [], f"{module_name} betölti: {heavy_loaded}")
+                self.assertLess(elapsed, self.IMPORT_BUDGET_SECONDS, f"{module_name}: {elapsed:.2f} mp")
+        print("\n'test_core_modules_import_within_budget_without_heavy_dependencies' ran successfully!")
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,126 @@
+# tool_cache.py
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# A cache-elt eredmények érvényességi körei. A "documents" kör generációját a
+# document_processor lépteti minden tudásbázis-változáskor; a régebbi generációban
+# készült bejegyzések ezután már nem kerülnek kiszolgálásra. A "conversations" kört
+# a beszélgetés-vektorok írói (memory_indexer, memory_tiering) léptetik.
+DOCUMENTS_SCOPE = "documents"
+CONVERSATIONS_SCOPE = "conversations"
+
+# Alapértékek (a config 'tool_cache' szekciója felülírja)
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 600
+
+_generations: Dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+def bump_generation(scope: str = DOCUMENTS_SCOPE) -> int:
+    """Jelzi, hogy a kör adatai megváltoztak. Az új generációszámot adja vissza."""
+    with _generations_lock:
+        _generations[scope] = _generations.get(scope, 0) + 1
+        return _generations[scope]
+
+def get_generation(scope: str = DOCUMENTS_SCOPE) -> int:
+    with _generations_lock:
+        return _generations.get(scope, 0)
+
+def _normalize_argument(value):
+    # A szöveges argumentumoknál a felesleges szóközök nem számítanak különböző hívásnak.
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+def _is_cacheable(result) -> bool:
+    # Az eszközök a hibákat szövegként adják vissza; ezeket nem őrizzük meg.
+    return not str(result).startswith("Hiba")
+
+class ToolResultCache:
+    """
+    A csak olvasó eszközök eredményeinek LRU + TTL cache-e. A kulcs az eszköz neve és
+    a normalizált argumentumok; egy bejegyzés akkor érvényes, ha nem járt le és a
+    köre (scope) azóta nem lépett új generációba. A találati arány a naplóban látszik.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS, name: str = "ToolCache"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+
+    @classmethod
+    def from_config(cls, config: dict, name: str = "ToolCache") -> "ToolResultCache":
+        cache_config = config.get('tool_cache', {})
+        return cls(
+            max_entries=cache_config.get('max_entries', DEFAULT_MAX_ENTRIES),
+            ttl_seconds=cache_config.get('ttl_seconds', DEFAULT_TTL_SECONDS),
+            name=name
+        )
+
+    @staticmethod
+    def make_key(tool_name: str, args: dict) -> str:
+        normalized = {key: _normalize_argument(value) for key, value in (args or {}).items()}
+        return f"{tool_name}:{json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)}"
+
+    def get_or_compute(self, tool_name: str, args: dict, compute: Callable[[], Any], scope: str = DOCUMENTS_SCOPE):
+        """Visszaadja a cache-elt eredményt, vagy kiszámolja (compute()) és eltárolja."""
+        key = self.make_key(tool_name, args)
+        generation = get_generation(scope)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, stored_at, stored_generation = entry
+                if stored_generation == generation and now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    self._log_lookup("TALÁLAT", tool_name)
+                    return result
+                del self._entries[key]
+                self._invalidations += 1
+            self._misses += 1
+            self._log_lookup("HIÁNY", tool_name)
+
+        result = compute()
+        if _is_cacheable(result):
+            with self._lock:
+                self._entries[key] = (result, time.monotonic(), generation)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+        return result
+
+    def _log_lookup(self, outcome: str, tool_name: str):
+        # A _lock alatt hívjuk.
+        lookups = self._hits + self._misses
+        logging.info(f"{self.name}: {outcome} '{tool_name}' (találati arány: {self._hits}/{lookups} = {self._hits / lookups:.0%})")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "invalidations": self._invalidations,
+                "evictions": self._evictions,
+            }
+
+logging.debug("Eszköz-eredmény cache modul (tool_cache.py) betöltve.")
@@ -0,0 +1,272 @@
+# tool_executor.py
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterable, List, Optional
+
+from langchain_core.messages import ToolMessage
+
+from tracing import bind_context, span
+
+# Alapértékek (a config 'tool_execution' szekciója felülírja)
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT_SECONDS = 30.0
+# Ennyi időtúllépés után is futó olvasó hívásnál az újabbak azonnal hibát kapnak (a szálkészlet nem telik meg velük).
+DEFAULT_MAX_STUCK_CALLS = 2
+
+class ToolCallExecutor:
+    """
+    Egy modellválasz eszközhívásait hajtja végre. A csak olvasó (egymástól független)
+    eszközök egy korlátos szálkészleten egyszerre futnak, így a válasz csak a
+    leglassabbra vár; az író eszközök egymás után, az eredeti sorrendben futnak, egy
+    saját, egyszálas sávon. A visszaadott ToolMessage-ek sorrendje mindig megegyezik a
+    tool_calls sorrendjével. Az időkorlátot túllépő hívás nem szakítható meg, a háttérben
+    tovább fut; ha egy sávon már 'max_stuck_calls' ilyen hívás fut (az író sávon egy is
+    elég), az újabb hívások el sem indulnak, hanem azonnal hibaüzenetet kapnak.
+    """
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, default_timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 timeouts: Optional[Dict[str, float]] = None, concurrent_tools: Optional[Iterable[str]] = None,
+                 name: str = "ToolExecutor", max_stuck_calls: int = DEFAULT_MAX_STUCK_CALLS):
+        self.name = name
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        # Ha nincs megadva, minden eszközt függetlennek (párhuzamosíthatónak) tekintünk.
+        self.concurrent_tools = set(concurrent_tools) if concurrent_tools is not None else None
+        self.max_stuck_calls = max_stuck_calls
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        # Az író eszközök külön sávja: egy beragadt írás nem foglalhatja el az olvasók szálait.
+        self._writer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-writer")
+        # Sávonként az időtúllépés után is futó hívások száma.
+        self._stuck_calls = {self._pool: 0, self._writer_pool: 0}
+        self._stats: Dict[str, dict] = {}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict, concurrent_tools: Optional[Iterable[str]] = None, name: str = "ToolExecutor") -> "ToolCallExecutor":
+        tool_config = config.get('tool_execution', {})
+        return cls(
+            max_workers=tool_config.get('max_workers', DEFAULT_MAX_WORKERS),
+            default_timeout=tool_config.get('default_timeout_seconds', DEFAULT_TIMEOUT_SECONDS),
+            timeouts=tool_config.get('timeouts', {}),
+            concurrent_tools=concurrent_tools,
+            name=name,
+            max_stuck_calls=tool_config.get('max_stuck_calls', DEFAULT_MAX_STUCK_CALLS)
+        )
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.timeouts.get(tool_name, self.default_timeout)
+
+    def is_concurrent(self, tool_name: str) -> bool:
+        return self.concurrent_tools is None or tool_name in self.concurrent_tools
+
+    def _lane_for(self, tool_name: str) -> ThreadPoolExecutor:
+        return self._pool if self.is_concurrent(tool_name) else self._writer_pool
+
+    def _submit(self, tool: Callable, tool_call: dict) -> Optional[Future]:
+        """A hívás indítása a saját sávján; None, ha a sávon már túl sok lejárt hívás fut."""
+        lane = self._lane_for(tool_call['name'])
+        stuck_limit = self.max_stuck_calls if lane is self._pool else 1
+        with self._stats_lock:
+            if self._stuck_calls[lane] >= stuck_limit:
+                return None
+        return lane.submit(bind_context(self._timed_call), tool, tool_call)
+
+    def _release_on_timeout(self, future: Future, tool_name: str):
+        # A még el sem indult hívás visszavonható; a már futó a sávon marad, amíg be nem fejeződik.
+        if future.cancel():
+            return
+        lane = self._lane_for(tool_name)
+        with self._stats_lock:
+            self._stuck_calls[lane] += 1
+        future.add_done_callback(lambda _: self._release_stuck(lane))
+
+    def _release_stuck(self, lane: ThreadPoolExecutor):
+        with self._stats_lock:
+            self._stuck_calls[lane] -= 1
+
+    def _rejected_message(self, tool_name: str) -> str:
+        with self._stats_lock:
+            stats = self._stats.setdefault(tool_name, self._empty_stats())
+            stats["rejected"] += 1
+        logging.warning(f"{self.name}: '{tool_name}' nem indult el, a sávján még korábbi, lejárt hívások futnak.")
+        return f"Hiba: A(z) '{tool_name}' eszköz most nem érhető el, mert korábbi hívásai az időkorlát után is futnak."
+
+    def execute(self, tool_calls: List[dict], tool_registry: Dict[str, Callable], caller: str = "") -> List[ToolMessage]:
+        """Végrehajtja az eszközhívásokat, és a tool_calls sorrendjében adja vissza a ToolMessage-eket."""
+        with span("tool_batch", caller=caller, tools=len(tool_calls)):
+            return self._execute(tool_calls, tool_registry, caller)
+
+    def _execute(self, tool_calls: List[dict], tool_registry: Dict[str, Callable], caller: str) -> List[ToolMessage]:
+        batch_start = time.monotonic()
+        outputs: List[Optional[str]] = [None] * len(tool_calls)
+        futures = {}
+
+        for index, tool_call in enumerate(tool_calls):
+            tool_name = tool_call['name']
+            logging.info(f"--- {caller} Eszközt Használ: {tool_name}, Argumentumok: {tool_call['args']} ---")
+            if tool_name not in tool_registry:
+                outputs[index] = f"Ismeretlen eszköz: {tool_name}"
+            elif self.is_concurrent(tool_name) and len(tool_calls) > 1:
+                future = self._submit(tool_registry[tool_name], tool_call)
+                if future is None:
+                    outputs[index] = self._rejected_message(tool_name)
+                else:
+                    futures[index] = (future, time.monotonic())
+
+        # Az író eszközök sorban futnak, miközben a párhuzamosak már dolgoznak.
+        for index, tool_call in enumerate(tool_calls):
+            if outputs[index] is None and index not in futures:
+                outputs[index] = self._run_inline(tool_registry[tool_call['name']], tool_call)
+
+        for index, (future, submitted_at) in futures.items():
+            tool_name = tool_calls[index]['name']
+            remaining = max(0.0, submitted_at + self.timeout_for(tool_name) - time.monotonic())
+            try:
+                outputs[index] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                self._release_on_timeout(future, tool_name)
+                outputs[index] = self._timeout_message(tool_name)
+
+        if len(tool_calls) > 1:
+            logging.info(f"{self.name}: {len(tool_calls)} eszközhívás kész {time.monotonic() - batch_start:.2f} mp alatt ({len(futures)} párhuzamosan).")
+
+        return [
+            ToolMessage(content=str(output), tool_call_id=tool_call['id'], name=tool_call['name'])
+            for tool_call, output in zip(tool_calls, outputs)
+        ]
+
+    async def aexecute(self, tool_calls: List[dict], tool_registry: Dict[str, Callable], caller: str = "") -> List[ToolMessage]:
+        """
+        Az execute() asyncio változata (lásd async_pipeline.py): a szinkron eszközök ugyanazokon a
+        sávokon futnak, a korutin-eszközök közvetlenül az eseményhurokban. A
+        várakozás nem foglal szálat; a sorrend, az időkorlátok és a hibaüzenetek ugyanazok.
+        """
+        with span("tool_batch", caller=caller, tools=len(tool_calls)):
+            batch_start = time.monotonic()
+            outputs: List[Optional[str]] = [None] * len(tool_calls)
+            tasks = {}
+            for index, tool_call in enumerate(tool_calls):
+                tool_name = tool_call['name']
+                logging.info(f"--- {caller} Eszközt Használ: {tool_name}, Argumentumok: {tool_call['args']} ---")
+                if tool_name not in tool_registry:
+                    outputs[index] = f"Ismeretlen eszköz: {tool_name}"
+                elif self.is_concurrent(tool_name) and len(tool_calls) > 1:
+                    tasks[index] = asyncio.ensure_future(self._acall_with_timeout(tool_registry[tool_name], tool_call))
+
+            # Az író eszközök sorban futnak, miközben a párhuzamosak már dolgoznak.
+            for index, tool_call in enumerate(tool_calls):
+                if outputs[index] is None and index not in tasks:
+                    outputs[index] = await self._acall_with_timeout(tool_registry[tool_call['name']], tool_call)
+
+            for index, task in tasks.items():
+                outputs[index] = await task
+
+            if len(tool_calls) > 1:
+                logging.info(f"{self.name}: {len(tool_calls)} eszközhívás kész {time.monotonic() - batch_start:.2f} mp alatt ({len(tasks)} párhuzamosan).")
+
+            return [
+                ToolMessage(content=str(output), tool_call_id=tool_call['id'], name=tool_call['name'])
+                for tool_call, output in zip(tool_calls, outputs)
+            ]
+
+    async def _acall_with_timeout(self, tool: Callable, tool_call: dict) -> str:
+        tool_name = tool_call['name']
+        if asyncio.iscoroutinefunction(tool):
+            try:
+                return await asyncio.wait_for(self._atimed_call(tool, tool_call), timeout=self.timeout_for(tool_name))
+            except asyncio.TimeoutError:
+                return self._timeout_message(tool_name)
+        future = self._submit(tool, tool_call)
+        if future is None:
+            return self._rejected_message(tool_name)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout_for(tool_name))
+        except asyncio.TimeoutError:
+            self._release_on_timeout(future, tool_name)
+            return self._timeout_message(tool_name)
+
+    async def _atimed_call(self, tool: Callable, tool_call: dict) -> str:
+        tool_name = tool_call['name']
+        with span(f"tool.{tool_name}", args=tool_call['args']) as tool_span:
+            start = time.monotonic()
+            try:
+                output = await tool(**tool_call['args'])
+            except Exception as e:
+                elapsed = time.monotonic() - start
+                self._record(tool_name, elapsed, failed=True)
+                logging.error(f"{self.name}: '{tool_name}' hibára futott ({elapsed:.2f} mp): {e}", exc_info=True)
+                output = f"Hiba történt a(z) '{tool_name}' eszköz futtatása közben: {e}"
+            else:
+                self._record(tool_name, time.monotonic() - start)
+            if str(output).startswith("Hiba"):
+                tool_span.record_error(str(output))
+            return output
+
+    def _run_inline(self, tool: Callable, tool_call: dict) -> str:
+        # A sorban futó hívás is a sávja szálkészletén fut, hogy az időkorlát rá is érvényes legyen.
+        tool_name = tool_call['name']
+        future = self._submit(tool, tool_call)
+        if future is None:
+            return self._rejected_message(tool_name)
+        try:
+            return future.result(timeout=self.timeout_for(tool_name))
+        except FutureTimeoutError:
+            self._release_on_timeout(future, tool_name)
+            return self._timeout_message(tool_name)
+
+    def _timeout_message(self, tool_name: str) -> str:
+        # A lejárt hívás a háttérben még befejeződhet; a futásidejét akkor a _timed_call rögzíti.
+        with self._stats_lock:
+            stats = self._stats.setdefault(tool_name, self._empty_stats())
+            stats["timeouts"] += 1
+        logging.warning(f"{self.name}: '{tool_name}' túllépte az időkorlátot ({self.timeout_for(tool_name):.0f} mp).")
+        return f"Hiba: A(z) '{tool_name}' eszköz nem válaszolt {self.timeout_for(tool_name):.0f} másodpercen belül."
+
+    def _timed_call(self, tool: Callable, tool_call: dict) -> str:
+        tool_name = tool_call['name']
+        with span(f"tool.{tool_name}", args=tool_call['args']) as tool_span:
+            output = self._call_tool(tool, tool_call)
+            if str(output).startswith("Hiba"):
+                tool_span.record_error(str(output))
+            return output
+
+    def _call_tool(self, tool: Callable, tool_call: dict) -> str:
+        tool_name = tool_call['name']
+        start = time.monotonic()
+        try:
+            output = tool(**tool_call['args'])
+        except Exception as e:
+            elapsed = time.monotonic() - start
+            self._record(tool_name, elapsed, failed=True)
+            logging.error(f"{self.name}: '{tool_name}' hibára futott ({elapsed:.2f} mp): {e}", exc_info=True)
+            return f"Hiba történt a(z) '{tool_name}' eszköz futtatása közben: {e}"
+        elapsed = time.monotonic() - start
+        self._record(tool_name, elapsed)
+        logging.info(f"{self.name}: '{tool_name}' lefutott ({elapsed:.2f} mp).")
+        logging.debug(f"Nyers eszköz-kimenet a '{tool_name}' eszköztől: {output}")
+        return output
+
+    @staticmethod
+    def _empty_stats() -> dict:
+        return {"calls": 0, "failures": 0, "timeouts": 0, "rejected": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
+    def _record(self, tool_name: str, elapsed: float, failed: bool = False):
+        with self._stats_lock:
+            stats = self._stats.setdefault(tool_name, self._empty_stats())
+            stats["calls"] += 1
+            stats["failures"] += int(failed)
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def latency_stats(self) -> Dict[str, dict]:
+        """Eszközönként a hívások, hibák és időtúllépések száma, valamint az átlagos és maximális futásidő."""
+        with self._stats_lock:
+            return {
+                tool_name: dict(stats, avg_seconds=stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0)
+                for tool_name, stats in self._stats.items()
+            }
+
+logging.debug("Eszköz-végrehajtó modul (tool_executor.py) betöltve.")
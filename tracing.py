@@ -0,0 +1,306 @@
+# tracing.py
+# Könnyűsúlyú, folyamaton belüli nyomkövetés: egymásba ágyazott span-ek, szálbiztos
+# környezet-továbbítással. A lezárt span-ek JSONL naplóba, a lassú kérések Chrome trace
+# formátumban (chrome://tracing, ui.perfetto.dev - lángdiagram) kerülnek. Parancssor:
+#   python tracing.py slowest [--limit 10]          - a leglassabb kérések (gyökér span-ek)
+#   python tracing.py chrome <trace_id> [--out f]   - egy kérés Chrome trace fájlként a JSONL naplóból
+
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+from memory_stores import LOCAL_DB_PATH
+
+TRACE_DIR = f"{LOCAL_DB_PATH}/traces"
+TRACE_JSONL_FILE = "spans.jsonl"
+
+# Alapértékek (a config 'tracing' szekciója felülírja)
+DEFAULT_SLOW_TRACE_MS = 1000
+DEFAULT_MAX_JSONL_MB = 50
+MAX_ATTRIBUTE_CHARS = 200
+# Ennyi lezárt kérés azonosítóját jegyezzük meg, hogy a később érkező span-ek ne írják felül a Chrome fájlt.
+EXPORTED_TRACES_MEMORY = 1000
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("aito_current_span", default=None)
+_span_ids = itertools.count(1)
+
+def _attribute_value(value):
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    text = str(value)
+    return text if len(text) <= MAX_ATTRIBUTE_CHARS else text[:MAX_ATTRIBUTE_CHARS] + "..."
+
+class Span:
+    """Egy mért szakasz: név, szülő, kezdés, időtartam, attribútumok és az esetleges hiba."""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start_wall", "start", "duration",
+                 "thread_id", "thread_name", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[int], attributes: Optional[dict] = None):
+        thread = threading.current_thread()
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.attributes = {key: _attribute_value(value) for key, value in (attributes or {}).items()}
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = _attribute_value(value)
+
+    def record_error(self, message: str):
+        self.error = _attribute_value(message)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+            "start": self.start_wall, "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "thread_id": self.thread_id, "thread_name": self.thread_name, "attributes": self.attributes, "error": self.error,
+        }
+
+class _NoopSpan:
+    """Kikapcsolt nyomkövetésnél visszaadott span: minden művelete üres."""
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def record_error(self, message: str):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """
+    A span-ek gyűjtője. Minden lezárt span egy sor a JSONL naplóban; amikor egy kérés
+    (trace) utolsó nyitott span-je is lezárul, és a gyökér legalább 'slow_trace_ms'
+    ideig tartott, a kérés teljes span-fája Chrome trace fájlba kerül.
+    """
+    def __init__(self, trace_dir: str = TRACE_DIR, enabled: bool = True, slow_trace_ms: float = DEFAULT_SLOW_TRACE_MS,
+                 max_jsonl_mb: float = DEFAULT_MAX_JSONL_MB):
+        self.trace_dir = trace_dir
+        self.enabled = enabled
+        self.slow_trace_ms = slow_trace_ms
+        self.max_jsonl_bytes = max_jsonl_mb * 1024 * 1024
+        self.jsonl_path = os.path.join(trace_dir, TRACE_JSONL_FILE)
+        self._open: Dict[str, int] = {}
+        self._finished: Dict[str, List[Span]] = {}
+        self._exported = deque(maxlen=EXPORTED_TRACES_MEMORY)
+        self._lock = threading.Lock()
+        if enabled:
+            os.makedirs(trace_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Tracer":
+        tracing_config = config.get('tracing', {})
+        return cls(
+            trace_dir=tracing_config.get('dir', TRACE_DIR),
+            enabled=tracing_config.get('enabled', True),
+            slow_trace_ms=tracing_config.get('slow_trace_ms', DEFAULT_SLOW_TRACE_MS),
+            max_jsonl_mb=tracing_config.get('max_jsonl_mb', DEFAULT_MAX_JSONL_MB)
+        )
+
+    def start_span(self, name: str, attributes: Optional[dict] = None) -> Span:
+        parent = _current_span.get()
+        if isinstance(parent, Span):
+            new_span = Span(name, parent.trace_id, parent.span_id, attributes)
+        else:
+            new_span = Span(name, uuid.uuid4().hex, None, attributes)
+        with self._lock:
+            self._open[new_span.trace_id] = self._open.get(new_span.trace_id, 0) + 1
+        return new_span
+
+    def finish_span(self, finished: Span):
+        finished.duration = time.perf_counter() - finished.start
+        completed = None
+        with self._lock:
+            self._finished.setdefault(finished.trace_id, []).append(finished)
+            self._open[finished.trace_id] -= 1
+            if self._open[finished.trace_id] == 0:
+                del self._open[finished.trace_id]
+                completed = self._finished.pop(finished.trace_id)
+        try:
+            self._append_jsonl(finished)
+            if completed is not None:
+                self._export_completed(completed)
+        except Exception as e:
+            # A nyomkövetés hibája soha nem akaszthatja meg a mért műveletet.
+            logging.warning(f"A nyomkövetési adatok írása sikertelen: {e}")
+
+    def _append_jsonl(self, finished: Span):
+        with self._lock:
+            if os.path.exists(self.jsonl_path) and os.path.getsize(self.jsonl_path) > self.max_jsonl_bytes:
+                os.replace(self.jsonl_path, f"{self.jsonl_path}.1")
+            with open(self.jsonl_path, "a", encoding="utf-8") as jsonl_file:
+                jsonl_file.write(json.dumps(finished.to_dict(), ensure_ascii=False) + "\n")
+
+    def _export_completed(self, spans: List[Span]):
+        trace_id = spans[0].trace_id
+        roots = [candidate for candidate in spans if candidate.parent_id is None]
+        if not roots or trace_id in self._exported:
+            # A gyökér már korábban lezárult (késve érkező span-ek): ezek csak a JSONL-ben szerepelnek.
+            return
+        self._exported.append(trace_id)
+        root = roots[0]
+        # A kérés teljes ideje: a gyökér (pl. send_click) hamarabb is lezárulhat, mint a háttérszálon futó válasz.
+        elapsed = max(item.start_wall + item.duration for item in spans) - root.start_wall
+        if elapsed * 1000 < self.slow_trace_ms:
+            return
+        started = datetime.fromtimestamp(root.start_wall, tz=timezone.utc).strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.trace_dir, f"{started}-{root.name}-{trace_id[:8]}.json")
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump(chrome_trace([span_item.to_dict() for span_item in spans]), trace_file, ensure_ascii=False)
+        logging.info(f"Lassú kérés ({root.name}, {elapsed:.2f} mp) nyomkövetése elmentve: {path}")
+
+_tracer = Tracer(enabled=False)
+
+def configure_tracing(config: dict) -> Tracer:
+    """A folyamat nyomkövetőjének beállítása a config 'tracing' szekciója alapján (az alkalmazás indulásakor)."""
+    tracer = Tracer.from_config(config)
+    set_tracer(tracer)
+    return tracer
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    """A folyamat nyomkövetőjének cseréje (pl. tesztekben); az előzőt adja vissza."""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+def current_span():
+    """Az aktuális (legbelső) span, vagy NOOP_SPAN, ha nincs ilyen."""
+    return _current_span.get() or NOOP_SPAN
+
+@contextmanager
+def span(name: str, **attributes):
+    """Egy mért szakasz; a belül nyitott span-ek (és a bind_context-tel indított szálak span-jei) a gyermekei."""
+    tracer = _tracer
+    if not tracer.enabled:
+        yield NOOP_SPAN
+        return
+    new_span = tracer.start_span(name, attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.record_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer.finish_span(new_span)
+
+def traced(name: Optional[str] = None):
+    """Dekorátor: a függvény minden hívása egy span (alapértelmezésben a függvény nevével); korutinra is."""
+    def decorator(function: Callable):
+        span_name = name or function.__name__
+        if asyncio.iscoroutinefunction(function):
+            @wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def bind_context(function: Callable) -> Callable:
+    """
+    A hívás pillanatában aktuális span-t a függvényhez köti, így egy másik szálon
+    (threading.Thread, szálkészlet) futtatva is az indító span gyermeke lesz.
+    """
+    parent = _current_span.get()
+    @wraps(function)
+    def run_in_context(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return run_in_context
+
+def chrome_trace(span_dicts: List[dict]) -> dict:
+    """A span-ek Chrome trace ("Trace Event") formátumban: szálanként egy sáv, span-enként egy "X" esemény."""
+    pid = os.getpid()
+    events, threads = [], {}
+    for item in sorted(span_dicts, key=lambda item: item["start"]):
+        threads.setdefault(item["thread_id"], item["thread_name"])
+        args = dict(item["attributes"])
+        if item.get("error"):
+            args["error"] = item["error"]
+        events.append({
+            "name": item["name"], "cat": item["name"].split(".")[0], "ph": "X", "pid": pid, "tid": item["thread_id"],
+            "ts": item["start"] * 1_000_000, "dur": item["duration_ms"] * 1000, "args": args,
+        })
+    for thread_id, thread_name in threads.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def load_spans(jsonl_path: str, trace_id: Optional[str] = None) -> List[dict]:
+    """A JSONL napló span-jei (a forgatott előző fájllal együtt), opcionálisan egyetlen kérésre szűrve."""
+    spans = []
+    for path in (f"{jsonl_path}.1", jsonl_path):
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as jsonl_file:
+            for line in jsonl_file:
+                item = json.loads(line)
+                if trace_id is None or item["trace_id"].startswith(trace_id):
+                    spans.append(item)
+    return spans
+
+def slowest_traces(jsonl_path: str, limit: int = 10) -> List[dict]:
+    roots = [item for item in load_spans(jsonl_path) if item["parent_id"] is None]
+    return sorted(roots, key=lambda item: item["duration_ms"], reverse=True)[:limit]
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Az AITO nyomkövetési naplójának elemzése.")
+    parser.add_argument("command", choices=["slowest", "chrome"])
+    parser.add_argument("trace_id", nargs="?", help="chrome: a kérés azonosítója (vagy annak eleje)")
+    parser.add_argument("--jsonl", default=os.path.join(TRACE_DIR, TRACE_JSONL_FILE))
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--out", help="chrome: a kimeneti fájl (alapértelmezés: trace-<azonosító>.json)")
+    args = parser.parse_args(argv)
+
+    if args.command == "slowest":
+        for item in slowest_traces(args.jsonl, args.limit):
+            started = datetime.fromtimestamp(item["start"], tz=timezone.utc).isoformat(timespec="seconds")
+            print(f"{item['trace_id']}  {item['duration_ms']:>10.1f} ms  {started}  {item['name']}")
+        return
+    if not args.trace_id:
+        parser.error("a 'chrome' parancshoz meg kell adni a kérés azonosítóját")
+    spans = load_spans(args.jsonl, args.trace_id)
+    if not spans:
+        print(f"Nincs '{args.trace_id}' azonosítójú kérés a naplóban.")
+        return
+    out = args.out or f"trace-{spans[0]['trace_id'][:8]}.json"
+    with open(out, "w", encoding="utf-8") as trace_file:
+        json.dump(chrome_trace(spans), trace_file, ensure_ascii=False)
+    print(f"{len(spans)} span kiírva: {out} (megnyitható: chrome://tracing vagy ui.perfetto.dev)")
+
+logging.debug("Nyomkövetési modul (tracing.py) betöltve.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
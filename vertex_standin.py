@@ -0,0 +1,314 @@
+# vertex_standin.py
+# Helyi helyettesítő a Vertex AI chat modellhez (ChatVertexAI) és embeddinghez
+# (VertexAIEmbeddings), hálózat és GCP fiók nélkül. A config_aito.yaml-ban választható:
+#   chat_backend: "standin"          - minden chat modell (model_factory.create_chat_model)
+#   embeddings: {backend: "standin"} - az embedding háttér (embedding_backends.py)
+# A viselkedést a 'vertex_standin' szekció adja: visszhang vagy forgatókönyv szerinti
+# válaszok, eszközhívások, strukturált kimenet, késleltetés-eloszlás, modellenkénti
+# token- és kéréskvóta (429), valamint véletlen hibák - így a párhuzamosság és a
+# visszatorlódás kezelése laptopon is terhelés alatt tesztelhető.
+
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+from document_reader import CHARS_PER_TOKEN
+
+# Alapértékek (a config 'vertex_standin' szekciójának 'chat' / 'embeddings' alszekciója felülírja)
+DEFAULT_CHAT_LATENCY = {"distribution": "lognormal", "median_ms": 800, "sigma": 0.5}
+DEFAULT_EMBEDDING_LATENCY = {"distribution": "uniform", "min_ms": 50, "max_ms": 150}
+DEFAULT_OUTPUT_TOKENS_PER_SECOND = 80
+# A ChatVertexAI alapértelmezett újrapróbálkozása (exponenciális várakozás 4 és 10 mp között).
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_RETRY_MIN_SECONDS = 4.0
+DEFAULT_RETRY_MAX_SECONDS = 10.0
+QUOTA_WINDOW_SECONDS = 60.0
+ECHO_MAX_CHARS = 500
+
+class StandinRateLimitError(Exception):
+    """Szimulált kvótatúllépés; a szövege a Vertex AI-éhoz hasonló ("429 ... RESOURCE_EXHAUSTED")."""
+
+class StandinServiceError(Exception):
+    """Szimulált szolgáltatáshiba (503)."""
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text or "") // CHARS_PER_TOKEN)
+
+def sample_latency(spec: Optional[dict], rng: random.Random) -> float:
+    """
+    Egy késleltetés (mp) a megadott eloszlásból: {"distribution": "fixed", "ms"},
+    "uniform" (min_ms, max_ms), "lognormal" (median_ms, sigma) vagy "exponential" (mean_ms).
+    """
+    if not spec:
+        return 0.0
+    distribution = spec.get("distribution", "fixed")
+    if distribution == "fixed":
+        milliseconds = spec.get("ms", 0)
+    elif distribution == "uniform":
+        milliseconds = rng.uniform(spec.get("min_ms", 0), spec.get("max_ms", 0))
+    elif distribution == "lognormal":
+        milliseconds = spec.get("median_ms", 0) * math.exp(rng.gauss(0, spec.get("sigma", 0.5)))
+    elif distribution == "exponential":
+        milliseconds = rng.expovariate(1 / spec["mean_ms"]) if spec.get("mean_ms") else 0
+    else:
+        raise ValueError(f"Ismeretlen késleltetés-eloszlás: '{distribution}' (fixed, uniform, lognormal, exponential)")
+    return max(0.0, milliseconds) / 1000
+
+class ServiceSimulator:
+    """
+    Egy szimulált szolgáltatás-végpont viselkedése: késleltetés, csúszóablakos (60 mp)
+    token- és kéréskvóta, véletlen 429 és 503 hibák. Egy modellnév összes példánya
+    ugyanazon a szimulátoron osztozik (lásd get_simulator), ahogy a valódi kvóta is
+    projektenként és modellenként közös.
+    """
+    def __init__(self, name: str, latency: Optional[dict] = None, tokens_per_minute: int = 0, requests_per_minute: int = 0,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.latency = latency
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.sleep = sleep
+        self._window: deque = deque()  # (időpont, tokenek)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "rate_limited": 0, "errors": 0, "tokens": 0}
+
+    @classmethod
+    def from_config(cls, name: str, section: dict, default_latency: Optional[dict] = None, seed: Optional[int] = None) -> "ServiceSimulator":
+        return cls(
+            name,
+            latency=section.get('latency', default_latency),
+            tokens_per_minute=section.get('tokens_per_minute', 0),
+            requests_per_minute=section.get('requests_per_minute', 0),
+            rate_limit_rate=section.get('rate_limit_rate', 0.0),
+            error_rate=section.get('error_rate', 0.0),
+            seed=seed
+        )
+
+    def admit(self, tokens: int):
+        """Egy kérés beengedése: kvóta és hibainjektálás, majd a késleltetés kivárása."""
+        with self._lock:
+            now = self.clock()
+            while self._window and now - self._window[0][0] >= QUOTA_WINDOW_SECONDS:
+                self._window.popleft()
+            used_tokens = sum(count for _, count in self._window)
+            self._stats["calls"] += 1
+            over_quota = ((self.tokens_per_minute and used_tokens + tokens > self.tokens_per_minute)
+                          or (self.requests_per_minute and len(self._window) + 1 > self.requests_per_minute))
+            if over_quota or self.random.random() < self.rate_limit_rate:
+                self._stats["rate_limited"] += 1
+                raise StandinRateLimitError(
+                    f"429 RESOURCE_EXHAUSTED: Quota exceeded for {self.name} "
+                    f"({used_tokens}/{self.tokens_per_minute or '-'} token, {len(self._window)}/{self.requests_per_minute or '-'} kérés / perc)")
+            if self.random.random() < self.error_rate:
+                self._stats["errors"] += 1
+                raise StandinServiceError(f"503 Service Unavailable: {self.name} (szimulált hiba)")
+            self._window.append((now, tokens))
+            self._stats["tokens"] += tokens
+            delay = sample_latency(self.latency, self.random)
+        self.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+_simulators: Dict[tuple, ServiceSimulator] = {}
+# A forgatókönyv modellenként közös: egy új modell-példány (pl. a következő ATOM-kör) a következő válasszal folytatja.
+_script_positions: Dict[str, int] = {}
+_simulators_lock = threading.Lock()
+
+def get_simulator(config: dict, kind: str, model_name: str) -> ServiceSimulator:
+    """A 'kind' ("chat" / "embeddings") és a modellnév közös szimulátora (az első kérés beállításaival)."""
+    standin_config = config.get('vertex_standin', {})
+    key = (kind, model_name)
+    with _simulators_lock:
+        if key not in _simulators:
+            default_latency = DEFAULT_CHAT_LATENCY if kind == "chat" else DEFAULT_EMBEDDING_LATENCY
+            _simulators[key] = ServiceSimulator.from_config(f"{kind}:{model_name}", standin_config.get(kind, {}),
+                                                            default_latency=default_latency, seed=standin_config.get('seed'))
+        return _simulators[key]
+
+def reset_simulators():
+    """A megosztott szimulátorok (kvóta-ablakaik) és a forgatókönyv-pozíciók törlése, pl. két terheléses futás között."""
+    with _simulators_lock:
+        _simulators.clear()
+        _script_positions.clear()
+
+def _message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in message.content)
+
+def placeholder_from_schema(schema: dict, text: str = "", definitions: Optional[dict] = None) -> Any:
+    """Egy JSON-sémának megfelelő minimális érték (a kötelező mezőkkel), a strukturált kimenethez és az eszközhívásokhoz."""
+    definitions = definitions if definitions is not None else schema.get("definitions", schema.get("$defs", {}))
+    if "$ref" in schema:
+        return placeholder_from_schema(definitions[schema["$ref"].split("/")[-1]], text, definitions)
+    for combinator in ("anyOf", "oneOf", "allOf"):
+        if combinator in schema:
+            options = [option for option in schema[combinator] if option.get("type") != "null"] or schema[combinator]
+            return placeholder_from_schema(options[0], text, definitions)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "default" in schema:
+        return schema["default"]
+    schema_type = schema.get("type", "object")
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        return {name: placeholder_from_schema(properties[name], text, definitions) for name in schema.get("required", []) if name in properties}
+    return {"array": [], "string": text or "STANDIN", "integer": 0, "number": 0.0, "boolean": False}.get(schema_type)
+
+class StandinChatModel(BaseChatModel):
+    """
+    A ChatVertexAI helyettesítője. 'mode' = "echo": a legutóbbi üzenetet adja vissza
+    (ha 'call_tools' és vannak kötött eszközök, előbb az első eszközt hívja meg);
+    "script": a 'script' válaszait adja sorban, körbe. Egy script-elem szöveg, vagy
+    {"content": ..., "tool_calls": [{"name", "args"}], "structured": {...}}. A
+    with_structured_output() a séma kötelező mezőit tölti ki (vagy a 'structured' értéket
+    adja). Hívásonként a ServiceSimulator szerinti késleltetés, kvóta és hiba; 429 esetén
+    a ChatVertexAI-hoz hasonlóan exponenciális várakozással újrapróbál (on_retry visszahívással).
+    """
+    model_name: str = "standin"
+    mode: str = "echo"
+    script: List[Any] = Field(default_factory=list)
+    call_tools: bool = False
+    output_tokens_per_second: float = DEFAULT_OUTPUT_TOKENS_PER_SECOND
+    max_retries: int = DEFAULT_MAX_RETRIES
+    retry_min_seconds: float = DEFAULT_RETRY_MIN_SECONDS
+    retry_max_seconds: float = DEFAULT_RETRY_MAX_SECONDS
+    simulator: Any = None
+
+    @classmethod
+    def from_config(cls, config: dict, model_name: str, callbacks: Optional[list] = None) -> "StandinChatModel":
+        chat_config = config.get('vertex_standin', {}).get('chat', {})
+        return cls(
+            model_name=model_name,
+            mode=chat_config.get('mode', "echo"),
+            script=chat_config.get('script', []),
+            call_tools=chat_config.get('call_tools', False),
+            output_tokens_per_second=chat_config.get('output_tokens_per_second', DEFAULT_OUTPUT_TOKENS_PER_SECOND),
+            max_retries=chat_config.get('max_retries', DEFAULT_MAX_RETRIES),
+            retry_min_seconds=chat_config.get('retry_min_seconds', DEFAULT_RETRY_MIN_SECONDS),
+            retry_max_seconds=chat_config.get('retry_max_seconds', DEFAULT_RETRY_MAX_SECONDS),
+            simulator=get_simulator(config, "chat", model_name),
+            callbacks=callbacks
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "vertex-standin"
+
+    def bind_tools(self, tools: Sequence[Any], tool_choice: Optional[str] = None, **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _next_script_entry(self) -> Any:
+        if not self.script:
+            return None
+        with _simulators_lock:
+            position = _script_positions.get(self.model_name, 0)
+            _script_positions[self.model_name] = position + 1
+        return self.script[position % len(self.script)]
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[dict]], tool_choice: Optional[str]) -> AIMessage:
+        last_text = _message_text(messages[-1]) if messages else ""
+        entry = self._next_script_entry() if self.mode == "script" else None
+        if isinstance(entry, str):
+            entry = {"content": entry}
+        entry = entry or {}
+
+        tool_calls = [{"name": call["name"], "args": call.get("args", {}), "id": f"call_{uuid.uuid4().hex[:12]}"}
+                      for call in entry.get("tool_calls", [])]
+        if tools and tool_choice:
+            # Strukturált kimenet (with_structured_output): az egyetlen "eszköz" a séma, a script-elem eszközhívásai nem számítanak.
+            function = tools[0]["function"]
+            args = entry.get("structured") or placeholder_from_schema(function.get("parameters", {}), last_text[:ECHO_MAX_CHARS])
+            tool_calls = [{"name": function["name"], "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}]
+        elif tools and self.call_tools and self.mode == "echo" and not isinstance(messages[-1], ToolMessage):
+            function = tools[0]["function"]
+            args = placeholder_from_schema(function.get("parameters", {}), last_text[:ECHO_MAX_CHARS])
+            tool_calls = [{"name": function["name"], "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}]
+
+        content = entry.get("content", "" if tool_calls else f"[{self.model_name}] {last_text[:ECHO_MAX_CHARS]}")
+        prompt_tokens = sum(estimate_tokens(_message_text(message)) for message in messages)
+        completion_tokens = estimate_tokens(content + json.dumps([call["args"] for call in tool_calls]))
+        return AIMessage(content=content, tool_calls=tool_calls, usage_metadata={
+            "input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens})
+
+    def _admit(self, messages: List[BaseMessage], run_manager: Optional[CallbackManagerForLLMRun]):
+        """A kérés beengedése a szimulátoron; 429 esetén exponenciálisan várakozva újrapróbál."""
+        from tenacity import Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+        tokens = sum(estimate_tokens(_message_text(message)) for message in messages)
+        simulator = self.simulator or get_simulator({}, "chat", self.model_name)
+        def before_sleep(retry_state):
+            if run_manager:
+                run_manager.on_retry(retry_state)
+        for attempt in Retrying(stop=stop_after_attempt(self.max_retries + 1), reraise=True, before_sleep=before_sleep,
+                                retry=retry_if_exception_type(StandinRateLimitError),
+                                wait=wait_exponential(multiplier=1, min=self.retry_min_seconds, max=self.retry_max_seconds)):
+            with attempt:
+                simulator.admit(tokens)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self._admit(messages, run_manager)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        if self.output_tokens_per_second:
+            time.sleep(message.usage_metadata["output_tokens"] / self.output_tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self._admit(messages, run_manager)
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        words = message.content.split(" ") if message.content else []
+        for index, word in enumerate(words):
+            text = word if index == 0 else f" {word}"
+            if self.output_tokens_per_second:
+                time.sleep(estimate_tokens(text) / self.output_tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+        # Az utolsó darab hordozza az eszközhívásokat és a token-felhasználást.
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=message.usage_metadata,
+            tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"], ensure_ascii=False), "id": call["id"], "index": index}
+                              for index, call in enumerate(message.tool_calls)]))
+
+class StandinEmbeddings(Embeddings):
+    """
+    A VertexAIEmbeddings helyettesítője: a vektorokat a determinisztikus helyi hash-embedding
+    (embedding_backends.HashingEmbeddings) adja, kérésenként a szimulátor késleltetésével,
+    kvótájával és hibáival. A 429-et nem próbálja újra: azt a hívó (pl. document_processor) kezeli.
+    """
+    def __init__(self, base: Embeddings, simulator: ServiceSimulator):
+        self.base = base
+        self.simulator = simulator
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.simulator.admit(sum(estimate_tokens(text) for text in texts))
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.simulator.admit(estimate_tokens(text))
+        return self.base.embed_query(text)
+
+logging.debug("Vertex AI helyettesítő modul (vertex_standin.py) betöltve.")
@@ -0,0 +1,115 @@
+# warmup.py
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+class WarmupError(Exception):
+    """Egy komponens nem tudott elindulni, mert egy függősége hibára futott."""
+
+class WarmupOrchestrator:
+    """
+    Az indításkor szükséges, lassú komponenseket (embedding kliens, vektor-tárolók,
+    beszélgetés-napló, LLM motor, gráf fordítás) párhuzamosan, háttérszálakon építi fel.
+    Minden komponenshez egy név alatt elérhető Future tartozik: a hívók ezen várnak
+    (get), a UI pedig azonnal interaktív marad. A függőségek csak akkor indulnak,
+    amikor minden előfeltételük elkészült, így egy munkaszál sem blokkol feleslegesen.
+    """
+    def __init__(self, max_workers: int = 4, name: str = "Warmup"):
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._futures: Dict[str, Future] = {}
+        self._timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+
+    def submit(self, name: str, fn: Callable, depends_on: Iterable[str] = ()) -> Future:
+        """
+        Elindít egy komponenst. Az 'fn' a 'depends_on' komponensek eredményeit kapja
+        meg pozícionális argumentumként, a felsorolás sorrendjében.
+        """
+        depends_on = list(depends_on)
+        with self._lock:
+            if name in self._futures:
+                raise ValueError(f"A(z) '{name}' komponens már el lett indítva.")
+            dependencies = [self._futures[dependency] for dependency in depends_on]
+            future = Future()
+            self._futures[name] = future
+
+        remaining = [len(dependencies)]
+        remaining_lock = threading.Lock()
+
+        def launch():
+            failed = [dep_name for dep_name, dep in zip(depends_on, dependencies) if dep.exception() is not None]
+            if failed:
+                future.set_exception(WarmupError(f"A(z) '{name}' nem indult el, mert hibára futott: {', '.join(failed)}"))
+                return
+            self._pool.submit(self._run, name, fn, [dep.result() for dep in dependencies], future)
+
+        def on_dependency_done(_):
+            with remaining_lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                launch()
+
+        if not dependencies:
+            launch()
+        for dependency in dependencies:
+            dependency.add_done_callback(on_dependency_done)
+        return future
+
+    def _run(self, name: str, fn: Callable, args: list, future: Future):
+        start = time.monotonic()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self._timings[name] = elapsed
+            logging.error(f"{self.name}: '{name}' inicializálása sikertelen ({elapsed:.2f} mp): {e}", exc_info=True)
+            future.set_exception(e)
+            return
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._timings[name] = elapsed
+        logging.info(f"{self.name}: '{name}' kész ({elapsed:.2f} mp, indítás óta {time.monotonic() - self._started_at:.2f} mp).")
+        future.set_result(result)
+
+    def future(self, name: str) -> Future:
+        with self._lock:
+            return self._futures[name]
+
+    def get(self, name: str, timeout: Optional[float] = None):
+        """Megvárja a komponens elkészültét és visszaadja. Hiba esetén az eredeti kivételt dobja tovább."""
+        return self.future(name).result(timeout=timeout)
+
+    def is_ready(self, name: str) -> bool:
+        with self._lock:
+            future = self._futures.get(name)
+        return future is not None and future.done() and future.exception() is None
+
+    def timings(self) -> Dict[str, float]:
+        """Az eddig elkészült (vagy hibára futott) komponensek inicializálási ideje, másodpercben."""
+        with self._lock:
+            return dict(self._timings)
+
+    def wait_all(self, timeout: Optional[float] = None) -> bool:
+        """Megvárja az összes komponenst. True, ha mind hiba nélkül elkészült."""
+        with self._lock:
+            futures = list(self._futures.values())
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for future in futures:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            try:
+                future.result(timeout=remaining)
+            except Exception:
+                return False
+        return True
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait)
+
+logging.debug("Bemelegítő modul (warmup.py) sikeresen betöltve.")